@@ -2,4 +2,4 @@
 This module contains all the relevant smart contracts for Folks Finance Protocol
 """
 
-__all__ = ["common", "testing", "xalgo"]
+__all__ = ["common", "offchain", "testing", "xalgo"]
@@ -0,0 +1,398 @@
+"""
+Peephole optimiser over the TEAL generated by PyTeal.
+
+The passes only rewrite patterns which are equivalent regardless of the surrounding code:
+- subroutines without branches nor local frame variables are inlined when called once or when small enough, with
+  their arguments read from the stack of the caller with dig and uncover instead of through the frame
+- a store immediately followed by a load of the same slot is removed when the slot is not used anywhere else
+- consecutive identical reads (loads, frame digs, transaction and global fields, global state) are collapsed
+- constants are assembled into intcblock and bytecblock ordered by usage frequency
+
+Run with `python3 -m common.utils.peephole <TEAL_FILE>` to print the optimised program and report.
+"""
+import argparse
+import sys
+from base64 import b32decode, b64decode
+from collections import Counter
+from dataclasses import dataclass, field
+from algosdk.encoding import checksum, decode_address
+
+Instruction = tuple[str, str]
+
+BRANCH_OPS = {"b", "bz", "bnz", "switch", "match"}
+TERMINAL_OPS = {"b", "retsub", "return", "err"}
+FRAME_OPS = {"frame_dig", "frame_bury"}
+DYNAMIC_SCRATCH_OPS = {"loads", "stores", "gload", "gloads", "gloadss"}
+# reads which return the same value when repeated back to back
+PURE_READ_OPS = {"load", "frame_dig", "txn", "txna", "global"}
+IMPURE_GLOBAL_FIELDS = {"OpcodeBudget"}
+
+# number of values popped and pushed by the ops which subroutines with arguments may use to be inlined
+STACK_EFFECTS = {
+    **{op: (0, 1) for op in ("int", "pushint", "byte", "pushbytes", "method", "addr", "txn", "txna", "global", "load")},
+    **{op: (1, 0) for op in ("pop", "store", "assert", "log", "itxn_field")},
+    **{op: (1, 1) for op in (
+        "!", "~", "len", "itob", "btoi", "sha256", "keccak256", "sqrt", "bitlen", "bzero", "extract", "gtxns",
+        "app_global_get", "balance", "min_balance",
+    )},
+    **{op: (1, 2) for op in ("dup", "box_get", "app_params_get", "acct_params_get", "asset_params_get")},
+    **{op: (2, 1) for op in (
+        "+", "-", "*", "/", "%", "<", ">", "<=", ">=", "==", "!=", "&&", "||", "&", "|", "^", "exp", "concat",
+        "getbit", "getbyte", "extract_uint16", "extract_uint32", "extract_uint64", "replace2",
+        "b+", "b-", "b*", "b/", "b%", "b<", "b>", "b<=", "b>=", "b==", "b!=",
+    )},
+    **{op: (2, 0) for op in ("app_global_put", "box_put")},
+    **{op: (2, 2) for op in ("swap", "mulw", "addw", "expw", "asset_holding_get")},
+    **{op: (3, 1) for op in ("divw", "select", "setbit", "setbyte", "extract3", "substring3", "replace3", "box_extract")},
+    "box_replace": (3, 0),
+    "divmodw": (4, 4),
+}
+
+NAMED_INTS = {
+    # transaction types
+    "unknown": 0, "pay": 1, "keyreg": 2, "acfg": 3, "axfer": 4, "afrz": 5, "appl": 6,
+    # on completion actions
+    "NoOp": 0, "OptIn": 1, "CloseOut": 2, "ClearState": 3, "UpdateApplication": 4, "DeleteApplication": 5,
+}
+
+# size in bytes of the immediates of each op, ops not listed have none
+IMMEDIATE_SIZES = {
+    "b": 2, "bz": 2, "bnz": 2, "callsub": 2,
+    "txna": 2, "gtxn": 2, "gtxna": 3, "gtxnsa": 2, "itxna": 2, "gitxn": 2, "gitxna": 3, "gtxnas": 2, "gload": 2,
+    "extract": 2, "substring": 2, "proto": 2,
+}
+
+
+@dataclass
+class OptimisationReport:
+    size_before: int
+    size_after: int = 0
+    ops_before: int = 0
+    ops_after: int = 0
+    # number of call sites inlined of each subroutine
+    inlined: dict[str, int] = field(default_factory=dict)
+    # opcodes no longer executed by each call of the inlined subroutines, which are straight-line so always the same
+    ops_saved_per_call: dict[str, int] = field(default_factory=dict)
+    removed_store_loads: int = 0
+    collapsed_reads: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.size_before - self.size_after
+
+    @property
+    def ops_saved(self) -> int:
+        return self.ops_before - self.ops_after
+
+    @property
+    def call_ops_saved(self) -> int:
+        # opcodes saved by a program which makes every inlined call once
+        return sum(self.inlined[name] * ops_saved for name, ops_saved in self.ops_saved_per_call.items())
+
+    def __str__(self) -> str:
+        num_inlined = sum(self.inlined.values())
+        return (
+            f"size {self.size_before} -> {self.size_after} bytes ({self.bytes_saved} saved), "
+            f"{self.ops_before} -> {self.ops_after} ops ({self.ops_saved} saved), "
+            f"{num_inlined} calls inlined ({self.call_ops_saved} opcodes saved when each is executed once), "
+            f"{self.removed_store_loads} store/load pairs removed, {self.collapsed_reads} reads collapsed"
+        )
+
+
+def parse(teal: str) -> list[Instruction]:
+    instructions = []
+    for line in teal.splitlines():
+        line = line.strip()
+        if not line or line.startswith("//"):
+            continue
+        op, _, args = line.partition(" ")
+        instructions.append((op, args.strip()))
+    return instructions
+
+
+def render(instructions: list[Instruction]) -> str:
+    return "\n".join(f"{op} {args}" if args else op for op, args in instructions) + "\n"
+
+
+def is_label(instruction: Instruction) -> bool:
+    return instruction[0].endswith(":")
+
+
+def _uvarint_size(n: int) -> int:
+    size = 1
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+
+def parse_int(arg: str) -> int:
+    if arg in NAMED_INTS:
+        return NAMED_INTS[arg]
+    return int(arg, 0)
+
+
+def parse_bytes(op: str, arg: str) -> bytes:
+    if op == "addr":
+        return decode_address(arg)
+    if op == "method":
+        return checksum(arg.strip('"').encode())[:4]
+    if arg.startswith('"'):
+        return arg[1:-1].encode().decode("unicode_escape").encode("latin-1")
+    if arg.startswith("0x"):
+        return bytes.fromhex(arg[2:])
+    encoding, _, value = arg.partition(" ") if " " in arg else arg.partition("(")
+    value = value.strip("()")
+    if encoding in ("base64", "b64"):
+        return b64decode(value)
+    if encoding in ("base32", "b32"):
+        return b32decode(value + "=" * (-len(value) % 8))
+    raise ValueError(f"Unsupported byte constant {arg}")
+
+
+def instruction_size(instruction: Instruction) -> int:
+    op, args = instruction
+    if is_label(instruction):
+        return 0
+    if op == "#pragma":
+        # version
+        return 1
+    if op == "pushint":
+        return 1 + _uvarint_size(int(args))
+    if op == "pushbytes":
+        value = bytes.fromhex(args[2:])
+        return 1 + _uvarint_size(len(value)) + len(value)
+    if op == "intcblock":
+        values = [int(value) for value in args.split()]
+        return 1 + _uvarint_size(len(values)) + sum(_uvarint_size(value) for value in values)
+    if op == "bytecblock":
+        values = [bytes.fromhex(value[2:]) for value in args.split()]
+        return 1 + _uvarint_size(len(values)) + sum(_uvarint_size(len(value)) + len(value) for value in values)
+    if op in ("switch", "match"):
+        return 2 + 2 * len(args.split())
+    if op in IMMEDIATE_SIZES:
+        return 1 + IMMEDIATE_SIZES[op]
+    # remaining ops have a single byte immediate per argument
+    return 1 + len(args.split())
+
+
+def count_ops(instructions: list[Instruction]) -> int:
+    return sum(1 for instruction in instructions if not is_label(instruction) and instruction[0] != "#pragma")
+
+
+def _get_subroutine(instructions: list[Instruction], start: int) -> tuple[int, list[Instruction]] | None:
+    """
+    The end index and body of the inlineable subroutine at the label at the given index, if there is one. The body of
+    a subroutine with arguments reads them from the stack of the caller in place of the frame.
+    """
+    if start + 1 >= len(instructions) or instructions[start + 1][0] != "proto":
+        return None
+    num_args, num_returns = map(int, instructions[start + 1][1].split())
+    if start == 0 or instructions[start - 1][0] not in TERMINAL_OPS:
+        return None
+    body = []
+    for end in range(start + 2, len(instructions)):
+        op, args = instructions[end]
+        if op == "retsub":
+            if not num_args:
+                return end, body
+            body = _read_args_from_stack(body, num_args, num_returns)
+            return None if body is None else (end, body)
+        if is_label(instructions[end]) or op in BRANCH_OPS | {"frame_bury", "dupn", "popn"}:
+            return None
+        # only arguments are read from the frame, which sit below the frame pointer
+        if op == "frame_dig" and not -num_args <= int(args) < 0:
+            return None
+        body.append((op, args))
+    return None
+
+
+def _read_args_from_stack(body: list[Instruction], num_args: int, num_returns: int) -> list[Instruction] | None:
+    """
+    Rewrite the frame digs of the arguments to dig them from the stack of the caller, or to uncover them at their
+    last read so none is left behind. None if an argument is never read, an op of the body has an unknown stack
+    effect or the body would reach below its own values.
+    """
+    last_reads = {int(args): i for i, (op, args) in enumerate(body) if op == "frame_dig"}
+    if len(last_reads) != num_args:
+        return None
+    # arguments yet to be uncovered from the bottom of the stack up, then the number of values pushed above them
+    args_left = list(range(-num_args, 0))
+    height = 0
+    rewritten = []
+    for i, (op, args) in enumerate(body):
+        if op == "frame_dig":
+            arg = int(args)
+            depth = height + len(args_left) - 1 - args_left.index(arg)
+            if i == last_reads[arg]:
+                args_left.remove(arg)
+                if depth:
+                    rewritten.append(("uncover", str(depth)))
+            else:
+                rewritten.append(("dig", str(depth)) if depth else ("dup", ""))
+            height += 1
+            continue
+        if op not in STACK_EFFECTS or STACK_EFFECTS[op][0] > height:
+            return None
+        pops, pushes = STACK_EFFECTS[op]
+        height += pushes - pops
+        rewritten.append((op, args))
+    return rewritten if height == num_returns else None
+
+
+def inline_subroutines(instructions: list[Instruction], max_inline_size: int, report: OptimisationReport):
+    while True:
+        calls = Counter(args for op, args in instructions if op == "callsub")
+        # labels which are branched to cannot be removed
+        branched = {target for op, args in instructions if op in BRANCH_OPS for target in args.split()}
+        for i, instruction in enumerate(instructions):
+            name = instruction[0][:-1]
+            if not is_label(instruction) or name not in calls or name in branched:
+                continue
+            if (subroutine := _get_subroutine(instructions, i)) is None:
+                continue
+            end, body = subroutine
+            if ("callsub", name) in body:
+                continue
+            if calls[name] > 1 and sum(instruction_size(op) for op in body) > max_inline_size:
+                continue
+            # callsub, proto, retsub and the ops of the body are executed in place of the rewritten body
+            report.ops_saved_per_call[name] = count_ops(instructions[i + 1:end + 1]) + 1 - count_ops(body)
+            del instructions[i:end + 1]
+            j = 0
+            while j < len(instructions):
+                if instructions[j] == ("callsub", name):
+                    instructions[j:j + 1] = body
+                    j += len(body)
+                else:
+                    j += 1
+            report.inlined[name] = calls[name]
+            break
+        else:
+            return
+
+
+def remove_store_loads(instructions: list[Instruction], report: OptimisationReport):
+    if any(op in DYNAMIC_SCRATCH_OPS for op, _ in instructions):
+        return
+    uses = Counter((op, args) for op, args in instructions if op in ("load", "store"))
+    i = 0
+    while i < len(instructions) - 1:
+        (op, slot), (next_op, next_slot) = instructions[i], instructions[i + 1]
+        if op == "store" and next_op == "load" and slot == next_slot:
+            if uses[("store", slot)] == 1 and uses[("load", slot)] == 1:
+                del instructions[i:i + 2]
+            else:
+                instructions[i:i + 2] = [("dup", ""), ("store", slot)]
+                i += 2
+            report.removed_store_loads += 1
+            continue
+        i += 1
+
+
+def collapse_reads(instructions: list[Instruction], report: OptimisationReport):
+    i = 0
+    while i < len(instructions) - 1:
+        op, args = instructions[i]
+        if op in PURE_READ_OPS and not (op == "global" and args in IMPURE_GLOBAL_FIELDS):
+            if instructions[i + 1] == instructions[i]:
+                instructions[i + 1] = ("dup", "")
+                report.collapsed_reads += 1
+        elif op in ("byte", "method") and instructions[i + 1][0] == "app_global_get":
+            if instructions[i + 2:i + 4] == instructions[i:i + 2]:
+                instructions[i + 2:i + 4] = [("dup", "")]
+                report.collapsed_reads += 1
+        i += 1
+
+
+def assemble_constants(instructions: list[Instruction]) -> list[Instruction]:
+    """
+    Replace the int, byte, method and addr pseudo ops with references to constant blocks ordered by frequency,
+    using push ops for the constants used only once
+    """
+    if any(op in ("intcblock", "bytecblock") for op, _ in instructions):
+        return instructions
+    ints = Counter()
+    byte_values = Counter()
+    values = []
+    for op, args in instructions:
+        if op == "int":
+            values.append(parse_int(args))
+            ints[values[-1]] += 1
+        elif op in ("byte", "method", "addr"):
+            values.append(parse_bytes(op, args))
+            byte_values[values[-1]] += 1
+        else:
+            values.append(None)
+
+    int_block = [value for value, count in ints.most_common() if count > 1]
+    bytes_block = [value for value, count in byte_values.most_common() if count > 1]
+    int_index = {value: i for i, value in enumerate(int_block)}
+    bytes_index = {value: i for i, value in enumerate(bytes_block)}
+
+    def reference(op: str, index: int) -> Instruction:
+        return (f"{op}_{index}", "") if index < 4 else (op, str(index))
+
+    assembled = []
+    for (op, args), value in zip(instructions, values):
+        if op == "int":
+            assembled.append(reference("intc", int_index[value]) if value in int_index else ("pushint", str(value)))
+        elif op in ("byte", "method", "addr"):
+            if value in bytes_index:
+                assembled.append(reference("bytec", bytes_index[value]))
+            else:
+                assembled.append(("pushbytes", "0x" + value.hex()))
+        else:
+            assembled.append((op, args))
+
+    blocks = []
+    if int_block:
+        blocks.append(("intcblock", " ".join(str(value) for value in int_block)))
+    if bytes_block:
+        blocks.append(("bytecblock", " ".join("0x" + value.hex() for value in bytes_block)))
+    # blocks go straight after the version pragma
+    start = 1 if assembled and assembled[0][0] == "#pragma" else 0
+    return assembled[:start] + blocks + assembled[start:]
+
+
+def estimate_size(instructions: list[Instruction]) -> int:
+    """
+    Size in bytes of the assembled program, assembling the constants as the assembler would
+    """
+    return sum(instruction_size(instruction) for instruction in assemble_constants(instructions))
+
+
+def optimise_teal(teal: str, max_inline_size: int = 8) -> tuple[str, OptimisationReport]:
+    """
+    Optimise the given TEAL program, returning the optimised program and a report of the savings
+
+    Args:
+        teal: program generated by PyTeal
+        max_inline_size: max size in bytes of a subroutine body to inline when it is called more than once
+    """
+    instructions = parse(teal)
+    report = OptimisationReport(estimate_size(instructions), ops_before=count_ops(instructions))
+
+    inline_subroutines(instructions, max_inline_size, report)
+    remove_store_loads(instructions, report)
+    collapse_reads(instructions, report)
+    instructions = assemble_constants(instructions)
+
+    report.size_after = estimate_size(instructions)
+    report.ops_after = count_ops(instructions)
+    return render(instructions), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peephole optimise a TEAL program generated by PyTeal")
+    parser.add_argument("teal", type=argparse.FileType())
+    parser.add_argument("--max-inline-size", type=int, default=8)
+    args = parser.parse_args()
+
+    teal, report = optimise_teal(args.teal.read(), args.max_inline_size)
+    print(teal, end="")
+    print(report, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+This module contains the off-chain tooling for interacting with the ALGO Liquid Staking contracts
+"""
+
+__all__ = [
+    "abi",
+    "async_algod",
+    "benchmark",
+    "budget_collector",
+    "claim_keeper",
+    "delta_tracker",
+    "events",
+    "fuzzer",
+    "group_builder",
+    "history_store",
+    "ledger_snapshot",
+    "load_generator",
+    "proposer_rewards",
+    "quote_service",
+    "rate_checkpoints",
+    "shard_router",
+    "state",
+    "state_reader",
+    "view_reader",
+]
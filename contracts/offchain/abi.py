@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from algosdk.abi import Contract
+
+CONTRACTS_PATH = Path(__file__).parent.parent
+CONSENSUS_V2_ABI_PATH = CONTRACTS_PATH / "testing" / "consensus_v2.json"
+CONSENSUS_V3_ABI_PATH = CONTRACTS_PATH / "xalgo" / "consensus_v3.json"
+SHARD_ROUTER_ABI_PATH = CONTRACTS_PATH / "xalgo" / "shard_router.json"
+LEDGER_SEEDER_ABI_PATH = CONTRACTS_PATH / "testing" / "ledger_seeder.json"
+
+
+def get_consensus_v2_contract() -> Contract:
+    with open(CONSENSUS_V2_ABI_PATH) as f:
+        return Contract.from_json(f.read())
+
+
+def get_consensus_v3_contract() -> Contract:
+    with open(CONSENSUS_V3_ABI_PATH) as f:
+        return Contract.from_json(f.read())
+
+
+def get_shard_router_contract() -> Contract:
+    with open(SHARD_ROUTER_ABI_PATH) as f:
+        return Contract.from_json(f.read())
+
+
+def get_ledger_seeder_contract() -> Contract:
+    with open(LEDGER_SEEDER_ABI_PATH) as f:
+        return Contract.from_json(f.read())
+
+
+def compile_pyteal(path: Path, *args: str) -> str:
+    """
+    TEAL printed by running the given PyTeal contract with the given arguments
+    """
+    env = {**os.environ, "PYTHONPATH": str(CONTRACTS_PATH)}
+    return subprocess.run([sys.executable, path, *args], env=env, capture_output=True, text=True, check=True).stdout
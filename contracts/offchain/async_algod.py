@@ -0,0 +1,261 @@
+import asyncio
+import json
+from base64 import b64decode, b64encode
+from urllib.parse import urlencode, urlsplit
+from algosdk.encoding import msgpack_encode
+from algosdk.transaction import SignedTransaction, SuggestedParams
+from algosdk.v2client.models import SimulateRequest, SimulateRequestTransactionGroup
+
+
+class AlgodHTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncAlgodClient:
+    """
+    Minimal asyncio algod client which keeps HTTP/1.1 connections alive in a pool.
+    At most max_connections requests are in flight at once, extra requests wait for a free connection.
+    """
+
+    def __init__(self, algod_token: str, algod_address: str, max_connections: int = 8, timeout: float = 30):
+        url = urlsplit(algod_address)
+        if url.scheme != "http":
+            raise ValueError("Only http algod addresses are supported")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.base_path = url.path.rstrip("/")
+        self.headers = {"X-Algo-API-Token": algod_token} if algod_token else {}
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._idle: list[_Connection] = []
+        # number of connections opened over the lifetime of the client
+        self.num_connections_opened = 0
+
+    async def __aenter__(self) -> "AsyncAlgodClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        while self._idle:
+            conn = self._idle.pop()
+            conn.close()
+            await conn.writer.wait_closed()
+
+    async def _acquire(self) -> _Connection:
+        if self._idle:
+            return self._idle.pop()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        self.num_connections_opened += 1
+        return _Connection(reader, writer)
+
+    async def _request(
+        self,
+        conn: _Connection,
+        method: str,
+        path: str,
+        body: bytes,
+        content_type: str,
+    ) -> tuple[int, dict, bytes]:
+        headers = {"Host": f"{self.host}:{self.port}", "Connection": "keep-alive", **self.headers}
+        if body:
+            headers["Content-Type"] = content_type
+        headers["Content-Length"] = str(len(body))
+        head = f"{method} {self.base_path}{path} HTTP/1.1\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        conn.writer.write(head.encode() + body)
+        await conn.writer.drain()
+
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by algod")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while (line := await conn.reader.readline()) not in (b"\r\n", b"\n", b""):
+            key, _, value = line.decode().partition(":")
+            response_headers[key.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            data = b""
+            while size := int((await conn.reader.readline()).strip(), 16):
+                data += await conn.reader.readexactly(size)
+                await conn.reader.readline()
+            await conn.reader.readline()
+        else:
+            data = await conn.reader.readexactly(int(response_headers.get("content-length", 0)))
+        return status, response_headers, data
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: dict = None,
+        body: bytes = b"",
+        content_type: str = "application/x-binary",
+    ) -> bytes:
+        if params:
+            path += "?" + urlencode(params)
+        async with self._semaphore:
+            conn = await self._acquire()
+            try:
+                status, headers, data = await asyncio.wait_for(
+                    self._request(conn, method, path, body, content_type),
+                    self.timeout,
+                )
+            except BaseException:
+                # connection is in an unknown state so don't reuse it
+                conn.close()
+                raise
+            if headers.get("connection", "").lower() == "close":
+                conn.close()
+            else:
+                self._idle.append(conn)
+        if status >= 400:
+            try:
+                message = json.loads(data).get("message", "")
+            except ValueError:
+                message = data.decode(errors="replace")
+            raise AlgodHTTPError(status, message)
+        return data
+
+    async def get(self, path: str, params: dict = None) -> dict:
+        return json.loads(await self.request("GET", path, params))
+
+    async def status(self) -> dict:
+        return await self.get("/v2/status")
+
+    async def status_after_block(self, rnd: int) -> dict:
+        return await self.get(f"/v2/status/wait-for-block-after/{rnd}")
+
+    async def block(self, rnd: int) -> dict:
+        return (await self.get(f"/v2/blocks/{rnd}", {"format": "json"}))["block"]
+
+    async def block_msgpack(self, rnd: int) -> bytes:
+        return await self.request("GET", f"/v2/blocks/{rnd}", {"format": "msgpack"})
+
+    async def ledger_state_delta(self, rnd: int) -> bytes:
+        """
+        State delta of the round in msgpack, served by nodes with the developer API enabled
+        """
+        return await self.request("GET", f"/v2/deltas/{rnd}", {"format": "msgpack"})
+
+    async def suggested_params(self) -> SuggestedParams:
+        params = await self.get("/v2/transactions/params")
+        return SuggestedParams(
+            params["fee"],
+            params["last-round"],
+            params["last-round"] + 1000,
+            params["genesis-hash"],
+            params["genesis-id"],
+            False,
+            params["consensus-version"],
+            params["min-fee"],
+        )
+
+    async def send_raw_transactions(self, raw: bytes) -> str:
+        response = await self.request("POST", "/v2/transactions", body=raw)
+        return json.loads(response)["txId"]
+
+    async def send_transactions(self, stxns: list[SignedTransaction]) -> str:
+        return await self.send_raw_transactions(b"".join(b64decode(msgpack_encode(stxn)) for stxn in stxns))
+
+    async def pending_transaction_info(self, txid: str) -> dict:
+        return await self.get(f"/v2/transactions/pending/{txid}")
+
+    async def wait_for_confirmation(self, txid: str, max_rounds: int = 10) -> dict:
+        """
+        Wait for the given transaction to be confirmed, returning its pending transaction info
+
+        Raises:
+            ValueError: if the transaction is rejected or not confirmed within the given number of rounds
+        """
+        rnd = (await self.status())["last-round"]
+        last_round = rnd + max_rounds
+        while rnd < last_round:
+            info = await self.pending_transaction_info(txid)
+            if info.get("confirmed-round"):
+                return info
+            if info.get("pool-error"):
+                raise ValueError(f"Transaction {txid} rejected: {info['pool-error']}")
+            rnd = (await self.status_after_block(rnd))["last-round"]
+        raise ValueError(f"Transaction {txid} not confirmed after {max_rounds} rounds")
+
+    async def compile(self, source: str) -> bytes:
+        response = await self.request("POST", "/v2/teal/compile", body=source.encode(), content_type="text/plain")
+        return b64decode(json.loads(response)["result"])
+
+    async def simulate(
+        self,
+        stxns: list[SignedTransaction],
+        extra_opcode_budget: int = 0,
+        allow_unnamed_resources: bool = False,
+        rnd: int | None = None,
+    ) -> dict:
+        """
+        Simulate a group allowing empty signatures, returning the result of the group. Unnamed resources let calls
+        access accounts and boxes they do not reference, and the round fixes the state simulated against.
+        """
+        request = SimulateRequest(
+            txn_groups=[SimulateRequestTransactionGroup(txns=stxns)],
+            round=rnd,
+            allow_empty_signatures=True,
+            allow_unnamed_resources=allow_unnamed_resources,
+            extra_opcode_budget=extra_opcode_budget,
+        )
+        body = b64decode(msgpack_encode(request))
+        response = await self.request(
+            "POST",
+            "/v2/transactions/simulate",
+            {"format": "json"},
+            body,
+            "application/msgpack",
+        )
+        return json.loads(response)["txn-groups"][0]
+
+    async def account_info(self, address: str, exclude: str = "all") -> dict:
+        return await self.get(f"/v2/accounts/{address}", {"exclude": exclude})
+
+    async def account_asset_info(self, address: str, asset_id: int) -> dict:
+        return await self.get(f"/v2/accounts/{address}/assets/{asset_id}")
+
+    async def application_info(self, app_id: int) -> dict:
+        return await self.get(f"/v2/applications/{app_id}")
+
+    async def application_boxes(self, app_id: int, prefix: bytes = b"", page_size: int = 0) -> list[bytes]:
+        """
+        Names of all boxes of the app with the given prefix, following next tokens until the list is exhausted
+        """
+        names = []
+        params = {}
+        if prefix:
+            params["prefix"] = "b64:" + b64encode(prefix).decode()
+        if page_size:
+            params["max"] = page_size
+        while True:
+            response = await self.get(f"/v2/applications/{app_id}/boxes", params)
+            names.extend(b64decode(box["name"]) for box in response.get("boxes", []))
+            next_token = response.get("next-token")
+            if not next_token:
+                return names
+            params["next"] = next_token
+
+    async def application_box_by_name(self, app_id: int, name: bytes) -> bytes:
+        response = await self.get(
+            f"/v2/applications/{app_id}/box",
+            {"name": "b64:" + b64encode(name).decode()}
+        )
+        return b64decode(response["value"])
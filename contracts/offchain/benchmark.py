@@ -0,0 +1,550 @@
+"""
+End-to-end cost and latency benchmarks of the consensus app methods across proposer counts and versions.
+
+Each scenario is a synthetic ledger snapshot of the app with a given number of proposers whose active balances are
+spread around the same average by an imbalance factor, so a factor of 0.5 gives balances from 0.5x to 1.5x the
+average. The snapshot is forked into a fresh local network, with matured delay mints to claim, and every method is
+then called in turn. Each group is built by the group builder with just enough pooled calls for the opcode cost
+measured by simulating it, simulated again to record the opcode cost and inner transactions and then sent to
+record the latency until it is confirmed.
+
+The consensus v2 contract in testing serves as baseline. It only implements minting, at a rate of one and always to
+the first proposer, so only immediate mints are compared against it.
+
+Results are written as json. A thresholds file records the maximum allowed value of each metric for each method,
+version, proposer count and imbalance. Running against thresholds exits with an error when any is exceeded, so the
+benchmarks can fail a build on a regression. Thresholds are recorded from the results of a reference run.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from copy import copy
+from dataclasses import asdict, dataclass
+
+from algosdk import mnemonic
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+from algosdk.transaction import ApplicationCallTxn, AssetTransferTxn, PaymentTxn, SuggestedParams
+
+from offchain.abi import CONTRACTS_PATH, compile_pyteal, get_consensus_v2_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.fuzzer import DELAY_MINT_BOX_MIN_BALANCE, DELAY_MINT_NONCE_BOX_MIN_BALANCE
+from offchain.group_builder import MAX_EXTRA_OPCODE_BUDGET, MIN_TXN_FEE, ConsensusGroupBuilder
+from offchain.ledger_snapshot import AccountSnapshot, LedgerSnapshot, fork_snapshot
+from offchain.state import (
+    X_ALGO_TOTAL_SUPPLY,
+    ConsensusV3GlobalState,
+    DelayMintBox,
+    ProposersBox,
+    get_delay_mint_box_name,
+    get_delay_mint_nonce_box_name,
+)
+from offchain.state_reader import ConsensusStateReader
+
+BASELINE_VERSION = "v2"
+VERSIONS = (BASELINE_VERSION, "v3")
+PROGRAM_PATHS = {
+    "v2": CONTRACTS_PATH / "testing" / "consensus_v2.py",
+    "v3": CONTRACTS_PATH / "xalgo" / "consensus_v3.py",
+}
+CLEAR_PROGRAM_PATH = CONTRACTS_PATH / "common" / "clear_program.py"
+AVM_VERSION = 10
+
+PROPOSER_COUNTS = (1, 5, 10, 20, 30)
+IMBALANCES = (0.0, 0.5, 0.9)
+METHODS = ("immediate_mint", "delayed_mint", "claim_delayed_mint", "burn", "claim_fee", "get_xalgo_rate")
+# methods implemented by the baseline and the name of its equivalent method
+BASELINE_METHODS = {"immediate_mint": "mint"}
+THRESHOLD_METRICS = ("opcode_cost", "num_inner_txns", "num_app_calls", "fees")
+DEFAULT_REPEATS = 3
+DEFAULT_TOLERANCE = 0.05
+
+# placeholders in the synthetic snapshot which are replaced on forking
+SNAPSHOT_APP_ID = 1
+SNAPSHOT_X_ALGO_ID = 2
+GLOBAL_SCHEMA = (32, 32)
+LOCAL_SCHEMA = (8, 8)
+EXTRA_PAGES = 3
+
+AVERAGE_PROPOSER_STAKE = int(1000e6)
+PROPOSER_MIN_BALANCE = 100_000
+# account, xALGO created and proposers box of 2500 + 400 * (2 byte name + 960 byte value)
+APP_MIN_BALANCE = 100_000 + 100_000 + 387_300
+FEE = 1000  # 10%
+RATE = 1.05
+MINT_AMOUNT = int(10e6)
+BURN_AMOUNT = int(10e6)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    version: str
+    num_proposers: int
+    imbalance: float
+
+
+@dataclass(frozen=True)
+class Measurement:
+    opcode_cost: int
+    num_inner_txns: int
+    num_app_calls: int
+    fees: int
+    latency: float  # seconds from sending the group until it is confirmed
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    version: str
+    num_proposers: int
+    imbalance: float
+    method: str
+    opcode_cost: int
+    num_inner_txns: int
+    num_app_calls: int
+    fees: int
+    latency_p50: float
+    latency_max: float
+    samples: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.version}/{self.method}/{self.num_proposers}/{self.imbalance}"
+
+
+def get_scenarios(
+    proposer_counts: list[int] = PROPOSER_COUNTS,
+    imbalances: list[float] = IMBALANCES,
+    versions: list[str] = VERSIONS,
+) -> list[Scenario]:
+    return [
+        Scenario(version, num_proposers, imbalance)
+        for version in versions for num_proposers in proposer_counts for imbalance in imbalances
+    ]
+
+
+def get_active_balances(num_proposers: int, imbalance: float, average: int = AVERAGE_PROPOSER_STAKE) -> list[int]:
+    """
+    Active balances spread linearly from (1 - imbalance) to (1 + imbalance) times the average
+    """
+    if num_proposers == 1:
+        return [average]
+    return [
+        round(average * (1 + imbalance * (2 * i / (num_proposers - 1) - 1))) for i in range(num_proposers)
+    ]
+
+
+def make_snapshot(
+    scenario: Scenario,
+    admin: str,
+    approval_program: bytes,
+    clear_program: bytes,
+    rnd: int,
+    num_delay_mints: int = 0,
+) -> LedgerSnapshot:
+    """
+    Synced state of the scenario with a rate of 1.05 ALGO per xALGO, unclaimed fees of 1% of the active balance and
+    the given number of delay mints of the admin which have matured. The admin holds the circulating xALGO.
+    """
+    app_address = get_application_address(SNAPSHOT_APP_ID)
+    active_balances = get_active_balances(scenario.num_proposers, scenario.imbalance)
+    if scenario.version == BASELINE_VERSION:
+        num_delay_mints = 0
+    # stake of delay mints was allocated to the proposers when minted but is not active until claimed
+    pending_stakes = [MINT_AMOUNT] * num_delay_mints
+    balances = list(active_balances)
+    balances[0] += sum(pending_stakes)
+    proposers = [
+        AccountSnapshot(
+            generate_account()[1], PROPOSER_MIN_BALANCE + balance, PROPOSER_MIN_BALANCE, "Online", app_address
+        )
+        for balance in balances
+    ]
+
+    active_balance = sum(active_balances)
+    unclaimed_fees = active_balance // 100
+    circulating_supply = int((active_balance - unclaimed_fees) / RATE)
+    global_state = {
+        ConsensusV3GlobalState.INITIALISED: 1,
+        ConsensusV3GlobalState.ADMIN: decode_address(admin),
+        ConsensusV3GlobalState.REGISTER_ADMIN: decode_address(admin),
+        ConsensusV3GlobalState.XGOV_ADMIN: decode_address(admin),
+        ConsensusV3GlobalState.X_ALGO_ID: SNAPSHOT_X_ALGO_ID,
+        ConsensusV3GlobalState.TIME_DELAY: 86400,
+        ConsensusV3GlobalState.NUM_PROPOSERS: scenario.num_proposers,
+        ConsensusV3GlobalState.MAX_PROPOSER_BALANCE: 10 * max(balances),
+        ConsensusV3GlobalState.FEE: FEE,
+        ConsensusV3GlobalState.PREMIUM: 0,
+        ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: active_balance,
+        ConsensusV3GlobalState.TOTAL_PENDING_STAKE: sum(pending_stakes),
+        ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES: unclaimed_fees,
+        ConsensusV3GlobalState.CAN_IMMEDIATE_MINT: 1,
+        ConsensusV3GlobalState.CAN_DELAY_MINT: 1,
+    }
+    if scenario.version != BASELINE_VERSION:
+        # rate checkpoints disabled
+        global_state[ConsensusV3GlobalState.RATE_CHECKPOINT_INTERVAL] = 0
+        global_state[ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND] = 0
+        global_state[ConsensusV3GlobalState.NEXT_RATE_CHECKPOINT_INDEX] = 0
+
+    boxes = {ProposersBox.NAME: b"".join(decode_address(p.address) for p in proposers).ljust(960, b"\0")}
+    matured_round = max(rnd - DelayMintBox.DELAY, 0)
+    for nonce, stake in enumerate(pending_stakes):
+        name = get_delay_mint_box_name(admin, nonce.to_bytes(2, "big"))
+        boxes[name] = decode_address(admin) + stake.to_bytes(8, "big") + matured_round.to_bytes(8, "big")
+
+    app_min_balance = APP_MIN_BALANCE + num_delay_mints * DELAY_MINT_BOX_MIN_BALANCE
+    if scenario.version != BASELINE_VERSION:
+        # new delay mints use the nonces after the seeded ones
+        boxes[get_delay_mint_nonce_box_name(admin)] = num_delay_mints.to_bytes(8, "big")
+        app_min_balance += DELAY_MINT_NONCE_BOX_MIN_BALANCE
+    return LedgerSnapshot(
+        round=rnd,
+        app_id=SNAPSHOT_APP_ID,
+        approval_program=approval_program,
+        clear_program=clear_program,
+        global_schema=GLOBAL_SCHEMA,
+        local_schema=LOCAL_SCHEMA,
+        extra_pages=EXTRA_PAGES,
+        global_state=global_state,
+        boxes=boxes,
+        app_account=AccountSnapshot(
+            app_address, app_min_balance, app_min_balance, "Offline",
+            holdings={SNAPSHOT_X_ALGO_ID: X_ALGO_TOTAL_SUPPLY - circulating_supply},
+        ),
+        proposers=proposers,
+    )
+
+
+def count_inner_txns(txn_result: dict) -> int:
+    inner_txns = txn_result.get("inner-txns", [])
+    return len(inner_txns) + sum(count_inner_txns(inner) for inner in inner_txns)
+
+
+def get_measurement(
+    txns: list[TransactionWithSigner],
+    app_id: int,
+    simulate_result: dict,
+    latency: float,
+) -> Measurement:
+    """
+    Costs of a group from its transactions and the result of simulating it
+    """
+    return Measurement(
+        opcode_cost=simulate_result.get("app-budget-consumed", 0),
+        num_inner_txns=sum(
+            count_inner_txns(result["txn-result"]) for result in simulate_result.get("txn-results", [])
+        ),
+        num_app_calls=sum(
+            1 for txn in txns if isinstance(txn.txn, ApplicationCallTxn) and txn.txn.index == app_id
+        ),
+        fees=sum(txn.txn.fee for txn in txns),
+        latency=latency,
+    )
+
+
+def aggregate(scenario: Scenario, method: str, measurements: list[Measurement]) -> BenchmarkResult:
+    """
+    Result of the repeated measurements of a method, taking the worst cost and the median latency
+    """
+    latencies = [measurement.latency for measurement in measurements]
+    return BenchmarkResult(
+        version=scenario.version,
+        num_proposers=scenario.num_proposers,
+        imbalance=scenario.imbalance,
+        method=method,
+        **{metric: max(getattr(measurement, metric) for measurement in measurements) for metric in THRESHOLD_METRICS},
+        latency_p50=statistics.median(latencies),
+        latency_max=max(latencies),
+        samples=len(measurements),
+    )
+
+
+def compare_to_baseline(results: list[BenchmarkResult]) -> list[dict]:
+    """
+    Ratios of the costs and latency of each result to those of the baseline for the same method and scenario
+    """
+    baseline = {
+        (result.method, result.num_proposers, result.imbalance): result
+        for result in results if result.version == BASELINE_VERSION
+    }
+    comparisons = []
+    for result in results:
+        base = baseline.get((result.method, result.num_proposers, result.imbalance))
+        if result.version == BASELINE_VERSION or base is None:
+            continue
+        comparison = {"key": result.key, "baseline_key": base.key}
+        for metric in ("opcode_cost", "num_inner_txns", "fees", "latency_p50"):
+            value, base_value = getattr(result, metric), getattr(base, metric)
+            comparison[f"{metric}_ratio"] = round(value / base_value, 3) if base_value else None
+        comparisons.append(comparison)
+    return comparisons
+
+
+def record_thresholds(results: list[BenchmarkResult], tolerance: float = DEFAULT_TOLERANCE) -> dict[str, dict]:
+    """
+    Thresholds allowing each metric of the given results to increase by at most the given fraction
+    """
+    return {
+        result.key: {metric: math.floor(getattr(result, metric) * (1 + tolerance)) for metric in THRESHOLD_METRICS}
+        for result in results
+    }
+
+
+def check_thresholds(results: list[BenchmarkResult], thresholds: dict[str, dict]) -> list[str]:
+    """
+    Violations of the thresholds by the given results. Any metric of a result can be given a threshold, including
+    latencies, and results without thresholds are not checked.
+    """
+    violations = []
+    for result in results:
+        for metric, limit in thresholds.get(result.key, {}).items():
+            value = getattr(result, metric)
+            if value > limit:
+                violations.append(f"{result.key} {metric} of {value} exceeds threshold of {limit}")
+    return violations
+
+
+def save_results(results: list[BenchmarkResult], path: str):
+    with open(path, "w") as f:
+        json.dump({
+            "results": [asdict(result) for result in results],
+            "baseline": compare_to_baseline(results),
+        }, f, indent=2)
+
+
+def load_results(path: str) -> list[BenchmarkResult]:
+    with open(path) as f:
+        return [BenchmarkResult(**result) for result in json.load(f)["results"]]
+
+
+class BenchmarkTarget:
+    """
+    Fork of a scenario in a local network. The funder is the admin of the app and the account which mints, burns
+    and claims.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAlgodClient,
+        funder_private_key: str,
+        scenario: Scenario,
+        app_id: int,
+        x_algo_id: int,
+        first_proposer: str,
+    ):
+        self.client = client
+        self.address = address_from_private_key(funder_private_key)
+        self.signer = AccountTransactionSigner(funder_private_key)
+        self.scenario = scenario
+        self.app_id = app_id
+        self.app_address = get_application_address(app_id)
+        self.x_algo_id = x_algo_id
+        self.first_proposer = first_proposer
+        self.reader = ConsensusStateReader(client, app_id)
+        # seeded delay mints are claimed in order
+        self.next_claim_nonce = 0
+
+    @classmethod
+    async def fork(
+        cls,
+        client: AsyncAlgodClient,
+        funder_private_key: str,
+        scenario: Scenario,
+        num_delay_mints: int = DEFAULT_REPEATS,
+    ) -> "BenchmarkTarget":
+        approval_program = await client.compile(compile_pyteal(PROGRAM_PATHS[scenario.version]))
+        clear_program = await client.compile(compile_pyteal(CLEAR_PROGRAM_PATH, str(AVM_VERSION)))
+        funder = address_from_private_key(funder_private_key)
+        params = await client.suggested_params()
+        snapshot = make_snapshot(scenario, funder, approval_program, clear_program, params.first, num_delay_mints)
+        forked = await fork_snapshot(client, funder_private_key, snapshot)
+        first_proposer = forked.addresses[snapshot.proposers[0].address]
+        return cls(client, funder_private_key, scenario, forked.app_id, forked.x_algo_id, first_proposer)
+
+    def _build_baseline(self, method: str, params: SuggestedParams) -> list[TransactionWithSigner]:
+        if method not in BASELINE_METHODS:
+            raise ValueError(f"Method {method} is not implemented by the baseline")
+        send_algo = PaymentTxn(self.address, params, self.first_proposer, MINT_AMOUNT)
+        params = copy(params)
+        params.flat_fee = True
+        # covers the xALGO sent by the app
+        params.fee = 2 * MIN_TXN_FEE
+        atc = AtomicTransactionComposer()
+        atc.add_method_call(
+            app_id=self.app_id,
+            method=get_consensus_v2_contract().get_method_by_name(BASELINE_METHODS[method]),
+            sender=self.address,
+            sp=params,
+            signer=self.signer,
+            method_args=[TransactionWithSigner(send_algo, self.signer)],
+            foreign_assets=[self.x_algo_id],
+            boxes=[(self.app_id, ProposersBox.NAME)],
+        )
+        return atc.build_group()
+
+    async def _build(self, method: str, params: SuggestedParams, opcode_cost: int) -> list[TransactionWithSigner]:
+        if self.scenario.version == BASELINE_VERSION:
+            return self._build_baseline(method, params)
+        user, signer = self.address, self.signer
+        if method in ("immediate_mint", "delayed_mint"):
+            send_algo = TransactionWithSigner(PaymentTxn(user, params, self.app_address, MINT_AMOUNT), signer)
+            if method == "immediate_mint":
+                third_arg = 0
+            else:
+                third_arg = (await self.reader.fetch_next_delay_mint_nonce(user)).to_bytes(2, "big")
+            method_args = [send_algo, user, third_arg]
+        elif method == "claim_delayed_mint":
+            method_args = [user, self.next_claim_nonce.to_bytes(2, "big")]
+        elif method == "burn":
+            send_xalgo = AssetTransferTxn(user, params, self.app_address, BURN_AMOUNT, self.x_algo_id)
+            method_args = [TransactionWithSigner(send_xalgo, signer), user, 0]
+        else:
+            method_args = []
+        builder = ConsensusGroupBuilder(self.app_id, await self.reader.fetch_state(force=True))
+        txns = builder.build(method, user, signer, params, method_args, opcode_cost).build_group()
+        if method == "delayed_mint":
+            box_payment = PaymentTxn(user, params, self.app_address, DELAY_MINT_BOX_MIN_BALANCE)
+            txns.insert(0, TransactionWithSigner(box_payment, signer))
+        return txns
+
+    async def _simulate(self, txns: list[TransactionWithSigner], extra_opcode_budget: int = 0) -> dict:
+        atc = AtomicTransactionComposer()
+        for txn in txns:
+            txn.txn.group = None
+            atc.add_transaction(txn)
+        result = await self.client.simulate(atc.gather_signatures(), extra_opcode_budget)
+        if "failure-message" in result:
+            raise ValueError(f"Simulated group failed: {result['failure-message']}")
+        return result
+
+    async def measure(self, method: str) -> Measurement:
+        """
+        Call the method with just enough pooled calls for its opcode cost, measuring the costs and latency
+        """
+        params = await self.client.suggested_params()
+        result = await self._simulate(await self._build(method, params, 0), MAX_EXTRA_OPCODE_BUDGET)
+        txns = await self._build(method, params, result.get("app-budget-consumed", 0))
+        result = await self._simulate(txns)
+
+        atc = AtomicTransactionComposer()
+        for txn in txns:
+            txn.txn.group = None
+            atc.add_transaction(txn)
+        stxns = atc.gather_signatures()
+        start = time.monotonic()
+        await self.client.wait_for_confirmation(await self.client.send_transactions(stxns))
+        latency = time.monotonic() - start
+
+        if method == "claim_delayed_mint":
+            self.next_claim_nonce += 1
+        return get_measurement(txns, self.app_id, result, latency)
+
+
+async def run_scenario(
+    client: AsyncAlgodClient,
+    funder_private_key: str,
+    scenario: Scenario,
+    methods: list[str] = METHODS,
+    repeats: int = DEFAULT_REPEATS,
+) -> list[BenchmarkResult]:
+    """
+    Measure each method the given number of times on a fork of the scenario, skipping those the baseline lacks
+    """
+    if scenario.version == BASELINE_VERSION:
+        methods = [method for method in methods if method in BASELINE_METHODS]
+    if not methods:
+        return []
+    target = await BenchmarkTarget.fork(client, funder_private_key, scenario, repeats)
+    measurements = {method: [] for method in methods}
+    for _ in range(repeats):
+        for method in methods:
+            measurements[method].append(await target.measure(method))
+    return [aggregate(scenario, method, method_measurements) for method, method_measurements in measurements.items()]
+
+
+async def run_benchmarks(
+    client: AsyncAlgodClient,
+    funder_private_key: str,
+    scenarios: list[Scenario],
+    methods: list[str] = METHODS,
+    repeats: int = DEFAULT_REPEATS,
+) -> list[BenchmarkResult]:
+    """
+    Run the scenarios one at a time so the latency of each is not affected by the others
+    """
+    results = []
+    for scenario in scenarios:
+        results.extend(await run_scenario(client, funder_private_key, scenario, methods, repeats))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the costs and latency of the consensus app methods")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="run the benchmarks against a local network")
+    run.add_argument("--output", required=True, help="json file to write the results to")
+    run.add_argument("--thresholds", help="json thresholds to check the results against")
+    run.add_argument("--proposer-counts", type=int, nargs="+", default=PROPOSER_COUNTS)
+    run.add_argument("--imbalances", type=float, nargs="+", default=IMBALANCES)
+    run.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    run.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    run.add_argument("--no-baseline", action="store_true", help="skip the consensus v2 baseline")
+
+    check = subparsers.add_parser("check", help="check results against thresholds")
+    check.add_argument("results")
+    check.add_argument("thresholds")
+
+    record = subparsers.add_parser("record", help="record thresholds from the results of a reference run")
+    record.add_argument("results")
+    record.add_argument("thresholds")
+    record.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed fractional increase")
+
+    args = parser.parse_args()
+
+    async def run_network() -> list[BenchmarkResult]:
+        versions = [version for version in VERSIONS if not (args.no_baseline and version == BASELINE_VERSION)]
+        scenarios = get_scenarios(args.proposer_counts, args.imbalances, versions)
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            # mnemonic is read from the environment so it does not appear in the process list
+            funder_private_key = mnemonic.to_private_key(os.environ["FUNDER_MNEMONIC"])
+            return await run_benchmarks(client, funder_private_key, scenarios, args.methods, args.repeats)
+
+    if args.command == "record":
+        with open(args.thresholds, "w") as f:
+            json.dump(record_thresholds(load_results(args.results), args.tolerance), f, indent=2)
+        return
+
+    if args.command == "run":
+        results = asyncio.run(run_network())
+        save_results(results, args.output)
+        print(json.dumps(compare_to_baseline(results), indent=2))
+        thresholds_path = args.thresholds
+    else:
+        results = load_results(args.results)
+        thresholds_path = args.thresholds
+
+    if thresholds_path:
+        with open(thresholds_path) as f:
+            violations = check_thresholds(results, json.load(f))
+        for violation in violations:
+            print(violation, file=sys.stderr)
+        if violations:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
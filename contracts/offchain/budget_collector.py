@@ -0,0 +1,202 @@
+"""
+Collector of the opcode budget logs emitted by the budget instrumented build of the consensus v3 app.
+
+The instrumented build is compiled with `python3 consensus_v3.py --instrument-budget` and logs the remaining opcode
+budget on entry and exit of each phase. The logs of each app call are paired into the cost of each phase and
+aggregated per method and phase into histograms. Sources can be blocks (e.g. the rounds of a load test replay),
+pending transaction info or simulate results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+from base64 import b64decode
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.events import get_event_selector
+from offchain.state import BudgetPhase
+
+BUDGET_SELECTOR = get_event_selector("Budget(uint8,uint8,uint64)")
+
+PHASE_NAMES = {
+    BudgetPhase.SYNC: "sync",
+    BudgetPhase.RECEIVE_ALLOCATION: "receive_allocation",
+    BudgetPhase.SEND_ALLOCATION: "send_allocation",
+    BudgetPhase.MINT_PRICING: "mint_pricing",
+    BudgetPhase.INNER_SUBMIT: "inner_submit",
+}
+
+# each budget log is 7 opcodes, of which 3 run after the budget is read on entry and 3 before it is read on exit
+LOG_BUDGET_COST = 7
+LOG_BUDGET_OVERHEAD = 6
+
+
+@dataclass(frozen=True)
+class BudgetLog:
+    phase: int
+    is_exit: bool
+    budget: int
+
+
+@dataclass(frozen=True)
+class PhaseCost:
+    method: str
+    phase: int
+    cost: int
+
+
+def decode_budget_log(log: bytes) -> BudgetLog | None:
+    """
+    Decode a log of the instrumented app, returning None if it is not a budget log
+    """
+    if log[:4] != BUDGET_SELECTOR or len(log) != 14:
+        return None
+    return BudgetLog(log[4], bool(log[5]), int.from_bytes(log[6:14], "big"))
+
+
+def get_phase_costs(logs: list[bytes]) -> list[tuple[int, int]]:
+    """
+    Pair the budget logs of a single app call into the (phase, cost) of each phase, in the order they exited.
+
+    Phases can be nested (e.g. inner submissions within allocation) so the instrumentation of nested phases is
+    excluded from the cost of the outer phase.
+
+    Raises:
+        ValueError: if the entry and exit logs do not match
+    """
+    costs = []
+    # entry log and number of nested phases of each open phase
+    stack: list[tuple[BudgetLog, int]] = []
+    for log in logs:
+        if (budget_log := decode_budget_log(log)) is None:
+            continue
+        if not budget_log.is_exit:
+            stack.append((budget_log, 0))
+            continue
+        if not stack or stack[-1][0].phase != budget_log.phase:
+            raise ValueError(f"Unmatched exit of phase {budget_log.phase}")
+        entry, num_nested = stack.pop()
+        cost = entry.budget - budget_log.budget - LOG_BUDGET_OVERHEAD - num_nested * 2 * LOG_BUDGET_COST
+        costs.append((budget_log.phase, cost))
+        if stack:
+            outer, outer_num_nested = stack.pop()
+            stack.append((outer, outer_num_nested + 1 + num_nested))
+    if stack:
+        raise ValueError(f"Unmatched entry of phase {stack[-1][0].phase}")
+    return costs
+
+
+class BudgetCollector:
+    """
+    Aggregates the cost of each phase of the instrumented app per method into histograms with the given bucket width
+    """
+
+    def __init__(self, app_id: int, bucket_width: int = 10):
+        self.app_id = app_id
+        self.bucket_width = bucket_width
+        self.methods = {method.get_selector(): method.name for method in get_consensus_v3_contract().methods}
+        self.costs: dict[str, dict[int, list[int]]] = defaultdict(lambda: defaultdict(list))
+
+    def _add_app_call(self, txn: dict, logs: list[str]):
+        if txn.get("type") != "appl" or txn.get("apid") != self.app_id or not txn.get("apaa"):
+            return
+        method = self.methods.get(b64decode(txn["apaa"][0]), "unknown")
+        for phase, cost in get_phase_costs([b64decode(log) for log in logs]):
+            self.costs[method][phase].append(cost)
+
+    def add_block(self, block: dict):
+        """
+        Add the app calls in a block returned by algod in json format
+        """
+        for stxn in block.get("txns", []):
+            self._add_app_call(stxn.get("txn", {}), stxn.get("dt", {}).get("lg", []))
+
+    def add_txn_result(self, result: dict):
+        """
+        Add the result of an app call as returned by the pending transaction info or simulate endpoints
+        """
+        self._add_app_call(result.get("txn", {}).get("txn", {}), result.get("logs", []))
+
+    def add_simulate_result(self, group_result: dict):
+        for txn_result in group_result.get("txn-results", []):
+            self.add_txn_result(txn_result["txn-result"])
+
+    def phase_costs(self) -> list[PhaseCost]:
+        return [
+            PhaseCost(method, phase, cost)
+            for method, phases in self.costs.items()
+            for phase, costs in phases.items()
+            for cost in costs
+        ]
+
+    def histograms(self) -> dict[str, dict[str, dict[int, int]]]:
+        """
+        Histogram of each method and phase, keyed by the lower bound of each bucket
+        """
+        return {
+            method: {
+                PHASE_NAMES.get(phase, str(phase)): dict(sorted(Counter(
+                    cost // self.bucket_width * self.bucket_width for cost in costs
+                ).items()))
+                for phase, costs in sorted(phases.items())
+            }
+            for method, phases in sorted(self.costs.items())
+        }
+
+    def summarise(self) -> dict[str, dict[str, dict]]:
+        summary = {}
+        for method, phases in sorted(self.costs.items()):
+            summary[method] = {}
+            for phase, costs in sorted(phases.items()):
+                costs = sorted(costs)
+                summary[method][PHASE_NAMES.get(phase, str(phase))] = {
+                    "count": len(costs),
+                    "min": costs[0],
+                    "median": statistics.median(costs),
+                    "max": costs[-1],
+                    "total": sum(costs),
+                }
+        return summary
+
+
+async def collect_rounds(client: AsyncAlgodClient, collector: BudgetCollector, rounds: list[int]):
+    blocks = await asyncio.gather(*(client.block(rnd) for rnd in rounds))
+    for block in blocks:
+        collector.add_block(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect the opcode budget of the instrumented consensus v3 app")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    parser.add_argument("--app-id", type=int, required=True)
+    parser.add_argument("--bucket-width", type=int, default=10)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--rounds", type=int, nargs=2, metavar=("FIRST", "LAST"))
+    source.add_argument("--results", type=Path, help="jsonl results of a load generator replay")
+    parser.add_argument("--histograms", action="store_true", help="print histograms instead of a summary")
+    args = parser.parse_args()
+
+    if args.rounds:
+        rounds = list(range(args.rounds[0], args.rounds[1] + 1))
+    else:
+        with open(args.results) as f:
+            results = [json.loads(line) for line in f]
+        rounds = sorted({result["confirmed_round"] for result in results if result.get("confirmed_round")})
+
+    async def run():
+        collector = BudgetCollector(args.app_id, args.bucket_width)
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            await collect_rounds(client, collector, rounds)
+        print(json.dumps(collector.histograms() if args.histograms else collector.summarise(), indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
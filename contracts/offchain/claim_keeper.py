@@ -0,0 +1,351 @@
+"""
+Keeper which claims delayed mints once they mature, earning the box min balance of each claim.
+
+Pending delayed mints are kept in a min-heap keyed by the round they can be claimed. The index is seeded from
+the boxes of the app once on start and then kept up to date from the DelayedMint and ClaimDelayedMint events
+of each new block, so the boxes are never rescanned.
+"""
+import argparse
+import asyncio
+import heapq
+import logging
+import os
+from copy import copy
+from dataclasses import dataclass
+from itertools import zip_longest
+
+from algosdk import mnemonic
+from algosdk.account import address_from_private_key
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    EmptySigner,
+    TransactionSigner,
+)
+from algosdk.transaction import SuggestedParams, Transaction
+
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.events import ClaimDelayedMintEvent, DelayedMintEvent, iter_block_events
+from offchain.group_builder import (
+    APP_CALL_BUDGET,
+    MAX_ENTRY_COST,
+    MAX_GROUP_SIZE,
+    OPUP_BUFFER,
+    AppCallReferences,
+    CallRequirements,
+    pack_references,
+)
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMint,
+    DelayMintBox,
+    OpcodeBudget,
+    ProposersBox,
+    RateCheckpointsBox,
+    decode_global_state,
+    decode_proposers,
+)
+from offchain.state_reader import ConsensusStateReader
+
+logger = logging.getLogger(__name__)
+
+# outer call plus inner xALGO transfer and box min balance refund
+CLAIM_FEE = 3000
+DUMMY_FEE = 1000
+
+
+class MaturityIndex:
+    """
+    Min-heap of pending delay mints keyed by the round they can be claimed.
+    Removed entries are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[int, bytes]] = []
+        self._entries: dict[bytes, DelayMint] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, box_name: bytes) -> bool:
+        return box_name in self._entries
+
+    def add(self, delay_mint: DelayMint):
+        if delay_mint.box_name in self._entries:
+            return
+        self._entries[delay_mint.box_name] = delay_mint
+        heapq.heappush(self._heap, (delay_mint.round, delay_mint.box_name))
+
+    def remove(self, box_name: bytes):
+        self._entries.pop(box_name, None)
+
+    def next_round(self) -> int | None:
+        self._drop_removed()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_matured(self, rnd: int) -> list[DelayMint]:
+        """
+        Remove and return all the delay mints which can be claimed at the given round, oldest first
+        """
+        matured = []
+        while (next_round := self.next_round()) is not None and next_round <= rnd:
+            _, box_name = heapq.heappop(self._heap)
+            matured.append(self._entries.pop(box_name))
+        return matured
+
+    def _drop_removed(self):
+        # box names can be reused once claimed so also check the heap entry is for the current delay mint
+        while self._heap:
+            rnd, box_name = self._heap[0]
+            delay_mint = self._entries.get(box_name)
+            if delay_mint is not None and delay_mint.round == rnd:
+                return
+            heapq.heappop(self._heap)
+
+
+@dataclass
+class ClaimCall:
+    # None for a dummy call which only carries references and budget
+    delay_mint: DelayMint | None
+    references: AppCallReferences
+
+
+def layout_claim_group(
+    delay_mints: list[DelayMint],
+    proposers: list[str],
+    x_algo_id: int,
+    claim_opcode_cost: int = APP_CALL_BUDGET,
+) -> list[ClaimCall] | None:
+    """
+    Lay out the app calls to claim the given delay mints in a single group, returning None if they do not fit.
+
+    References are shared across the group so the proposers, xALGO and the common boxes are spread over the
+    free reference slots of the claims, adding dummy calls when there are not enough slots or opcode budget.
+    """
+    requirements = [
+        CallRequirements(
+            accounts=[delay_mint.receiver, *proposers],
+            assets=[x_algo_id],
+            boxes=[ProposersBox.NAME, delay_mint.box_name, RateCheckpointsBox.NAME],
+        )
+        for delay_mint in delay_mints
+    ]
+    # enough pooled budget that the contract never tops it up with inner app calls not covered by the claim fee, even
+    # when a rate checkpoint is due
+    ensured_cost = (
+        OpcodeBudget.CLAIM_DELAYED_MINT + OpcodeBudget.SYNC * len(proposers) + OpcodeBudget.CHECKPOINT
+        + MAX_ENTRY_COST + OPUP_BUFFER
+    )
+    references = pack_references(requirements, opcode_cost=len(delay_mints) * max(claim_opcode_cost, ensured_cost))
+    if references is None:
+        return None
+    return [ClaimCall(delay_mint, refs) for delay_mint, refs in zip_longest(delay_mints, references)]
+
+
+def plan_claim_groups(
+    delay_mints: list[DelayMint],
+    proposers: list[str],
+    x_algo_id: int,
+    claim_opcode_cost: int = APP_CALL_BUDGET,
+) -> list[list[ClaimCall]]:
+    """
+    Pack the claims into as few groups as possible, filling each group with as many claims as fit
+
+    Raises:
+        ValueError: if a single claim does not fit in a group
+    """
+    groups = []
+    remaining = list(delay_mints)
+    while remaining:
+        for num_claims in range(min(len(remaining), MAX_GROUP_SIZE), 0, -1):
+            layout = layout_claim_group(remaining[:num_claims], proposers, x_algo_id, claim_opcode_cost)
+            if layout is not None:
+                groups.append(layout)
+                remaining = remaining[num_claims:]
+                break
+        else:
+            raise ValueError("Cannot fit claim in a single group")
+    return groups
+
+
+def build_claim_group(
+    app_id: int,
+    calls: list[ClaimCall],
+    sender: str,
+    signer: TransactionSigner,
+    params: SuggestedParams,
+) -> AtomicTransactionComposer:
+    contract = get_consensus_v3_contract()
+    atc = AtomicTransactionComposer()
+    for call in calls:
+        refs = call.references
+        sp = copy(params)
+        sp.flat_fee = True
+        if call.delay_mint is None:
+            sp.fee = DUMMY_FEE
+            method, method_args = contract.get_method_by_name("dummy"), []
+        else:
+            sp.fee = CLAIM_FEE
+            method = contract.get_method_by_name("claim_delayed_mint")
+            method_args = [call.delay_mint.minter, call.delay_mint.nonce]
+        atc.add_method_call(
+            app_id=app_id,
+            method=method,
+            sender=sender,
+            sp=sp,
+            signer=signer,
+            method_args=method_args,
+            accounts=refs.accounts,
+            foreign_assets=refs.assets,
+            foreign_apps=refs.apps,
+            boxes=[(app_id, box_name) for box_name in refs.boxes],
+        )
+    return atc
+
+
+class ClaimKeeper:
+    """
+    Claims matured delayed mints on behalf of their receivers.
+
+    In dry run mode the groups are built and logged but never signed nor sent.
+    """
+
+    def __init__(
+        self,
+        client: AsyncAlgodClient,
+        app_id: int,
+        sender: str,
+        signer: TransactionSigner | None = None,
+        dry_run: bool = False,
+        claim_opcode_cost: int = APP_CALL_BUDGET,
+    ):
+        if signer is None and not dry_run:
+            raise ValueError("Signer is required unless in dry run mode")
+        self.client = client
+        self.app_id = app_id
+        self.sender = sender
+        self.signer = signer or EmptySigner()
+        self.dry_run = dry_run
+        self.claim_opcode_cost = claim_opcode_cost
+        self.index = MaturityIndex()
+        # claims which have been sent, keyed by box name, with the last round they can be confirmed in
+        self.in_flight: dict[bytes, tuple[DelayMint, int]] = {}
+        self.last_round: int | None = None
+
+    async def bootstrap(self):
+        """
+        Seed the index from the boxes of the app. Only needs to be called once on start.
+        """
+        snapshot = await ConsensusStateReader(self.client, self.app_id).fetch_state()
+        for delay_mint in snapshot.delay_mints.values():
+            self.index.add(delay_mint)
+        self.last_round = snapshot.round
+        logger.info("Seeded index with %d delayed mints at round %d", len(self.index), self.last_round)
+
+    async def process_block(self, rnd: int):
+        block = await self.client.block(rnd)
+        for event in iter_block_events(block, self.app_id):
+            if isinstance(event, DelayedMintEvent):
+                nonce = event.box_name[len(DelayMintBox.NAME_PREFIX) + 32:]
+                self.index.add(DelayMint(event.minter, nonce, event.receiver, event.stake, rnd + DelayMintBox.DELAY))
+            elif isinstance(event, ClaimDelayedMintEvent):
+                self.index.remove(event.box_name)
+                self.in_flight.pop(event.box_name, None)
+
+        # retry claims which were never confirmed
+        for box_name, (delay_mint, last_valid) in list(self.in_flight.items()):
+            if rnd >= last_valid:
+                del self.in_flight[box_name]
+                self.index.add(delay_mint)
+        self.last_round = rnd
+
+    async def _fetch_proposers_and_x_algo_id(self) -> tuple[list[str], int]:
+        app_info, proposers_box = await asyncio.gather(
+            self.client.application_info(self.app_id),
+            self.client.application_box_by_name(self.app_id, ProposersBox.NAME),
+        )
+        global_state = decode_global_state(app_info["params"].get("global-state", []))
+        proposers = decode_proposers(proposers_box, global_state[ConsensusV3GlobalState.NUM_PROPOSERS])
+        return proposers, global_state[ConsensusV3GlobalState.X_ALGO_ID]
+
+    async def claim_matured(self) -> list[list[Transaction]]:
+        """
+        Claim all the delayed mints which can be claimed in the next round, returning the groups of transactions
+        """
+        # the next block is the first in which the claim can be confirmed
+        matured = self.index.pop_matured(self.last_round + 1)
+        if not matured:
+            return []
+
+        (proposers, x_algo_id), params = await asyncio.gather(
+            self._fetch_proposers_and_x_algo_id(),
+            self.client.suggested_params(),
+        )
+        groups = plan_claim_groups(matured, proposers, x_algo_id, self.claim_opcode_cost)
+
+        txn_groups = []
+        for calls in groups:
+            atc = build_claim_group(self.app_id, calls, self.sender, self.signer, params)
+            txn_groups.append([txn_with_signer.txn for txn_with_signer in atc.build_group()])
+            claims = [call.delay_mint for call in calls if call.delay_mint is not None]
+            if self.dry_run:
+                logger.info("Dry run: would claim %d delayed mints in group of %d", len(claims), len(calls))
+                continue
+            try:
+                await self.client.send_transactions(atc.gather_signatures())
+            except Exception:
+                logger.exception("Failed to send claims")
+                for delay_mint in claims:
+                    self.index.add(delay_mint)
+                continue
+            for delay_mint in claims:
+                self.in_flight[delay_mint.box_name] = (delay_mint, params.last)
+            logger.info("Sent %d claims in group of %d", len(claims), len(calls))
+
+        if self.dry_run:
+            # nothing was sent so keep claims in the index
+            for delay_mint in matured:
+                self.index.add(delay_mint)
+        return txn_groups
+
+    async def run(self):
+        await self.bootstrap()
+        while True:
+            status = await self.client.status_after_block(self.last_round)
+            for rnd in range(self.last_round + 1, status["last-round"] + 1):
+                await self.process_block(rnd)
+            await self.claim_matured()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim matured delayed mints of the consensus v3 app")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    parser.add_argument("--app-id", type=int, required=True)
+    parser.add_argument("--sender", help="address to claim from, required in dry run mode")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--claim-opcode-cost", type=int, default=APP_CALL_BUDGET)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    signer = None
+    sender = args.sender
+    if not args.dry_run:
+        # mnemonic is read from the environment so it does not appear in the process list
+        private_key = mnemonic.to_private_key(os.environ["KEEPER_MNEMONIC"])
+        signer = AccountTransactionSigner(private_key)
+        sender = address_from_private_key(private_key)
+    elif sender is None:
+        parser.error("--sender is required in dry run mode")
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            keeper = ClaimKeeper(client, args.app_id, sender, signer, args.dry_run, args.claim_opcode_cost)
+            await keeper.run()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Live view of the consensus v3 app kept up to date from the state delta of each round, with no polling of accounts.
+
+The tracker is seeded once with a snapshot of the app and then applies, round by round, the block and ledger state
+delta served by algod in msgpack at /v2/blocks/{round} and /v2/deltas/{round}. Only the parts of a delta touching
+the app are decoded, as named in the go-algorand encoding of the state delta:
+- the balance, min balance and status of the proposers and the app account
+- the global state of the app
+- the xALGO holding of the app account, giving the circulating supply
+- the proposers box and the delay mint boxes
+
+Each applied round gives a RoundChanges event with what changed in it. Deltas can be followed live from a node, or
+a local stand-in serving the same endpoints, or recorded to a file of msgpack records and replayed later.
+"""
+import argparse
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import msgpack
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from offchain.async_algod import AsyncAlgodClient
+from offchain.ledger_snapshot import LedgerSnapshot, load_snapshot
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMint,
+    DelayMintBox,
+    ProposersBox,
+    X_ALGO_TOTAL_SUPPLY,
+    decode_delay_mint,
+    decode_proposers,
+)
+from offchain.state_reader import ConsensusSnapshot, ConsensusStateReader, ProposerAccount
+
+# protocol min balance requirements
+MIN_BALANCE = 100_000
+APP_FLAT_PARAMS_MIN_BALANCE = 100_000
+APP_FLAT_OPT_IN_MIN_BALANCE = 100_000
+SCHEMA_MIN_BALANCE_PER_ENTRY = 25_000
+SCHEMA_UINT_MIN_BALANCE = 3_500
+SCHEMA_BYTES_MIN_BALANCE = 25_000
+BOX_FLAT_MIN_BALANCE = 2_500
+BOX_BYTE_MIN_BALANCE = 400
+
+ACCOUNT_STATUSES = {0: "Offline", 1: "Online", 2: "NotParticipating"}
+TEAL_BYTES_TYPE = 1
+BOX_KEY_PREFIX = b"bx:"
+
+
+@dataclass(frozen=True)
+class RoundChanges:
+    round: int
+    timestamp: int
+    # proposers and app account whose balance, min balance or status changed
+    accounts: dict[str, ProposerAccount] = field(default_factory=dict)
+    # new values of the global state keys which changed, None if deleted
+    global_state: dict[str, int | bytes | None] = field(default_factory=dict)
+    proposers_changed: bool = False
+    added_delay_mints: list[DelayMint] = field(default_factory=list)
+    removed_delay_mints: list[bytes] = field(default_factory=list)
+    x_algo_circulating_supply: int | None = None
+
+
+def get_min_balance(account_data: dict) -> int:
+    """
+    Min balance of an account from its data in a state delta
+    """
+    schema = account_data.get(b"TotalAppSchema", {})
+    num_uints, num_byte_slices = schema.get(b"nui", 0), schema.get(b"nbs", 0)
+    num_app_pages = account_data.get(b"TotalAppParams", 0) + account_data.get(b"TotalExtraAppPages", 0)
+    return (
+        MIN_BALANCE * (1 + account_data.get(b"TotalAssets", 0))
+        + APP_FLAT_PARAMS_MIN_BALANCE * num_app_pages
+        + APP_FLAT_OPT_IN_MIN_BALANCE * account_data.get(b"TotalAppLocalStates", 0)
+        + SCHEMA_MIN_BALANCE_PER_ENTRY * (num_uints + num_byte_slices)
+        + SCHEMA_UINT_MIN_BALANCE * num_uints
+        + SCHEMA_BYTES_MIN_BALANCE * num_byte_slices
+        + BOX_FLAT_MIN_BALANCE * account_data.get(b"TotalBoxes", 0)
+        + BOX_BYTE_MIN_BALANCE * account_data.get(b"TotalBoxBytes", 0)
+    )
+
+
+def decode_account(address: str, account_data: dict) -> ProposerAccount:
+    return ProposerAccount(
+        address,
+        account_data.get(b"MicroAlgos", 0),
+        get_min_balance(account_data),
+        ACCOUNT_STATUSES[account_data.get(b"Status", 0)],
+    )
+
+
+def decode_teal_key_values(key_values: dict) -> dict[str, int | bytes]:
+    return {
+        key.decode(): value.get(b"tb", b"") if value.get(b"tt") == TEAL_BYTES_TYPE else value.get(b"ui", 0)
+        for key, value in key_values.items()
+    }
+
+
+def encode_record(rnd: int, block: bytes, delta: bytes) -> bytes:
+    return msgpack.packb({"round": rnd, "block": block, "delta": delta})
+
+
+def read_records(path: Path | str) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        yield from msgpack.Unpacker(f, raw=False)
+
+
+async def fetch_round(client: AsyncAlgodClient, rnd: int) -> tuple[bytes, bytes]:
+    block, delta = await asyncio.gather(client.block_msgpack(rnd), client.ledger_state_delta(rnd))
+    return block, delta
+
+
+async def record(client: AsyncAlgodClient, path: Path | str, first_round: int, last_round: int, batch_size: int = 16):
+    """
+    Append the block and state delta of each round from the first to the last to a file of records
+    """
+    with open(path, "ab") as f:
+        for batch_start in range(first_round, last_round + 1, batch_size):
+            rounds = range(batch_start, min(batch_start + batch_size, last_round + 1))
+            payloads = await asyncio.gather(*(fetch_round(client, rnd) for rnd in rounds))
+            for rnd, (block, delta) in zip(rounds, payloads):
+                f.write(encode_record(rnd, block, delta))
+
+
+class DeltaTracker:
+    """
+    In-memory state of the consensus v3 app which is updated by applying the state delta of each round in order.
+
+    The accounts of new proposers are only known once they change in a delta, so proposers which were rekeyed to
+    the app before being added are fetched from the node when following live.
+    """
+
+    def __init__(
+        self,
+        app_id: int,
+        snapshot: ConsensusSnapshot,
+        app_account: ProposerAccount,
+        proposers_box: bytes,
+    ):
+        self.app_id = app_id
+        self.app_address = get_application_address(app_id)
+        self.round = snapshot.round
+        self.timestamp = 0
+        self.global_state = dict(snapshot.global_state)
+        self.proposers = [proposer.address for proposer in snapshot.proposers]
+        self.accounts = {proposer.address: proposer for proposer in snapshot.proposers}
+        self.accounts[self.app_address] = app_account
+        self.delay_mints = dict(snapshot.delay_mints)
+        self.x_algo_circulating_supply = snapshot.x_algo_circulating_supply
+        self._proposers_box = proposers_box
+        self._box_key_prefix = BOX_KEY_PREFIX + app_id.to_bytes(8, "big")
+        self._tracked_public_keys: dict[bytes, str] = {}
+        self._update_tracked_accounts()
+
+    @classmethod
+    async def bootstrap(cls, client: AsyncAlgodClient, app_id: int) -> "DeltaTracker":
+        snapshot, app_info = await asyncio.gather(
+            ConsensusStateReader(client, app_id).fetch_state(),
+            client.account_info(get_application_address(app_id)),
+        )
+        app_account = ProposerAccount(
+            app_info["address"], app_info["amount"], app_info["min-balance"], app_info["status"]
+        )
+        proposers_box = b"".join(decode_address(proposer.address) for proposer in snapshot.proposers)
+        return cls(app_id, snapshot, app_account, proposers_box)
+
+    @classmethod
+    def from_ledger_snapshot(cls, snapshot: LedgerSnapshot) -> "DeltaTracker":
+        app = snapshot.app_account
+        app_account = ProposerAccount(app.address, app.amount, app.min_balance, app.status)
+        return cls(snapshot.app_id, snapshot.to_consensus_snapshot(), app_account, snapshot.boxes[ProposersBox.NAME])
+
+    @property
+    def app_account(self) -> ProposerAccount:
+        return self.accounts[self.app_address]
+
+    @property
+    def missing_proposers(self) -> list[str]:
+        return [address for address in self.proposers if address not in self.accounts]
+
+    @property
+    def snapshot(self) -> ConsensusSnapshot:
+        return ConsensusSnapshot(
+            self.round,
+            dict(self.global_state),
+            [self.accounts[address] for address in self.proposers],
+            dict(self.delay_mints),
+            self.x_algo_circulating_supply,
+        )
+
+    def _update_tracked_accounts(self):
+        addresses = [*self.proposers, self.app_address]
+        self._tracked_public_keys = {decode_address(address): address for address in addresses}
+        self.accounts = {address: account for address, account in self.accounts.items() if address in addresses}
+
+    def _apply_global_state(self, app_resources: list[dict]) -> dict[str, int | bytes | None]:
+        for resource in app_resources:
+            if resource.get(b"Aidx") != self.app_id:
+                continue
+            params_delta = resource.get(b"Params", {})
+            if params_delta.get(b"Deleted"):
+                raise ValueError(f"App {self.app_id} was deleted in round {self.round + 1}")
+            if params_delta.get(b"Params") is None:
+                continue
+            global_state = decode_teal_key_values(params_delta[b"Params"].get(b"gs", {}))
+            changed = {key: value for key, value in global_state.items() if self.global_state.get(key) != value}
+            changed.update({key: None for key in self.global_state if key not in global_state})
+            self.global_state = global_state
+            return changed
+        return {}
+
+    def _apply_boxes(self, kv_mods: dict) -> tuple[bool, list[DelayMint], list[bytes]]:
+        proposers_box_changed = False
+        added, removed = [], []
+        for key, value_delta in kv_mods.items():
+            if not key.startswith(self._box_key_prefix):
+                continue
+            name = key[len(self._box_key_prefix):]
+            data = value_delta.get(b"Data")
+            if name == ProposersBox.NAME:
+                self._proposers_box = data or b""
+                proposers_box_changed = True
+            elif name.startswith(DelayMintBox.NAME_PREFIX):
+                if data:
+                    delay_mint = decode_delay_mint(name, data)
+                    self.delay_mints[name] = delay_mint
+                    added.append(delay_mint)
+                elif self.delay_mints.pop(name, None) is not None:
+                    removed.append(name)
+        return proposers_box_changed, added, removed
+
+    def _apply_accounts(self, balance_records: list[dict]) -> dict[str, ProposerAccount]:
+        changed = {}
+        for balance_record in balance_records:
+            address = self._tracked_public_keys.get(balance_record.get(b"Addr"))
+            if address is None:
+                continue
+            account = decode_account(address, balance_record)
+            if self.accounts.get(address) != account:
+                self.accounts[address] = changed[address] = account
+        return changed
+
+    def _apply_x_algo_holding(self, asset_resources: list[dict]) -> int | None:
+        x_algo_id = self.global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)
+        app_public_key = decode_address(self.app_address)
+        for resource in asset_resources:
+            if resource.get(b"Aidx") != x_algo_id or resource.get(b"Addr") != app_public_key:
+                continue
+            holding = resource.get(b"Holding", {}).get(b"Holding")
+            if holding is None:
+                continue
+            x_algo_circulating_supply = X_ALGO_TOTAL_SUPPLY - holding.get(b"a", 0)
+            if x_algo_circulating_supply != self.x_algo_circulating_supply:
+                self.x_algo_circulating_supply = x_algo_circulating_supply
+                return x_algo_circulating_supply
+        return None
+
+    def apply(self, block: bytes, delta: bytes) -> RoundChanges:
+        """
+        Apply the block and state delta of the next round, both as served by algod in msgpack
+        """
+        header = msgpack.unpackb(block, raw=True, strict_map_key=False)[b"block"]
+        rnd = header.get(b"rnd", 0)
+        if rnd != self.round + 1:
+            raise ValueError(f"Expected round {self.round + 1} but got round {rnd}")
+        state_delta = msgpack.unpackb(delta, raw=True, strict_map_key=False)
+        account_deltas = state_delta.get(b"Accts", {})
+
+        global_state = self._apply_global_state(account_deltas.get(b"AppResources") or [])
+        proposers_box_changed, added, removed = self._apply_boxes(state_delta.get(b"KvMods") or {})
+        proposers_changed = False
+        if proposers_box_changed or ConsensusV3GlobalState.NUM_PROPOSERS in global_state:
+            num_proposers = self.global_state.get(ConsensusV3GlobalState.NUM_PROPOSERS, 0)
+            proposers = decode_proposers(self._proposers_box, num_proposers)
+            proposers_changed = proposers != self.proposers
+            self.proposers = proposers
+            self._update_tracked_accounts()
+        accounts = self._apply_accounts(account_deltas.get(b"Accts") or [])
+        x_algo_circulating_supply = self._apply_x_algo_holding(account_deltas.get(b"AssetResources") or [])
+
+        self.round = rnd
+        self.timestamp = header.get(b"ts", 0)
+        return RoundChanges(
+            rnd,
+            self.timestamp,
+            accounts,
+            global_state,
+            proposers_changed,
+            added,
+            removed,
+            x_algo_circulating_supply,
+        )
+
+    async def _fetch_missing_proposers(self, client: AsyncAlgodClient) -> dict[str, ProposerAccount]:
+        missing = self.missing_proposers
+        infos = await asyncio.gather(*(client.account_info(address) for address in missing))
+        for address, info in zip(missing, infos):
+            self.accounts[address] = ProposerAccount(address, info["amount"], info["min-balance"], info["status"])
+        return {address: self.accounts[address] for address in missing}
+
+    async def follow(self, client: AsyncAlgodClient, last_round: int | None = None) -> AsyncIterator[RoundChanges]:
+        """
+        Apply the state delta of each new round from the node as it is produced, up to the last round if given
+        """
+        while last_round is None or self.round < last_round:
+            status = await client.status_after_block(self.round)
+            end_round = status["last-round"] if last_round is None else min(status["last-round"], last_round)
+            for rnd in range(self.round + 1, end_round + 1):
+                changes = self.apply(*await fetch_round(client, rnd))
+                if self.missing_proposers:
+                    accounts = await self._fetch_missing_proposers(client)
+                    changes = replace(changes, accounts={**changes.accounts, **accounts})
+                yield changes
+
+    def replay(self, path: Path | str) -> Iterator[RoundChanges]:
+        """
+        Apply the state deltas of a file of records, skipping rounds which have already been applied
+        """
+        for entry in read_records(path):
+            if entry["round"] <= self.round:
+                continue
+            changes = self.apply(entry["block"], entry["delta"])
+            if self.missing_proposers:
+                raise ValueError(f"Accounts of proposers {self.missing_proposers} not in records")
+            yield changes
+
+
+def _dump_changes(changes: RoundChanges):
+    print(json.dumps(asdict(changes), default=lambda value: value.hex()), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track the consensus v3 app from the state delta of each round")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    follow = subparsers.add_parser("follow", help="print the changes of each new round as json lines")
+    follow.add_argument("--app-id", type=int, required=True)
+    follow.add_argument("--last-round", type=int)
+
+    record_parser = subparsers.add_parser("record", help="append the blocks and deltas of rounds to a file")
+    record_parser.add_argument("records")
+    record_parser.add_argument("--first-round", type=int, required=True)
+    record_parser.add_argument("--last-round", type=int, required=True)
+
+    replay = subparsers.add_parser("replay", help="print the changes of each recorded round from a ledger snapshot")
+    replay.add_argument("records")
+    replay.add_argument("--snapshot", required=True, help="ledger snapshot taken before the first recorded round")
+
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        tracker = DeltaTracker.from_ledger_snapshot(load_snapshot(args.snapshot))
+        for changes in tracker.replay(args.records):
+            _dump_changes(changes)
+        return
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            if args.command == "record":
+                await record(client, args.records, args.first_round, args.last_round)
+                return
+            tracker = await DeltaTracker.bootstrap(client, args.app_id)
+            async for changes in tracker.follow(client, args.last_round):
+                _dump_changes(changes)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Decoding of the events logged by the consensus v3 contract
+"""
+from base64 import b64decode
+from dataclasses import dataclass
+from typing import Iterator
+from algosdk.encoding import checksum, encode_address
+
+
+def get_event_selector(signature: str) -> bytes:
+    return checksum(signature.encode())[:4]
+
+
+DELAYED_MINT_SELECTOR = get_event_selector("DelayedMint(byte[36],address,address,uint64)")
+CLAIM_DELAYED_MINT_SELECTOR = get_event_selector("ClaimDelayedMint(byte[36],address,address,uint64,uint64)")
+IMMEDIATE_MINT_SELECTOR = get_event_selector("ImmediateMint(address,address,uint64,uint64)")
+BURN_SELECTOR = get_event_selector("Burn(address,uint64,uint64)")
+UPDATE_FEE_SELECTOR = get_event_selector("UpdateFee(uint64)")
+UPDATE_PREMIUM_SELECTOR = get_event_selector("UpdatePremium(uint64)")
+UPDATE_FEE_SETTLEMENT_SELECTOR = get_event_selector("UpdateFeeSettlement(bool)")
+REBALANCE_PROPOSERS_SELECTOR = get_event_selector("RebalanceProposers(uint64,uint64,uint64)")
+
+
+@dataclass(frozen=True)
+class DelayedMintEvent:
+    round: int
+    box_name: bytes
+    minter: str
+    receiver: str
+    stake: int
+
+
+@dataclass(frozen=True)
+class ClaimDelayedMintEvent:
+    round: int
+    box_name: bytes
+    minter: str
+    receiver: str
+    stake: int
+    mint_amount: int
+
+
+@dataclass(frozen=True)
+class ImmediateMintEvent:
+    round: int
+    minter: str
+    receiver: str
+    algo_sent: int
+    mint_amount: int
+
+
+@dataclass(frozen=True)
+class BurnEvent:
+    round: int
+    burner: str
+    burn_amount: int
+    algo_sent: int
+
+
+@dataclass(frozen=True)
+class UpdateFeeEvent:
+    round: int
+    fee: int  # 4 d.p
+
+
+@dataclass(frozen=True)
+class UpdatePremiumEvent:
+    round: int
+    premium: int  # 16 d.p
+
+
+@dataclass(frozen=True)
+class UpdateFeeSettlementEvent:
+    round: int
+    settle_in_x_algo: bool
+
+
+@dataclass(frozen=True)
+class RebalanceProposersEvent:
+    round: int
+    from_proposer_index: int
+    to_proposer_index: int
+    amount: int
+
+
+Event = (
+    DelayedMintEvent | ClaimDelayedMintEvent | ImmediateMintEvent | BurnEvent | UpdateFeeEvent | UpdatePremiumEvent
+    | UpdateFeeSettlementEvent | RebalanceProposersEvent
+)
+
+
+def decode_event(log: bytes, rnd: int) -> Event | None:
+    """
+    Decode a log of the consensus v3 contract, returning None if it is not a known event
+    """
+    selector, data = log[:4], log[4:]
+    if selector == DELAYED_MINT_SELECTOR and len(data) == 108:
+        return DelayedMintEvent(
+            round=rnd,
+            box_name=data[:36],
+            minter=encode_address(data[36:68]),
+            receiver=encode_address(data[68:100]),
+            stake=int.from_bytes(data[100:108], "big"),
+        )
+    if selector == CLAIM_DELAYED_MINT_SELECTOR and len(data) == 116:
+        return ClaimDelayedMintEvent(
+            round=rnd,
+            box_name=data[:36],
+            minter=encode_address(data[36:68]),
+            receiver=encode_address(data[68:100]),
+            stake=int.from_bytes(data[100:108], "big"),
+            mint_amount=int.from_bytes(data[108:116], "big"),
+        )
+    if selector == IMMEDIATE_MINT_SELECTOR and len(data) == 80:
+        return ImmediateMintEvent(
+            round=rnd,
+            minter=encode_address(data[:32]),
+            receiver=encode_address(data[32:64]),
+            algo_sent=int.from_bytes(data[64:72], "big"),
+            mint_amount=int.from_bytes(data[72:80], "big"),
+        )
+    if selector == BURN_SELECTOR and len(data) == 48:
+        return BurnEvent(
+            round=rnd,
+            burner=encode_address(data[:32]),
+            burn_amount=int.from_bytes(data[32:40], "big"),
+            algo_sent=int.from_bytes(data[40:48], "big"),
+        )
+    if selector == UPDATE_FEE_SELECTOR and len(data) == 8:
+        return UpdateFeeEvent(rnd, int.from_bytes(data, "big"))
+    if selector == UPDATE_PREMIUM_SELECTOR and len(data) == 8:
+        return UpdatePremiumEvent(rnd, int.from_bytes(data, "big"))
+    if selector == UPDATE_FEE_SETTLEMENT_SELECTOR and len(data) == 1:
+        # abi bool is encoded as its highest bit
+        return UpdateFeeSettlementEvent(rnd, bool(data[0] & 0x80))
+    if selector == REBALANCE_PROPOSERS_SELECTOR and len(data) == 24:
+        return RebalanceProposersEvent(
+            round=rnd,
+            from_proposer_index=int.from_bytes(data[:8], "big"),
+            to_proposer_index=int.from_bytes(data[8:16], "big"),
+            amount=int.from_bytes(data[16:24], "big"),
+        )
+    return None
+
+
+def _iter_txn_logs(stxn: dict, app_id: int) -> Iterator[bytes]:
+    txn = stxn.get("txn", {})
+    apply_data = stxn.get("dt", {})
+    if txn.get("type") == "appl" and txn.get("apid") == app_id:
+        for log in apply_data.get("lg", []):
+            yield b64decode(log)
+    # app may also be called from within another app
+    for inner in apply_data.get("itx", []):
+        yield from _iter_txn_logs(inner, app_id)
+
+
+def iter_block_events(block: dict, app_id: int) -> Iterator[Event]:
+    """
+    Events logged by the app in a block returned by algod in json format, in the order they were emitted
+    """
+    rnd = block.get("rnd", 0)
+    for stxn in block.get("txns", []):
+        for log in _iter_txn_logs(stxn, app_id):
+            if (event := decode_event(log, rnd)) is not None:
+                yield event
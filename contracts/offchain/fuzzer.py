@@ -0,0 +1,854 @@
+"""
+Differential fuzzer for the economics of the consensus v3 app.
+
+Random sequences of immediate mints, delayed mints, claims, burns, fee claims, updates of the fee and how it is
+settled, and reward payments to proposers are run against an exact integer reference model of the contract. The
+model mirrors the uint64 arithmetic of the contract, rejecting a step wherever the AVM would panic or an assert
+fail, and also computes the exact rational amount of each mint and burn. After every step the following invariants
+are checked:
+- the rate, net of the fee on rewards not yet synced, never decreases
+- mints and burns round in favour of the protocol, by less than one microunit per division
+- the app account never keeps ALGO it receives above its min balance
+- the active balance of the proposers is accounted for by the state and the rewards since the last sync
+
+Seeds run in parallel across a process pool and failing sequences are shrunk to a minimal reproduction.
+
+Against a local network the same steps are also run on a fork of a ledger snapshot, comparing whether each step
+was rejected and the state of the app with the model after every step. Each seed forks its own app so seeds run
+concurrently. The network should be in dev mode so that each group is confirmed in its own round.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from dataclasses import asdict, dataclass, field
+from fractions import Fraction
+
+from algosdk import mnemonic
+from algosdk.account import address_from_private_key
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.encoding import encode_address
+from algosdk.logic import get_application_address
+from algosdk.transaction import AssetTransferTxn, PaymentTxn
+
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.group_builder import ONE_4_DP, ConsensusGroupBuilder
+from offchain.ledger_snapshot import LedgerSnapshot, fork_snapshot, load_snapshot
+from offchain.state import X_ALGO_TOTAL_SUPPLY, ConsensusV3GlobalState, DelayMintNonceBox
+from offchain.state_reader import ConsensusSnapshot, ConsensusStateReader
+
+MAX_UINT64 = 2 ** 64 - 1
+ONE_16_DP = int(1e16)
+DELAY_MINT_ROUNDS = 320
+# 2500 + 400 * (36 byte name + 48 byte value), paid by the minter and refunded to the claimer
+DELAY_MINT_BOX_MIN_BALANCE = 36_100
+# 2500 + 400 * (34 byte name + 8 byte value), paid by the minter on its first delayed mint and never refunded
+DELAY_MINT_NONCE_BOX_MIN_BALANCE = 19_300
+MAX_REWARD = int(100e6)
+
+OPERATIONS = (
+    "immediate_mint", "delayed_mint", "claim_delayed_mint", "burn", "claim_fee", "update_fee", "update_fee_settlement",
+    "reward", "advance",
+)
+DEFAULT_MIX = {
+    "immediate_mint": 0.25,
+    "delayed_mint": 0.15,
+    "claim_delayed_mint": 0.1,
+    "burn": 0.2,
+    "claim_fee": 0.05,
+    "update_fee": 0.05,
+    "update_fee_settlement": 0.03,
+    "reward": 0.12,
+    "advance": 0.05,
+}
+
+
+class ContractRejection(Exception):
+    """
+    The contract would reject the call e.g. a failed assert or uint64 overflow
+    """
+
+
+def _check_uint64(value: int) -> int:
+    if value < 0:
+        raise ContractRejection("uint64 underflow")
+    if value > MAX_UINT64:
+        raise ContractRejection("uint64 overflow")
+    return value
+
+
+def _mul_scale(n1: int, n2: int, scale: int) -> int:
+    # mirrors MulDiv64 which panics on division by zero or a result which does not fit in uint64
+    if not scale:
+        raise ContractRejection("division by zero")
+    return _check_uint64(n1 * n2 // scale)
+
+
+@dataclass(frozen=True)
+class Step:
+    op: str
+    amount: int = 0
+    # proposer index of a reward, nonce of a delayed mint or of the delayed mint to claim
+    index: int = 0
+
+
+@dataclass(frozen=True)
+class Outcome:
+    rejection: str | None = None
+    # xALGO minted, ALGO sent on burn or fees claimed
+    amount: int = 0
+    # exact rational amount the contract rounds down from
+    exact: Fraction | None = None
+    # number of floor divisions between the exact and actual amount
+    num_roundings: int = 0
+
+
+@dataclass
+class ModelState:
+    round: int
+    proposer_balances: list[int]
+    proposer_min_balances: list[int]
+    max_proposer_balance: int
+    fee: int
+    premium: int
+    last_proposers_active_balance: int
+    total_pending_stake: int
+    total_unclaimed_fees: int
+    x_algo_circulating_supply: int
+    # ALGO of the app account above its min balance
+    app_algo_balance: int = 0
+    # xALGO held by the fuzzing account, which is both minter and admin
+    user_x_algo: int = 0
+    # nonce to stake and round of the delayed mints of the fuzzing account
+    delay_mints: dict[int, tuple[int, int]] = field(default_factory=dict)
+    # ALGO paid to proposers outside of the app since the last sync
+    unsynced_rewards: int = 0
+    next_nonce: int = 0
+    has_nonce_box: bool = False
+    settle_fees_in_x_algo: bool = False
+
+
+def initial_state(rng: random.Random) -> ModelState:
+    """
+    Random synced state with a rate between 1 and 1.5 ALGO per xALGO
+    """
+    num_proposers = rng.randint(1, 6)
+    min_balances = [100_000] * num_proposers
+    balances = [min_balance + _random_amount(rng, int(1e12)) for min_balance in min_balances]
+    active_balance = sum(balances) - sum(min_balances)
+    circulating_supply = active_balance * rng.randint(6_667, 10_000) // 10_000
+    return ModelState(
+        round=1000,
+        proposer_balances=balances,
+        proposer_min_balances=min_balances,
+        max_proposer_balance=max(balances) * rng.choice([2, 10, 1000]),
+        fee=rng.randint(0, ONE_4_DP),
+        premium=rng.randint(0, int(0.01e16)),
+        last_proposers_active_balance=active_balance,
+        total_pending_stake=0,
+        total_unclaimed_fees=0,
+        x_algo_circulating_supply=circulating_supply,
+        user_x_algo=circulating_supply,
+    )
+
+
+class ReferenceModel:
+    """
+    Exact integer mirror of the economics of the consensus v3 app. Rate checkpoints, logs and parameters other than
+    the fee are not modelled. Rejected steps leave the state unchanged.
+    """
+
+    def __init__(self, state: ModelState):
+        self.state = state
+
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: ConsensusSnapshot,
+        user_x_algo: int,
+        app_algo_balance: int = 0,
+    ) -> "ReferenceModel":
+        global_state = snapshot.global_state
+        proposers_active_balance = sum(p.balance - p.min_balance for p in snapshot.proposers)
+        total_pending_stake = global_state.get(ConsensusV3GlobalState.TOTAL_PENDING_STAKE, 0)
+        last_proposers_active_balance = global_state.get(ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE, 0)
+        return cls(ModelState(
+            round=snapshot.round + 1,
+            proposer_balances=[p.balance for p in snapshot.proposers],
+            proposer_min_balances=[p.min_balance for p in snapshot.proposers],
+            max_proposer_balance=global_state.get(ConsensusV3GlobalState.MAX_PROPOSER_BALANCE, 0),
+            fee=global_state.get(ConsensusV3GlobalState.FEE, 0),
+            premium=global_state.get(ConsensusV3GlobalState.PREMIUM, 0),
+            last_proposers_active_balance=last_proposers_active_balance,
+            total_pending_stake=total_pending_stake,
+            total_unclaimed_fees=global_state.get(ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES, 0),
+            x_algo_circulating_supply=snapshot.x_algo_circulating_supply,
+            app_algo_balance=app_algo_balance,
+            user_x_algo=user_x_algo,
+            unsynced_rewards=proposers_active_balance - total_pending_stake - last_proposers_active_balance,
+            settle_fees_in_x_algo=bool(global_state.get(ConsensusV3GlobalState.SETTLE_FEES_IN_X_ALGO, 0)),
+        ))
+
+    @property
+    def algo_balance(self) -> int:
+        return self.state.last_proposers_active_balance - self.state.total_unclaimed_fees
+
+    def synced_rate(self) -> Fraction | None:
+        """
+        Rate the contract would use after syncing, or None if there is no xALGO in circulation
+        """
+        s = self.state
+        if not s.x_algo_circulating_supply:
+            return None
+        unclaimed_fees = s.total_unclaimed_fees + max(s.unsynced_rewards, 0) * s.fee // ONE_4_DP
+        algo_balance = s.last_proposers_active_balance + s.unsynced_rewards - unclaimed_fees
+        return Fraction(algo_balance, s.x_algo_circulating_supply)
+
+    def observe(self) -> dict:
+        """
+        State which can be compared with that read from the network
+        """
+        s = self.state
+        return {
+            "proposer_balances": list(s.proposer_balances),
+            "fee": s.fee,
+            "last_proposers_active_balance": s.last_proposers_active_balance,
+            "total_pending_stake": s.total_pending_stake,
+            "total_unclaimed_fees": s.total_unclaimed_fees,
+            "x_algo_circulating_supply": s.x_algo_circulating_supply,
+            "app_algo_balance": s.app_algo_balance,
+            "user_x_algo": s.user_x_algo,
+            "delay_mints": dict(s.delay_mints),
+        }
+
+    def apply(self, step: Step) -> Outcome:
+        state = deepcopy(self.state)
+        try:
+            outcome = getattr(self, "_" + step.op)(step)
+        except ContractRejection as e:
+            self.state = state
+            return Outcome(rejection=str(e))
+        self.state.round += step.amount if step.op == "advance" else 1
+        return outcome
+
+    def _sync(self):
+        # mirrors sync_proposers_active_balance_and_unclaimed_fees
+        s = self.state
+        proposers_active_balance = sum(
+            _check_uint64(balance - min_balance)
+            for balance, min_balance in zip(s.proposer_balances, s.proposer_min_balances)
+        )
+        proposers_active_balance = _check_uint64(proposers_active_balance - s.total_pending_stake)
+        total_rewards_delta = _check_uint64(proposers_active_balance - s.last_proposers_active_balance)
+        unclaimed_fees_delta = _mul_scale(total_rewards_delta, s.fee, ONE_4_DP)
+        s.total_unclaimed_fees = _check_uint64(s.total_unclaimed_fees + unclaimed_fees_delta)
+        s.last_proposers_active_balance = proposers_active_balance
+        s.unsynced_rewards = 0
+
+    def _receive(self, amount: int):
+        # mirrors receive_algo_to_proposers
+        s = self.state
+        balances = s.proposer_balances
+        target = _check_uint64(sum(balances) + amount) // len(balances) + 1
+        if target > s.max_proposer_balance:
+            raise ContractRejection("exceeds max proposer balance")
+        rem = amount
+        for i, balance in enumerate(balances):
+            if not rem:
+                break
+            if balance < target:
+                alloc = min(target - balance, rem)
+                balances[i] += alloc
+                rem -= alloc
+        if rem:
+            raise ContractRejection("algo not fully allocated")
+
+    def _send(self, amount: int):
+        # mirrors send_algo_from_proposers, proposers cannot be left below their min balance
+        s = self.state
+        balances = s.proposer_balances
+        target = _check_uint64(sum(balances) - amount) // len(balances)
+        rem = amount
+        for i, balance in enumerate(balances):
+            if not rem:
+                break
+            if balance > target:
+                alloc = min(balance - target, rem)
+                if balance - alloc < s.proposer_min_balances[i]:
+                    raise ContractRejection("proposer below min balance")
+                balances[i] -= alloc
+                rem -= alloc
+        if rem:
+            raise ContractRejection("algo not fully allocated")
+
+    def _mint(self, amount: int):
+        s = self.state
+        if s.x_algo_circulating_supply + amount > X_ALGO_TOTAL_SUPPLY:
+            raise ContractRejection("insufficient xALGO in app")
+        s.x_algo_circulating_supply += amount
+        s.user_x_algo += amount
+
+    def _send_unclaimed_fees(self) -> Outcome:
+        s = self.state
+        self._sync()
+        fees = s.total_unclaimed_fees
+        if s.settle_fees_in_x_algo:
+            # xALGO minted to the admin at the current rate, the ALGO stays with the proposers
+            algo_balance = _check_uint64(self.algo_balance)
+            if algo_balance:
+                mint_amount = _mul_scale(fees, s.x_algo_circulating_supply, algo_balance)
+                exact = Fraction(fees * s.x_algo_circulating_supply, algo_balance)
+            else:
+                mint_amount = exact = fees
+            if mint_amount:
+                self._mint(mint_amount)
+            s.total_unclaimed_fees = 0
+            return Outcome(amount=mint_amount, exact=Fraction(exact), num_roundings=1)
+        self._send(fees)
+        s.last_proposers_active_balance = _check_uint64(s.last_proposers_active_balance - fees)
+        s.total_unclaimed_fees = 0
+        return Outcome(amount=fees)
+
+    def _immediate_mint(self, step: Step) -> Outcome:
+        s = self.state
+        self._sync()
+        self._receive(step.amount)
+        algo_balance = _check_uint64(self.algo_balance)
+        circulating_supply = s.x_algo_circulating_supply
+        if algo_balance:
+            mint_amount = _mul_scale(
+                _mul_scale(step.amount, circulating_supply, algo_balance), ONE_16_DP - s.premium, ONE_16_DP
+            )
+            exact = Fraction(step.amount * circulating_supply * (ONE_16_DP - s.premium), algo_balance * ONE_16_DP)
+        else:
+            mint_amount = exact = step.amount
+        s.last_proposers_active_balance = _check_uint64(s.last_proposers_active_balance + step.amount)
+        if not mint_amount:
+            raise ContractRejection("nothing to mint")
+        self._mint(mint_amount)
+        return Outcome(amount=mint_amount, exact=Fraction(exact), num_roundings=2)
+
+    def _delayed_mint(self, step: Step) -> Outcome:
+        s = self.state
+        # box min balances are paid to the app in the same group
+        box_min_balance = DELAY_MINT_BOX_MIN_BALANCE + (0 if s.has_nonce_box else DELAY_MINT_NONCE_BOX_MIN_BALANCE)
+        s.app_algo_balance += box_min_balance
+        self._sync()
+        self._receive(step.amount)
+        s.total_pending_stake = _check_uint64(s.total_pending_stake + step.amount)
+        if step.index in s.delay_mints:
+            raise ContractRejection("delay mint box exists")
+        s.app_algo_balance -= box_min_balance
+        s.delay_mints[step.index] = (step.amount, s.round + DELAY_MINT_ROUNDS)
+        s.next_nonce = (step.index + 1) % DelayMintNonceBox.NUM_NONCES
+        s.has_nonce_box = True
+        return Outcome()
+
+    def _claim_delayed_mint(self, step: Step) -> Outcome:
+        s = self.state
+        if step.index not in s.delay_mints:
+            raise ContractRejection("no delay mint box")
+        stake, rnd = s.delay_mints.pop(step.index)
+        if s.round < rnd:
+            raise ContractRejection("delay mint not matured")
+        self._sync()
+        algo_balance = _check_uint64(self.algo_balance)
+        circulating_supply = s.x_algo_circulating_supply
+        if algo_balance:
+            mint_amount = _mul_scale(stake, circulating_supply, algo_balance)
+            exact = Fraction(stake * circulating_supply, algo_balance)
+        else:
+            mint_amount = exact = stake
+        s.last_proposers_active_balance = _check_uint64(s.last_proposers_active_balance + stake)
+        s.total_pending_stake = _check_uint64(s.total_pending_stake - stake)
+        self._mint(mint_amount)
+        # box min balance and anything else above the min balance of the app is sent to the claimer
+        s.app_algo_balance = 0
+        return Outcome(amount=mint_amount, exact=Fraction(exact), num_roundings=1)
+
+    def _burn(self, step: Step) -> Outcome:
+        s = self.state
+        if step.amount > s.user_x_algo:
+            raise ContractRejection("insufficient xALGO")
+        s.user_x_algo -= step.amount
+        s.x_algo_circulating_supply -= step.amount
+        self._sync()
+        algo_balance = _check_uint64(self.algo_balance)
+        algo_to_send = _mul_scale(step.amount, algo_balance, s.x_algo_circulating_supply + step.amount)
+        exact = Fraction(step.amount * algo_balance, s.x_algo_circulating_supply + step.amount)
+        if not algo_to_send:
+            raise ContractRejection("nothing to send")
+        self._send(algo_to_send)
+        s.last_proposers_active_balance = _check_uint64(s.last_proposers_active_balance - algo_to_send)
+        return Outcome(amount=algo_to_send, exact=exact, num_roundings=1)
+
+    def _claim_fee(self, step: Step) -> Outcome:
+        return self._send_unclaimed_fees()
+
+    def _update_fee(self, step: Step) -> Outcome:
+        outcome = self._send_unclaimed_fees()
+        if step.amount > ONE_4_DP:
+            raise ContractRejection("fee exceeds 100%")
+        self.state.fee = step.amount
+        return outcome
+
+    def _update_fee_settlement(self, step: Step) -> Outcome:
+        self.state.settle_fees_in_x_algo = bool(step.amount)
+        return Outcome()
+
+    def _reward(self, step: Step) -> Outcome:
+        self.state.proposer_balances[step.index] += step.amount
+        self.state.unsynced_rewards += step.amount
+        return Outcome()
+
+    def _advance(self, step: Step) -> Outcome:
+        return Outcome()
+
+
+def _random_amount(rng: random.Random, maximum: int) -> int:
+    # log uniform so that dust amounts near the rounding boundaries are as likely as large ones
+    if maximum < 1:
+        return 0
+    return min(int(10 ** rng.uniform(0, math.log10(maximum))), maximum)
+
+
+def next_step(rng: random.Random, model: ReferenceModel, mix: dict[str, float] = None) -> Step:
+    """
+    Random step which is valid to attempt in the current state of the model. It may still be rejected e.g. a mint
+    so small that no xALGO would be minted.
+    """
+    s = model.state
+    ops, weights = zip(*(mix or DEFAULT_MIX).items())
+    op = rng.choices(ops, weights)[0]
+
+    if op == "claim_delayed_mint":
+        matured = [nonce for nonce, (_, rnd) in s.delay_mints.items() if rnd <= s.round]
+        if matured:
+            return Step(op, index=rng.choice(matured))
+        if s.delay_mints:
+            return Step("advance", min(rnd for _, rnd in s.delay_mints.values()) - s.round)
+        op = "reward"
+    if op == "burn":
+        if s.user_x_algo:
+            return Step(op, _random_amount(rng, s.user_x_algo))
+        op = "immediate_mint"
+    if op in ("immediate_mint", "delayed_mint"):
+        # up to the capacity left below the max proposer balance
+        capacity = s.max_proposer_balance * len(s.proposer_balances) - sum(s.proposer_balances)
+        return Step(op, _random_amount(rng, max(capacity, 1)), s.next_nonce if op == "delayed_mint" else 0)
+    if op == "reward":
+        return Step(op, _random_amount(rng, MAX_REWARD), rng.randrange(len(s.proposer_balances)))
+    if op == "update_fee":
+        return Step(op, rng.randint(0, ONE_4_DP))
+    if op == "update_fee_settlement":
+        return Step(op, rng.randint(0, 1))
+    if op == "advance":
+        return Step(op, rng.randint(1, DELAY_MINT_ROUNDS))
+    return Step(op)
+
+
+def check_invariants(before: ReferenceModel, after: ReferenceModel, step: Step, outcome: Outcome) -> list[str]:
+    """
+    Invariants broken by the given step, empty if none
+    """
+    violations = []
+    s = after.state
+
+    rate_before, rate_after = before.synced_rate(), after.synced_rate()
+    if rate_before is not None and rate_after is not None and rate_after < rate_before:
+        violations.append(f"rate decreased from {float(rate_before)} to {float(rate_after)}")
+
+    if outcome.exact is not None:
+        if outcome.amount > outcome.exact:
+            violations.append(f"{step.op} rounded up from {float(outcome.exact)} to {outcome.amount}")
+        elif outcome.exact - outcome.amount >= outcome.num_roundings:
+            violations.append(f"{step.op} rounded down from {float(outcome.exact)} to {outcome.amount}")
+
+    if s.app_algo_balance > before.state.app_algo_balance:
+        violations.append(f"app account kept {s.app_algo_balance - before.state.app_algo_balance} ALGO")
+
+    proposers_active_balance = sum(s.proposer_balances) - sum(s.proposer_min_balances)
+    unaccounted = (
+        proposers_active_balance - s.total_pending_stake - s.last_proposers_active_balance - s.unsynced_rewards
+    )
+    if unaccounted:
+        violations.append(f"{unaccounted} ALGO of proposers unaccounted for")
+    if any(b < m for b, m in zip(s.proposer_balances, s.proposer_min_balances)):
+        violations.append("proposer below min balance")
+
+    if s.total_unclaimed_fees > s.last_proposers_active_balance:
+        violations.append("unclaimed fees exceed proposers active balance")
+    if s.user_x_algo > s.x_algo_circulating_supply:
+        violations.append("xALGO held exceeds circulating supply")
+    # pending stake of other minters is unchanged
+    other_pending_stakes = [
+        state.total_pending_stake - sum(stake for stake, _ in state.delay_mints.values())
+        for state in (before.state, s)
+    ]
+    if other_pending_stakes[0] != other_pending_stakes[1]:
+        violations.append("pending stake does not match delay mints")
+    return violations
+
+
+@dataclass(frozen=True)
+class Failure:
+    step_index: int
+    step: Step
+    messages: list[str]
+
+
+@dataclass
+class FuzzResult:
+    seed: int
+    steps: list[Step]
+    executed: dict[str, int] = field(default_factory=dict)
+    rejections: dict[str, int] = field(default_factory=dict)
+    failure: Failure | None = None
+
+
+def replay(
+    initial: ModelState,
+    steps: list[Step],
+    model_type: type[ReferenceModel] = ReferenceModel,
+) -> Failure | None:
+    """
+    Run the given steps against the model from the given state, returning the first broken invariant
+    """
+    model = model_type(deepcopy(initial))
+    for i, step in enumerate(steps):
+        before = model_type(deepcopy(model.state))
+        outcome = model.apply(step)
+        if violations := check_invariants(before, model, step, outcome):
+            return Failure(i, step, violations)
+    return None
+
+
+def shrink(
+    initial: ModelState,
+    steps: list[Step],
+    model_type: type[ReferenceModel] = ReferenceModel,
+) -> list[Step]:
+    """
+    Remove steps one at a time from a failing sequence while it still fails
+    """
+    failure = replay(initial, steps, model_type)
+    if failure is None:
+        raise ValueError("Steps do not fail")
+    steps = steps[:failure.step_index + 1]
+    i = len(steps) - 2
+    while i >= 0:
+        candidate = steps[:i] + steps[i + 1:]
+        if replay(initial, candidate, model_type) is not None:
+            steps = candidate
+        i -= 1
+    return steps
+
+
+def run_seed(seed: int, num_steps: int, initial: ModelState = None, mix: dict[str, float] = None) -> FuzzResult:
+    """
+    Run a random sequence of steps against the model only, shrinking the sequence on failure
+    """
+    rng = random.Random(seed)
+    initial = initial if initial is not None else initial_state(rng)
+    model = ReferenceModel(deepcopy(initial))
+    result = FuzzResult(seed, [])
+    executed, rejections = Counter(), Counter()
+    for i in range(num_steps):
+        step = next_step(rng, model, mix)
+        result.steps.append(step)
+        before = ReferenceModel(deepcopy(model.state))
+        outcome = model.apply(step)
+        if outcome.rejection:
+            rejections[outcome.rejection] += 1
+        else:
+            executed[step.op] += 1
+        if violations := check_invariants(before, model, step, outcome):
+            result.steps = shrink(initial, result.steps)
+            result.failure = replay(initial, result.steps) or Failure(i, step, violations)
+            break
+    result.executed, result.rejections = dict(executed), dict(rejections)
+    return result
+
+
+def _run_seed(args: tuple) -> FuzzResult:
+    return run_seed(*args)
+
+
+def run_campaign(
+    seeds: list[int],
+    num_steps: int,
+    initial: ModelState = None,
+    mix: dict[str, float] = None,
+    processes: int | None = None,
+) -> list[FuzzResult]:
+    """
+    Run each seed against the model in a process pool
+    """
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(_run_seed, [(seed, num_steps, initial, mix) for seed in seeds]))
+
+
+class NetworkTarget:
+    """
+    Fork of a ledger snapshot in a local network which steps are run against. The funder is substituted for the
+    admin of the snapshot and is the account which mints, burns and pays rewards.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, funder_private_key: str, app_id: int, x_algo_id: int):
+        self.client = client
+        self.private_key = funder_private_key
+        self.address = address_from_private_key(funder_private_key)
+        self.signer = AccountTransactionSigner(funder_private_key)
+        self.app_id = app_id
+        self.app_address = get_application_address(app_id)
+        self.x_algo_id = x_algo_id
+        self.reader = ConsensusStateReader(client, app_id)
+        self.has_nonce_box = False
+
+    @classmethod
+    async def fork(cls, client: AsyncAlgodClient, funder_private_key: str, snapshot: LedgerSnapshot) -> "NetworkTarget":
+        admin = encode_address(snapshot.global_state[ConsensusV3GlobalState.ADMIN])
+        addresses = {admin: address_from_private_key(funder_private_key)}
+        forked = await fork_snapshot(client, funder_private_key, snapshot, addresses)
+        return cls(client, funder_private_key, forked.app_id, forked.x_algo_id)
+
+    async def next_round(self) -> int:
+        return (await self.client.status())["last-round"] + 1
+
+    async def fetch_model(self) -> ReferenceModel:
+        observed = await self.observe()
+        model = ReferenceModel.from_snapshot(
+            await self.reader.fetch_state(force=True), observed["user_x_algo"], observed["app_algo_balance"]
+        )
+        model.state.delay_mints = observed["delay_mints"]
+        nonce = await self.reader.fetch_delay_mint_nonce_cursor(self.address)
+        model.state.next_nonce = nonce or 0
+        model.state.has_nonce_box = self.has_nonce_box = nonce is not None
+        return model
+
+    async def observe(self) -> dict:
+        snapshot, app_info, holding = await asyncio.gather(
+            self.reader.fetch_state(force=True),
+            self.client.account_info(self.app_address),
+            self.client.account_asset_info(self.address, self.x_algo_id),
+        )
+        global_state = snapshot.global_state
+        delay_mints = {
+            int.from_bytes(delay_mint.nonce, "big"): (delay_mint.stake, delay_mint.round)
+            for delay_mint in snapshot.delay_mints.values() if delay_mint.minter == self.address
+        }
+        return {
+            "proposer_balances": [proposer.balance for proposer in snapshot.proposers],
+            "fee": global_state.get(ConsensusV3GlobalState.FEE, 0),
+            "last_proposers_active_balance": global_state.get(ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE, 0),
+            "total_pending_stake": global_state.get(ConsensusV3GlobalState.TOTAL_PENDING_STAKE, 0),
+            "total_unclaimed_fees": global_state.get(ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES, 0),
+            "x_algo_circulating_supply": snapshot.x_algo_circulating_supply,
+            "app_algo_balance": app_info["amount"] - app_info["min-balance"],
+            "user_x_algo": holding["asset-holding"]["amount"],
+            "delay_mints": delay_mints,
+        }
+
+    async def _send(self, txns: list[TransactionWithSigner]) -> int:
+        atc = AtomicTransactionComposer()
+        for txn in txns:
+            txn.txn.group = None
+            atc.add_transaction(txn)
+        info = await self.client.wait_for_confirmation(await self.client.send_transactions(atc.gather_signatures()))
+        return info["confirmed-round"]
+
+    def _build(self, step: Step, snapshot: ConsensusSnapshot, params) -> list[TransactionWithSigner]:
+        builder = ConsensusGroupBuilder(self.app_id, snapshot)
+        user, signer = self.address, self.signer
+        if step.op == "reward":
+            proposer = snapshot.proposers[step.index].address
+            return [TransactionWithSigner(PaymentTxn(user, params, proposer, step.amount), signer)]
+        if step.op in ("immediate_mint", "delayed_mint"):
+            send_algo = TransactionWithSigner(PaymentTxn(user, params, self.app_address, step.amount), signer)
+            third_arg = 0 if step.op == "immediate_mint" else step.index.to_bytes(2, "big")
+            method_args = [send_algo, user, third_arg]
+        elif step.op == "claim_delayed_mint":
+            method_args = [user, step.index.to_bytes(2, "big")]
+        elif step.op == "burn":
+            send_xalgo = AssetTransferTxn(user, params, self.app_address, step.amount, self.x_algo_id)
+            method_args = [TransactionWithSigner(send_xalgo, signer), user, 0]
+        elif step.op == "update_fee":
+            method_args = [step.amount]
+        elif step.op == "update_fee_settlement":
+            method_args = [bool(step.amount)]
+        else:
+            method_args = []
+        txns = builder.build(step.op, user, signer, params, method_args).build_group()
+        if step.op == "delayed_mint":
+            box_min_balance = DELAY_MINT_BOX_MIN_BALANCE
+            if not self.has_nonce_box:
+                box_min_balance += DELAY_MINT_NONCE_BOX_MIN_BALANCE
+            box_payment = PaymentTxn(user, params, self.app_address, box_min_balance)
+            txns.insert(0, TransactionWithSigner(box_payment, signer))
+        return txns
+
+    async def execute(self, step: Step) -> tuple[str | None, int | None]:
+        """
+        Run the step, returning the reason it was rejected if so and otherwise the round it was confirmed in
+        """
+        try:
+            params = await self.client.suggested_params()
+            if step.op == "advance":
+                # in dev mode each transaction is confirmed in its own round
+                for i in range(step.amount):
+                    txn = PaymentTxn(self.address, params, self.address, 0, note=f"advance {i}".encode())
+                    rnd = await self._send([TransactionWithSigner(txn, self.signer)])
+                return None, rnd
+            snapshot = await self.reader.fetch_state(force=True)
+            rnd = await self._send(self._build(step, snapshot, params))
+            if step.op == "delayed_mint":
+                self.has_nonce_box = True
+            return None, rnd
+        except (AlgodHTTPError, ValueError) as e:
+            return str(e), None
+
+
+async def run_network_seed(
+    target: NetworkTarget,
+    seed: int,
+    num_steps: int,
+    mix: dict[str, float] = None,
+) -> FuzzResult:
+    """
+    Run a random sequence of steps against both the network and the model, comparing them after each step
+    """
+    rng = random.Random(seed)
+    model = await target.fetch_model()
+    result = FuzzResult(seed, [])
+    executed, rejections = Counter(), Counter()
+    for i in range(num_steps):
+        model.state.round = await target.next_round()
+        step = next_step(rng, model, mix)
+        result.steps.append(step)
+        network_rejection, confirmed_round = await target.execute(step)
+        if confirmed_round is not None:
+            # rounds can move on between building and confirming the group
+            model.state.round = confirmed_round - (step.amount - 1 if step.op == "advance" else 0)
+        before = ReferenceModel(deepcopy(model.state))
+        outcome = model.apply(step)
+        if outcome.rejection:
+            rejections[outcome.rejection] += 1
+        else:
+            executed[step.op] += 1
+
+        messages = check_invariants(before, model, step, outcome)
+        if (outcome.rejection is None) != (network_rejection is None):
+            messages.append(f"rejected by model: {outcome.rejection}, rejected by network: {network_rejection}")
+        expected, observed = model.observe(), await target.observe()
+        messages.extend(
+            f"{key} is {observed[key]} on network but {value} in model"
+            for key, value in expected.items() if observed[key] != value
+        )
+        if messages:
+            result.failure = Failure(i, step, messages)
+            break
+    result.executed, result.rejections = dict(executed), dict(rejections)
+    return result
+
+
+async def run_network_campaign(
+    client: AsyncAlgodClient,
+    funder_private_key: str,
+    snapshot: LedgerSnapshot,
+    seeds: list[int],
+    num_steps: int,
+    mix: dict[str, float] = None,
+    concurrency: int = 4,
+) -> list[FuzzResult]:
+    """
+    Run each seed against its own fork of the snapshot, with at most the given number of seeds running at once
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(seed: int) -> FuzzResult:
+        async with semaphore:
+            target = await NetworkTarget.fork(client, funder_private_key, snapshot)
+            return await run_network_seed(target, seed, num_steps, mix)
+
+    return list(await asyncio.gather(*(run(seed) for seed in seeds)))
+
+
+def summarise(results: list[FuzzResult], elapsed: float) -> dict:
+    executed, rejections = Counter(), Counter()
+    for result in results:
+        executed.update(result.executed)
+        rejections.update(result.rejections)
+    return {
+        "seeds": len(results),
+        "steps_per_second": sum(len(result.steps) for result in results) / elapsed if elapsed else 0,
+        "executed": dict(executed),
+        "rejections": dict(rejections),
+        "failed_seeds": [result.seed for result in results if result.failure is not None],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the economics of the consensus v3 app against a model")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    model = subparsers.add_parser("model", help="run against the reference model only")
+    model.add_argument("--snapshot", help="ledger snapshot to start from instead of a random state per seed")
+    model.add_argument("--processes", type=int)
+
+    network = subparsers.add_parser("network", help="run against forks of a ledger snapshot and the model")
+    network.add_argument("snapshot")
+    network.add_argument("--concurrency", type=int, default=4)
+
+    for subparser in (model, network):
+        subparser.add_argument("--num-seeds", type=int, default=100)
+        subparser.add_argument("--first-seed", type=int, default=0)
+        subparser.add_argument("--num-steps", type=int, default=1000)
+        subparser.add_argument("--mix", type=json.loads, default=DEFAULT_MIX, help="json weights of each operation")
+        subparser.add_argument("--failures", help="jsonl file to write the steps of failed seeds to")
+
+    args = parser.parse_args()
+    if unknown := set(args.mix) - set(OPERATIONS):
+        parser.error(f"Unknown operations {unknown}")
+    seeds = list(range(args.first_seed, args.first_seed + args.num_seeds))
+
+    async def run_network() -> list[FuzzResult]:
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            # mnemonic is read from the environment so it does not appear in the process list
+            funder_private_key = mnemonic.to_private_key(os.environ["FUNDER_MNEMONIC"])
+            return await run_network_campaign(
+                client, funder_private_key, load_snapshot(args.snapshot), seeds, args.num_steps, args.mix,
+                args.concurrency,
+            )
+
+    start = time.monotonic()
+    if args.command == "model":
+        initial = None
+        if args.snapshot:
+            snapshot = load_snapshot(args.snapshot)
+            initial = ReferenceModel.from_snapshot(
+                snapshot.to_consensus_snapshot(), snapshot.x_algo_circulating_supply
+            ).state
+        results = run_campaign(seeds, args.num_steps, initial, args.mix, args.processes)
+    else:
+        results = asyncio.run(run_network())
+
+    if args.failures:
+        with open(args.failures, "w") as f:
+            f.writelines(json.dumps(asdict(result)) + "\n" for result in results if result.failure is not None)
+    print(json.dumps(summarise(results, time.monotonic() - start), indent=2))
+
+
+if __name__ == "__main__":
+    main()
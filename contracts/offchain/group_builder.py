@@ -0,0 +1,661 @@
+"""
+Builds transaction groups for the methods of the consensus v3 app.
+
+The references each call needs (proposer accounts, boxes, xALGO) are derived from a snapshot of the app state and
+shared across the group, so they are packed into the free reference slots of the group, only adding dummy calls
+when the slots run out. The contract ensures the opcode budget it needs as it loops over the proposers, only topping it
+up with inner app calls paid for by the pooled fee once it runs short. The number of inner transactions is derived by
+replaying the contract logic against the snapshot so the pooled fee can be set to the exact minimum, bar the inner app
+calls for budget which are bounded from the opcodes each step may use.
+"""
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from algosdk.atomic_transaction_composer import (
+    AtomicTransactionComposer,
+    EmptySigner,
+    TransactionSigner,
+    TransactionWithSigner,
+)
+from algosdk.encoding import decode_address, encode_address
+from algosdk.transaction import SuggestedParams
+
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.state import (
+    AddedProposerBox,
+    ConsensusV3GlobalState,
+    OpcodeBudget,
+    ProposerRecord,
+    ProposersBox,
+    RateCheckpointsBox,
+    SCUpdateBox,
+    get_delay_mint_box_name,
+    get_delay_mint_nonce_box_name,
+)
+from offchain.state_reader import ConsensusSnapshot
+
+MAX_GROUP_SIZE = 16
+MAX_TXN_REFERENCES = 8
+MAX_TXN_ACCOUNTS = 4
+APP_CALL_BUDGET = 700
+MAX_EXTRA_OPCODE_BUDGET = 320000  # max allowed by algod when simulating
+MIN_TXN_FEE = 1000
+# mirror OpUp.ensure_budget, where each inner app call uses some of the budget it adds
+OPUP_BUFFER = 10
+OPUP_CALL_COST = 18
+# upper bound of the opcodes used by the group before the contract ensures its budget, plus those used by the hinted
+# variants which are dispatched after the other methods and by the checks of each mint of a batch
+MAX_ENTRY_COST = 150
+HINTED_ENTRY_COST = 90
+MINT_ENTRY_COST = 28
+# upper bounds of the opcodes used by a step of the allocation loop with and without a transfer to or from a proposer,
+# and after the last step until the budget is next ensured
+ALLOCATION_TRANSFER_COST = 125
+ALLOCATION_SKIP_COST = 51
+ALLOCATION_END_COST = 27
+
+ONE_4_DP = int(1e4)
+
+
+def get_added_proposer_box_name(proposer: str) -> bytes:
+    return AddedProposerBox.NAME + decode_address(proposer)
+
+
+@dataclass
+class AppCallReferences:
+    accounts: list[str] = field(default_factory=list)
+    assets: list[int] = field(default_factory=list)
+    apps: list[int] = field(default_factory=list)
+    boxes: list[bytes] = field(default_factory=list)
+
+    @property
+    def num_references(self) -> int:
+        return len(self.accounts) + len(self.assets) + len(self.apps) + len(self.boxes)
+
+    def can_add_account(self) -> bool:
+        return self.num_references < MAX_TXN_REFERENCES and len(self.accounts) < MAX_TXN_ACCOUNTS
+
+    def can_add(self) -> bool:
+        return self.num_references < MAX_TXN_REFERENCES
+
+
+@dataclass
+class CallRequirements:
+    # resources which can be referenced by any app call of the group
+    accounts: list[str] = field(default_factory=list)
+    assets: list[int] = field(default_factory=list)
+    apps: list[int] = field(default_factory=list)
+    boxes: list[bytes] = field(default_factory=list)
+    # resources passed as method arguments so must be referenced by the call itself
+    pinned_accounts: list[str] = field(default_factory=list)
+    pinned_apps: list[int] = field(default_factory=list)
+    # excluding the inner app calls made to ensure the opcode budget
+    num_inner_txns: int = 0
+    # budget ensured at each check of the contract in order, with an upper bound of the opcodes used until the next
+    opcode_budgets: list[tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def opcode_budget(self) -> int:
+        # upper bound of the opcodes used once the budget is first ensured
+        return sum(cost for _, cost in self.opcode_budgets)
+
+
+def _unique(values: Iterable, exclude: set) -> list:
+    unique = []
+    for value in values:
+        if value not in exclude and value not in unique:
+            unique.append(value)
+    return unique
+
+
+def pack_references(
+    requirements: list[CallRequirements],
+    num_other_txns: int = 0,
+    opcode_cost: int = 0,
+) -> list[AppCallReferences] | None:
+    """
+    Pack the references needed by the given app calls into as few app calls as possible.
+
+    Returns the references of each app call, those of the given calls first followed by any dummy calls needed,
+    or None if the group would exceed the maximum group size.
+    """
+    calls = [AppCallReferences(accounts=list(r.pinned_accounts), apps=list(r.pinned_apps)) for r in requirements]
+    pinned_accounts = {account for r in requirements for account in r.pinned_accounts}
+    pinned_apps = {app for r in requirements for app in r.pinned_apps}
+
+    accounts = _unique((account for r in requirements for account in r.accounts), pinned_accounts)
+    assets = _unique((asset for r in requirements for asset in r.assets), set())
+    apps = _unique((app for r in requirements for app in r.apps), pinned_apps)
+    # each box is at most 1024 bytes so referencing every box covers the box io budget
+    boxes = _unique((box for r in requirements for box in r.boxes), set())
+
+    def get_call_with_free_slot(is_account: bool) -> AppCallReferences:
+        for call in calls:
+            if call.can_add_account() if is_account else call.can_add():
+                return call
+        calls.append(AppCallReferences())
+        return calls[-1]
+
+    # accounts are the most constrained so are placed first
+    for account in accounts:
+        get_call_with_free_slot(True).accounts.append(account)
+    for asset in assets:
+        get_call_with_free_slot(False).assets.append(asset)
+    for app in apps:
+        get_call_with_free_slot(False).apps.append(app)
+    for box in boxes:
+        get_call_with_free_slot(False).boxes.append(box)
+
+    # opcode budget is pooled across the app calls of the group
+    while opcode_cost > len(calls) * APP_CALL_BUDGET:
+        calls.append(AppCallReferences())
+
+    return calls if len(calls) + num_other_txns <= MAX_GROUP_SIZE else None
+
+
+def count_opup_calls(opcode_budgets: list[tuple[int, int]], num_app_calls: int) -> int:
+    """
+    Number of inner app calls the contract makes to ensure the given opcode budgets when the group has the given
+    number of app calls, assuming the worst case of opcodes used before the first is ensured and between each
+    """
+    available = num_app_calls * APP_CALL_BUDGET - MAX_ENTRY_COST
+    num_calls = 0
+    for opcode_budget, cost in opcode_budgets:
+        # only topped up when short, using about as many opcodes as an inner app call to do so
+        if available < opcode_budget:
+            available -= OPUP_CALL_COST
+            while available < opcode_budget + OPUP_BUFFER:
+                available += APP_CALL_BUDGET - OPUP_CALL_COST
+                num_calls += 1
+        available -= cost
+    return num_calls
+
+
+def _count_allocations(rooms: list[int], amount: int, hints: list[tuple[int, int]]) -> tuple[int, int]:
+    # returns the number of transfers and of steps of the allocation loop
+    rooms = list(rooms)
+    num_allocations = 0
+    num_steps = 0
+    for i, hint in hints or [(i, None) for i in range(len(rooms))]:
+        if not amount:
+            break
+        num_steps += 1
+        if rooms[i] > 0:
+            alloc = min(rooms[i] if hint is None else hint, amount)
+            if alloc > rooms[i]:
+                raise ValueError(f"Allocation hint exceeds target of proposer {i}")
+            rooms[i] -= alloc
+            amount -= alloc
+            num_allocations += 1
+    if amount:
+        raise ValueError("Allocation hints do not cover amount")
+    return num_allocations, num_steps
+
+
+def _count_receive_allocations(
+    balances: list[int],
+    amount: int,
+    hints: list[tuple[int, int]] = None,
+) -> tuple[int, int]:
+    # mirrors receive_algo_to_proposers
+    target = (sum(balances) + amount) // len(balances) + 1
+    return _count_allocations([target - balance for balance in balances], amount, hints)
+
+
+def _count_send_allocations(
+    balances: list[int],
+    amount: int,
+    hints: list[tuple[int, int]] = None,
+) -> tuple[int, int]:
+    # mirrors send_algo_from_proposers excluding the final transfer to the receiver
+    target = (sum(balances) - amount) // len(balances)
+    return _count_allocations([balance - target for balance in balances], amount, hints)
+
+
+def _get_allocation_hints(rooms: list[int], amount: int) -> list[tuple[int, int]]:
+    # filling the proposers with the most room first needs the fewest transfers, ties broken by index
+    hints = []
+    for i in sorted(range(len(rooms)), key=lambda i: -rooms[i]):
+        if not amount or rooms[i] <= 0:
+            break
+        alloc = min(rooms[i], amount)
+        hints.append((i, alloc))
+        amount -= alloc
+    return hints
+
+
+def get_receive_allocation_hints(balances: list[int], amount: int) -> list[tuple[int, int]]:
+    """
+    Allocation hints of the given amount received by receive_algo_to_proposers with the fewest transfers, as the
+    proposer index and amount of each transfer
+    """
+    target = (sum(balances) + amount) // len(balances) + 1
+    return _get_allocation_hints([target - balance for balance in balances], amount)
+
+
+def get_send_allocation_hints(balances: list[int], amount: int, margin: int = 0) -> list[tuple[int, int]]:
+    """
+    Allocation hints of the given amount sent by send_algo_from_proposers with the fewest transfers, as the proposer
+    index and amount of each transfer. The hints cover the margin on top of the amount where the proposers have
+    room as the contract stops once the amount is allocated.
+    """
+    target = (sum(balances) - amount) // len(balances)
+    return _get_allocation_hints([balance - target for balance in balances], amount + margin)
+
+
+class ConsensusGroupBuilder:
+    """
+    Builds the group for a call to any method of the consensus v3 app given a snapshot of its state.
+
+    Transactions passed as method arguments have their fee set to zero and the app call pays the pooled fee of the
+    whole group including dummy calls and inner transactions.
+    """
+
+    def __init__(self, app_id: int, snapshot: ConsensusSnapshot):
+        self.app_id = app_id
+        self.snapshot = snapshot
+        self.contract = get_consensus_v3_contract()
+        self.proposers = [proposer.address for proposer in snapshot.proposers]
+        self.x_algo_id = snapshot.global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)
+
+    def _get_global(self, key: str) -> int | bytes:
+        return self.snapshot.global_state.get(key, 0)
+
+    def _get_proposer(self, proposer_index: int) -> str:
+        if not 0 <= proposer_index < len(self.proposers):
+            raise ValueError(f"Unknown proposer index {proposer_index}")
+        return self.proposers[proposer_index]
+
+    def _get_proposer_balances(self) -> list[int]:
+        if not self.proposers:
+            raise ValueError("No proposers")
+        return [proposer.balance for proposer in self.snapshot.proposers]
+
+    def _get_synced_balances(self) -> tuple[int, int]:
+        # mirrors sync_proposers_active_balance_and_unclaimed_fees, returning active balance and unclaimed fees
+        active_balance = sum(p.balance - p.min_balance for p in self.snapshot.proposers)
+        active_balance -= self._get_global(ConsensusV3GlobalState.TOTAL_PENDING_STAKE)
+        rewards = active_balance - self._get_global(ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE)
+        unclaimed_fees = self._get_global(ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES)
+        unclaimed_fees += rewards * self._get_global(ConsensusV3GlobalState.FEE) // ONE_4_DP
+        return active_balance, unclaimed_fees
+
+    def _get_checkpoint_budgets(self) -> list[tuple[int, int]]:
+        # ensured by checkpoint_rate at the end of the call as it may be due once confirmed
+        if self._get_global(ConsensusV3GlobalState.RATE_CHECKPOINT_INTERVAL):
+            return [(OpcodeBudget.CHECKPOINT, OpcodeBudget.CHECKPOINT)]
+        return []
+
+    def _get_opcode_budget(self, base: int, per_proposer: int) -> int:
+        # mirrors get_proposers_budget
+        return base + per_proposer * len(self.proposers)
+
+    @staticmethod
+    def _get_step_budgets(num_allocations: int, num_steps: int) -> list[tuple[int, int]]:
+        # budgets ensured at each step of the allocation loop, where the steps with a transfer are taken to come first
+        # as the most opcodes are then used before each budget is ensured
+        steps = [ALLOCATION_TRANSFER_COST] * num_allocations + [ALLOCATION_SKIP_COST] * (num_steps - num_allocations)
+        return [*[(OpcodeBudget.ALLOCATION_STEP, cost) for cost in steps], (0, ALLOCATION_END_COST)]
+
+    def _get_allocation_budgets(
+        self,
+        num_allocations: int,
+        num_steps: int,
+        tail: int,
+        entry_cost: int = 0,
+    ) -> list[tuple[int, int]]:
+        # budgets ensured before, during and after the allocation loop
+        opcode_budget = self._get_opcode_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)
+        return [
+            (0, entry_cost),
+            (opcode_budget, opcode_budget),
+            *self._get_step_budgets(num_allocations, num_steps),
+            (tail, tail),
+            *self._get_checkpoint_budgets(),
+        ]
+
+    def _get_hints(self, hints: list) -> list[tuple[int, int]]:
+        hints = [(proposer_index, amount) for proposer_index, amount in hints]
+        for proposer_index, _ in hints:
+            self._get_proposer(proposer_index)
+        return hints
+
+    def _get_burn_algo(self, burn_amount: int) -> int:
+        # circulating supply before the xALGO is received so matches the contract which adds back the burn amount
+        active_balance, unclaimed_fees = self._get_synced_balances()
+        return burn_amount * (active_balance - unclaimed_fees) // self.snapshot.x_algo_circulating_supply
+
+    def _get_send_unclaimed_fees_requirements(self) -> CallRequirements:
+        active_balance, unclaimed_fees = self._get_synced_balances()
+        settle_budget = self._get_opcode_budget(OpcodeBudget.SETTLE_FEES, OpcodeBudget.SYNC)
+        if self.snapshot.global_state.get(ConsensusV3GlobalState.SETTLE_FEES_IN_X_ALGO):
+            # mirrors the xALGO minted at the current rate in send_unclaimed_fees
+            algo_balance = active_balance - unclaimed_fees
+            mint_amount = (
+                unclaimed_fees * self.snapshot.x_algo_circulating_supply // algo_balance if algo_balance
+                else unclaimed_fees
+            )
+            return CallRequirements(
+                accounts=[encode_address(self._get_global(ConsensusV3GlobalState.ADMIN)), *self.proposers],
+                assets=[self.x_algo_id],
+                boxes=[ProposersBox.NAME, RateCheckpointsBox.NAME],
+                num_inner_txns=1 if mint_amount else 0,
+                opcode_budgets=[(settle_budget, settle_budget), *self._get_checkpoint_budgets()],
+            )
+        num_allocations, num_steps = _count_send_allocations(self._get_proposer_balances(), unclaimed_fees)
+        send_budget = self._get_opcode_budget(OpcodeBudget.SEND_FEES, OpcodeBudget.SYNC)
+        return CallRequirements(
+            accounts=[encode_address(self._get_global(ConsensusV3GlobalState.ADMIN)), *self.proposers],
+            boxes=[ProposersBox.NAME, RateCheckpointsBox.NAME],
+            num_inner_txns=num_allocations + 1,
+            opcode_budgets=[
+                (settle_budget, settle_budget),
+                (send_budget, send_budget),
+                *self._get_step_budgets(num_allocations, num_steps),
+                (OpcodeBudget.CLAIM_FEE, OpcodeBudget.CLAIM_FEE),
+                *self._get_checkpoint_budgets(),
+            ],
+        )
+
+    def _get_proposer_admin_boxes(self, proposer_indexes: list[int]) -> list[bytes]:
+        return [get_added_proposer_box_name(self._get_proposer(i)) for i in proposer_indexes]
+
+    def get_allocation_hints(self, method_name: str, amount: int, margin: int = 0) -> list[tuple[int, int]]:
+        """
+        Allocation hints with the fewest transfers for a mint of the given ALGO or a burn of the given xALGO, passed as
+        the last argument of the hinted variant of the method. Hints are only valid for the state of the snapshot so
+        for a burn the margin in ALGO is allocated on top in case the rate rises before the group is confirmed.
+
+        Raises:
+            ValueError: if the method takes no allocation hints
+        """
+        balances = self._get_proposer_balances()
+        method_name = method_name.removesuffix("_hinted")
+        if method_name in ("immediate_mint", "immediate_mint_batch", "delayed_mint"):
+            return get_receive_allocation_hints(balances, amount)
+        if method_name == "burn":
+            return get_send_allocation_hints(balances, self._get_burn_algo(amount), margin)
+        raise ValueError(f"Method {method_name} takes no allocation hints")
+
+    def requirements(self, method_name: str, sender: str, method_args: list) -> CallRequirements:
+        """
+        Resources and number of inner transactions needed to call the given method with the given arguments
+        """
+        args = [arg.txn if isinstance(arg, TransactionWithSigner) else arg for arg in method_args]
+        x_algo = [self.x_algo_id]
+        hints = []
+        entry_cost = 0
+        if method_name.endswith("_hinted"):
+            # hinted variants take the allocation hints after the arguments of the method they share the body of
+            method_name = method_name.removesuffix("_hinted")
+            *args, hints = args
+            hints = self._get_hints(hints)
+            entry_cost = HINTED_ENTRY_COST
+
+        if method_name in (
+            "initialise", "update_admin", "update_max_proposer_balance", "update_premium", "pause_minting", "dummy",
+        ):
+            return CallRequirements()
+        if method_name == "update_fee_settlement":
+            # xALGO holding of the admin is checked when settling in xALGO
+            return CallRequirements(assets=x_algo)
+        if method_name == "update_rate_checkpoint_interval":
+            return CallRequirements(boxes=[RateCheckpointsBox.NAME])
+        if method_name == "schedule_update_sc":
+            return CallRequirements(boxes=[SCUpdateBox.NAME])
+        if method_name == "update_sc":
+            return CallRequirements(boxes=[SCUpdateBox.NAME], num_inner_txns=1)
+        if method_name == "add_proposer":
+            [proposer] = args
+            return CallRequirements(
+                boxes=[ProposersBox.NAME, get_added_proposer_box_name(proposer)],
+                pinned_accounts=[proposer],
+            )
+        if method_name == "remove_proposer":
+            [proposer_index] = args
+            proposer = self._get_proposer(proposer_index)
+            if len(self.proposers) == 1:
+                raise ValueError("Cannot remove last proposer")
+            # balance is split among the remaining proposers once the last is swapped into its place
+            balances = self._get_proposer_balances()
+            remaining = list(balances)
+            remaining[proposer_index] = remaining[-1]
+            remaining.pop()
+            num_allocations, num_steps = _count_receive_allocations(remaining, balances[proposer_index])
+            return CallRequirements(
+                accounts=self.proposers,
+                boxes=[ProposersBox.NAME, get_added_proposer_box_name(proposer), RateCheckpointsBox.NAME],
+                # key registration, close, allocations to remaining proposers and box min balance refund
+                num_inner_txns=2 + num_allocations + 1,
+                opcode_budgets=self._get_allocation_budgets(num_allocations, num_steps, OpcodeBudget.REMOVE_PROPOSER),
+            )
+        if method_name in ("update_fee", "claim_fee"):
+            return self._get_send_unclaimed_fees_requirements()
+        if method_name == "set_proposer_admin":
+            proposer_index, _ = args
+            return CallRequirements(boxes=[ProposersBox.NAME, *self._get_proposer_admin_boxes([proposer_index])])
+        if method_name in ("register_online", "register_offline"):
+            proposer_index = args[1] if method_name == "register_online" else args[0]
+            return CallRequirements(
+                accounts=[self._get_proposer(proposer_index)],
+                boxes=[ProposersBox.NAME, *self._get_proposer_admin_boxes([proposer_index])],
+                num_inner_txns=1,
+            )
+        if method_name == "register_online_batch":
+            _, registrations = args
+            proposer_indexes = [registration[0] for registration in registrations]
+            return CallRequirements(
+                accounts=[self._get_proposer(i) for i in proposer_indexes],
+                boxes=[ProposersBox.NAME, *self._get_proposer_admin_boxes(proposer_indexes)],
+                # proposer is sent its fee before its key registration if non-zero
+                num_inner_txns=sum(1 + (registration[7] > 0) for registration in registrations),
+            )
+        if method_name == "register_offline_batch":
+            [proposer_indexes] = args
+            # proposer admins are not checked when called by the register admin
+            is_register_admin = decode_address(sender) == self._get_global(ConsensusV3GlobalState.REGISTER_ADMIN)
+            admin_boxes = [] if is_register_admin else self._get_proposer_admin_boxes(proposer_indexes)
+            return CallRequirements(
+                accounts=[self._get_proposer(i) for i in proposer_indexes],
+                boxes=[ProposersBox.NAME, *admin_boxes],
+                num_inner_txns=len(proposer_indexes),
+            )
+        if method_name in ("subscribe_xgov", "unsubscribe_xgov"):
+            proposer_index, xgov_registry = args[1:3] if method_name == "subscribe_xgov" else args
+            return CallRequirements(
+                accounts=[self._get_proposer(proposer_index)],
+                boxes=[ProposersBox.NAME],
+                pinned_apps=[xgov_registry],
+                # app call to xgov registry, with payment when subscribing
+                num_inner_txns=2 if method_name == "subscribe_xgov" else 1,
+            )
+        if method_name == "rebalance_proposers":
+            from_proposer_index, to_proposer_index, _ = args
+            return CallRequirements(
+                accounts=[self._get_proposer(from_proposer_index), self._get_proposer(to_proposer_index)],
+                boxes=[ProposersBox.NAME],
+                num_inner_txns=1,
+            )
+        if method_name == "immediate_mint":
+            send_algo, receiver, _ = args
+            num_allocations, num_steps = _count_receive_allocations(self._get_proposer_balances(), send_algo.amt, hints)
+            return CallRequirements(
+                accounts=[receiver, *self.proposers],
+                assets=x_algo,
+                boxes=[ProposersBox.NAME, RateCheckpointsBox.NAME],
+                # allocations to proposers and xALGO transfer
+                num_inner_txns=num_allocations + 1,
+                opcode_budgets=self._get_allocation_budgets(num_allocations, num_steps, OpcodeBudget.MINT, entry_cost),
+            )
+        if method_name == "immediate_mint_batch":
+            send_algo, mints = args
+            num_allocations, num_steps = _count_receive_allocations(self._get_proposer_balances(), send_algo.amt, hints)
+            return CallRequirements(
+                accounts=[*dict.fromkeys(mint[0] for mint in mints), *self.proposers],
+                assets=x_algo,
+                boxes=[ProposersBox.NAME, RateCheckpointsBox.NAME],
+                # allocations to proposers once and xALGO transfer to each receiver
+                num_inner_txns=num_allocations + len(mints),
+                opcode_budgets=self._get_allocation_budgets(
+                    num_allocations,
+                    num_steps,
+                    OpcodeBudget.MINT_BATCH + OpcodeBudget.MINT_BATCH_ENTRY * len(mints),
+                    entry_cost + MINT_ENTRY_COST * len(mints),
+                ),
+            )
+        if method_name == "delayed_mint":
+            send_algo, _, nonce = args
+            num_allocations, num_steps = _count_receive_allocations(self._get_proposer_balances(), send_algo.amt, hints)
+            return CallRequirements(
+                accounts=self.proposers,
+                boxes=[
+                    ProposersBox.NAME,
+                    get_delay_mint_box_name(sender, nonce),
+                    get_delay_mint_nonce_box_name(sender),
+                    RateCheckpointsBox.NAME,
+                ],
+                num_inner_txns=num_allocations,
+                opcode_budgets=self._get_allocation_budgets(
+                    num_allocations, num_steps, OpcodeBudget.DELAYED_MINT, entry_cost
+                ),
+            )
+        if method_name == "claim_delayed_mint":
+            minter, nonce = args
+            box_name = get_delay_mint_box_name(minter, nonce)
+            if box_name not in self.snapshot.delay_mints:
+                raise ValueError("Unknown delay mint")
+            opcode_budget = self._get_opcode_budget(OpcodeBudget.CLAIM_DELAYED_MINT, OpcodeBudget.SYNC)
+            return CallRequirements(
+                accounts=[self.snapshot.delay_mints[box_name].receiver, *self.proposers],
+                assets=x_algo,
+                boxes=[ProposersBox.NAME, box_name, RateCheckpointsBox.NAME],
+                # xALGO transfer and box min balance refund
+                num_inner_txns=2,
+                opcode_budgets=[(opcode_budget, opcode_budget), *self._get_checkpoint_budgets()],
+            )
+        if method_name == "burn":
+            send_xalgo, receiver, _ = args
+            algo_to_send = self._get_burn_algo(send_xalgo.amount)
+            num_allocations, num_steps = _count_send_allocations(self._get_proposer_balances(), algo_to_send, hints)
+            return CallRequirements(
+                accounts=[receiver, *self.proposers],
+                assets=x_algo,
+                boxes=[ProposersBox.NAME, RateCheckpointsBox.NAME],
+                # allocations from proposers and ALGO transfer
+                num_inner_txns=num_allocations + 1,
+                opcode_budgets=self._get_allocation_budgets(num_allocations, num_steps, OpcodeBudget.BURN, entry_cost),
+            )
+        if method_name == "get_xalgo_rate":
+            opcode_budget = self._get_opcode_budget(OpcodeBudget.GET_XALGO_RATE, OpcodeBudget.RATE)
+            return CallRequirements(
+                accounts=self.proposers,
+                assets=x_algo,
+                boxes=[ProposersBox.NAME],
+                opcode_budgets=[(opcode_budget, opcode_budget)],
+            )
+        # views are meant to be simulated with unnamed resources but can be called with references too
+        if method_name == "get_proposer_records":
+            [start] = args
+            indexes = range(start, min(start + ProposerRecord.MAX_PER_CALL, len(self.proposers)))
+            return CallRequirements(
+                accounts=[self.proposers[i] for i in indexes],
+                boxes=[ProposersBox.NAME, *self._get_proposer_admin_boxes(list(indexes))],
+            )
+        if method_name == "get_delay_mint_records":
+            [keys] = args
+            return CallRequirements(boxes=[get_delay_mint_box_name(minter, nonce) for minter, nonce in keys])
+        if method_name == "get_scheduled_update":
+            return CallRequirements(boxes=[SCUpdateBox.NAME])
+        raise ValueError(f"Unknown method {method_name}")
+
+    def build(
+        self,
+        method_name: str,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        method_args: list,
+        opcode_cost: int = 0,
+        extra_fee: int = 0,
+        **call_kwargs,
+    ) -> AtomicTransactionComposer:
+        """
+        Build the group for the given method call, adding dummy calls for references as needed and for the opcode
+        cost if given and more than the contract ensures. The extra fee covers any change in state before the group
+        is confirmed e.g. more allocations to proposers.
+        Extra keyword arguments are passed to the method call e.g. on_complete and programs for update_sc.
+
+        Raises:
+            ValueError: if the call does not fit in a single group
+        """
+        requirements = self.requirements(method_name, sender, method_args)
+
+        # transactions passed as arguments are copied as their fee is covered by the app call
+        method_args = [
+            TransactionWithSigner(copy(arg.txn), arg.signer) if isinstance(arg, TransactionWithSigner) else arg
+            for arg in method_args
+        ]
+        txn_args = [arg.txn for arg in method_args if isinstance(arg, TransactionWithSigner)]
+        # the contract tops up the budget it ensures itself
+        if opcode_cost <= requirements.opcode_budget:
+            opcode_cost = 0
+        references = pack_references([requirements], len(txn_args), opcode_cost)
+        if references is None:
+            raise ValueError(f"Cannot fit {method_name} call in a single group")
+
+        min_fee = max(params.min_fee or 0, MIN_TXN_FEE)
+        num_opup_calls = count_opup_calls(requirements.opcode_budgets, len(references))
+        num_txns = len(references) + len(txn_args) + requirements.num_inner_txns + num_opup_calls
+        for txn in txn_args:
+            txn.fee = 0
+            txn.group = None
+
+        atc = AtomicTransactionComposer()
+        for i, refs in enumerate(references):
+            sp = copy(params)
+            sp.flat_fee = True
+            sp.fee = min_fee * num_txns + extra_fee if i == 0 else 0
+            atc.add_method_call(
+                app_id=self.app_id,
+                method=self.contract.get_method_by_name(method_name if i == 0 else "dummy"),
+                sender=sender,
+                sp=sp,
+                signer=signer,
+                method_args=method_args if i == 0 else [],
+                accounts=refs.accounts,
+                foreign_assets=refs.assets,
+                foreign_apps=refs.apps,
+                boxes=[(self.app_id, box_name) for box_name in refs.boxes],
+                **(call_kwargs if i == 0 else {}),
+            )
+        return atc
+
+    async def build_with_simulated_budget(
+        self,
+        client: AsyncAlgodClient,
+        method_name: str,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        method_args: list,
+        **call_kwargs,
+    ) -> AtomicTransactionComposer:
+        """
+        Build the group with dummy calls to cover the opcode cost measured by simulating the call, when more than
+        the contract ensures itself e.g. for large batches
+
+        Raises:
+            ValueError: if the simulated call fails
+        """
+        unsigned_args = [
+            TransactionWithSigner(arg.txn, EmptySigner()) if isinstance(arg, TransactionWithSigner) else arg
+            for arg in method_args
+        ]
+        atc = self.build(method_name, sender, EmptySigner(), params, unsigned_args, **call_kwargs)
+        result = await client.simulate(atc.gather_signatures(), MAX_EXTRA_OPCODE_BUDGET)
+        if "failure-message" in result:
+            raise ValueError(f"Simulated {method_name} call failed: {result['failure-message']}")
+        opcode_cost = result.get("app-budget-consumed", 0)
+        return self.build(method_name, sender, signer, params, method_args, opcode_cost, **call_kwargs)
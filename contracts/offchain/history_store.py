@@ -0,0 +1,294 @@
+"""
+Columnar history store of the events and rates of the consensus v3 app.
+
+Each table is partitioned by round range and each column of a partition is a flat file of fixed size values which
+is appended to and memory-mapped for reading, so range scans return views over the files without copying and
+aggregations are vectorised over whole partitions. Rows must be appended in round order.
+
+Requires numpy which is an optional dependency of the off-chain tooling.
+"""
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from algosdk.encoding import decode_address
+
+from offchain.events import (
+    BurnEvent,
+    ClaimDelayedMintEvent,
+    Event,
+    ImmediateMintEvent,
+    UpdateFeeEvent,
+    UpdatePremiumEvent,
+    iter_block_events,
+)
+from offchain.state import ConsensusV3GlobalState
+from offchain.state_reader import ConsensusSnapshot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_PARTITION_ROUNDS = 1_000_000
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+MINT_KIND_IMMEDIATE = 0
+MINT_KIND_DELAYED = 1
+UPDATE_KIND_FEE = 0
+UPDATE_KIND_PREMIUM = 1
+
+# dtype of each column of each table, the round column is always first
+SCHEMAS = {
+    "mints": {
+        "round": "<u8",
+        "kind": "u1",
+        "minter": "S32",
+        "receiver": "S32",
+        "algo": "<u8",
+        "x_algo": "<u8",
+    },
+    "burns": {
+        "round": "<u8",
+        "burner": "S32",
+        "x_algo": "<u8",
+        "algo": "<u8",
+    },
+    "updates": {
+        "round": "<u8",
+        "kind": "u1",
+        "value": "<u8",
+    },
+    "rates": {
+        "round": "<u8",
+        "timestamp": "<u8",
+        "algo_balance": "<u8",
+        "x_algo_circulating_supply": "<u8",
+    },
+}
+
+
+def _event_row(event: Event) -> tuple[str, tuple] | None:
+    if isinstance(event, ImmediateMintEvent):
+        row = (MINT_KIND_IMMEDIATE, event.minter, event.receiver, event.algo_sent, event.mint_amount)
+        return "mints", (event.round, *row)
+    if isinstance(event, ClaimDelayedMintEvent):
+        row = (MINT_KIND_DELAYED, event.minter, event.receiver, event.stake, event.mint_amount)
+        return "mints", (event.round, *row)
+    if isinstance(event, BurnEvent):
+        return "burns", (event.round, event.burner, event.burn_amount, event.algo_sent)
+    if isinstance(event, UpdateFeeEvent):
+        return "updates", (event.round, UPDATE_KIND_FEE, event.fee)
+    if isinstance(event, UpdatePremiumEvent):
+        return "updates", (event.round, UPDATE_KIND_PREMIUM, event.premium)
+    return None
+
+
+class HistoryStore:
+    """
+    Append only store of the app history under the given directory, partitioned every partition_rounds rounds
+    """
+
+    def __init__(self, path: Path | str, partition_rounds: int = DEFAULT_PARTITION_ROUNDS):
+        if np is None:
+            raise ImportError("numpy is required for the history store")
+        self.path = Path(path)
+        self.partition_rounds = partition_rounds
+        self._last_rounds = {table: self._read_last_round(table) for table in SCHEMAS}
+
+    def _partition_path(self, table: str, partition: int) -> Path:
+        return self.path / table / f"{partition:012d}"
+
+    def _partitions(self, table: str) -> list[int]:
+        table_path = self.path / table
+        if not table_path.exists():
+            return []
+        return sorted(int(name) for name in os.listdir(table_path))
+
+    def _read_column(self, table: str, partition: int, column: str) -> "np.ndarray":
+        path = self._partition_path(table, partition) / f"{column}.bin"
+        dtype = np.dtype(SCHEMAS[table][column])
+        if not path.exists() or not path.stat().st_size:
+            return np.empty(0, dtype)
+        # columns are appended together so ignore a partially written trailing value
+        return np.memmap(path, dtype, mode="r", shape=(path.stat().st_size // dtype.itemsize,))
+
+    def _num_rows(self, table: str, partition: int) -> int:
+        return min(len(self._read_column(table, partition, column)) for column in SCHEMAS[table])
+
+    def _read_last_round(self, table: str) -> int:
+        partitions = self._partitions(table)
+        if not partitions or not (num_rows := self._num_rows(table, partitions[-1])):
+            return 0
+        return int(self._read_column(table, partitions[-1], "round")[num_rows - 1])
+
+    def append(self, table: str, rows: list[tuple]):
+        """
+        Append rows of the table, each a tuple of the values of its columns in schema order
+
+        Raises:
+            ValueError: if a row is older than the last row appended
+        """
+        if not rows:
+            return
+        rounds = [row[0] for row in rows]
+        if rounds[0] < self._last_rounds[table] or any(a > b for a, b in zip(rounds, rounds[1:])):
+            raise ValueError(f"Rows of {table} must be appended in round order")
+
+        schema = SCHEMAS[table]
+        start = 0
+        while start < len(rows):
+            partition = rows[start][0] // self.partition_rounds * self.partition_rounds
+            end = start
+            while end < len(rows) and rows[end][0] < partition + self.partition_rounds:
+                end += 1
+            partition_path = self._partition_path(table, partition)
+            partition_path.mkdir(parents=True, exist_ok=True)
+            num_rows = self._num_rows(table, partition)
+            for i, (column, dtype) in enumerate(schema.items()):
+                values = [row[i] for row in rows[start:end]]
+                if dtype == "S32":
+                    values = [decode_address(value) if isinstance(value, str) else value for value in values]
+                with open(partition_path / f"{column}.bin", "r+b" if num_rows else "wb") as f:
+                    # drop any partially written rows of a previous append
+                    f.truncate(num_rows * np.dtype(dtype).itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.asarray(values, dtype).tobytes())
+            start = end
+        self._last_rounds[table] = rounds[-1]
+
+    def append_events(self, events: Iterable[Event]):
+        rows: dict[str, list[tuple]] = {table: [] for table in SCHEMAS}
+        for event in events:
+            if (entry := _event_row(event)) is not None:
+                rows[entry[0]].append(entry[1])
+        for table, table_rows in rows.items():
+            self.append(table, table_rows)
+
+    def append_block(self, block: dict, app_id: int):
+        """
+        Append the events of the app in a block returned by algod in json format
+        """
+        self.append_events(iter_block_events(block, app_id))
+
+    def append_rate(self, rnd: int, timestamp: int, algo_balance: int, x_algo_circulating_supply: int):
+        self.append("rates", [(rnd, timestamp, algo_balance, x_algo_circulating_supply)])
+
+    def append_snapshot(self, snapshot: ConsensusSnapshot, timestamp: int):
+        """
+        Append the rate of a state snapshot, valued the same as the rate checkpoints of the app
+        """
+        state = snapshot.global_state
+        algo_balance = state[ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE]
+        algo_balance -= state[ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES]
+        self.append_rate(snapshot.round, timestamp, algo_balance, snapshot.x_algo_circulating_supply)
+
+    def scan(self, table: str, first_round: int, last_round: int) -> Iterator[dict[str, "np.ndarray"]]:
+        """
+        Columns of the rows of each partition in the inclusive round range, as read only views over the files
+        """
+        for partition in self._partitions(table):
+            if partition + self.partition_rounds <= first_round or partition > last_round:
+                continue
+            num_rows = self._num_rows(table, partition)
+            rounds = self._read_column(table, partition, "round")[:num_rows]
+            start = int(np.searchsorted(rounds, first_round, "left")) if partition < first_round else 0
+            end = int(np.searchsorted(rounds, last_round, "right"))
+            if start < end:
+                yield {column: self._read_column(table, partition, column)[start:end] for column in SCHEMAS[table]}
+
+    def read(self, table: str, first_round: int, last_round: int) -> dict[str, "np.ndarray"]:
+        """
+        Columns of the rows in the inclusive round range, concatenated across partitions
+        """
+        parts = list(self.scan(table, first_round, last_round))
+        return {
+            column: np.concatenate([part[column] for part in parts]) if parts else np.empty(0, dtype)
+            for column, dtype in SCHEMAS[table].items()
+        }
+
+    def _sum(self, table: str, column: str, first_round: int, last_round: int) -> int:
+        return sum(int(part[column].sum(dtype=np.uint64)) for part in self.scan(table, first_round, last_round))
+
+    def volume(self, first_round: int, last_round: int) -> dict[str, int]:
+        """
+        Total ALGO and xALGO minted and burnt in the inclusive round range
+        """
+        return {
+            "mint_algo": self._sum("mints", "algo", first_round, last_round),
+            "mint_x_algo": self._sum("mints", "x_algo", first_round, last_round),
+            "burn_algo": self._sum("burns", "algo", first_round, last_round),
+            "burn_x_algo": self._sum("burns", "x_algo", first_round, last_round),
+            "num_mints": sum(len(part["round"]) for part in self.scan("mints", first_round, last_round)),
+            "num_burns": sum(len(part["round"]) for part in self.scan("burns", first_round, last_round)),
+        }
+
+    def rates(self, first_round: int, last_round: int) -> tuple["np.ndarray", "np.ndarray"]:
+        """
+        Rounds and ALGO per xALGO rates in the inclusive round range
+        """
+        rates = self.read("rates", first_round, last_round)
+        algo_balance = rates["algo_balance"].astype(np.float64)
+        x_algo_circulating_supply = rates["x_algo_circulating_supply"].astype(np.float64)
+        # mints 1:1 when there is nothing staked
+        staked = (algo_balance > 0) & (x_algo_circulating_supply > 0)
+        rate = np.divide(algo_balance, x_algo_circulating_supply, out=np.ones_like(algo_balance), where=staked)
+        return rates["round"], rate
+
+    def apy(self, first_round: int, last_round: int) -> float | None:
+        """
+        Annualised growth of the rate between the first and last rates in the inclusive round range
+        """
+        rates = self.read("rates", first_round, last_round)
+        if len(rates["round"]) < 2:
+            return None
+        _, rate = self.rates(first_round, last_round)
+        elapsed = int(rates["timestamp"][-1]) - int(rates["timestamp"][0])
+        if elapsed <= 0:
+            return None
+        return float((rate[-1] / rate[0]) ** (SECONDS_PER_YEAR / elapsed) - 1)
+
+    def fee_accrual(self, first_round: int, last_round: int, initial_fee: int) -> dict[str, int]:
+        """
+        Rewards and protocol fees accrued between the first and last rates in the inclusive round range.
+
+        The rewards of each interval between rates are the change in ALGO balance not explained by mints and burns,
+        with the fee charged on them being the last fee set before the interval (or the initial fee if none was).
+        """
+        rates = self.read("rates", first_round, last_round)
+        rounds = rates["round"]
+        if len(rounds) < 2:
+            return {"rewards": 0, "fees": 0}
+        mints = self.read("mints", int(rounds[0]) + 1, int(rounds[-1]))
+        burns = self.read("burns", int(rounds[0]) + 1, int(rounds[-1]))
+        updates = self.read("updates", 0, int(rounds[-1]))
+
+        def flows(flow_rounds: "np.ndarray", amounts: "np.ndarray") -> "np.ndarray":
+            # net amount of each interval from the cumulative sum at each rate round
+            cumulative = np.concatenate(([0], np.cumsum(amounts, dtype=np.int64)))
+            return np.diff(cumulative[np.searchsorted(flow_rounds, rounds, "right")])
+
+        net_flows = flows(mints["round"], mints["algo"]) - flows(burns["round"], burns["algo"])
+        rewards = np.diff(rates["algo_balance"].astype(np.int64)) - net_flows
+
+        is_fee = updates["kind"] == UPDATE_KIND_FEE
+        fee_rounds, fee_values = updates["round"][is_fee], updates["value"][is_fee].astype(np.int64)
+        fee_index = np.searchsorted(fee_rounds, rounds[:-1], "right") - 1
+        fees = np.where(fee_index >= 0, fee_values[np.maximum(fee_index, 0)] if len(fee_values) else 0, initial_fee)
+        # balance is net of fees so gross up to the fee charged on the total rewards
+        accrued_fees = rewards * fees // (10_000 - fees)
+        return {"rewards": int(rewards.sum()), "fees": int(accrued_fees.sum())}
+
+    def user_history(self, address: str, first_round: int, last_round: int) -> dict[str, dict[str, "np.ndarray"]]:
+        """
+        Mints received and burns made by the address in the inclusive round range
+        """
+        key = decode_address(address)
+        mints = self.read("mints", first_round, last_round)
+        burns = self.read("burns", first_round, last_round)
+        mint_mask = mints["receiver"] == key
+        burn_mask = burns["burner"] == key
+        return {
+            "mints": {column: values[mint_mask] for column, values in mints.items()},
+            "burns": {column: values[burn_mask] for column, values in burns.items()},
+        }
@@ -0,0 +1,485 @@
+"""
+Snapshots of the full ledger state of the consensus app for forking scenario tests from a checkpoint.
+
+A snapshot holds the programs, schemas, global state and every box of the app together with the balances, auth
+addresses and xALGO holdings of the app account, the proposers and any given holders. It is serialised as
+compressed msgpack with addresses kept as raw public keys.
+
+A snapshot can be forked either into the off-chain evaluator, as the ConsensusSnapshot the group builder and
+load generator work from, or into a fresh local network. Forking into a network creates the app with a seeder
+program which writes the global state and boxes directly, recreates the proposers as new accounts rekeyed to the
+new app and xALGO as a new asset distributed to new holder accounts, and then updates the app to the program of
+the snapshot. Addresses and rounds are remapped throughout the state so delay mints and rate checkpoints keep
+their age relative to the current round.
+"""
+import argparse
+import asyncio
+import json
+import os
+import zlib
+from base64 import b64decode
+from copy import copy
+from dataclasses import asdict, dataclass, field
+
+import msgpack
+from algosdk import mnemonic
+from algosdk.abi import ABIType
+from algosdk.account import address_from_private_key, generate_account
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    TransactionWithSigner,
+)
+from algosdk.encoding import decode_address, encode_address
+from algosdk.logic import get_application_address
+from algosdk.transaction import (
+    ApplicationCreateTxn,
+    ApplicationUpdateTxn,
+    AssetOptInTxn,
+    OnComplete,
+    PaymentTxn,
+    StateSchema,
+    Transaction,
+    assign_group_id,
+)
+
+from offchain.abi import CONTRACTS_PATH, compile_pyteal, get_ledger_seeder_contract
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.group_builder import MAX_GROUP_SIZE
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMintBox,
+    ProposersBox,
+    RateCheckpointsBox,
+    X_ALGO_TOTAL_SUPPLY,
+    decode_delay_mint,
+    decode_global_state,
+    decode_proposers,
+)
+from offchain.state_reader import ConsensusSnapshot, ProposerAccount
+
+LEDGER_SEEDER_PATH = CONTRACTS_PATH / "testing" / "ledger_seeder.py"
+SNAPSHOT_VERSION = 1
+# max box bytes written per call, within the 2048 bytes of app args and the io budget of a box reference
+BOX_CHUNK_SIZE = 1024
+ABI_RETURN_PREFIX = bytes.fromhex("151f7c75")
+# holders are funded with their min balance for xALGO plus fees to use it
+HOLDER_FUND_AMOUNT = 1_000_000
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    address: str
+    amount: int
+    min_balance: int
+    status: str
+    auth_address: str | None = None
+    holdings: dict[int, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class LedgerSnapshot:
+    round: int
+    app_id: int
+    approval_program: bytes
+    clear_program: bytes
+    global_schema: tuple[int, int]  # num uints, num byte slices
+    local_schema: tuple[int, int]
+    extra_pages: int
+    global_state: dict[str, int | bytes]
+    boxes: dict[bytes, bytes]
+    app_account: AccountSnapshot
+    proposers: list[AccountSnapshot]
+    holders: list[AccountSnapshot] = field(default_factory=list)
+
+    @property
+    def x_algo_id(self) -> int:
+        return self.global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)
+
+    @property
+    def x_algo_circulating_supply(self) -> int:
+        if not self.x_algo_id:
+            return 0
+        return X_ALGO_TOTAL_SUPPLY - self.app_account.holdings.get(self.x_algo_id, 0)
+
+    def to_consensus_snapshot(self) -> ConsensusSnapshot:
+        """
+        Fork into the off-chain evaluator
+        """
+        delay_mints = [
+            decode_delay_mint(name, value)
+            for name, value in self.boxes.items() if name.startswith(DelayMintBox.NAME_PREFIX)
+        ]
+        return ConsensusSnapshot(
+            round=self.round,
+            global_state=dict(self.global_state),
+            proposers=[ProposerAccount(p.address, p.amount, p.min_balance, p.status) for p in self.proposers],
+            delay_mints={delay_mint.box_name: delay_mint for delay_mint in delay_mints},
+            x_algo_circulating_supply=self.x_algo_circulating_supply,
+        )
+
+
+def _encode_account(account: AccountSnapshot) -> list:
+    auth_address = decode_address(account.auth_address) if account.auth_address else None
+    return [
+        decode_address(account.address),
+        account.amount,
+        account.min_balance,
+        account.status,
+        auth_address,
+        account.holdings,
+    ]
+
+
+def _decode_account(encoded: list) -> AccountSnapshot:
+    address, amount, min_balance, status, auth_address, holdings = encoded
+    return AccountSnapshot(
+        encode_address(address),
+        amount,
+        min_balance,
+        status,
+        encode_address(auth_address) if auth_address else None,
+        holdings,
+    )
+
+
+def encode_snapshot(snapshot: LedgerSnapshot) -> bytes:
+    return zlib.compress(msgpack.packb([
+        SNAPSHOT_VERSION,
+        snapshot.round,
+        snapshot.app_id,
+        snapshot.approval_program,
+        snapshot.clear_program,
+        snapshot.global_schema,
+        snapshot.local_schema,
+        snapshot.extra_pages,
+        snapshot.global_state,
+        snapshot.boxes,
+        _encode_account(snapshot.app_account),
+        [_encode_account(proposer) for proposer in snapshot.proposers],
+        [_encode_account(holder) for holder in snapshot.holders],
+    ], use_bin_type=True))
+
+
+def decode_snapshot(data: bytes) -> LedgerSnapshot:
+    """
+    Raises:
+        ValueError: if the snapshot was encoded with a different version
+    """
+    version, *fields = msgpack.unpackb(zlib.decompress(data), raw=False, strict_map_key=False)
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    (
+        rnd, app_id, approval, clear, global_schema, local_schema, extra_pages, global_state, boxes,
+        app_account, proposers, holders,
+    ) = fields
+    return LedgerSnapshot(
+        round=rnd,
+        app_id=app_id,
+        approval_program=approval,
+        clear_program=clear,
+        global_schema=tuple(global_schema),
+        local_schema=tuple(local_schema),
+        extra_pages=extra_pages,
+        global_state=global_state,
+        boxes=boxes,
+        app_account=_decode_account(app_account),
+        proposers=[_decode_account(proposer) for proposer in proposers],
+        holders=[_decode_account(holder) for holder in holders],
+    )
+
+
+def save_snapshot(snapshot: LedgerSnapshot, path: str):
+    with open(path, "wb") as f:
+        f.write(encode_snapshot(snapshot))
+
+
+def load_snapshot(path: str) -> LedgerSnapshot:
+    with open(path, "rb") as f:
+        return decode_snapshot(f.read())
+
+
+async def _fetch_account(client: AsyncAlgodClient, address: str, asset_ids: list[int]) -> AccountSnapshot:
+    async def fetch_holding(asset_id: int) -> int | None:
+        try:
+            return (await client.account_asset_info(address, asset_id))["asset-holding"]["amount"]
+        except AlgodHTTPError as e:
+            # not opted in
+            if e.status == 404:
+                return None
+            raise
+
+    info, holdings = await asyncio.gather(
+        client.account_info(address),
+        asyncio.gather(*(fetch_holding(asset_id) for asset_id in asset_ids)),
+    )
+    return AccountSnapshot(
+        address,
+        info["amount"],
+        info["min-balance"],
+        info["status"],
+        info.get("auth-addr"),
+        {asset_id: amount for asset_id, amount in zip(asset_ids, holdings) if amount is not None},
+    )
+
+
+async def capture_snapshot(client: AsyncAlgodClient, app_id: int, holders: list[str] = ()) -> LedgerSnapshot:
+    """
+    Capture the state of the consensus app and of the given xALGO holders. The state is read over several
+    requests so should be captured while no transactions are being confirmed e.g. on a dev mode network.
+    """
+    status, app_info, box_names = await asyncio.gather(
+        client.status(),
+        client.application_info(app_id),
+        client.application_boxes(app_id),
+    )
+    params = app_info["params"]
+    global_state = decode_global_state(params.get("global-state", []))
+    box_values = await asyncio.gather(*(client.application_box_by_name(app_id, name) for name in box_names))
+    boxes = dict(zip(box_names, box_values))
+
+    num_proposers = global_state.get(ConsensusV3GlobalState.NUM_PROPOSERS, 0)
+    proposer_addresses = decode_proposers(boxes.get(ProposersBox.NAME, b""), num_proposers)
+    x_algo_id = global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)
+    asset_ids = [x_algo_id] if x_algo_id else []
+    app_account, proposers, holder_accounts = await asyncio.gather(
+        _fetch_account(client, get_application_address(app_id), asset_ids),
+        asyncio.gather(*(_fetch_account(client, address, []) for address in proposer_addresses)),
+        asyncio.gather(*(_fetch_account(client, address, asset_ids) for address in holders)),
+    )
+
+    global_schema = params.get("global-state-schema", {})
+    local_schema = params.get("local-state-schema", {})
+    return LedgerSnapshot(
+        round=status["last-round"],
+        app_id=app_id,
+        approval_program=b64decode(params.get("approval-program", "")),
+        clear_program=b64decode(params.get("clear-state-program", "")),
+        global_schema=(global_schema.get("num-uint", 0), global_schema.get("num-byte-slice", 0)),
+        local_schema=(local_schema.get("num-uint", 0), local_schema.get("num-byte-slice", 0)),
+        extra_pages=params.get("extra-program-pages", 0),
+        global_state=global_state,
+        boxes=boxes,
+        app_account=app_account,
+        proposers=list(proposers),
+        holders=list(holder_accounts),
+    )
+
+
+def _shift_round(value: bytes, offset: int, round_offset: int) -> bytes:
+    rnd = max(int.from_bytes(value[offset:offset + 8], "big") + round_offset, 0)
+    return value[:offset] + rnd.to_bytes(8, "big") + value[offset + 8:]
+
+
+def remap_state(
+    snapshot: LedgerSnapshot,
+    addresses: dict[str, str],
+    x_algo_id: int,
+    round_offset: int,
+) -> tuple[dict[str, int | bytes], dict[bytes, bytes]]:
+    """
+    Global state and boxes of the snapshot with the given addresses replaced, the xALGO id replaced and the rounds
+    of delay mints and rate checkpoints shifted by the given offset
+    """
+    replacements = [(decode_address(old), decode_address(new)) for old, new in addresses.items()]
+
+    def replace(value: bytes) -> bytes:
+        for old, new in replacements:
+            value = value.replace(old, new)
+        return value
+
+    global_state = {
+        key: replace(value) if isinstance(value, bytes) else value for key, value in snapshot.global_state.items()
+    }
+    global_state[ConsensusV3GlobalState.X_ALGO_ID] = x_algo_id
+    last_checkpoint_round = global_state.get(ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND)
+    if last_checkpoint_round:
+        global_state[ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND] = max(last_checkpoint_round + round_offset, 0)
+
+    boxes = {}
+    for name, value in snapshot.boxes.items():
+        value = replace(value)
+        if name.startswith(DelayMintBox.NAME_PREFIX):
+            value = _shift_round(value, DelayMintBox.ROUND, round_offset)
+        elif name == RateCheckpointsBox.NAME:
+            for offset in range(0, len(value), RateCheckpointsBox.CHECKPOINT_SIZE):
+                # empty checkpoints are left as zero
+                if any(value[offset:offset + RateCheckpointsBox.CHECKPOINT_SIZE]):
+                    value = _shift_round(value, offset + RateCheckpointsBox.ROUND, round_offset)
+        boxes[replace(name)] = value
+    return global_state, boxes
+
+
+@dataclass(frozen=True)
+class ForkedLedger:
+    app_id: int
+    x_algo_id: int
+    # snapshot address to address in the fork
+    addresses: dict[str, str]
+    # private keys of the holders created in the fork
+    private_keys: dict[str, str]
+
+
+def _get_return_value(info: dict, abi_type: str):
+    log = b64decode(info["logs"][-1])
+    if not log.startswith(ABI_RETURN_PREFIX):
+        raise ValueError("No ABI return value logged")
+    return ABIType.from_string(abi_type).decode(log[len(ABI_RETURN_PREFIX):])
+
+
+async def _send_group(client: AsyncAlgodClient, atc: AtomicTransactionComposer) -> dict:
+    return await client.wait_for_confirmation(await client.send_transactions(atc.gather_signatures()))
+
+
+async def _send_txns(client: AsyncAlgodClient, txns: list[Transaction], private_keys: list[str]) -> dict:
+    if len(txns) > 1:
+        assign_group_id(txns)
+    stxns = [txn.sign(private_key) for txn, private_key in zip(txns, private_keys)]
+    return await client.wait_for_confirmation(await client.send_transactions(stxns))
+
+
+async def fork_snapshot(
+    client: AsyncAlgodClient,
+    funder_private_key: str,
+    snapshot: LedgerSnapshot,
+    addresses: dict[str, str] = None,
+) -> ForkedLedger:
+    """
+    Fork the snapshot into the network of the given client, funding the new accounts from the funder
+
+    Args:
+        client: client of a local network
+        funder_private_key: private key of an account holding enough ALGO to fund the balances of the snapshot
+        snapshot: snapshot to fork
+        addresses: addresses to substitute in the state e.g. admins to accounts controlled by the test
+    """
+    funder = address_from_private_key(funder_private_key)
+    signer = AccountTransactionSigner(funder_private_key)
+    seeder = get_ledger_seeder_contract()
+    addresses = dict(addresses or {})
+    private_keys = {}
+
+    # create app with seeder program and the schemas of the snapshot, schemas cannot be changed on update
+    seeder_program = await client.compile(compile_pyteal(LEDGER_SEEDER_PATH))
+    create_txn = ApplicationCreateTxn(
+        funder,
+        await client.suggested_params(),
+        OnComplete.NoOpOC,
+        seeder_program,
+        snapshot.clear_program,
+        StateSchema(*snapshot.global_schema),
+        StateSchema(*snapshot.local_schema),
+        extra_pages=snapshot.extra_pages,
+    )
+    app_id = (await _send_txns(client, [create_txn], [funder_private_key]))["application-index"]
+    app_address = get_application_address(app_id)
+    addresses[snapshot.app_account.address] = app_address
+    params = await client.suggested_params()
+    round_offset = params.first - snapshot.round
+
+    min_fee = max(params.min_fee or 0, 1000)
+
+    def add_seeder_call(atc: AtomicTransactionComposer, method_name: str, method_args: list, **kwargs):
+        sp = copy(params)
+        sp.flat_fee = True
+        # covers the inner transaction of those methods which send one
+        sp.fee = min_fee * (2 if method_name in ("create_x_algo", "send_asset") else 1)
+        atc.add_method_call(app_id, seeder.get_method_by_name(method_name), funder, sp, signer, method_args, **kwargs)
+
+    # fund app account then create xALGO
+    atc = AtomicTransactionComposer()
+    fund_txn = PaymentTxn(funder, params, app_address, snapshot.app_account.amount)
+    atc.add_transaction(TransactionWithSigner(fund_txn, signer))
+    x_algo_id = 0
+    if snapshot.x_algo_id:
+        add_seeder_call(atc, "create_x_algo", [])
+        x_algo_id = _get_return_value(await _send_group(client, atc), "uint64")
+    else:
+        await _send_group(client, atc)
+
+    # recreate proposers rekeyed to the new app
+    for proposer in snapshot.proposers:
+        private_key, address = generate_account()
+        addresses[proposer.address] = address
+        rekey_to = app_address if proposer.auth_address == snapshot.app_account.address else None
+        fund_txn = PaymentTxn(funder, params, address, proposer.amount + min_fee)
+        rekey_txn = PaymentTxn(address, params, address, 0, rekey_to=rekey_to)
+        await _send_txns(client, [fund_txn, rekey_txn], [funder_private_key, private_key])
+
+    # recreate holders opted into the new xALGO, the funder holds the rest of the circulating supply
+    x_algo_holders = []
+    if x_algo_id:
+        for holder in snapshot.holders:
+            private_key, address = generate_account()
+            addresses[holder.address] = address
+            private_keys[address] = private_key
+            fund_txn = PaymentTxn(funder, params, address, holder.amount + HOLDER_FUND_AMOUNT)
+            opt_in_txn = AssetOptInTxn(address, params, x_algo_id)
+            await _send_txns(client, [fund_txn, opt_in_txn], [funder_private_key, private_key])
+            x_algo_holders.append((address, holder.holdings.get(snapshot.x_algo_id, 0)))
+        await _send_txns(client, [AssetOptInTxn(funder, params, x_algo_id)], [funder_private_key])
+        held = sum(amount for _, amount in x_algo_holders)
+        x_algo_holders.append((funder, snapshot.x_algo_circulating_supply - held))
+    for address, amount in x_algo_holders:
+        if amount > 0:
+            atc = AtomicTransactionComposer()
+            add_seeder_call(atc, "send_asset", [x_algo_id, address, amount])
+            await _send_group(client, atc)
+
+    # seed global state and boxes
+    global_state, boxes = remap_state(snapshot, addresses, x_algo_id, round_offset)
+    calls = []
+    for key, value in global_state.items():
+        method_name = "set_global_bytes" if isinstance(value, bytes) else "set_global_uint"
+        calls.append((method_name, [key.encode(), value], {}))
+    for name, value in boxes.items():
+        for offset in range(0, len(value), BOX_CHUNK_SIZE):
+            chunk = value[offset:offset + BOX_CHUNK_SIZE]
+            calls.append(("put_box", [name, len(value), offset, chunk], {"boxes": [(app_id, name)]}))
+    for i in range(0, len(calls), MAX_GROUP_SIZE):
+        atc = AtomicTransactionComposer()
+        for method_name, method_args, kwargs in calls[i:i + MAX_GROUP_SIZE]:
+            add_seeder_call(atc, method_name, method_args, **kwargs)
+        await _send_group(client, atc)
+
+    # update to the program of the snapshot
+    update_txn = ApplicationUpdateTxn(
+        funder, await client.suggested_params(), app_id, snapshot.approval_program, snapshot.clear_program
+    )
+    await _send_txns(client, [update_txn], [funder_private_key])
+    return ForkedLedger(app_id, x_algo_id, addresses, private_keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture ledger snapshots of the consensus app and fork them")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    capture = subparsers.add_parser("capture", help="write a snapshot of the app state to a file")
+    capture.add_argument("snapshot")
+    capture.add_argument("--app-id", type=int, required=True)
+    capture.add_argument("--holders", nargs="*", default=[], help="xALGO holders to include")
+
+    fork = subparsers.add_parser("fork", help="fork a snapshot into a fresh local network")
+    fork.add_argument("snapshot")
+    fork.add_argument("--replace", nargs="*", default=[], help="addresses to substitute as OLD=NEW")
+
+    args = parser.parse_args()
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            if args.command == "capture":
+                save_snapshot(await capture_snapshot(client, args.app_id, args.holders), args.snapshot)
+            else:
+                # mnemonic is read from the environment so it does not appear in the process list
+                funder_private_key = mnemonic.to_private_key(os.environ["FUNDER_MNEMONIC"])
+                addresses = dict(replacement.split("=") for replacement in args.replace)
+                forked = await fork_snapshot(client, funder_private_key, load_snapshot(args.snapshot), addresses)
+                print(json.dumps(asdict(forked), indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Offline load generator and replayer for benchmarking the consensus v3 app against a local network.
+
+Generation builds and signs groups ahead of time in a process pool and writes them to msgpack files, so replaying
+only has to stream the raw bytes to the node. Files are replayed in name order, each file being fully confirmed
+before the next is started, so that the setup files (funding, opting in and minting xALGO for the load accounts)
+complete before the load itself.
+
+Groups are valid for the 1000 rounds after the state snapshot they are built from so must be replayed within that
+window. Fees include a configurable margin as the state moves on from the snapshot during replay.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from base64 import b64decode, b64encode
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import msgpack
+from algosdk import mnemonic
+from algosdk.account import address_from_private_key
+from algosdk.atomic_transaction_composer import AccountTransactionSigner, TransactionWithSigner
+from algosdk.encoding import msgpack_encode
+from algosdk.logic import get_application_address
+from algosdk.transaction import AssetTransferTxn, PaymentTxn, SignedTransaction, SuggestedParams
+from nacl.signing import SigningKey
+
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.group_builder import ConsensusGroupBuilder
+from offchain.state_reader import ConsensusSnapshot, ConsensusStateReader
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("immediate_mint", "delayed_mint", "burn", "claim_delayed_mint")
+DEFAULT_MIX = {"immediate_mint": 0.4, "delayed_mint": 0.3, "burn": 0.2, "claim_delayed_mint": 0.1}
+
+
+@dataclass(frozen=True)
+class LoadConfig:
+    num_accounts: int
+    num_groups: int
+    mix: dict[str, float]
+    seed: int = 0
+    fund_amount: int = int(100e6)
+    setup_mint_amount: int = int(10e6)
+    mint_amount: int = int(1e6)
+    burn_amount: int = int(0.1e6)
+    extra_fee: int = 0
+    groups_per_file: int = 1000
+
+
+def get_load_account(seed: int, index: int) -> tuple[str, str]:
+    """
+    Deterministic load account so the same accounts are reused across generations with the same seed
+    """
+    signing_key = SigningKey(hashlib.sha256(f"load:{seed}:{index}".encode()).digest())
+    private_key = b64encode(bytes(signing_key) + bytes(signing_key.verify_key)).decode()
+    return private_key, address_from_private_key(private_key)
+
+
+def _encode_group(op: str, stxns: list[SignedTransaction]) -> bytes:
+    raw = b"".join(b64decode(msgpack_encode(stxn)) for stxn in stxns)
+    return msgpack.packb({"op": op, "txid": stxns[0].get_txid(), "txns": raw})
+
+
+def read_groups(path: Path):
+    with open(path, "rb") as f:
+        yield from msgpack.Unpacker(f, raw=False)
+
+
+# state of each worker process, set once by the pool initialiser
+_worker: dict = {}
+
+
+def _init_worker(app_id: int, snapshot: ConsensusSnapshot, params: SuggestedParams, config: LoadConfig):
+    _worker["builder"] = ConsensusGroupBuilder(app_id, snapshot)
+    _worker["params"] = params
+    _worker["config"] = config
+    _worker["accounts"] = [get_load_account(config.seed, i) for i in range(config.num_accounts)]
+
+
+def _build_group(index: int, op: str, claim: tuple[str, bytes] | None) -> bytes:
+    builder: ConsensusGroupBuilder = _worker["builder"]
+    params: SuggestedParams = _worker["params"]
+    config: LoadConfig = _worker["config"]
+    private_key, address = _worker["accounts"][index % config.num_accounts]
+    signer = AccountTransactionSigner(private_key)
+    app_address = get_application_address(builder.app_id)
+
+    if op in ("immediate_mint", "delayed_mint"):
+        send_algo = TransactionWithSigner(PaymentTxn(address, params, app_address, config.mint_amount), signer)
+        # nonce is unique per account as long as each account makes fewer than 2^16 groups
+        third_arg = 0 if op == "immediate_mint" else (index // config.num_accounts % 2 ** 16).to_bytes(2, "big")
+        method_args = [send_algo, address, third_arg]
+    elif op == "burn":
+        send_xalgo = AssetTransferTxn(address, params, app_address, config.burn_amount, builder.x_algo_id)
+        method_args = [TransactionWithSigner(send_xalgo, signer), address, 0]
+    else:
+        method_args = list(claim)
+
+    atc = builder.build(op, address, signer, params, method_args, extra_fee=config.extra_fee)
+    return _encode_group(op, atc.gather_signatures())
+
+
+def _write_file(path: Path, groups: list[tuple[int, str, tuple[str, bytes] | None]]) -> Counter:
+    with open(path, "wb") as f:
+        for index, op, claim in groups:
+            f.write(_build_group(index, op, claim))
+    return Counter(op for _, op, _ in groups)
+
+
+def _write_setup_files(
+    out_dir: Path,
+    app_id: int,
+    params: SuggestedParams,
+    config: LoadConfig,
+    funder_private_key: str,
+):
+    funder = address_from_private_key(funder_private_key)
+    with open(out_dir / "00-fund.msgpack", "wb") as f:
+        for _, address in _worker["accounts"]:
+            txn = PaymentTxn(funder, params, address, config.fund_amount)
+            f.write(_encode_group("fund", [txn.sign(funder_private_key)]))
+
+    x_algo_id = _worker["builder"].x_algo_id
+    with open(out_dir / "01-opt-in.msgpack", "wb") as f:
+        for private_key, address in _worker["accounts"]:
+            txn = AssetTransferTxn(address, params, address, 0, x_algo_id)
+            f.write(_encode_group("opt_in", [txn.sign(private_key)]))
+
+    # accounts need xALGO to burn
+    with open(out_dir / "02-setup-mint.msgpack", "wb") as f:
+        for private_key, address in _worker["accounts"]:
+            signer = AccountTransactionSigner(private_key)
+            send_algo = PaymentTxn(address, params, get_application_address(app_id), config.setup_mint_amount)
+            atc = _worker["builder"].build(
+                "immediate_mint",
+                address,
+                signer,
+                params,
+                [TransactionWithSigner(send_algo, signer), address, 0],
+                extra_fee=config.extra_fee,
+            )
+            f.write(_encode_group("immediate_mint", atc.gather_signatures()))
+
+
+def plan_operations(snapshot: ConsensusSnapshot, params: SuggestedParams, config: LoadConfig) -> list[tuple]:
+    """
+    Pick the operation of each group. Claims use the delay mints of the snapshot which have matured, each at most
+    once, falling back to immediate mints when they run out.
+    """
+    rng = random.Random(config.seed)
+    ops, weights = zip(*config.mix.items())
+    matured = [dm for dm in snapshot.delay_mints.values() if dm.round <= params.first]
+    planned = []
+    for index, op in enumerate(rng.choices(ops, weights, k=config.num_groups)):
+        claim = None
+        if op == "claim_delayed_mint":
+            if matured:
+                delay_mint = matured.pop()
+                claim = (delay_mint.minter, delay_mint.nonce)
+            else:
+                op = "immediate_mint"
+        planned.append((index, op, claim))
+    return planned
+
+
+def generate(
+    out_dir: Path,
+    app_id: int,
+    snapshot: ConsensusSnapshot,
+    params: SuggestedParams,
+    config: LoadConfig,
+    funder_private_key: str,
+    processes: int | None = None,
+) -> Counter:
+    """
+    Build and sign the setup and load groups, writing them to msgpack files in the given directory.
+    Returns the number of load groups of each operation.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _init_worker(app_id, snapshot, params, config)
+    _write_setup_files(out_dir, app_id, params, config, funder_private_key)
+
+    planned = plan_operations(snapshot, params, config)
+    chunks = [planned[i:i + config.groups_per_file] for i in range(0, len(planned), config.groups_per_file)]
+    paths = [out_dir / f"10-load-{i:04d}.msgpack" for i in range(len(chunks))]
+    counts = Counter()
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(app_id, snapshot, params, config)) as pool:
+        for chunk_counts in pool.map(_write_file, paths, chunks):
+            counts += chunk_counts
+    return counts
+
+
+@dataclass
+class ReplayResult:
+    file: str
+    op: str
+    txid: str
+    latency: float | None = None
+    confirmed_round: int | None = None
+    error: str | None = None
+
+
+async def _replay_group(
+    client: AsyncAlgodClient,
+    file: str,
+    group: dict,
+    poll_interval: float,
+    confirm_timeout: float,
+) -> ReplayResult:
+    result = ReplayResult(file, group["op"], group["txid"])
+    start = time.monotonic()
+    try:
+        await client.send_raw_transactions(group["txns"])
+        while time.monotonic() - start < confirm_timeout:
+            info = await client.pending_transaction_info(group["txid"])
+            if info.get("pool-error"):
+                result.error = info["pool-error"]
+                return result
+            if info.get("confirmed-round"):
+                result.confirmed_round = info["confirmed-round"]
+                result.latency = time.monotonic() - start
+                return result
+            await asyncio.sleep(poll_interval)
+        result.error = "timed out waiting for confirmation"
+    except AlgodHTTPError as e:
+        result.error = e.message
+    return result
+
+
+async def replay(
+    client: AsyncAlgodClient,
+    paths: list[Path],
+    concurrency: int = 64,
+    poll_interval: float = 0.5,
+    confirm_timeout: float = 60,
+) -> list[ReplayResult]:
+    """
+    Stream the groups of the given files to the node with at most the given number of groups in flight
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def run(file: str, group: dict):
+        try:
+            results.append(await _replay_group(client, file, group, poll_interval, confirm_timeout))
+        finally:
+            semaphore.release()
+
+    for path in sorted(paths):
+        tasks = []
+        for group in read_groups(path):
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run(path.name, group)))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def summarise(results: list[ReplayResult], elapsed: float) -> dict:
+    latencies = sorted(result.latency for result in results if result.error is None)
+    summary = {
+        "groups": len(results),
+        "confirmed": len(latencies),
+        "groups_per_minute": len(latencies) / elapsed * 60 if elapsed else 0,
+        "by_op": dict(Counter(result.op for result in results)),
+        "failures": dict(Counter(result.error for result in results if result.error is not None)),
+    }
+    if latencies:
+        # quantiles needs at least two points
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        summary["latency"] = {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98], "max": latencies[-1]}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and replay load against the consensus v3 app")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    gen = subparsers.add_parser("generate", help="build and sign groups into msgpack files")
+    gen.add_argument("out_dir", type=Path)
+    gen.add_argument("--app-id", type=int, required=True)
+    gen.add_argument("--num-accounts", type=int, default=100)
+    gen.add_argument("--num-groups", type=int, default=10000)
+    gen.add_argument("--mix", type=json.loads, default=DEFAULT_MIX, help="json weights of each operation")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--extra-fee", type=int, default=0)
+    gen.add_argument("--processes", type=int)
+
+    rep = subparsers.add_parser("replay", help="send generated groups to the node")
+    rep.add_argument("out_dir", type=Path)
+    rep.add_argument("--concurrency", type=int, default=64)
+    rep.add_argument("--results", type=Path, help="jsonl file to write the result of each group to")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            if args.command == "generate":
+                if unknown := set(args.mix) - set(OPERATIONS):
+                    parser.error(f"Unknown operations {unknown}")
+                # mnemonic is read from the environment so it does not appear in the process list
+                funder_private_key = mnemonic.to_private_key(os.environ["FUNDER_MNEMONIC"])
+                snapshot = await ConsensusStateReader(client, args.app_id).fetch_state()
+                params = await client.suggested_params()
+                config = LoadConfig(args.num_accounts, args.num_groups, args.mix, args.seed, extra_fee=args.extra_fee)
+                start = time.monotonic()
+                counts = generate(
+                    args.out_dir, args.app_id, snapshot, params, config, funder_private_key, args.processes
+                )
+                logger.info("Generated %s in %.1fs", dict(counts), time.monotonic() - start)
+            else:
+                start = time.monotonic()
+                results = await replay(client, list(args.out_dir.glob("*.msgpack")), args.concurrency)
+                if args.results:
+                    with open(args.results, "w") as f:
+                        f.writelines(json.dumps(asdict(result)) + "\n" for result in results)
+                print(json.dumps(summarise(results, time.monotonic() - start), indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Attribution of rewards to the individual proposers of the consensus v3 app.
+
+The app only tracks the aggregate active balance of its proposers, so the rewards of each proposer are derived
+off-chain from blocks. Every balance change of a proposer is classified as either:
+- a reward: the payout of a block it proposed, participation rewards realised on a transaction, or a payment from
+  an account other than the app or another proposer
+- a transfer: a payment to or from the app account or another proposer, or any payment within a call to the app
+  e.g. allocations on mint and burn, rebalancing and the fee sent before registering online
+- a fee paid by the proposer e.g. the incentive eligibility fee of a key registration
+
+Algod only serves current balances, so the balances at the start of a range are reconstructed from the current
+balances and the flows of every block since. The yield per ALGO of each proposer is its rewards over its time
+weighted average active balance within each window of rounds.
+"""
+import argparse
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+from algosdk.logic import get_application_address
+
+from offchain.async_algod import AsyncAlgodClient
+from offchain.state_reader import ConsensusStateReader
+
+DEFAULT_WINDOW = 10_000
+DEFAULT_BATCH_SIZE = 64
+
+
+@dataclass
+class ProposerFlows:
+    blocks_proposed: int = 0
+    block_payouts: int = 0
+    participation_rewards: int = 0
+    other_inflows: int = 0
+    transfers_in: int = 0
+    transfers_out: int = 0
+    fees_paid: int = 0
+
+    @property
+    def rewards(self) -> int:
+        return self.block_payouts + self.participation_rewards + self.other_inflows
+
+    @property
+    def net_flow(self) -> int:
+        return self.rewards + self.transfers_in - self.transfers_out - self.fees_paid
+
+    def add(self, other: "ProposerFlows"):
+        for name, value in asdict(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+@dataclass(frozen=True)
+class BlockFlows:
+    round: int
+    flows: dict[str, ProposerFlows] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ProposerPerformance:
+    address: str
+    first_round: int
+    last_round: int
+    blocks_proposed: int
+    rewards: int
+    block_payouts: int
+    average_stake: int
+    yield_per_algo: float
+
+
+def _add_txn_flows(
+    stxn: dict,
+    app_id: int,
+    app_address: str,
+    proposers: set[str],
+    flows: dict[str, ProposerFlows],
+    in_app_call: bool,
+):
+    txn = stxn.get("txn", {})
+    apply_data = stxn.get("dt", {})
+    sender, receiver, close_to = txn.get("snd"), txn.get("rcv"), txn.get("close")
+
+    def get(address: str) -> ProposerFlows:
+        return flows.setdefault(address, ProposerFlows())
+
+    if sender in proposers:
+        get(sender).fees_paid += txn.get("fee", 0)
+        get(sender).participation_rewards += apply_data.get("rs", 0)
+    if receiver in proposers:
+        get(receiver).participation_rewards += apply_data.get("rr", 0)
+    if close_to in proposers:
+        get(close_to).participation_rewards += apply_data.get("rc", 0)
+
+    if txn.get("type") == "pay":
+        ours = in_app_call or sender == app_address or sender in proposers
+        for address, amount in ((receiver, txn.get("amt", 0)), (close_to, apply_data.get("ca", 0))):
+            if sender in proposers:
+                get(sender).transfers_out += amount
+            if address in proposers:
+                if ours:
+                    get(address).transfers_in += amount
+                else:
+                    get(address).other_inflows += amount
+
+    in_app_call = in_app_call or (txn.get("type") == "appl" and txn.get("apid") == app_id)
+    for inner in apply_data.get("itx", []):
+        _add_txn_flows(inner, app_id, app_address, proposers, flows, in_app_call)
+
+
+def get_block_flows(block: dict, app_id: int, proposers: set[str]) -> BlockFlows:
+    """
+    Flows of the given proposers in a block returned by algod in json format
+    """
+    flows: dict[str, ProposerFlows] = {}
+    proposer = block.get("prp")
+    if proposer in proposers:
+        flows[proposer] = ProposerFlows(blocks_proposed=1, block_payouts=block.get("pp", 0))
+    app_address = get_application_address(app_id)
+    for stxn in block.get("txns", []):
+        _add_txn_flows(stxn, app_id, app_address, proposers, flows, False)
+    return BlockFlows(block.get("rnd", 0), flows)
+
+
+def reconstruct_start_balances(end_balances: dict[str, int], block_flows: list[BlockFlows]) -> dict[str, int]:
+    """
+    Balances before the first of the given blocks from the balances after the last
+    """
+    balances = dict(end_balances)
+    for flows in block_flows:
+        for address, proposer_flows in flows.flows.items():
+            if address in balances:
+                balances[address] -= proposer_flows.net_flow
+    return balances
+
+
+def attribute_rewards(
+    block_flows: list[BlockFlows],
+    start_balances: dict[str, int],
+    first_round: int,
+    last_round: int,
+    window: int = DEFAULT_WINDOW,
+) -> list[ProposerPerformance]:
+    """
+    Performance of each proposer in each window of rounds from the first round, given the flows of every round in
+    order and the active balances before the first
+    """
+    balances = dict(start_balances)
+    flows_by_round = {flows.round: flows.flows for flows in block_flows}
+    performances = []
+    for window_start in range(first_round, last_round + 1, window):
+        window_end = min(window_start + window - 1, last_round)
+        totals = {address: ProposerFlows() for address in balances}
+        stake_rounds = dict.fromkeys(balances, 0)
+        for rnd in range(window_start, window_end + 1):
+            # stake over the round is the balance before the block of the round is applied
+            for address, balance in balances.items():
+                stake_rounds[address] += balance
+            for address, proposer_flows in flows_by_round.get(rnd, {}).items():
+                if address in balances:
+                    balances[address] += proposer_flows.net_flow
+                    totals[address].add(proposer_flows)
+        num_rounds = window_end - window_start + 1
+        for address, total in totals.items():
+            average_stake = stake_rounds[address] // num_rounds
+            performances.append(ProposerPerformance(
+                address=address,
+                first_round=window_start,
+                last_round=window_end,
+                blocks_proposed=total.blocks_proposed,
+                rewards=total.rewards,
+                block_payouts=total.block_payouts,
+                average_stake=average_stake,
+                yield_per_algo=total.rewards / average_stake if average_stake > 0 else 0.0,
+            ))
+    return performances
+
+
+def rank_proposers(performances: list[ProposerPerformance]) -> list[ProposerPerformance]:
+    """
+    Performances ordered by best yield per ALGO first, within each window
+    """
+    return sorted(performances, key=lambda performance: (performance.first_round, -performance.yield_per_algo))
+
+
+async def fetch_block_flows(
+    client: AsyncAlgodClient,
+    app_id: int,
+    proposers: set[str],
+    first_round: int,
+    last_round: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> list[BlockFlows]:
+    block_flows = []
+    for batch_start in range(first_round, last_round + 1, batch_size):
+        rounds = range(batch_start, min(batch_start + batch_size, last_round + 1))
+        blocks = await asyncio.gather(*(client.block(rnd) for rnd in rounds))
+        block_flows.extend(get_block_flows(block, app_id, proposers) for block in blocks)
+    return block_flows
+
+
+async def report(
+    client: AsyncAlgodClient,
+    app_id: int,
+    first_round: int,
+    last_round: int | None = None,
+    window: int = DEFAULT_WINDOW,
+) -> list[ProposerPerformance]:
+    """
+    Ranked performance of the current proposers of the app in each window from the first to the last round,
+    defaulting to the current round. Blocks up to the current round are fetched to reconstruct the balances.
+    """
+    snapshot = await ConsensusStateReader(client, app_id).fetch_state()
+    last_round = snapshot.round if last_round is None else min(last_round, snapshot.round)
+    end_balances = {p.address: p.balance - p.min_balance for p in snapshot.proposers}
+    block_flows = await fetch_block_flows(client, app_id, set(end_balances), first_round, snapshot.round)
+    start_balances = reconstruct_start_balances(end_balances, block_flows)
+    return rank_proposers(attribute_rewards(block_flows, start_balances, first_round, last_round, window))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attribute rewards to the proposers of the consensus v3 app")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    parser.add_argument("--app-id", type=int, required=True)
+    parser.add_argument("--first-round", type=int, required=True)
+    parser.add_argument("--last-round", type=int)
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="number of rounds in each window")
+    args = parser.parse_args()
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            performances = await report(client, args.app_id, args.first_round, args.last_round, args.window)
+        print(json.dumps([asdict(performance) for performance in performances], indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
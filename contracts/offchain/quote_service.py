@@ -0,0 +1,249 @@
+"""
+HTTP service quoting immediate mints, burns and claims of delayed mints of the consensus v3 app.
+
+Quotes are exact: each is computed by the reference model of the fuzzer from the state of the app, syncing rewards
+received since the last call just as the contract would. The state is fetched once per round however many clients
+request quotes. A single long poll follows the rounds of the node and concurrent requests in a new round all wait
+on the same upstream fetch, so the load on the node stays constant as the number of clients grows. Quotes are
+cached by round, method and amount in an LRU cache.
+
+    GET /quote/{immediate_mint|burn|claim_delayed_mint}?amount=<microunits>
+
+returns the round quoted at and the xALGO minted, or the ALGO sent for a burn. The amount of a claim is the stake
+of the delayed mint. Quotes which the contract would reject are answered with status 422 and the reason.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.fuzzer import ReferenceModel, Step
+from offchain.state import ConsensusV3GlobalState
+from offchain.state_reader import ConsensusSnapshot, ConsensusStateReader
+
+logger = logging.getLogger(__name__)
+
+QUOTE_METHODS = ("immediate_mint", "burn", "claim_delayed_mint")
+DEFAULT_CACHE_SIZE = 4096
+# wait before polling again when the node returns without a new round
+POLL_INTERVAL = 0.5
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    422: "Unprocessable Entity",
+    502: "Bad Gateway",
+}
+
+
+def get_quote(snapshot: ConsensusSnapshot, method: str, amount: int) -> int:
+    """
+    Exact amount the method would return if called in the round after the snapshot.
+    Raises ValueError with the reason if the contract would reject the call.
+    """
+    if method not in QUOTE_METHODS:
+        raise ValueError(f"Unknown method {method}")
+    if method == "immediate_mint" and not snapshot.global_state.get(ConsensusV3GlobalState.CAN_IMMEDIATE_MINT):
+        raise ValueError("immediate mint paused")
+    if method == "burn" and amount > snapshot.x_algo_circulating_supply:
+        raise ValueError("exceeds xALGO in circulation")
+    # burner holds exactly the amount burnt
+    model = ReferenceModel.from_snapshot(snapshot, amount if method == "burn" else 0)
+    if method == "claim_delayed_mint":
+        # matured delayed mint whose stake is pending with a proposer, which leaves the rate unchanged
+        model.state.delay_mints = {0: (amount, model.state.round)}
+        model.state.total_pending_stake += amount
+        model.state.proposer_balances[0] += amount
+    outcome = model.apply(Step(method, amount))
+    if outcome.rejection is not None:
+        raise ValueError(outcome.rejection)
+    return outcome.amount
+
+
+class LRUCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class RoundStateCache:
+    """
+    State of the app at the latest round, fetched at most once per round. Requests made while a fetch for the
+    latest round is in flight wait on that fetch rather than starting their own.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, app_id: int):
+        self.client = client
+        self.reader = ConsensusStateReader(client, app_id)
+        # latest round known to the node
+        self.round = 0
+        self.num_fetches = 0
+        self._snapshot: ConsensusSnapshot | None = None
+        self._fetch: asyncio.Task | None = None
+        self._fetch_round = 0
+        self._follower: asyncio.Task | None = None
+
+    async def start(self):
+        self.round = (await self.client.status())["last-round"]
+        self._follower = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        for task in (self._follower, self._fetch):
+            if task is not None:
+                task.cancel()
+
+    async def _follow(self):
+        while True:
+            try:
+                status = await self.client.status_after_block(self.round)
+            except (AlgodHTTPError, OSError, asyncio.TimeoutError):
+                logger.exception("Failed to wait for round after %d", self.round)
+                status = {"last-round": self.round}
+            if status["last-round"] > self.round:
+                self.round = status["last-round"]
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    async def _fetch_state(self, rnd: int) -> ConsensusSnapshot:
+        try:
+            snapshot = await self.reader.fetch_state(force=True)
+        except BaseException:
+            # let the next request retry
+            if self._fetch_round == rnd:
+                self._fetch = None
+            raise
+        self.num_fetches += 1
+        if self._snapshot is None or snapshot.round > self._snapshot.round:
+            self._snapshot = snapshot
+        return snapshot
+
+    async def get(self) -> ConsensusSnapshot:
+        if self._snapshot is not None and self._snapshot.round >= self.round:
+            return self._snapshot
+        if self._fetch is None or self._fetch_round < self.round:
+            self._fetch_round = self.round
+            self._fetch = asyncio.create_task(self._fetch_state(self.round))
+        # a waiter being cancelled must not cancel the fetch of the others
+        return await asyncio.shield(self._fetch)
+
+
+class QuoteService:
+    def __init__(self, client: AsyncAlgodClient, app_id: int, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.state = RoundStateCache(client, app_id)
+        self.cache = LRUCache(cache_size)
+
+    async def quote(self, method: str, amount: int) -> tuple[int, int | str]:
+        """
+        Round quoted at and the quote, or the reason the contract would reject the call
+        """
+        snapshot = await self.state.get()
+        key = (snapshot.round, method, amount)
+        result = self.cache.get(key)
+        if result is None:
+            try:
+                result = get_quote(snapshot, method, amount)
+            except ValueError as e:
+                result = str(e)
+            self.cache.put(key, result)
+        return snapshot.round, result
+
+    async def handle_request(self, method: str, target: str) -> tuple[int, dict]:
+        if method != "GET":
+            return 405, {"message": f"Method {method} not allowed"}
+        url = urlsplit(target)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "quote" or parts[1] not in QUOTE_METHODS:
+            return 404, {"message": f"Unknown path {url.path}"}
+        params = parse_qs(url.query)
+        try:
+            amount = int(params["amount"][0])
+        except (KeyError, ValueError):
+            return 400, {"message": "amount must be an integer"}
+        if amount <= 0:
+            return 400, {"message": "amount must be positive"}
+
+        try:
+            rnd, result = await self.quote(parts[1], amount)
+        except (AlgodHTTPError, OSError, asyncio.TimeoutError) as e:
+            return 502, {"message": f"Failed to fetch state: {e}"}
+        if isinstance(result, str):
+            return 422, {"round": rnd, "message": result}
+        return 200, {"round": rnd, "method": parts[1], "amount": amount, "quote": result}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while request_line := await reader.readline():
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, body = await self.handle_request(method, target)
+                data = json.dumps(body).encode()
+                head = f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                head += f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+                writer.write(head.encode() + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        await self.state.start()
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self, server: asyncio.Server):
+        server.close()
+        await server.wait_closed()
+        await self.state.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve exact quotes of the consensus v3 app over HTTP")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    parser.add_argument("--app-id", type=int, required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            service = QuoteService(client, args.app_id, args.cache_size)
+            server = await service.start(args.host, args.port)
+            logger.info("Serving quotes on %s:%d", args.host, args.port)
+            async with server:
+                await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from base64 import b64decode
+from bisect import bisect_right
+from dataclasses import dataclass
+from fractions import Fraction
+from algosdk.v2client.algod import AlgodClient
+from offchain.state import RateCheckpointsBox
+
+
+@dataclass(frozen=True)
+class RateCheckpoint:
+    round: int
+    algo_balance: int
+    x_algo_circulating_supply: int
+
+    @property
+    def rate(self) -> Fraction:
+        """
+        ALGO per xALGO. Matches the contract which mints 1:1 when there is nothing staked
+        """
+        if not self.algo_balance or not self.x_algo_circulating_supply:
+            return Fraction(1)
+        return Fraction(self.algo_balance, self.x_algo_circulating_supply)
+
+
+def decode_rate_checkpoints(value: bytes) -> list[RateCheckpoint]:
+    """
+    Decode the ring buffer stored in the rate checkpoints box, ordered by round. Unused slots are skipped
+    """
+    size = RateCheckpointsBox.CHECKPOINT_SIZE
+    checkpoints = []
+    for offset in range(0, len(value) - size + 1, size):
+        record = value[offset:offset + size]
+        rnd = int.from_bytes(record[RateCheckpointsBox.ROUND:RateCheckpointsBox.ALGO_BALANCE], "big")
+        if not rnd:
+            continue
+        checkpoints.append(RateCheckpoint(
+            round=rnd,
+            algo_balance=int.from_bytes(
+                record[RateCheckpointsBox.ALGO_BALANCE:RateCheckpointsBox.X_ALGO_CIRCULATING_SUPPLY], "big"
+            ),
+            x_algo_circulating_supply=int.from_bytes(record[RateCheckpointsBox.X_ALGO_CIRCULATING_SUPPLY:], "big"),
+        ))
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint.round)
+
+
+class RateCheckpoints:
+    """
+    Historical xALGO/ALGO rates read from the rate checkpoints box in a single box read
+    """
+
+    def __init__(self, checkpoints: list[RateCheckpoint]):
+        self.checkpoints = sorted(checkpoints, key=lambda checkpoint: checkpoint.round)
+        self.rounds = [checkpoint.round for checkpoint in self.checkpoints]
+
+    @classmethod
+    def from_box_value(cls, value: bytes) -> "RateCheckpoints":
+        return cls(decode_rate_checkpoints(value))
+
+    @classmethod
+    def fetch(cls, algod_client: AlgodClient, app_id: int) -> "RateCheckpoints":
+        box = algod_client.application_box_by_name(app_id, RateCheckpointsBox.NAME)
+        return cls.from_box_value(b64decode(box["value"]))
+
+    def rate_at(self, rnd: int) -> Fraction:
+        """
+        Rate at the given round, linearly interpolated between the surrounding checkpoints.
+        Rounds after the latest checkpoint return the latest rate.
+
+        Raises:
+            ValueError: if the round precedes the oldest checkpoint
+        """
+        i = bisect_right(self.rounds, rnd)
+        if i == 0:
+            raise ValueError(f"No rate checkpoint at or before round {rnd}")
+        before = self.checkpoints[i - 1]
+        if before.round == rnd or i == len(self.checkpoints):
+            return before.rate
+        after = self.checkpoints[i]
+        return before.rate + (after.rate - before.rate) * Fraction(rnd - before.round, after.round - before.round)
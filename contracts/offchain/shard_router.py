@@ -0,0 +1,575 @@
+"""
+Routes mints and burns of a shared xALGO across consensus v3 apps deployed as shards behind the shard router app.
+
+Each shard is a full consensus app with its own proposers and xALGO so the number of proposers, and with it the
+TVL and the mints which can be served concurrently, grows with the number of shards. The router mints a shared xALGO
+backed by the xALGO of the shards it holds. Mirroring the router app:
+- mints go to the least loaded shard, the one with the most capacity left below its max proposer balance, with the
+  router receiving the shard xALGO and minting shared xALGO of the same value to the receiver
+- burns redeem shard xALGO of the same value as the shared xALGO burnt, from the best funded shard of those the
+  router holds enough xALGO of
+- the combined rate is that of the value of the shard xALGO held by the router and the shared xALGO circulating supply
+
+Mints and burns sync every shard with proposers first, so each shard is valued including the rewards received since
+its last sync and the state used here mirrors that sync from the balances of its proposers.
+
+Run with `python3 -m offchain.shard_router deploy --shards <APP_ID>...` to deploy a router over existing shards.
+"""
+import argparse
+import asyncio
+import json
+import os
+from copy import copy
+from dataclasses import asdict, dataclass
+
+from algosdk import mnemonic
+from algosdk.account import address_from_private_key
+from algosdk.atomic_transaction_composer import (
+    AccountTransactionSigner,
+    AtomicTransactionComposer,
+    TransactionSigner,
+    TransactionWithSigner,
+)
+from algosdk.logic import get_application_address
+from algosdk.transaction import AssetTransferTxn, PaymentTxn, StateSchema, SuggestedParams
+
+from offchain.abi import CONTRACTS_PATH, compile_pyteal, get_shard_router_contract
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.group_builder import (
+    MAX_GROUP_SIZE,
+    MAX_TXN_ACCOUNTS,
+    MAX_TXN_REFERENCES,
+    MIN_TXN_FEE,
+    ONE_4_DP,
+    AppCallReferences,
+    CallRequirements,
+    ConsensusGroupBuilder,
+    count_opup_calls,
+)
+from offchain.state import (
+    X_ALGO_TOTAL_SUPPLY,
+    ConsensusV3GlobalState,
+    ShardRouterGlobalState,
+    ShardRouterOpcodeBudget,
+    ShardsBox,
+    decode_global_state,
+    decode_shards,
+)
+from offchain.state_reader import ConsensusSnapshot, ConsensusStateReader
+
+SHARD_ROUTER_PATH = CONTRACTS_PATH / "xalgo" / "shard_router.py"
+CLEAR_PROGRAM_PATH = CONTRACTS_PATH / "common" / "clear_program.py"
+
+# account min balance, shared xALGO created and min balance of the shards box
+ROUTER_MIN_BALANCE = 100_000 + 100_000 + 2500 + 400 * (len(ShardsBox.NAME) + ShardsBox.SIZE)
+# opt in to the shard xALGO
+SHARD_MIN_BALANCE = 100_000
+
+
+@dataclass(frozen=True)
+class ShardState:
+    app_id: int
+    x_algo_id: int
+    algo_balance: int
+    x_algo_circulating_supply: int
+    capacity: int
+    can_immediate_mint: bool
+    # shard xALGO held by the router, which backs the shared xALGO
+    router_x_algo_balance: int = 0
+
+
+def get_shard_state(app_id: int, snapshot: ConsensusSnapshot, router_x_algo_balance: int = 0) -> ShardState:
+    """
+    State of the shard once synced by a mint or burn, mirrors the sync and the shard getters of the router app
+    """
+    def get_global(key: str) -> int:
+        return snapshot.global_state.get(key, 0)
+
+    num_proposers = get_global(ConsensusV3GlobalState.NUM_PROPOSERS)
+    max_balance = num_proposers * get_global(ConsensusV3GlobalState.MAX_PROPOSER_BALANCE)
+    pending_stake = get_global(ConsensusV3GlobalState.TOTAL_PENDING_STAKE)
+    active_balance = get_global(ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE)
+    unclaimed_fees = get_global(ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES)
+    # shard without proposers is not synced
+    if num_proposers:
+        last_active_balance = active_balance
+        active_balance = sum(p.balance - p.min_balance for p in snapshot.proposers) - pending_stake
+        unclaimed_fees += (active_balance - last_active_balance) * get_global(ConsensusV3GlobalState.FEE) // ONE_4_DP
+    # pending stake is held by the proposers but not yet counted as active
+    balance = active_balance + pending_stake
+    return ShardState(
+        app_id=app_id,
+        x_algo_id=get_global(ConsensusV3GlobalState.X_ALGO_ID),
+        algo_balance=active_balance - unclaimed_fees,
+        x_algo_circulating_supply=snapshot.x_algo_circulating_supply,
+        capacity=max(max_balance - balance, 0),
+        can_immediate_mint=bool(get_global(ConsensusV3GlobalState.CAN_IMMEDIATE_MINT)),
+        router_x_algo_balance=router_x_algo_balance,
+    )
+
+
+def get_x_algo_value(state: ShardState, x_algo_amount: int) -> int:
+    """
+    Value in ALGO of the given amount of the shard's xALGO, at the rate the shard mints at
+    """
+    if not state.x_algo_circulating_supply:
+        return x_algo_amount
+    return x_algo_amount * state.algo_balance // state.x_algo_circulating_supply
+
+
+def get_combined_rate(states: list[ShardState], x_algo_circulating_supply: int) -> tuple[int, int]:
+    """
+    The value in ALGO of the shard xALGO held by the router and the shared xALGO circulating supply
+    """
+    return sum(get_x_algo_value(state, state.router_x_algo_balance) for state in states), x_algo_circulating_supply
+
+
+def get_burn_value(states: list[ShardState], x_algo_circulating_supply: int, amount: int) -> int:
+    """
+    Value in ALGO of the given amount of shared xALGO, redeemed in shard xALGO from a single shard
+    """
+    algo_balance, _ = get_combined_rate(states, x_algo_circulating_supply)
+    return amount * algo_balance // x_algo_circulating_supply if x_algo_circulating_supply else 0
+
+
+def select_mint_shard(states: list[ShardState], amount: int) -> ShardState:
+    """
+    Raises:
+        ValueError: if no shard allows immediate mints with capacity for the amount
+    """
+    best = None
+    for state in states:
+        if state.can_immediate_mint and state.capacity > (best.capacity if best else 0):
+            best = state
+    if best is None or best.capacity < amount:
+        raise ValueError(f"No shard with capacity to mint {amount}")
+    return best
+
+
+def select_burn_shard(states: list[ShardState], amount: int) -> ShardState:
+    """
+    Args:
+        states: states of the shards
+        amount: value in ALGO of the shard xALGO to redeem
+
+    Raises:
+        ValueError: if the router does not hold enough xALGO of any shard
+    """
+    best = None
+    for state in states:
+        if state.algo_balance <= (best.algo_balance if best else 0):
+            continue
+        if get_x_algo_value(state, state.router_x_algo_balance) >= amount:
+            best = state
+    if best is None:
+        raise ValueError(f"No shard to burn for {amount}")
+    return best
+
+
+def get_shard_references(
+    app_id: int,
+    x_algo_id: int,
+    states: list[ShardState],
+    receiver: str | None = None,
+) -> list[AppCallReferences]:
+    """
+    References of the app calls to the router needed to read the state of the given shards. The app, account
+    and xALGO of each shard are kept in the same call so the shard's xALGO holding is available, as is the holding
+    of the shared xALGO of the receiver if given. Boxes are given with their app id as a mint or burn also
+    references the boxes of the shard.
+    """
+    first = AppCallReferences(boxes=[(app_id, ShardsBox.NAME)])
+    if x_algo_id:
+        first.assets.append(x_algo_id)
+    if receiver is not None:
+        first.accounts.append(receiver)
+    calls = [first]
+    for state in states:
+        call = calls[-1]
+        if call.num_references + 3 > MAX_TXN_REFERENCES or len(call.accounts) == MAX_TXN_ACCOUNTS:
+            calls.append(call := AppCallReferences())
+        call.apps.append(state.app_id)
+        call.accounts.append(get_application_address(state.app_id))
+        call.assets.append(state.x_algo_id)
+    return calls
+
+
+def add_shard_call_references(
+    calls: list[AppCallReferences],
+    shard: int,
+    requirements: CallRequirements,
+    exclude_accounts: set[str],
+) -> list[AppCallReferences]:
+    """
+    Add the references of an inner call the router makes to the shard into the free slots of the given calls,
+    adding dummy calls when the slots run out, as the inner call can use the resources of any call of the group
+    """
+    def get_call_with_free_slot(is_account: bool) -> AppCallReferences:
+        for call in calls:
+            if call.can_add_account() if is_account else call.can_add():
+                return call
+        calls.append(AppCallReferences())
+        return calls[-1]
+
+    accounts = [*requirements.pinned_accounts, *requirements.accounts]
+    apps = [*requirements.pinned_apps, *requirements.apps]
+    for account in dict.fromkeys(accounts):
+        if account not in exclude_accounts and all(account not in call.accounts for call in calls):
+            get_call_with_free_slot(True).accounts.append(account)
+    for asset in dict.fromkeys(requirements.assets):
+        if all(asset not in call.assets for call in calls):
+            get_call_with_free_slot(False).assets.append(asset)
+    for app in dict.fromkeys(apps):
+        if app != shard and all(app not in call.apps for call in calls):
+            get_call_with_free_slot(False).apps.append(app)
+    # a box must be referenced by a call which references its app
+    for box_name in dict.fromkeys(requirements.boxes):
+        if any((shard, box_name) in call.boxes for call in calls):
+            continue
+        call = next((call for call in calls if shard in call.apps and call.can_add()), None)
+        if call is None:
+            call = next((call for call in calls if call.num_references + 2 <= MAX_TXN_REFERENCES), None)
+            if call is None:
+                calls.append(call := AppCallReferences())
+            call.apps.append(shard)
+        call.boxes.append((shard, box_name))
+    return calls
+
+
+class ShardRouter:
+    """
+    Reads the shards of a shard router app and builds the calls to the router which mint and burn the shared xALGO
+    in the shard selected.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, app_id: int):
+        self.client = client
+        self.app_id = app_id
+        self.address = get_application_address(app_id)
+        self.contract = get_shard_router_contract()
+        self._readers: dict[int, ConsensusStateReader] = {}
+        self.snapshots: dict[int, ConsensusSnapshot] = {}
+        self.x_algo_id = 0
+        self.x_algo_circulating_supply = 0
+
+    async def fetch_shards(self) -> list[int]:
+        app_info = await self.client.application_info(self.app_id)
+        global_state = decode_global_state(app_info["params"].get("global-state", []))
+        self.x_algo_id = global_state.get(ShardRouterGlobalState.X_ALGO_ID, 0)
+        num_shards = global_state.get(ShardRouterGlobalState.NUM_SHARDS, 0)
+        if not num_shards:
+            return []
+        return decode_shards(await self.client.application_box_by_name(self.app_id, ShardsBox.NAME), num_shards)
+
+    async def fetch_states(self) -> list[ShardState]:
+        shards = await self.fetch_shards()
+        for shard in shards:
+            if shard not in self._readers:
+                self._readers[shard] = ConsensusStateReader(self.client, shard)
+        snapshots = await asyncio.gather(*(self._readers[shard].fetch_state() for shard in shards))
+        self.snapshots = dict(zip(shards, snapshots))
+
+        # shard xALGO held by the router and shared xALGO not yet minted
+        x_algo_ids = [snapshot.global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0) for snapshot in snapshots]
+        *balances, reserve = await asyncio.gather(
+            *(self._fetch_holding(self.address, x_algo_id) for x_algo_id in [*x_algo_ids, self.x_algo_id])
+        )
+        self.x_algo_circulating_supply = X_ALGO_TOTAL_SUPPLY - reserve if self.x_algo_id else 0
+        return [
+            get_shard_state(shard, snapshot, balance)
+            for (shard, snapshot), balance in zip(self.snapshots.items(), balances)
+        ]
+
+    async def _fetch_holding(self, address: str, asset_id: int) -> int:
+        try:
+            info = await self.client.account_asset_info(address, asset_id)
+        except AlgodHTTPError as e:
+            # not opted in
+            if e.status == 404:
+                return 0
+            raise
+        return info["asset-holding"]["amount"]
+
+    async def build_mint(
+        self,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        amount: int,
+        receiver: str,
+        min_received: int = 0,
+        extra_fee: int = 0,
+    ) -> tuple[int, AtomicTransactionComposer]:
+        """
+        Build the mint of shared xALGO with the given ALGO, returning the app id of the least loaded shard the
+        router mints in and the group. The min received is of the shared xALGO.
+        """
+        states = await self.fetch_states()
+        state = select_mint_shard(states, amount)
+        send_algo = PaymentTxn(sender, params, self.address, amount)
+
+        # the router mints in the shard with itself as receiver
+        shard_send_algo = PaymentTxn(self.address, params, get_application_address(state.app_id), amount)
+        shard_requirements = ConsensusGroupBuilder(state.app_id, self.snapshots[state.app_id]).requirements(
+            "immediate_mint", self.address, [shard_send_algo, self.address, 0]
+        )
+        method_args = [TransactionWithSigner(send_algo, signer), receiver, min_received]
+        # payment and app call to the shard and shared xALGO transfer
+        atc = self._build(
+            "mint", sender, signer, params, method_args, states, state, shard_requirements, receiver, 3, extra_fee
+        )
+        return state.app_id, atc
+
+    async def build_burn(
+        self,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        amount: int,
+        receiver: str,
+        min_received: int = 0,
+        extra_fee: int = 0,
+    ) -> tuple[int, AtomicTransactionComposer]:
+        """
+        Build the burn of the given shared xALGO, returning the app id of the best funded shard the router redeems
+        shard xALGO of the same value from and the group. The min received is of the ALGO.
+
+        Raises:
+            ValueError: if the router does not hold enough xALGO of any shard to redeem the value
+        """
+        states = await self.fetch_states()
+        value = get_burn_value(states, self.x_algo_circulating_supply, amount)
+        state = select_burn_shard(states, value)
+        send_xalgo = AssetTransferTxn(sender, params, self.address, amount, self.x_algo_id)
+
+        # the router burns the shard xALGO of the same value, rounding down, with the ALGO sent to the receiver
+        shard_burn_amount = value * state.x_algo_circulating_supply // state.algo_balance
+        shard_address = get_application_address(state.app_id)
+        shard_send_xalgo = AssetTransferTxn(self.address, params, shard_address, shard_burn_amount, state.x_algo_id)
+        shard_requirements = ConsensusGroupBuilder(state.app_id, self.snapshots[state.app_id]).requirements(
+            "burn", self.address, [shard_send_xalgo, receiver, min_received]
+        )
+        method_args = [TransactionWithSigner(send_xalgo, signer), receiver, min_received]
+        # asset transfer and app call to the shard
+        atc = self._build(
+            "burn", sender, signer, params, method_args, states, state, shard_requirements, receiver, 2, extra_fee
+        )
+        return state.app_id, atc
+
+    def _build(
+        self,
+        method_name: str,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        method_args: list,
+        states: list[ShardState],
+        state: ShardState,
+        shard_requirements: CallRequirements,
+        receiver: str,
+        num_inner_txns: int,
+        extra_fee: int,
+    ) -> AtomicTransactionComposer:
+        # every shard with proposers is synced first, mirroring sync_shards
+        sync_requirements = {
+            shard.app_id: ConsensusGroupBuilder(shard.app_id, self.snapshots[shard.app_id]).requirements(
+                "get_xalgo_rate", self.address, []
+            )
+            for shard in states
+            if self.snapshots[shard.app_id].global_state.get(ConsensusV3GlobalState.NUM_PROPOSERS)
+        }
+        references = get_shard_references(self.app_id, self.x_algo_id, states, receiver)
+        # router account is available to its own calls
+        for shard, requirements in [*sync_requirements.items(), (state.app_id, shard_requirements)]:
+            references = add_shard_call_references(references, shard, requirements, {self.address})
+        if len(references) + 1 > MAX_GROUP_SIZE:
+            raise ValueError(f"Cannot fit {method_name} call in a single group")
+
+        # budgets ensured by the router between its calls to the shards, each of which may use up the pooled budget so
+        # the budget ensured after one is counted from none
+        router_budgets = [[]]
+        for shard in states:
+            router_budgets[-1].append(ShardRouterOpcodeBudget.SYNC)
+            if shard.app_id in sync_requirements:
+                router_budgets.append([])
+        router_budgets[-1].append(ShardRouterOpcodeBudget.BASE + ShardRouterOpcodeBudget.SHARD * len(states))
+        router_budgets.append([ShardRouterOpcodeBudget.BASE])
+        num_opup_calls = sum(
+            count_opup_calls([(budget, budget) for budget in budgets], len(references) if i == 0 else 0)
+            for i, budgets in enumerate(router_budgets)
+        )
+        # each shard tops up its own budget from that of the inner app call
+        for requirements in [*sync_requirements.values(), shard_requirements]:
+            num_opup_calls += count_opup_calls(requirements.opcode_budgets, 1)
+            num_inner_txns += requirements.num_inner_txns
+        # app call syncing each shard
+        num_inner_txns += len(sync_requirements) + num_opup_calls
+        fee = max(params.min_fee or 0, MIN_TXN_FEE) * (len(references) + 1 + num_inner_txns) + extra_fee
+        return self._build_calls(method_name, sender, signer, params, references, method_args, fee)
+
+    def _build_calls(
+        self,
+        method_name: str,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        references: list[AppCallReferences],
+        method_args: list,
+        fee: int,
+    ) -> AtomicTransactionComposer:
+        # transactions passed as arguments are copied as their fee is covered by the app call
+        method_args = [
+            TransactionWithSigner(copy(arg.txn), arg.signer) if isinstance(arg, TransactionWithSigner) else arg
+            for arg in method_args
+        ]
+        for arg in method_args:
+            if isinstance(arg, TransactionWithSigner):
+                arg.txn.fee = 0
+                arg.txn.group = None
+
+        atc = AtomicTransactionComposer()
+        for i, refs in enumerate(references):
+            sp = copy(params)
+            sp.flat_fee = True
+            sp.fee = fee if i == 0 else 0
+            atc.add_method_call(
+                app_id=self.app_id,
+                method=self.contract.get_method_by_name(method_name if i == 0 else "dummy"),
+                sender=sender,
+                sp=sp,
+                signer=signer,
+                method_args=list(method_args) if i == 0 else [],
+                accounts=refs.accounts,
+                foreign_assets=refs.assets,
+                foreign_apps=refs.apps,
+                boxes=refs.boxes,
+            )
+        return atc
+
+    def build_view(
+        self,
+        method_name: str,
+        sender: str,
+        signer: TransactionSigner,
+        params: SuggestedParams,
+        states: list[ShardState],
+        method_args: list = (),
+    ) -> AtomicTransactionComposer:
+        """
+        Build the call to a read-only method of the router app referencing the given shards, to be simulated
+        """
+        references = get_shard_references(self.app_id, self.x_algo_id, states)
+        fee = max(params.min_fee or 0, MIN_TXN_FEE) * len(references)
+        return self._build_calls(method_name, sender, signer, params, references, list(method_args), fee)
+
+
+async def deploy_shard_router(client: AsyncAlgodClient, admin_private_key: str, shards: list[int]) -> int:
+    """
+    Create a shard router app administered by the given account, fund its min balance, create the shared xALGO and
+    add the given shards
+
+    Raises:
+        ValueError: if more than the max number of shards are given or a transaction is not confirmed
+    """
+    if len(shards) > ShardsBox.MAX_NUM_SHARDS:
+        raise ValueError(f"Cannot add more than {ShardsBox.MAX_NUM_SHARDS} shards")
+    admin = address_from_private_key(admin_private_key)
+    signer = AccountTransactionSigner(admin_private_key)
+    contract = get_shard_router_contract()
+    approval_program = await client.compile(compile_pyteal(SHARD_ROUTER_PATH))
+    clear_program = await client.compile(compile_pyteal(CLEAR_PROGRAM_PATH, "10"))
+
+    atc = AtomicTransactionComposer()
+    atc.add_method_call(
+        app_id=0,
+        method=contract.get_method_by_name("create"),
+        sender=admin,
+        sp=await client.suggested_params(),
+        signer=signer,
+        method_args=[admin],
+        approval_program=approval_program,
+        clear_program=clear_program,
+        global_schema=StateSchema(num_uints=2, num_byte_slices=1),
+        local_schema=StateSchema(0, 0),
+    )
+    txid = await client.send_transactions(atc.gather_signatures())
+    app_id = (await client.wait_for_confirmation(txid))["application-index"]
+    app_address = get_application_address(app_id)
+
+    # fund min balance and create shared xALGO
+    params = await client.suggested_params()
+    sp = copy(params)
+    sp.flat_fee = True
+    sp.fee = 2 * max(params.min_fee or 0, MIN_TXN_FEE)
+    atc = AtomicTransactionComposer()
+    atc.add_transaction(TransactionWithSigner(PaymentTxn(admin, params, app_address, ROUTER_MIN_BALANCE), signer))
+    atc.add_method_call(
+        app_id=app_id,
+        method=contract.get_method_by_name("initialise"),
+        sender=admin,
+        sp=sp,
+        signer=signer,
+    )
+    await client.wait_for_confirmation(await client.send_transactions(atc.gather_signatures()))
+
+    # fund min balance of the opt in to the xALGO of each shard
+    for shard in shards:
+        shard_info = await client.application_info(shard)
+        shard_state = decode_global_state(shard_info["params"].get("global-state", []))
+        params = await client.suggested_params()
+        sp = copy(params)
+        sp.flat_fee = True
+        sp.fee = 2 * max(params.min_fee or 0, MIN_TXN_FEE)
+        atc = AtomicTransactionComposer()
+        fund = PaymentTxn(admin, params, app_address, SHARD_MIN_BALANCE)
+        atc.add_transaction(TransactionWithSigner(fund, signer))
+        atc.add_method_call(
+            app_id=app_id,
+            method=contract.get_method_by_name("add_shard"),
+            sender=admin,
+            sp=sp,
+            signer=signer,
+            method_args=[shard],
+            foreign_assets=[shard_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)],
+            boxes=[(app_id, ShardsBox.NAME)],
+        )
+        await client.wait_for_confirmation(await client.send_transactions(atc.gather_signatures()))
+    return app_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy and inspect a router of consensus v3 shards")
+    parser.add_argument("--algod-address", default="http://localhost:8080")
+    parser.add_argument("--algod-token", default=os.environ.get("ALGOD_TOKEN", ""))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    deploy = subparsers.add_parser("deploy", help="create the router app and add the given shards")
+    deploy.add_argument("--shards", type=int, nargs="+", required=True)
+
+    state = subparsers.add_parser("state", help="print the state of each shard and the combined rate")
+    state.add_argument("--app-id", type=int, required=True)
+
+    args = parser.parse_args()
+
+    async def run():
+        async with AsyncAlgodClient(args.algod_token, args.algod_address) as client:
+            if args.command == "deploy":
+                # mnemonic is read from the environment so it does not appear in the process list
+                admin_private_key = mnemonic.to_private_key(os.environ["ADMIN_MNEMONIC"])
+                print(await deploy_shard_router(client, admin_private_key, args.shards))
+            else:
+                router = ShardRouter(client, args.app_id)
+                states = await router.fetch_states()
+                algo_balance, x_algo_circulating_supply = get_combined_rate(states, router.x_algo_circulating_supply)
+                print(json.dumps({
+                    "x_algo_id": router.x_algo_id,
+                    "shards": [asdict(state) for state in states],
+                    "algo_balance": algo_balance,
+                    "x_algo_circulating_supply": x_algo_circulating_supply,
+                }, indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Off-chain mirror of the consensus v3 and shard router state layouts defined in xalgo/consensus_state_v3.py and
+xalgo/shard_router_state.py
+"""
+from base64 import b64decode
+from dataclasses import dataclass
+from algosdk.encoding import decode_address, encode_address
+
+
+class ConsensusV3GlobalState:
+    INITIALISED = "init"
+    ADMIN = "admin"
+    REGISTER_ADMIN = "register_admin"
+    XGOV_ADMIN = "xgov_admin"
+    X_ALGO_ID = "x_algo_id"
+    TIME_DELAY = "time_delay"
+    NUM_PROPOSERS = "num_proposers"
+    MAX_PROPOSER_BALANCE = "max_proposer_balance"
+    FEE = "fee"  # 4 d.p
+    PREMIUM = "premium"  # 16 d.p
+    LAST_PROPOSERS_ACTIVE_BALANCE = "last_proposers_active_balance"
+    TOTAL_PENDING_STAKE = "total_pending_stake"
+    TOTAL_UNCLAIMED_FEES = "total_unclaimed_fees"
+    CAN_IMMEDIATE_MINT = "can_immediate_mint"
+    CAN_DELAY_MINT = "can_delay_mint"
+    RATE_CHECKPOINT_INTERVAL = "rate_checkpoint_interval"
+    LAST_RATE_CHECKPOINT_ROUND = "last_rate_checkpoint_round"
+    NEXT_RATE_CHECKPOINT_INDEX = "next_rate_checkpoint_index"
+    SETTLE_FEES_IN_X_ALGO = "settle_fees_in_x_algo"
+
+
+class ProposersBox:
+    NAME = b"pr"
+    ADDRESS_SIZE = 32
+    MAX_NUM_PROPOSERS = 30
+
+
+class AddedProposerBox:
+    NAME = b"ap"
+    TIMESTAMP = 0  # uint64
+    ADMIN = 8  # 32 bytes
+    SIZE = 40
+
+
+class SCUpdateBox:
+    NAME = b"sc"
+    TIMESTAMP = 0  # uint64
+    APPROVAL = 8  # 32 bytes
+    CLEAR = 40  # 32 bytes
+    SIZE = 72
+
+
+class DelayMintBox:
+    NAME_PREFIX = b"dm"
+    RECEIVER = 0  # 32 bytes
+    STAKE = 32  # uint64
+    ROUND = 40  # uint64
+    SIZE = 48
+    DELAY = 320  # rounds until claimable
+
+
+class DelayMintNonceBox:
+    NAME_PREFIX = b"nc"
+    NEXT_NONCE = 0  # uint64
+    SIZE = 8
+    NUM_NONCES = 2**16
+
+
+class RateCheckpointsBox:
+    NAME = b"rc"
+    ROUND = 0  # uint64
+    ALGO_BALANCE = 8  # uint64
+    X_ALGO_CIRCULATING_SUPPLY = 16  # uint64
+    CHECKPOINT_SIZE = 24
+    MAX_NUM_CHECKPOINTS = 42
+
+
+class ProposerRecord:
+    ADDRESS = 0  # 32 bytes
+    BALANCE = 32  # uint64
+    MIN_BALANCE = 40  # uint64
+    ADDED_PROPOSER = 48  # 40 bytes
+    SIZE = 88
+    MAX_PER_CALL = 11
+
+
+class DelayMintRecord:
+    SIZE = 48
+    MAX_PER_CALL = 20
+
+
+class BudgetPhase:
+    SYNC = 1
+    RECEIVE_ALLOCATION = 2
+    SEND_ALLOCATION = 3
+    MINT_PRICING = 4
+    INNER_SUBMIT = 5
+
+
+class OpcodeBudget:
+    ALLOCATION_BASE = 176
+    ALLOCATION = 80
+    ALLOCATION_STEP = 184
+    MINT = 140
+    MINT_BATCH = 86
+    MINT_BATCH_ENTRY = 104
+    DELAYED_MINT = 92
+    BURN = 56
+    SETTLE_FEES = 175
+    SEND_FEES = 88
+    CLAIM_FEE = 61
+    REMOVE_PROPOSER = 66
+    CLAIM_DELAYED_MINT = 219
+    SYNC = 41
+    GET_XALGO_RATE = 125
+    RATE = 84
+    CHECKPOINT = 73
+
+
+class ShardRouterGlobalState:
+    ADMIN = "admin"
+    NUM_SHARDS = "num_shards"
+    X_ALGO_ID = "x_algo_id"
+
+
+class ShardsBox:
+    NAME = b"sh"
+    APP_ID_SIZE = 8
+    MAX_NUM_SHARDS = 16
+    SIZE = 128
+
+
+class ShardRouterOpcodeBudget:
+    BASE = 400
+    SHARD = 300
+    SYNC = 60
+
+
+X_ALGO_TOTAL_SUPPLY = int(10e15)
+
+
+@dataclass(frozen=True)
+class DelayMint:
+    minter: str
+    nonce: bytes
+    receiver: str
+    stake: int
+    round: int
+
+    @property
+    def box_name(self) -> bytes:
+        return get_delay_mint_box_name(self.minter, self.nonce)
+
+
+def get_delay_mint_box_name(minter: str, nonce: bytes) -> bytes:
+    return DelayMintBox.NAME_PREFIX + decode_address(minter) + nonce
+
+
+def get_delay_mint_nonce_box_name(minter: str) -> bytes:
+    return DelayMintNonceBox.NAME_PREFIX + decode_address(minter)
+
+
+def decode_delay_mint(box_name: bytes, value: bytes) -> DelayMint:
+    prefix_len = len(DelayMintBox.NAME_PREFIX)
+    return DelayMint(
+        minter=encode_address(box_name[prefix_len:prefix_len + 32]),
+        nonce=box_name[prefix_len + 32:],
+        receiver=encode_address(value[DelayMintBox.RECEIVER:DelayMintBox.STAKE]),
+        stake=int.from_bytes(value[DelayMintBox.STAKE:DelayMintBox.ROUND], "big"),
+        round=int.from_bytes(value[DelayMintBox.ROUND:DelayMintBox.SIZE], "big"),
+    )
+
+
+def decode_proposers(value: bytes, num_proposers: int) -> list[str]:
+    size = ProposersBox.ADDRESS_SIZE
+    return [encode_address(value[i * size:(i + 1) * size]) for i in range(num_proposers)]
+
+
+def decode_shards(value: bytes, num_shards: int) -> list[int]:
+    size = ShardsBox.APP_ID_SIZE
+    return [int.from_bytes(value[i * size:(i + 1) * size], "big") for i in range(num_shards)]
+
+
+def decode_global_state(global_state: list[dict]) -> dict[str, int | bytes]:
+    """
+    Decode the global state returned by algod into a dict of key to uint64 or bytes value
+    """
+    state = {}
+    for entry in global_state:
+        key = b64decode(entry["key"]).decode()
+        value = entry["value"]
+        state[key] = b64decode(value.get("bytes", "")) if value["type"] == 1 else value.get("uint", 0)
+    return state
@@ -0,0 +1,137 @@
+import asyncio
+from dataclasses import dataclass
+from algosdk.logic import get_application_address
+
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMint,
+    DelayMintBox,
+    DelayMintNonceBox,
+    ProposersBox,
+    X_ALGO_TOTAL_SUPPLY,
+    decode_delay_mint,
+    decode_global_state,
+    decode_proposers,
+    get_delay_mint_box_name,
+    get_delay_mint_nonce_box_name,
+)
+
+
+@dataclass(frozen=True)
+class ProposerAccount:
+    address: str
+    balance: int
+    min_balance: int
+    status: str
+
+
+@dataclass(frozen=True)
+class ConsensusSnapshot:
+    round: int
+    global_state: dict[str, int | bytes]
+    proposers: list[ProposerAccount]
+    delay_mints: dict[bytes, DelayMint]
+    x_algo_circulating_supply: int
+
+
+class ConsensusStateReader:
+    """
+    Reads the full consensus v3 state (global state, proposer balances, delay mint boxes and xALGO circulating
+    supply) using concurrent requests over the pooled client.
+
+    Nothing is fetched again if the chain has not advanced since the last snapshot. Delay mint boxes are never
+    modified once created so only the values of newly listed boxes are fetched.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, app_id: int):
+        self.client = client
+        self.app_id = app_id
+        self._snapshot: ConsensusSnapshot | None = None
+        self._delay_mints: dict[bytes, DelayMint] = {}
+
+    async def _fetch_delay_mint(self, box_name: bytes) -> DelayMint:
+        value = await self.client.application_box_by_name(self.app_id, box_name)
+        return decode_delay_mint(box_name, value)
+
+    async def _fetch_proposer(self, address: str) -> ProposerAccount:
+        info = await self.client.account_info(address)
+        return ProposerAccount(address, info["amount"], info["min-balance"], info["status"])
+
+    async def _fetch_x_algo_circulating_supply(self, x_algo_id: int) -> int:
+        if not x_algo_id:
+            return 0
+        info = await self.client.account_asset_info(get_application_address(self.app_id), x_algo_id)
+        return X_ALGO_TOTAL_SUPPLY - info["asset-holding"]["amount"]
+
+    async def fetch_state(self, force: bool = False) -> ConsensusSnapshot:
+        status = await self.client.status()
+        rnd = status["last-round"]
+        if not force and self._snapshot is not None and self._snapshot.round == rnd:
+            return self._snapshot
+
+        app_info, proposers_box, box_names = await asyncio.gather(
+            self.client.application_info(self.app_id),
+            self.client.application_box_by_name(self.app_id, ProposersBox.NAME),
+            self.client.application_boxes(self.app_id, DelayMintBox.NAME_PREFIX),
+        )
+        global_state = decode_global_state(app_info["params"].get("global-state", []))
+        proposer_addresses = decode_proposers(proposers_box, global_state[ConsensusV3GlobalState.NUM_PROPOSERS])
+
+        new_box_names = [name for name in box_names if name not in self._delay_mints]
+        x_algo_id = global_state.get(ConsensusV3GlobalState.X_ALGO_ID, 0)
+        proposers, new_delay_mints, x_algo_circulating_supply = await asyncio.gather(
+            asyncio.gather(*(self._fetch_proposer(address) for address in proposer_addresses)),
+            asyncio.gather(*(self._fetch_delay_mint(name) for name in new_box_names)),
+            self._fetch_x_algo_circulating_supply(x_algo_id),
+        )
+
+        # drop boxes which have since been claimed
+        self._delay_mints = {name: self._delay_mints.get(name) for name in box_names if name in self._delay_mints}
+        self._delay_mints.update({delay_mint.box_name: delay_mint for delay_mint in new_delay_mints})
+
+        self._snapshot = ConsensusSnapshot(
+            rnd,
+            global_state,
+            list(proposers),
+            dict(self._delay_mints),
+            x_algo_circulating_supply,
+        )
+        return self._snapshot
+
+    async def fetch_delay_mint_nonce_cursor(self, minter: str) -> int | None:
+        """
+        Nonce after the one the minter last delay minted with, wrapping back to 0 after the highest possible. None if
+        the minter has never delay minted.
+        """
+        try:
+            value = await self.client.application_box_by_name(self.app_id, get_delay_mint_nonce_box_name(minter))
+        except AlgodHTTPError as e:
+            if e.status == 404:
+                return None
+            raise
+        return int.from_bytes(value[DelayMintNonceBox.NEXT_NONCE:DelayMintNonceBox.SIZE], "big")
+
+    async def fetch_next_delay_mint_nonce(self, minter: str, max_scan: int = 16) -> int:
+        """
+        Free nonce for the minter to delay mint with, in two box reads however many boxes the app holds unless taken
+        nonces have to be skipped. The scan starts from the nonce after the one last used, or from 0 if the minter has
+        no nonce box yet, and moves forward past nonces still taken by unclaimed delay mints, which is only the case if
+        the minter has since wrapped around, chosen nonces of its own or delay minted before the nonce box was kept.
+
+        Raises:
+            ValueError: if the next max_scan nonces are all taken by delay mints yet to be claimed
+        """
+        cursor = await self.fetch_delay_mint_nonce_cursor(minter) or 0
+        for i in range(max_scan):
+            nonce = (cursor + i) % DelayMintNonceBox.NUM_NONCES
+            box_name = get_delay_mint_box_name(minter, nonce.to_bytes(2, "big"))
+            try:
+                await self.client.application_box_by_name(self.app_id, box_name)
+            except AlgodHTTPError as e:
+                if e.status == 404:
+                    return nonce
+                raise
+        raise ValueError(
+            f"Next {max_scan} delay mint nonces of {minter} from {cursor} are taken by delay mints yet to be claimed"
+        )
@@ -0,0 +1,197 @@
+"""
+Bulk reads of the consensus v3 app through its read-only view methods.
+
+The views return the records of many proposers (address, balances and admin) and delayed mints in each call, and
+are simulated with extra opcode budget and unnamed resources so no references are needed. A full operational
+snapshot takes a round trip to list the delay mint boxes and then one simulated group per 16 view calls, all
+simulated against the same round, rather than a request for each account and box.
+"""
+import asyncio
+from base64 import b64decode
+from dataclasses import dataclass
+
+from algosdk.abi import ABIType
+from algosdk.atomic_transaction_composer import AtomicTransactionComposer, EmptySigner
+from algosdk.encoding import encode_address
+from algosdk.transaction import SuggestedParams
+
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.group_builder import MAX_EXTRA_OPCODE_BUDGET, MAX_GROUP_SIZE
+from offchain.state import (
+    AddedProposerBox,
+    DelayMint,
+    DelayMintBox,
+    DelayMintRecord,
+    ProposerRecord,
+    ProposersBox,
+    SCUpdateBox,
+    decode_delay_mint,
+)
+
+ABI_RETURN_PREFIX = bytes.fromhex("151f7c75")
+BYTES_TYPE = ABIType.from_string("byte[]")
+SC_UPDATE_TYPE = ABIType.from_string(f"byte[{SCUpdateBox.SIZE}]")
+
+
+@dataclass(frozen=True)
+class ProposerView:
+    address: str
+    balance: int
+    min_balance: int
+    # timestamp from which the admin is active, zero with no admin if none has been set
+    admin_timestamp: int
+    admin: str | None
+
+
+@dataclass(frozen=True)
+class ScheduledUpdate:
+    timestamp: int
+    approval_sha256: bytes
+    clear_sha256: bytes
+
+
+@dataclass(frozen=True)
+class OperationalSnapshot:
+    round: int
+    proposers: list[ProposerView]
+    # pending delay mints by box name, claimed ones are left out
+    delay_mints: dict[bytes, DelayMint]
+    scheduled_update: ScheduledUpdate | None
+
+
+def decode_proposer_records(value: bytes) -> list[ProposerView]:
+    proposers = []
+    for offset in range(0, len(value), ProposerRecord.SIZE):
+        record = value[offset:offset + ProposerRecord.SIZE]
+        added_proposer = record[ProposerRecord.ADDED_PROPOSER:]
+        admin = added_proposer[AddedProposerBox.ADMIN:AddedProposerBox.SIZE]
+        proposers.append(ProposerView(
+            address=encode_address(record[ProposerRecord.ADDRESS:ProposerRecord.BALANCE]),
+            balance=int.from_bytes(record[ProposerRecord.BALANCE:ProposerRecord.MIN_BALANCE], "big"),
+            min_balance=int.from_bytes(record[ProposerRecord.MIN_BALANCE:ProposerRecord.ADDED_PROPOSER], "big"),
+            admin_timestamp=int.from_bytes(added_proposer[AddedProposerBox.TIMESTAMP:AddedProposerBox.ADMIN], "big"),
+            admin=encode_address(admin) if any(admin) else None,
+        ))
+    return proposers
+
+
+def decode_delay_mint_records(box_names: list[bytes], value: bytes) -> dict[bytes, DelayMint]:
+    """
+    Delay mints of the given box names in the order requested, leaving out those claimed
+    """
+    delay_mints = {}
+    for i, box_name in enumerate(box_names):
+        record = value[i * DelayMintRecord.SIZE:(i + 1) * DelayMintRecord.SIZE]
+        if any(record):
+            delay_mints[box_name] = decode_delay_mint(box_name, record)
+    return delay_mints
+
+
+def decode_scheduled_update(value: bytes) -> ScheduledUpdate | None:
+    timestamp = int.from_bytes(value[SCUpdateBox.TIMESTAMP:SCUpdateBox.APPROVAL], "big")
+    if not timestamp:
+        return None
+    return ScheduledUpdate(
+        timestamp=timestamp,
+        approval_sha256=value[SCUpdateBox.APPROVAL:SCUpdateBox.CLEAR],
+        clear_sha256=value[SCUpdateBox.CLEAR:SCUpdateBox.SIZE],
+    )
+
+
+def _get_return_value(txn_result: dict, abi_type: ABIType) -> bytes:
+    log = b64decode(txn_result["logs"][-1])
+    if not log.startswith(ABI_RETURN_PREFIX):
+        raise ValueError("No ABI return value logged")
+    return bytes(abi_type.decode(log[len(ABI_RETURN_PREFIX):]))
+
+
+class ConsensusViewReader:
+    """
+    Reads the operational state of the app by simulating its view methods. The sender must be funded to pay the
+    fees of the simulated calls but nothing is signed or sent.
+    """
+
+    def __init__(self, client: AsyncAlgodClient, app_id: int, sender: str):
+        self.client = client
+        self.app_id = app_id
+        self.sender = sender
+        self.contract = get_consensus_v3_contract()
+
+    def _build_calls(self, calls: list[tuple[str, list]], params: SuggestedParams) -> AtomicTransactionComposer:
+        atc = AtomicTransactionComposer()
+        for method_name, method_args in calls:
+            atc.add_method_call(
+                app_id=self.app_id,
+                method=self.contract.get_method_by_name(method_name),
+                sender=self.sender,
+                sp=params,
+                signer=EmptySigner(),
+                method_args=method_args,
+            )
+        return atc
+
+    async def _simulate(self, calls: list[tuple[str, list]], params: SuggestedParams) -> list[dict]:
+        groups = [calls[i:i + MAX_GROUP_SIZE] for i in range(0, len(calls), MAX_GROUP_SIZE)]
+        results = await asyncio.gather(*(
+            self.client.simulate(
+                self._build_calls(group, params).gather_signatures(),
+                MAX_EXTRA_OPCODE_BUDGET,
+                allow_unnamed_resources=True,
+                rnd=params.first,
+            )
+            for group in groups
+        ))
+        txn_results = []
+        for result in results:
+            if "failure-message" in result:
+                raise ValueError(f"Simulated views failed: {result['failure-message']}")
+            txn_results.extend(txn_result["txn-result"] for txn_result in result["txn-results"])
+        return txn_results
+
+    async def fetch_snapshot(self, delay_mint_box_names: list[bytes] | None = None) -> OperationalSnapshot:
+        """
+        Snapshot of the proposers, the given delay mints (all boxes of the app by default) and the scheduled update
+
+        Raises:
+            ValueError: if the simulated views fail
+        """
+        if delay_mint_box_names is None:
+            delay_mint_box_names, params = await asyncio.gather(
+                self.client.application_boxes(self.app_id, DelayMintBox.NAME_PREFIX),
+                self.client.suggested_params(),
+            )
+        else:
+            params = await self.client.suggested_params()
+        params.flat_fee = True
+        params.fee = params.min_fee
+
+        # pages past the last proposer are empty
+        proposer_starts = range(0, ProposersBox.MAX_NUM_PROPOSERS, ProposerRecord.MAX_PER_CALL)
+        delay_mint_pages = [
+            delay_mint_box_names[i:i + DelayMintRecord.MAX_PER_CALL]
+            for i in range(0, len(delay_mint_box_names), DelayMintRecord.MAX_PER_CALL)
+        ]
+        prefix_len = len(DelayMintBox.NAME_PREFIX)
+        calls = [("get_scheduled_update", [])]
+        calls += [("get_proposer_records", [start]) for start in proposer_starts]
+        calls += [
+            ("get_delay_mint_records", [[
+                (encode_address(name[prefix_len:prefix_len + 32]), name[prefix_len + 32:]) for name in page
+            ]])
+            for page in delay_mint_pages
+        ]
+        txn_results = await self._simulate(calls, params)
+
+        proposers = []
+        for txn_result in txn_results[1:1 + len(proposer_starts)]:
+            proposers += decode_proposer_records(_get_return_value(txn_result, BYTES_TYPE))
+        delay_mints = {}
+        for page, txn_result in zip(delay_mint_pages, txn_results[1 + len(proposer_starts):]):
+            delay_mints.update(decode_delay_mint_records(page, _get_return_value(txn_result, BYTES_TYPE)))
+        return OperationalSnapshot(
+            round=params.first,
+            proposers=proposers,
+            delay_mints=delay_mints,
+            scheduled_update=decode_scheduled_update(_get_return_value(txn_results[0], SC_UPDATE_TYPE)),
+        )
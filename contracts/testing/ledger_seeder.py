@@ -0,0 +1,105 @@
+import json
+import os
+from pyteal import *
+from common.inner_txn import *
+
+# Approval program an app is created with to seed its state from a ledger snapshot before being updated to the
+# program of the snapshot. Only for testing, every method is restricted to the creator.
+
+router = Router(
+    name="LedgerSeeder",
+    bare_calls=BareCallActions(
+        no_op=OnCompleteAction(action=Approve(), call_config=CallConfig.CREATE),
+        update_application=OnCompleteAction(
+            action=Seq(Assert(Txn.sender() == Global.creator_address()), Approve()),
+            call_config=CallConfig.CALL
+        ),
+    )
+)
+
+
+@Subroutine(TealType.none)
+def check_creator_call():
+    return Assert(Txn.sender() == Global.creator_address())
+
+
+@router.method(no_op=CallConfig.CALL)
+def set_global_uint(key: abi.DynamicBytes, value: abi.Uint64) -> Expr:
+    return Seq(
+        check_creator_call(),
+        App.globalPut(key.get(), value.get()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def set_global_bytes(key: abi.DynamicBytes, value: abi.DynamicBytes) -> Expr:
+    return Seq(
+        check_creator_call(),
+        App.globalPut(key.get(), value.get()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def put_box(name: abi.DynamicBytes, size: abi.Uint64, offset: abi.Uint64, data: abi.DynamicBytes) -> Expr:
+    length = BoxLen(name.get())
+
+    return Seq(
+        check_creator_call(),
+        # create box on first chunk
+        length,
+        If(Not(length.hasValue()), Assert(App.box_create(name.get(), size.get()))),
+        App.box_replace(name.get(), offset.get(), data.get()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def create_x_algo(*, output: abi.Uint64) -> Expr:
+    return Seq(
+        check_creator_call(),
+        # same params as the xALGO created by the consensus app
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.AssetConfig,
+            TxnField.config_asset_name: Bytes("Governance xAlgo"),
+            TxnField.config_asset_unit_name: Bytes("xALGO"),
+            TxnField.config_asset_total: Int(int(10e15)),
+            TxnField.config_asset_decimals: Int(6),
+            TxnField.config_asset_reserve: Global.current_application_address(),
+            TxnField.fee: Int(0),
+        }),
+        InnerTxnBuilder.Submit(),
+        output.set(InnerTxn.created_asset_id()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def send_asset(asset: abi.Asset, receiver: abi.Account, amount: abi.Uint64) -> Expr:
+    return Seq(
+        check_creator_call(),
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(
+            Global.current_application_address(),
+            receiver.address(),
+            amount.get(),
+            asset.asset_id()
+        ),
+        InnerTxnBuilder.Submit(),
+    )
+
+
+# used to append accounts to foreign account array
+@router.method(no_op=CallConfig.CALL)
+def dummy() -> Expr:
+    return Seq()
+
+
+pragma(compiler_version="0.26.1")
+approval_program, clear_program, contract = router.compile_program(
+    version=10, optimize=OptimizeOptions(scratch_slots=True)
+)
+
+if __name__ == "__main__":
+    with open(os.path.dirname(os.path.abspath(__file__)) + "/ledger_seeder.json", "w") as f:
+        f.write(json.dumps(contract.dictify(), indent=4))
+
+    print(approval_program)
@@ -1,4 +1,5 @@
 from enum import EnumMeta
+from typing import Literal as L
 from pyteal import abi, Bytes, Int
 
 
@@ -18,6 +19,10 @@ class ConsensusV3GlobalState(EnumMeta):
     TOTAL_UNCLAIMED_FEES = Bytes("total_unclaimed_fees")
     CAN_IMMEDIATE_MINT = Bytes("can_immediate_mint")
     CAN_DELAY_MINT = Bytes("can_delay_mint")
+    RATE_CHECKPOINT_INTERVAL = Bytes("rate_checkpoint_interval")
+    LAST_RATE_CHECKPOINT_ROUND = Bytes("last_rate_checkpoint_round")
+    NEXT_RATE_CHECKPOINT_INDEX = Bytes("next_rate_checkpoint_index")
+    SETTLE_FEES_IN_X_ALGO = Bytes("settle_fees_in_x_algo")
 
 
 class ProposersBox(EnumMeta):
@@ -49,7 +54,97 @@ class DelayMintBox(EnumMeta):
     SIZE = Int(48)
 
 
+class DelayMintNonceBox(EnumMeta):
+    NAME_PREFIX = Bytes("nc")
+    NEXT_NONCE = Int(0)  # uint64
+    SIZE = Int(8)
+    NUM_NONCES = Int(2**16)
+
+
+class RateCheckpointsBox(EnumMeta):
+    NAME = Bytes("rc")
+    ROUND = Int(0)  # uint64
+    ALGO_BALANCE = Int(8)  # uint64
+    X_ALGO_CIRCULATING_SUPPLY = Int(16)  # uint64
+    CHECKPOINT_SIZE = Int(24)
+    MAX_NUM_CHECKPOINTS = Int(42)  # fits in single box reference
+
+
+class BudgetPhase(EnumMeta):
+    SYNC = 1
+    RECEIVE_ALLOCATION = 2
+    SEND_ALLOCATION = 3
+    MINT_PRICING = 4
+    INNER_SUBMIT = 5
+
+
+class OpcodeBudget(EnumMeta):
+    # each bounds the opcodes executed from where it is ensured until the next is, so the pooled budget of the group is
+    # only topped up once it runs short. measured with the budget instrumented build, including the top up which may
+    # follow, across 1 to 30 proposers with and without hints and rate checkpoints
+    ALLOCATION_BASE = Int(176)  # up to the allocation loop, plus ALLOCATION per proposer
+    ALLOCATION = Int(80)  # per proposer to sync and sum the balances before allocating
+    ALLOCATION_STEP = Int(184)  # per step of the allocation loop, including what follows the last step
+    MINT = Int(140)  # once allocated, to price and send the xALGO of an immediate mint
+    MINT_BATCH = Int(86)  # once allocated, to price a batch of mints, plus MINT_BATCH_ENTRY per mint
+    MINT_BATCH_ENTRY = Int(104)
+    DELAYED_MINT = Int(92)  # once allocated, to save a delayed mint
+    BURN = Int(56)  # once allocated, to log a burn
+    SETTLE_FEES = Int(175)  # to sync and settle the fees, plus SYNC per proposer
+    SEND_FEES = Int(88)  # once synced, up to the allocation loop to send the fees, plus SYNC per proposer
+    CLAIM_FEE = Int(61)  # once the fees are sent
+    REMOVE_PROPOSER = Int(66)  # once the proposer balance is allocated
+    CLAIM_DELAYED_MINT = Int(219)  # to claim a delayed mint, plus SYNC per proposer
+    SYNC = Int(41)
+    GET_XALGO_RATE = Int(125)  # to return the rate, plus RATE per proposer
+    RATE = Int(84)
+    CHECKPOINT = Int(73)  # once a rate checkpoint is due
+
+
+class ProposerRecord(EnumMeta):
+    # returned by get_proposer_records, the value of the added proposer box is zero if no admin has been set
+    ADDRESS = Int(0)  # 32 bytes
+    BALANCE = Int(32)  # uint64
+    MIN_BALANCE = Int(40)  # uint64
+    ADDED_PROPOSER = Int(48)  # 40 bytes
+    SIZE = Int(88)
+    MAX_PER_CALL = Int(11)  # return value is logged so must fit in 1024 bytes
+
+
+class DelayMintRecord(EnumMeta):
+    # returned by get_delay_mint_records, the value of the delay mint box or zero if claimed
+    SIZE = Int(48)
+    MAX_PER_CALL = Int(20)  # return value is logged so must fit in 1024 bytes
+
+
+class DelayMintKey(abi.NamedTuple):
+    minter: abi.Field[abi.Address]
+    nonce: abi.Field[abi.StaticBytes[L[2]]]
+
+
+class AllocationHint(abi.NamedTuple):
+    proposer_index: abi.Field[abi.Uint8]
+    amount: abi.Field[abi.Uint64]
+
+
 class XAlgoRate(abi.NamedTuple):
     algo_balance: abi.Field[abi.Uint64]
     x_algo_circulating_supply: abi.Field[abi.Uint64]
     proposers_balances: abi.Field[abi.DynamicBytes] # interpreted as uint64[] (workaround for output)
+
+
+class KeyRegistration(abi.NamedTuple):
+    proposer_index: abi.Field[abi.Uint8]
+    vote_key: abi.Field[abi.Address]
+    sel_key: abi.Field[abi.Address]
+    state_proof_key: abi.Field[abi.StaticBytes[L[64]]]
+    vote_first: abi.Field[abi.Uint64]
+    vote_last: abi.Field[abi.Uint64]
+    vote_key_dilution: abi.Field[abi.Uint64]
+    fee: abi.Field[abi.Uint64]
+
+
+class MintEntry(abi.NamedTuple):
+    receiver: abi.Field[abi.Address]
+    amount: abi.Field[abi.Uint64]
+    min_received: abi.Field[abi.Uint64]
@@ -1,8 +1,10 @@
+import sys
 from typing import Literal as L
 from pyteal import *
 from common.math_lib import ONE_4_DP, ONE_16_DP, mul_scale, minimum
 from common.checks import *
 from common.inner_txn import *
+from common.utils.peephole import optimise_teal
 from consensus_state_v3 import *
 
 initialised_key = ConsensusV3GlobalState.INITIALISED
@@ -20,6 +22,65 @@ total_pending_stake_key = ConsensusV3GlobalState.TOTAL_PENDING_STAKE
 total_unclaimed_fees_key = ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES
 can_immediate_mint_key = ConsensusV3GlobalState.CAN_IMMEDIATE_MINT
 can_delay_mint_key = ConsensusV3GlobalState.CAN_DELAY_MINT
+rate_checkpoint_interval_key = ConsensusV3GlobalState.RATE_CHECKPOINT_INTERVAL
+last_rate_checkpoint_round_key = ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND
+next_rate_checkpoint_index_key = ConsensusV3GlobalState.NEXT_RATE_CHECKPOINT_INDEX
+settle_fees_in_x_algo_key = ConsensusV3GlobalState.SETTLE_FEES_IN_X_ALGO
+
+# compile with --instrument-budget to log the remaining opcode budget on entry and exit of each phase
+# only for profiling on a local network as each phase adds two logs (max 32 per txn), default build is unchanged
+instrument_budget = "--instrument-budget" in sys.argv
+
+
+def log_budget(phase: int, is_exit: bool) -> Expr:
+    return Log(Concat(
+        MethodSignature("Budget(uint8,uint8,uint64)"),
+        Bytes("base16", bytes([phase, is_exit]).hex()),
+        Itob(Global.opcode_budget()),
+    ))
+
+
+def instrument(phase: int, expr: Expr) -> Expr:
+    if not instrument_budget:
+        return expr
+    return Seq(log_budget(phase, False), expr, log_budget(phase, True))
+
+
+def submit_inner_txn() -> Expr:
+    return instrument(BudgetPhase.INNER_SUBMIT, InnerTxnBuilder.Submit())
+
+
+# budget pooled by the app calls of the group is topped up with inner app calls, paid for by the fee credit of the
+# group, so groups only need extra app calls for their references
+opup = OpUp(OpUpMode.OnCall)
+
+
+@Subroutine(TealType.none)
+def top_up_opcode_budget(required: Expr):
+    return opup.ensure_budget(required, OpUpFeeSource.GroupCredit)
+
+
+def ensure_opcode_budget(required: Expr) -> Expr:
+    # each bound only covers the opcodes until the next is ensured so the budget is topped up when the pooled budget
+    # actually runs short, checked inline as it costs a few opcodes when no top up is needed
+    return If(Global.opcode_budget() < required, top_up_opcode_budget(required))
+
+
+def get_proposers_budget(base: Expr, per_proposer: Expr) -> Expr:
+    return base + per_proposer * App.globalGet(num_proposers_key)
+
+
+# encoding of an empty list of allocation hints, for allocations which are always searched for on-chain
+no_allocation_hints = Bytes("base16", "0x0000")
+
+
+# allocation hints are static tuples encoded one after the other following the length
+def get_hint_proposer_index(hints: Expr, i: Expr) -> Expr:
+    return GetByte(hints, Int(2) + i * Int(9))
+
+
+def get_hint_amount(hints: Expr, i: Expr) -> Expr:
+    return ExtractUint64(hints, Int(3) + i * Int(9))
 
 
 @Subroutine(TealType.none)
@@ -135,19 +196,49 @@ def sync_proposers_active_balance_and_unclaimed_fees():
     total_rewards_delta = proposers_active_balance.load() - App.globalGet(last_proposers_active_balance_key)
     unclaimed_fees_delta = mul_scale(total_rewards_delta, App.globalGet(fee_key), ONE_4_DP)
 
-    return Seq(
+    return instrument(BudgetPhase.SYNC, Seq(
         # calculate new proposers active balance to derive delta between now and last sync
         proposers_active_balance.store(get_proposers_algo_balance(Int(0)) - App.globalGet(total_pending_stake_key)),
         # update unclaimed fees
         App.globalPut(total_unclaimed_fees_key, App.globalGet(total_unclaimed_fees_key) + unclaimed_fees_delta),
         App.globalPut(last_proposers_active_balance_key, proposers_active_balance.load()),
+    ))
+
+
+@Subroutine(TealType.none)
+def checkpoint_rate():
+    interval = ScratchVar(TealType.uint64)
+    index = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # disabled when interval is zero
+        interval.store(App.globalGet(rate_checkpoint_interval_key)),
+        If(And(interval.load(), Global.round() >= App.globalGet(last_rate_checkpoint_round_key) + interval.load()), Seq(
+            ensure_opcode_budget(OpcodeBudget.CHECKPOINT),
+            # overwrite oldest checkpoint in ring buffer
+            index.store(App.globalGet(next_rate_checkpoint_index_key)),
+            BoxReplace(
+                RateCheckpointsBox.NAME,
+                index.load() * RateCheckpointsBox.CHECKPOINT_SIZE,
+                Concat(
+                    Itob(Global.round()),
+                    Itob(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
+                    Itob(get_x_algo_circulating_supply()),
+                )
+            ),
+            App.globalPut(next_rate_checkpoint_index_key, (index.load() + Int(1)) % RateCheckpointsBox.MAX_NUM_CHECKPOINTS),
+            App.globalPut(last_rate_checkpoint_round_key, Global.round()),
+        )),
     )
 
 
 @Subroutine(TealType.none)
-def receive_algo_to_proposers(amt: Expr):
+def receive_algo_to_proposers(amt: Expr, hints: Expr):
     num_proposers = ScratchVar(TealType.uint64)
+    num_hints = ScratchVar(TealType.uint64)
+    num_steps = ScratchVar(TealType.uint64)
     i = ScratchVar(TealType.uint64)
+    j = ScratchVar(TealType.uint64)
 
     rem = ScratchVar(TealType.uint64)
     total_bal = ScratchVar(TealType.uint64)
@@ -155,36 +246,46 @@ def receive_algo_to_proposers(amt: Expr):
     target = ScratchVar(TealType.uint64)
     alloc = ScratchVar(TealType.uint64)
 
-    return Seq(
+    return instrument(BudgetPhase.RECEIVE_ALLOCATION, Seq(
         # common vars accessed in loop
         num_proposers.store(App.globalGet(num_proposers_key)),
+        num_hints.store(ExtractUint16(hints, Int(0))),
+        # follow the hints if given, otherwise search through the proposers in order
+        num_steps.store(If(num_hints.load(), num_hints.load(), num_proposers.load())),
         total_bal.store(get_proposers_algo_balance(Int(1))),
         target.store(Div(total_bal.load() + amt, num_proposers.load()) + Int(1)), # always round up even if exact div
         # check target doesn't exceed max proposer balance (assumes current approx equal split)
         Assert(target.load() <= App.globalGet(max_proposer_balance_key)),
         # split amount in app account among proposers
         For(
-            Seq(i.store(Int(0)), rem.store(amt)),
-            And(i.load() < num_proposers.load(), rem.load()),
-            i.store(i.load() + Int(1))
+            Seq(j.store(Int(0)), rem.store(amt)),
+            And(j.load() < num_steps.load(), rem.load()),
+            j.store(j.load() + Int(1))
         ).Do(
+            ensure_opcode_budget(OpcodeBudget.ALLOCATION_STEP),
+            i.store(If(num_hints.load(), get_hint_proposer_index(hints, j.load()), j.load())),
             proposer_bal.store(get_proposer_balance(i.load(), Int(1))),
             If(proposer_bal.load() < target.load(), Seq(
-                alloc.store(minimum(target.load() - proposer_bal.load(), rem.load())),
+                # hinted amounts may add up to more than the amount but are held to the same target
+                alloc.store(minimum(If(num_hints.load(), get_hint_amount(hints, j.load()), target.load() - proposer_bal.load()), rem.load())),
+                Assert(alloc.load() <= target.load() - proposer_bal.load()),
                 InnerTxnBuilder.Begin(),
                 get_transfer_inner_txn(Global.current_application_address(), get_proposer(i.load()), alloc.load(), Int(0)),
-                InnerTxnBuilder.Submit(),
+                submit_inner_txn(),
                 rem.store(rem.load() - alloc.load()),
             )),
         ),
         # ensure fully allocated algo
         Assert(Not(rem.load())),
-    )
+    ))
 
 @Subroutine(TealType.none)
-def send_algo_from_proposers(receiver: Expr, amt: Expr):
+def send_algo_from_proposers(receiver: Expr, amt: Expr, hints: Expr):
     num_proposers = ScratchVar(TealType.uint64)
+    num_hints = ScratchVar(TealType.uint64)
+    num_steps = ScratchVar(TealType.uint64)
     i = ScratchVar(TealType.uint64)
+    j = ScratchVar(TealType.uint64)
 
     rem = ScratchVar(TealType.uint64)
     total_bal = ScratchVar(TealType.uint64)
@@ -192,24 +293,31 @@ def send_algo_from_proposers(receiver: Expr, amt: Expr):
     target = ScratchVar(TealType.uint64)
     alloc = ScratchVar(TealType.uint64)
 
-    return Seq(
+    return instrument(BudgetPhase.SEND_ALLOCATION, Seq(
         # common vars accessed in loop
         num_proposers.store(App.globalGet(num_proposers_key)),
+        num_hints.store(ExtractUint16(hints, Int(0))),
+        # follow the hints if given, otherwise search through the proposers in order
+        num_steps.store(If(num_hints.load(), num_hints.load(), num_proposers.load())),
         total_bal.store(get_proposers_algo_balance(Int(1))),
         target.store(Div(total_bal.load() - amt, num_proposers.load())),  # round down
         # no check on min proposer balance (assumes sufficient with current approx equal split)
         # split algo among proposers and collect in app account
         For(
-            Seq(i.store(Int(0)), rem.store(amt)),
-            And(i.load() < num_proposers.load(), rem.load()),
-            i.store(i.load() + Int(1))
+            Seq(j.store(Int(0)), rem.store(amt)),
+            And(j.load() < num_steps.load(), rem.load()),
+            j.store(j.load() + Int(1))
         ).Do(
+            ensure_opcode_budget(OpcodeBudget.ALLOCATION_STEP),
+            i.store(If(num_hints.load(), get_hint_proposer_index(hints, j.load()), j.load())),
             proposer_bal.store(get_proposer_balance(i.load(), Int(1))),
             If(proposer_bal.load() > target.load(), Seq(
-                alloc.store(minimum(proposer_bal.load() - target.load(), rem.load())),
+                # hinted amounts may add up to more than the amount but are held to the same target
+                alloc.store(minimum(If(num_hints.load(), get_hint_amount(hints, j.load()), proposer_bal.load() - target.load()), rem.load())),
+                Assert(alloc.load() <= proposer_bal.load() - target.load()),
                 InnerTxnBuilder.Begin(),
                 get_transfer_inner_txn(get_proposer(i.load()), Global.current_application_address(), alloc.load(), Int(0)),
-                InnerTxnBuilder.Submit(),
+                submit_inner_txn(),
                 rem.store(rem.load() - alloc.load()),
             )),
         ),
@@ -218,26 +326,52 @@ def send_algo_from_proposers(receiver: Expr, amt: Expr):
         # send total from app account to receiver
         InnerTxnBuilder.Begin(),
         get_transfer_inner_txn(Global.current_application_address(), receiver, amt, Int(0)),
-        InnerTxnBuilder.Submit(),
-    )
+        submit_inner_txn(),
+    ))
 
 
 @Subroutine(TealType.none)
-def send_unclaimed_fees():
+def mint_x_algo(amt: Expr, receiver: Expr):
     return Seq(
-        sync_proposers_active_balance_and_unclaimed_fees(),
-        send_algo_from_proposers( App.globalGet(admin_key), App.globalGet(total_unclaimed_fees_key)),
-        App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
-        App.globalPut(total_unclaimed_fees_key, Int(0)),
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(Global.current_application_address(), receiver, amt, App.globalGet(x_algo_id_key)),
+        submit_inner_txn(),
     )
 
 
 @Subroutine(TealType.none)
-def mint_x_algo(amt: Expr, receiver: Expr):
+def send_unclaimed_fees():
+    algo_balance = ScratchVar(TealType.uint64)
+    mint_amount = ScratchVar(TealType.uint64)
+
     return Seq(
-        InnerTxnBuilder.Begin(),
-        get_transfer_inner_txn(Global.current_application_address(), receiver, amt, App.globalGet(x_algo_id_key)),
-        InnerTxnBuilder.Submit(),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.SETTLE_FEES, OpcodeBudget.SYNC)),
+        sync_proposers_active_balance_and_unclaimed_fees(),
+        If(
+            App.globalGet(settle_fees_in_x_algo_key),
+            # mint the xALGO equivalent of the fees at the current rate so the ALGO stays with the proposers
+            Seq(
+                algo_balance.store(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
+                mint_amount.store(
+                    If(
+                        algo_balance.load(),
+                        mul_scale(App.globalGet(total_unclaimed_fees_key), get_x_algo_circulating_supply(), algo_balance.load()),
+                        App.globalGet(total_unclaimed_fees_key)
+                    )
+                ),
+                If(mint_amount.load(), mint_x_algo(mint_amount.load(), App.globalGet(admin_key))),
+            ),
+            Seq(
+                ensure_opcode_budget(get_proposers_budget(OpcodeBudget.SEND_FEES, OpcodeBudget.SYNC)),
+                send_algo_from_proposers(
+                    App.globalGet(admin_key), App.globalGet(total_unclaimed_fees_key), no_allocation_hints
+                ),
+                ensure_opcode_budget(OpcodeBudget.CLAIM_FEE),
+                App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
+            ),
+        ),
+        App.globalPut(total_unclaimed_fees_key, Int(0)),
+        checkpoint_rate(),
     )
 
 
@@ -348,7 +482,7 @@ def update_sc() -> Expr:
         # refund box min balance
         InnerTxnBuilder.Begin(),
         get_transfer_inner_txn(Global.current_application_address(), Txn.sender(), get_app_algo_balance(), Int(0)),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
         # delete initialised
         App.globalPut(initialised_key, Int(0)),
     )
@@ -381,6 +515,74 @@ def add_proposer(proposer: abi.Account) -> Expr:
     )
 
 
+@router.method(no_op=CallConfig.CALL)
+def remove_proposer(proposer_index: abi.Uint8) -> Expr:
+    proposer = ScratchVar(TealType.bytes)
+    proposer_min_balance = ScratchVar(TealType.uint64)
+    proposer_balance = ScratchVar(TealType.uint64)
+    last_index = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # verify caller is register admin
+        check_register_admin_call(),
+        # check proposer exists and is not the last remaining
+        last_index.store(App.globalGet(num_proposers_key) - Int(1)),
+        Assert(last_index.load()),
+        Assert(proposer_index.get() <= last_index.load()),
+        proposer.store(get_proposer(proposer_index.get())),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)),
+        # sync before draining as to not mistake the proposer min balance for rewards
+        sync_proposers_active_balance_and_unclaimed_fees(),
+        # take proposer offline so it can be closed
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.KeyRegistration,
+            TxnField.sender: proposer.load(),
+            TxnField.fee: Int(0),
+        }),
+        submit_inner_txn(),
+        # close proposer into app account
+        proposer_min_balance.store(MinBalance(proposer.load())),
+        proposer_balance.store(Balance(proposer.load())),
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.Payment,
+            TxnField.sender: proposer.load(),
+            TxnField.receiver: Global.current_application_address(),
+            TxnField.amount: Int(0),
+            TxnField.close_remainder_to: Global.current_application_address(),
+            TxnField.fee: Int(0),
+        }),
+        submit_inner_txn(),
+        # swap remove so proposers stay contiguous
+        BoxReplace(
+            ProposersBox.NAME,
+            proposer_index.get() * ProposersBox.ADDRESS_SIZE,
+            BoxExtract(ProposersBox.NAME, last_index.load() * ProposersBox.ADDRESS_SIZE, ProposersBox.ADDRESS_SIZE)
+        ),
+        BoxReplace(ProposersBox.NAME, last_index.load() * ProposersBox.ADDRESS_SIZE, BytesZero(ProposersBox.ADDRESS_SIZE)),
+        App.globalPut(num_proposers_key, last_index.load()),
+        # distribute balance among remaining proposers
+        receive_algo_to_proposers(proposer_balance.load(), no_allocation_hints),
+        ensure_opcode_budget(OpcodeBudget.REMOVE_PROPOSER),
+        # proposer min balance is now active in the remaining proposers
+        App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) + proposer_min_balance.load()),
+        # delete added proposer box so proposer can be added again
+        Assert(BoxDelete(Concat(AddedProposerBox.NAME, proposer.load()))),
+        # give box min balance to sender
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(Global.current_application_address(), Txn.sender(), get_app_algo_balance(), Int(0)),
+        submit_inner_txn(),
+        # publish rate if due
+        checkpoint_rate(),
+        # log remove proposer
+        Log(Concat(MethodSignature("RemoveProposer(address)"), proposer.load())),
+    )
+
+
 @router.method(no_op=CallConfig.CALL)
 def update_max_proposer_balance(new_max_proposer_balance: abi.Uint64) -> Expr:
     return Seq(
@@ -396,6 +598,29 @@ def update_max_proposer_balance(new_max_proposer_balance: abi.Uint64) -> Expr:
     )
 
 
+@router.method(no_op=CallConfig.CALL)
+def update_rate_checkpoint_interval(new_rate_checkpoint_interval: abi.Uint64) -> Expr:
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # verify caller is admin
+        check_admin_call(),
+        # create box if it doesn't already exist
+        Pop(BoxCreate(
+            RateCheckpointsBox.NAME,
+            RateCheckpointsBox.CHECKPOINT_SIZE * RateCheckpointsBox.MAX_NUM_CHECKPOINTS
+        )),
+        # set new rate checkpoint interval
+        App.globalPut(rate_checkpoint_interval_key, new_rate_checkpoint_interval.get()),
+        # log update rate checkpoint interval
+        Log(Concat(
+            MethodSignature("UpdateRateCheckpointInterval(uint64)"),
+            Itob(new_rate_checkpoint_interval.get())
+        )),
+    )
+
+
 @router.method(no_op=CallConfig.CALL)
 def update_fee(new_fee: abi.Uint64) -> Expr:
     return Seq(
@@ -426,6 +651,24 @@ def claim_fee() -> Expr:
     )
 
 
+@router.method(no_op=CallConfig.CALL)
+def update_fee_settlement(settle_in_x_algo: abi.Bool) -> Expr:
+    admin_x_algo_holding = AssetHolding.balance(App.globalGet(admin_key), App.globalGet(x_algo_id_key))
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # verify caller is admin
+        check_admin_call(),
+        # admin must be opted into xALGO to receive fees in xALGO
+        If(settle_in_x_algo.get(), Seq(admin_x_algo_holding, Assert(admin_x_algo_holding.hasValue()))),
+        App.globalPut(settle_fees_in_x_algo_key, settle_in_x_algo.get()),
+        # log update fee settlement
+        Log(Concat(MethodSignature("UpdateFeeSettlement(bool)"), settle_in_x_algo.encode())),
+    )
+
+
 @router.method(no_op=CallConfig.CALL)
 def update_premium(new_premium: abi.Uint64) -> Expr:
     return Seq(
@@ -539,7 +782,7 @@ def register_online(
             TxnField.vote_key_dilution: vote_key_dilution.get(),
             TxnField.fee: send_algo.get().amount(),
         }),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
     )
 
 
@@ -560,7 +803,108 @@ def register_offline(proposer_index: abi.Uint8) -> Expr:
             TxnField.sender: get_proposer(proposer_index.get()),
             TxnField.fee: Int(0),
         }),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def register_online_batch(send_algo: abi.PaymentTransaction, registrations: abi.DynamicArray[KeyRegistration]) -> Expr:
+    registration = KeyRegistration()
+    proposer_index = abi.Uint8()
+    vote_key = abi.Address()
+    sel_key = abi.Address()
+    state_proof_key = abi.StaticBytes(abi.StaticBytesTypeSpec(64))
+    vote_first = abi.Uint64()
+    vote_last = abi.Uint64()
+    vote_key_dilution = abi.Uint64()
+    fee = abi.Uint64()
+
+    num_registrations = ScratchVar(TealType.uint64)
+    total_fee = ScratchVar(TealType.uint64)
+    proposer = ScratchVar(TealType.bytes)
+    i = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # check payment for fees
+        check_algo_sent(send_algo, Global.current_application_address()),
+        # check non-empty
+        num_registrations.store(registrations.length()),
+        Assert(num_registrations.load()),
+        # key registrations (with special fee to opt into rewards) submitted as single inner group
+        total_fee.store(Int(0)),
+        InnerTxnBuilder.Begin(),
+        For(i.store(Int(0)), i.load() < num_registrations.load(), i.store(i.load() + Int(1))).Do(
+            registrations[i.load()].store_into(registration),
+            registration.proposer_index.store_into(proposer_index),
+            registration.vote_key.store_into(vote_key),
+            registration.sel_key.store_into(sel_key),
+            registration.state_proof_key.store_into(state_proof_key),
+            registration.vote_first.store_into(vote_first),
+            registration.vote_last.store_into(vote_last),
+            registration.vote_key_dilution.store_into(vote_key_dilution),
+            registration.fee.store_into(fee),
+            # verify caller is proposer admin (also checks proposer exists)
+            check_proposer_admin_call(proposer_index.get()),
+            proposer.store(get_proposer(proposer_index.get())),
+            If(i.load(), InnerTxnBuilder.Next()),
+            # send proposer its share of the payment so it can pay the fee
+            If(fee.get(), Seq(
+                get_transfer_inner_txn(Global.current_application_address(), proposer.load(), fee.get(), Int(0)),
+                InnerTxnBuilder.Next(),
+            )),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.KeyRegistration,
+                TxnField.sender: proposer.load(),
+                TxnField.vote_pk: vote_key.get(),
+                TxnField.selection_pk: sel_key.get(),
+                TxnField.state_proof_pk: state_proof_key.get(),
+                TxnField.vote_first: vote_first.get(),
+                TxnField.vote_last: vote_last.get(),
+                TxnField.vote_key_dilution: vote_key_dilution.get(),
+                TxnField.fee: fee.get(),
+            }),
+            total_fee.store(total_fee.load() + fee.get()),
+        ),
+        submit_inner_txn(),
+        # check payment covers exactly the fees
+        Assert(total_fee.load() == send_algo.get().amount()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def register_offline_batch(proposer_indexes: abi.DynamicArray[abi.Uint8]) -> Expr:
+    proposer_index = abi.Uint8()
+
+    num_proposer_indexes = ScratchVar(TealType.uint64)
+    is_register_admin = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # check non-empty
+        num_proposer_indexes.store(proposer_indexes.length()),
+        Assert(num_proposer_indexes.load()),
+        # register admin is verified once for all proposers
+        is_register_admin.store(is_register_admin_call()),
+        # key registrations submitted as single inner group
+        InnerTxnBuilder.Begin(),
+        For(i.store(Int(0)), i.load() < num_proposer_indexes.load(), i.store(i.load() + Int(1))).Do(
+            proposer_indexes[i.load()].store_into(proposer_index),
+            # verify caller is register admin or proposer admin
+            If(Not(is_register_admin.load()), check_proposer_admin_call(proposer_index.get())),
+            If(i.load(), InnerTxnBuilder.Next()),
+            InnerTxnBuilder.SetFields({
+                TxnField.type_enum: TxnType.KeyRegistration,
+                TxnField.sender: get_proposer(proposer_index.get()),
+                TxnField.fee: Int(0),
+            }),
+        ),
+        submit_inner_txn(),
     )
 
 
@@ -608,7 +952,7 @@ def subscribe_xgov(
             args=[voting_address, send_payment],
             extra_fields={TxnField.sender: get_proposer(proposer_index.get()), TxnField.fee: Int(0)}
         ),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
     )
 
 
@@ -634,12 +978,54 @@ def unsubscribe_xgov(proposer_index: abi.Uint8, xgov_registry: abi.Application)
             args=[proposer_address],
             extra_fields={TxnField.sender: proposer_address.get(), TxnField.fee: Int(0)}
         ),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
     )
 
 
 @router.method(no_op=CallConfig.CALL)
-def immediate_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+def rebalance_proposers(from_proposer_index: abi.Uint8, to_proposer_index: abi.Uint8, amount: abi.Uint64) -> Expr:
+    from_proposer_balance = ScratchVar(TealType.uint64)
+    to_proposer_balance = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # callable by anyone - can only narrow the gap between the two proposers
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # check proposers exist and are distinct
+        Assert(from_proposer_index.get() != to_proposer_index.get()),
+        from_proposer_balance.store(get_proposer_balance(from_proposer_index.get(), Int(1))),
+        to_proposer_balance.store(get_proposer_balance(to_proposer_index.get(), Int(1))),
+        # check amount is non-zero and doesn't overshoot an equal split of the two balances
+        Assert(amount.get()),
+        Assert(from_proposer_balance.load() > to_proposer_balance.load()),
+        Assert(amount.get() <= Div(from_proposer_balance.load() - to_proposer_balance.load(), Int(2))),
+        # move algo between proposers (total proposers balance is unchanged so no sync needed)
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(
+            get_proposer(from_proposer_index.get()),
+            get_proposer(to_proposer_index.get()),
+            amount.get(),
+            Int(0)
+        ),
+        submit_inner_txn(),
+        # log rebalance
+        Log(Concat(
+            MethodSignature("RebalanceProposers(uint64,uint64,uint64)"),
+            Itob(from_proposer_index.get()),
+            Itob(to_proposer_index.get()),
+            Itob(amount.get()),
+        )),
+    )
+
+
+@Subroutine(TealType.none)
+def process_immediate_mint(
+    send_algo: abi.PaymentTransaction,
+    receiver: abi.Address,
+    min_received: abi.Uint64,
+    hints: Expr,
+):
     algo_sent = send_algo.get().amount()
     algo_balance = ScratchVar(TealType.uint64)
     mint_amount = ScratchVar(TealType.uint64)
@@ -652,14 +1038,16 @@ def immediate_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min
         Assert(App.globalGet(can_immediate_mint_key)),
         # check address passed is 32 bytes
         address_length_check(receiver),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)),
         # sync before receiving the algo as to not mistake new algo received for rewards
         sync_proposers_active_balance_and_unclaimed_fees(),
         # check algo sent and distribute among proposers
         check_algo_sent(send_algo, Global.current_application_address()),
-        receive_algo_to_proposers(algo_sent),
+        receive_algo_to_proposers(algo_sent, hints),
+        ensure_opcode_budget(OpcodeBudget.MINT),
         # calculate mint amount before we update proposers active balance
         algo_balance.store(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
-        mint_amount.store(
+        instrument(BudgetPhase.MINT_PRICING, mint_amount.store(
             If(
                 algo_balance.load(),
                 mul_scale(
@@ -669,13 +1057,15 @@ def immediate_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min
                 ),
                 algo_sent
             )
-        ),
+        )),
         # update proposers active balance considering new algo received
         App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) + algo_sent),
         # check mint amount and send xALGO to user
         Assert(mint_amount.load()),
         Assert(mint_amount.load() >= min_received.get()),
         mint_x_algo(mint_amount.load(), receiver.get()),
+        # publish rate if due
+        checkpoint_rate(),
         # log mint
         Log(Concat(
             MethodSignature("ImmediateMint(address,address,uint64,uint64)"),
@@ -688,10 +1078,130 @@ def immediate_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min
 
 
 @router.method(no_op=CallConfig.CALL)
-def delayed_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Expr:
+def immediate_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+    return process_immediate_mint(send_algo, receiver, min_received, no_allocation_hints)
+
+
+# as immediate_mint but with the allocation given by the caller, which is verified rather than searched for
+@router.method(no_op=CallConfig.CALL)
+def immediate_mint_hinted(
+    send_algo: abi.PaymentTransaction,
+    receiver: abi.Address,
+    min_received: abi.Uint64,
+    allocation: abi.DynamicArray[AllocationHint],
+) -> Expr:
+    return process_immediate_mint(send_algo, receiver, min_received, allocation.encode())
+
+
+@Subroutine(TealType.none)
+def process_immediate_mint_batch(
+    send_algo: abi.PaymentTransaction,
+    mints: abi.DynamicArray[MintEntry],
+    hints: Expr,
+):
+    algo_sent = send_algo.get().amount()
+    mint = MintEntry()
+    receiver = abi.Address()
+    amount = abi.Uint64()
+    min_received = abi.Uint64()
+
+    num_mints = ScratchVar(TealType.uint64)
+    total_amount = ScratchVar(TealType.uint64)
+    algo_balance = ScratchVar(TealType.uint64)
+    x_algo_circulating_supply = ScratchVar(TealType.uint64)
+    mint_amount = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(initialised_key)),
+        # verify can immediate mint
+        Assert(App.globalGet(can_immediate_mint_key)),
+        # check non-empty
+        num_mints.store(mints.length()),
+        Assert(num_mints.load()),
+        # check algo sent covers exactly the amounts
+        total_amount.store(Int(0)),
+        For(i.store(Int(0)), i.load() < num_mints.load(), i.store(i.load() + Int(1))).Do(
+            mints[i.load()].store_into(mint),
+            mint.amount.store_into(amount),
+            Assert(amount.get()),
+            total_amount.store(total_amount.load() + amount.get()),
+        ),
+        Assert(total_amount.load() == algo_sent),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)),
+        # sync before receiving the algo as to not mistake new algo received for rewards
+        sync_proposers_active_balance_and_unclaimed_fees(),
+        # check algo sent and distribute among proposers once for all mints
+        check_algo_sent(send_algo, Global.current_application_address()),
+        receive_algo_to_proposers(algo_sent, hints),
+        ensure_opcode_budget(OpcodeBudget.MINT_BATCH + OpcodeBudget.MINT_BATCH_ENTRY * num_mints.load()),
+        # shared rate calculated before we update proposers active balance
+        algo_balance.store(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
+        x_algo_circulating_supply.store(get_x_algo_circulating_supply()),
+        # update proposers active balance considering new algo received
+        App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) + algo_sent),
+        # send xALGO to each receiver (limited to 12 mints by the 1024 bytes of logs per txn)
+        For(i.store(Int(0)), i.load() < num_mints.load(), i.store(i.load() + Int(1))).Do(
+            mints[i.load()].store_into(mint),
+            mint.receiver.store_into(receiver),
+            mint.amount.store_into(amount),
+            mint.min_received.store_into(min_received),
+            instrument(BudgetPhase.MINT_PRICING, mint_amount.store(
+                If(
+                    algo_balance.load(),
+                    mul_scale(
+                        mul_scale(amount.get(), x_algo_circulating_supply.load(), algo_balance.load()),
+                        ONE_16_DP - App.globalGet(premium_key),
+                        ONE_16_DP
+                    ),
+                    amount.get()
+                )
+            )),
+            Assert(mint_amount.load()),
+            Assert(mint_amount.load() >= min_received.get()),
+            mint_x_algo(mint_amount.load(), receiver.get()),
+            # log each mint as if separate immediate mint
+            Log(Concat(
+                MethodSignature("ImmediateMint(address,address,uint64,uint64)"),
+                Txn.sender(),
+                receiver.get(),
+                Itob(amount.get()),
+                Itob(mint_amount.load()),
+            )),
+        ),
+        # publish rate if due
+        checkpoint_rate(),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def immediate_mint_batch(send_algo: abi.PaymentTransaction, mints: abi.DynamicArray[MintEntry]) -> Expr:
+    return process_immediate_mint_batch(send_algo, mints, no_allocation_hints)
+
+
+# as immediate_mint_batch but with the allocation given by the caller, which is verified rather than searched for
+@router.method(no_op=CallConfig.CALL)
+def immediate_mint_batch_hinted(
+    send_algo: abi.PaymentTransaction,
+    mints: abi.DynamicArray[MintEntry],
+    allocation: abi.DynamicArray[AllocationHint],
+) -> Expr:
+    return process_immediate_mint_batch(send_algo, mints, allocation.encode())
+
+
+@Subroutine(TealType.none)
+def process_delayed_mint(
+    send_algo: abi.PaymentTransaction,
+    receiver: abi.Address,
+    nonce: abi.StaticBytes[L[2]],
+    hints: Expr,
+):
     algo_sent = send_algo.get().amount()
 
     box_name = Concat(DelayMintBox.NAME_PREFIX, Txn.sender(), nonce.get())
+    nonce_box_name = Concat(DelayMintNonceBox.NAME_PREFIX, Txn.sender())
 
     return Seq(
         rekey_and_close_to_check(),
@@ -703,16 +1213,23 @@ def delayed_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, nonce
         address_length_check(receiver),
         # check nonce is 2 bytes
         Assert(Len(nonce.get()) == Int(2)),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)),
         # sync before receiving the algo as to not mistake new algo received for rewards
         sync_proposers_active_balance_and_unclaimed_fees(),
         # check algo sent and distribute among proposers
         check_algo_sent(send_algo, Global.current_application_address()),
-        receive_algo_to_proposers(algo_sent),
+        receive_algo_to_proposers(algo_sent, hints),
+        ensure_opcode_budget(OpcodeBudget.DELAYED_MINT),
         # update total pending stake considering new algo received
         App.globalPut(total_pending_stake_key, App.globalGet(total_pending_stake_key) + algo_sent),
         # save in box and fail if box already exists
         Assert(BoxCreate(box_name, DelayMintBox.SIZE)),
         BoxPut(box_name, Concat(receiver.get(), Itob(algo_sent), Itob(Global.round() + Int(320)))),
+        # point next nonce of sender past the one used, wrapping after the highest, creating the box on first delay mint
+        # with its min balance paid by the sender, which is never refunded as the box is kept to not reset the nonce
+        App.box_put(nonce_box_name, Itob((Btoi(nonce.get()) + Int(1)) % DelayMintNonceBox.NUM_NONCES)),
+        # publish rate if due
+        checkpoint_rate(),
         # log so can retrieve info for claiming
         Log(Concat(
             MethodSignature("DelayedMint(byte[36],address,address,uint64)"),
@@ -724,6 +1241,22 @@ def delayed_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, nonce
     )
 
 
+@router.method(no_op=CallConfig.CALL)
+def delayed_mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Expr:
+    return process_delayed_mint(send_algo, receiver, nonce, no_allocation_hints)
+
+
+# as delayed_mint but with the allocation given by the caller, which is verified rather than searched for
+@router.method(no_op=CallConfig.CALL)
+def delayed_mint_hinted(
+    send_algo: abi.PaymentTransaction,
+    receiver: abi.Address,
+    nonce: abi.StaticBytes[L[2]],
+    allocation: abi.DynamicArray[AllocationHint],
+) -> Expr:
+    return process_delayed_mint(send_algo, receiver, nonce, allocation.encode())
+
+
 @router.method(no_op=CallConfig.CALL)
 def claim_delayed_mint(minter: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Expr:
     box_name = Concat(DelayMintBox.NAME_PREFIX, minter.get(), nonce.get())
@@ -749,17 +1282,18 @@ def claim_delayed_mint(minter: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Exp
         box,
         Assert(box.hasValue()),
         Assert(Global.round() >= delay_mint_round),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.CLAIM_DELAYED_MINT, OpcodeBudget.SYNC)),
         # sync
         sync_proposers_active_balance_and_unclaimed_fees(),
         # calculate mint amount before we update proposers active balance
         algo_balance.store(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
-        mint_amount.store(
+        instrument(BudgetPhase.MINT_PRICING, mint_amount.store(
             If(
                 algo_balance.load(),
                 mul_scale(delay_mint_stake, get_x_algo_circulating_supply(), algo_balance.load()),
                 delay_mint_stake
             )
-        ),
+        )),
         # update proposers active balance and total stakes considering new algo active
         App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) + delay_mint_stake),
         App.globalPut(total_pending_stake_key, App.globalGet(total_pending_stake_key) - delay_mint_stake),
@@ -770,7 +1304,9 @@ def claim_delayed_mint(minter: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Exp
         # give box min balance to sender as incentive
         InnerTxnBuilder.Begin(),
         get_transfer_inner_txn(Global.current_application_address(), Txn.sender(), get_app_algo_balance(), Int(0)),
-        InnerTxnBuilder.Submit(),
+        submit_inner_txn(),
+        # publish rate if due
+        checkpoint_rate(),
         # log so can retrieve info for claiming
         Log(Concat(
             MethodSignature("ClaimDelayedMint(byte[36],address,address,uint64,uint64)"),
@@ -783,8 +1319,13 @@ def claim_delayed_mint(minter: abi.Address, nonce: abi.StaticBytes[L[2]]) -> Exp
     )
 
 
-@router.method(no_op=CallConfig.CALL)
-def burn(send_xalgo: abi.AssetTransferTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+@Subroutine(TealType.none)
+def process_burn(
+    send_xalgo: abi.AssetTransferTransaction,
+    receiver: abi.Address,
+    min_received: abi.Uint64,
+    hints: Expr,
+):
     burn_amount = send_xalgo.get().asset_amount()
     algo_balance = ScratchVar(TealType.uint64)
     algo_to_send = ScratchVar(TealType.uint64)
@@ -797,23 +1338,27 @@ def burn(send_xalgo: abi.AssetTransferTransaction, receiver: abi.Address, min_re
         address_length_check(receiver),
         # check xALGO sent
         check_x_algo_sent(send_xalgo),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.ALLOCATION_BASE, OpcodeBudget.ALLOCATION)),
         # sync before sending the algo as to not offset sent algo against rewards
         sync_proposers_active_balance_and_unclaimed_fees(),
         # calculate algo amount to send before update proposers active balance
         algo_balance.store(App.globalGet(last_proposers_active_balance_key) - App.globalGet(total_unclaimed_fees_key)),
-        algo_to_send.store(
+        instrument(BudgetPhase.MINT_PRICING, algo_to_send.store(
             mul_scale(
                 burn_amount,
                 algo_balance.load(),
                 get_x_algo_circulating_supply() + burn_amount
             )
-        ),
+        )),
         # check amount and send ALGO to user
         Assert(algo_to_send.load()),
         Assert(algo_to_send.load() >= min_received.get()),
-        send_algo_from_proposers(receiver.get(), algo_to_send.load()),
+        send_algo_from_proposers(receiver.get(), algo_to_send.load(), hints),
+        ensure_opcode_budget(OpcodeBudget.BURN),
         # update proposers active balance considering algo sent
         App.globalPut(last_proposers_active_balance_key, App.globalGet(last_proposers_active_balance_key) - algo_to_send.load()),
+        # publish rate if due
+        checkpoint_rate(),
         # log burn
         Log(Concat(
             MethodSignature("Burn(address,uint64,uint64)"),
@@ -824,6 +1369,22 @@ def burn(send_xalgo: abi.AssetTransferTransaction, receiver: abi.Address, min_re
     )
 
 
+@router.method(no_op=CallConfig.CALL)
+def burn(send_xalgo: abi.AssetTransferTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+    return process_burn(send_xalgo, receiver, min_received, no_allocation_hints)
+
+
+# as burn but with the allocation given by the caller, which is verified rather than searched for
+@router.method(no_op=CallConfig.CALL)
+def burn_hinted(
+    send_xalgo: abi.AssetTransferTransaction,
+    receiver: abi.Address,
+    min_received: abi.Uint64,
+    allocation: abi.DynamicArray[AllocationHint],
+) -> Expr:
+    return process_burn(send_xalgo, receiver, min_received, allocation.encode())
+
+
 @router.method(no_op=CallConfig.CALL)
 def get_xalgo_rate(*, output: XAlgoRate) -> Expr:
     algo_balance = abi.Uint64()
@@ -840,6 +1401,7 @@ def get_xalgo_rate(*, output: XAlgoRate) -> Expr:
         Assert(App.globalGet(initialised_key)),
         # check proposer exists
         Assert(App.globalGet(num_proposers_key)),
+        ensure_opcode_budget(get_proposers_budget(OpcodeBudget.GET_XALGO_RATE, OpcodeBudget.RATE)),
         # ensure latest changes
         sync_proposers_active_balance_and_unclaimed_fees(),
         # calculate rate
@@ -861,16 +1423,119 @@ def get_xalgo_rate(*, output: XAlgoRate) -> Expr:
     )
 
 
+# read-only views returning many records at once, meant to be simulated with extra opcode budget and unnamed
+# resources. records are returned as bytes (workaround for output) and decoded off-chain
+@router.method(no_op=CallConfig.CALL)
+def get_proposer_records(start: abi.Uint8, *, output: abi.DynamicBytes) -> Expr:
+    proposer = ScratchVar(TealType.bytes)
+    end = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    records = ScratchVar(TealType.bytes)
+    added_proposer = BoxGet(Concat(AddedProposerBox.NAME, proposer.load()))
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # page ends at last proposer
+        end.store(minimum(start.get() + ProposerRecord.MAX_PER_CALL, App.globalGet(num_proposers_key))),
+        records.store(Bytes("")),
+        For(i.store(start.get()), i.load() < end.load(), i.store(i.load() + Int(1))).Do(
+            proposer.store(get_proposer(i.load())),
+            added_proposer,
+            Assert(added_proposer.hasValue()),
+            records.store(Concat(
+                records.load(),
+                proposer.load(),
+                Itob(Balance(proposer.load())),
+                Itob(MinBalance(proposer.load())),
+                # box is empty until an admin is set
+                added_proposer.value(),
+                BytesZero(AddedProposerBox.SIZE - Len(added_proposer.value())),
+            )),
+        ),
+        output.set(records.load()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_delay_mint_records(keys: abi.DynamicArray[DelayMintKey], *, output: abi.DynamicBytes) -> Expr:
+    i = ScratchVar(TealType.uint64)
+    records = ScratchVar(TealType.bytes)
+    # static tuples are encoded one after the other following the length, each is the minter and nonce
+    key = Extract(keys.encode(), Int(2) + i.load() * Int(34), Int(34))
+    delay_mint = BoxGet(Concat(DelayMintBox.NAME_PREFIX, key))
+
+    return Seq(
+        rekey_and_close_to_check(),
+        Assert(keys.length() <= DelayMintRecord.MAX_PER_CALL),
+        records.store(Bytes("")),
+        For(i.store(Int(0)), i.load() < keys.length(), i.store(i.load() + Int(1))).Do(
+            delay_mint,
+            # box is deleted once claimed
+            records.store(Concat(
+                records.load(),
+                If(delay_mint.hasValue(), delay_mint.value(), BytesZero(DelayMintRecord.SIZE)),
+            )),
+        ),
+        output.set(records.load()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_scheduled_update(*, output: abi.StaticBytes[L[72]]) -> Expr:
+    box = App.box_get(SCUpdateBox.NAME)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        box,
+        # zero if no update is scheduled
+        output.set(If(box.hasValue(), box.value(), BytesZero(SCUpdateBox.SIZE))),
+    )
+
+
 # used to append proposer accounts to foreign app array
 @router.method(no_op=CallConfig.CALL)
 def dummy() -> Expr:
     return Seq()
 
 
+# methods matched first when dispatching, each selector compared before a match costs four opcodes. user methods
+# are ordered by expected call frequency, with the dummy calls pooled for budget first, the rest keep their order.
+DISPATCH_ORDER = [
+    "dummy",
+    "immediate_mint",
+    "burn",
+    "claim_delayed_mint",
+    "delayed_mint",
+    "get_xalgo_rate",
+    "immediate_mint_batch",
+]
+
+
+def dispatch_priority(method_with_cond) -> int:
+    name = method_with_cond.method_sig.split("(")[0]
+    return DISPATCH_ORDER.index(name) if name in DISPATCH_ORDER else len(DISPATCH_ORDER)
+
+
+# methods_with_conds is private to the PyTeal router so it is only reordered for the pinned compiler version, and the
+# build fails rather than dispatching in an unexpected order if the structure or the registered methods change
 pragma(compiler_version="0.26.1")
+assert hasattr(router.approval_ast, "methods_with_conds"), "Router approval AST has no methods_with_conds to reorder"
+unregistered_methods = set(DISPATCH_ORDER) - {m.method_sig.split("(")[0] for m in router.approval_ast.methods_with_conds}
+assert not unregistered_methods, f"Dispatch order has unregistered methods {sorted(unregistered_methods)}"
+
+# stable sort so the remaining methods keep the order they are declared in
+router.approval_ast.methods_with_conds.sort(key=dispatch_priority)
+
 approval_program, clear_program, contract = router.compile_program(
     version=10, optimize=OptimizeOptions(scratch_slots=True)
 )
 
+# compile with --optimise to run the peephole optimiser, hashes for schedule_update_sc must be of the output
+optimisation_report = None
+if "--optimise" in sys.argv:
+    approval_program, optimisation_report = optimise_teal(approval_program)
+
 if __name__ == "__main__":
     print(approval_program)
+    if optimisation_report is not None:
+        print(optimisation_report, file=sys.stderr)
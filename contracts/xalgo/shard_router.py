@@ -0,0 +1,587 @@
+from pyteal import *
+from common.checks import *
+from common.inner_txn import get_transfer_inner_txn
+from common.math_lib import mul_scale
+from consensus_state_v3 import ConsensusV3GlobalState
+from shard_router_state import *
+
+admin_key = ShardRouterGlobalState.ADMIN
+num_shards_key = ShardRouterGlobalState.NUM_SHARDS
+x_algo_id_key = ShardRouterGlobalState.X_ALGO_ID
+
+X_ALGO_TOTAL_SUPPLY = Int(int(10e15))
+
+
+@Subroutine(TealType.none)
+def check_admin_call():
+    return Assert(Txn.sender() == App.globalGet(admin_key))
+
+
+@Subroutine(TealType.none)
+def check_algo_sent(txn: abi.PaymentTransaction):
+    return Seq(
+        Assert(txn.get().type_enum() == TxnType.Payment),
+        Assert(txn.get().sender() == Txn.sender()),
+        Assert(txn.get().receiver() == Global.current_application_address()),
+        Assert(txn.get().close_remainder_to() == Global.zero_address()),
+        Assert(txn.get().rekey_to() == Global.zero_address()),
+    )
+
+
+@Subroutine(TealType.none)
+def check_x_algo_sent(txn: abi.AssetTransferTransaction):
+    return Seq(
+        Assert(txn.get().type_enum() == TxnType.AssetTransfer),
+        Assert(txn.get().xfer_asset() == App.globalGet(x_algo_id_key)),
+        Assert(txn.get().sender() == Txn.sender()),
+        Assert(txn.get().asset_receiver() == Global.current_application_address()),
+        Assert(txn.get().asset_close_to() == Global.zero_address()),
+        Assert(txn.get().close_remainder_to() == Global.zero_address()),
+        Assert(txn.get().rekey_to() == Global.zero_address()),
+    )
+
+
+# budget pooled by the app calls of the group is topped up with inner app calls, paid for by the fee credit of the
+# group, so groups only need extra app calls for their references
+opup = OpUp(OpUpMode.OnCall)
+
+
+@Subroutine(TealType.none)
+def ensure_opcode_budget(required: Expr):
+    return opup.ensure_budget(required, OpUpFeeSource.GroupCredit)
+
+
+def get_shards_budget() -> Expr:
+    return ShardRouterOpcodeBudget.BASE + ShardRouterOpcodeBudget.SHARD * App.globalGet(num_shards_key)
+
+
+@Subroutine(TealType.uint64)
+def get_x_algo_circulating_supply():
+    # shared xALGO not held by the router
+    bal = AssetHolding.balance(Global.current_application_address(), App.globalGet(x_algo_id_key))
+    return Seq(
+        bal,
+        Assert(bal.hasValue()),
+        X_ALGO_TOTAL_SUPPLY - bal.value()
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_shard(shard_index: Expr):
+    return Seq(
+        Assert(shard_index < App.globalGet(num_shards_key)),
+        Btoi(BoxExtract(ShardsBox.NAME, shard_index * ShardsBox.APP_ID_SIZE, ShardsBox.APP_ID_SIZE))
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_shard_global(shard: Expr, key: Expr):
+    value = App.globalGetEx(shard, key)
+    # keys which are not set are read as zero
+    return Seq(value, value.value())
+
+
+@Subroutine(TealType.bytes)
+def get_shard_address(shard: Expr):
+    shard_address = AppParam.address(shard)
+    return Seq(shard_address, shard_address.value())
+
+
+@Subroutine(TealType.uint64)
+def get_shard_algo_balance(shard: Expr):
+    # as of the last sync of the shard, which mint and burn make of every shard first
+    return (
+        get_shard_global(shard, ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE)
+        - get_shard_global(shard, ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES)
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_shard_x_algo_circulating_supply(shard: Expr):
+    bal = AssetHolding.balance(
+        get_shard_address(shard),
+        get_shard_global(shard, ConsensusV3GlobalState.X_ALGO_ID)
+    )
+    return Seq(
+        bal,
+        Assert(bal.hasValue()),
+        X_ALGO_TOTAL_SUPPLY - bal.value()
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_shard_capacity(shard: Expr):
+    max_balance = ScratchVar(TealType.uint64)
+    balance = ScratchVar(TealType.uint64)
+
+    return Seq(
+        max_balance.store(
+            get_shard_global(shard, ConsensusV3GlobalState.NUM_PROPOSERS)
+            * get_shard_global(shard, ConsensusV3GlobalState.MAX_PROPOSER_BALANCE)
+        ),
+        # pending stake is held by the proposers but not yet counted as active
+        balance.store(
+            get_shard_global(shard, ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE)
+            + get_shard_global(shard, ConsensusV3GlobalState.TOTAL_PENDING_STAKE)
+        ),
+        If(max_balance.load() > balance.load(), max_balance.load() - balance.load(), Int(0))
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_router_x_algo_balance(shard: Expr):
+    # xALGO of the shard held by the router, which backs the shared xALGO
+    bal = AssetHolding.balance(
+        Global.current_application_address(),
+        get_shard_global(shard, ConsensusV3GlobalState.X_ALGO_ID)
+    )
+    return Seq(
+        bal,
+        Assert(bal.hasValue()),
+        bal.value()
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_x_algo_value(x_algo_amount: Expr, algo_balance: Expr, x_algo_circulating_supply: Expr):
+    # same as the shard mints at when it has no xALGO in circulation
+    return If(
+        x_algo_circulating_supply,
+        mul_scale(x_algo_amount, algo_balance, x_algo_circulating_supply),
+        x_algo_amount
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_router_x_algo_value(shard: Expr):
+    return get_x_algo_value(
+        get_router_x_algo_balance(shard),
+        get_shard_algo_balance(shard),
+        get_shard_x_algo_circulating_supply(shard)
+    )
+
+
+@Subroutine(TealType.none)
+def sync_shards():
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # so the shard xALGO held is valued including the rewards received by each shard since its last sync
+        num_shards.store(App.globalGet(num_shards_key)),
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            # previous shard may have used the pooled budget
+            ensure_opcode_budget(ShardRouterOpcodeBudget.SYNC),
+            shard.store(get_shard(i.load())),
+            # shard without proposers has no rewards to sync
+            If(get_shard_global(shard.load(), ConsensusV3GlobalState.NUM_PROPOSERS), Seq(
+                InnerTxnBuilder.Begin(),
+                InnerTxnBuilder.MethodCall(
+                    app_id=shard.load(),
+                    method_signature="get_xalgo_rate()(uint64,uint64,byte[])",
+                    args=[],
+                    extra_fields={TxnField.fee: Int(0)}
+                ),
+                InnerTxnBuilder.Submit(),
+            )),
+        ),
+    )
+
+
+@Subroutine(TealType.uint64)
+def get_algo_balance():
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    algo_balance = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # value of the shard xALGO held, so rate is weighted by the share of each shard backing the shared xALGO
+        num_shards.store(App.globalGet(num_shards_key)),
+        algo_balance.store(Int(0)),
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            shard.store(get_shard(i.load())),
+            algo_balance.store(algo_balance.load() + get_router_x_algo_value(shard.load())),
+        ),
+        algo_balance.load(),
+    )
+
+
+@Subroutine(TealType.uint64)
+def select_mint_shard(amount: Expr):
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    capacity = ScratchVar(TealType.uint64)
+    best_shard = ScratchVar(TealType.uint64)
+    best_capacity = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # least loaded shard is the one with the most capacity left which allows immediate mints
+        num_shards.store(App.globalGet(num_shards_key)),
+        best_shard.store(Int(0)),
+        best_capacity.store(Int(0)),
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            shard.store(get_shard(i.load())),
+            capacity.store(get_shard_capacity(shard.load())),
+            If(
+                And(
+                    get_shard_global(shard.load(), ConsensusV3GlobalState.CAN_IMMEDIATE_MINT),
+                    capacity.load() > best_capacity.load()
+                ),
+                Seq(best_shard.store(shard.load()), best_capacity.store(capacity.load()))
+            ),
+        ),
+        # check shard found which can take amount
+        Assert(best_shard.load()),
+        Assert(best_capacity.load() >= amount),
+        best_shard.load(),
+    )
+
+
+@Subroutine(TealType.uint64)
+def select_burn_shard(amount: Expr):
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    algo_balance = ScratchVar(TealType.uint64)
+    best_shard = ScratchVar(TealType.uint64)
+    best_algo_balance = ScratchVar(TealType.uint64)
+
+    return Seq(
+        # best funded shard of those whose xALGO the router holds enough of to redeem amount in ALGO
+        num_shards.store(App.globalGet(num_shards_key)),
+        best_shard.store(Int(0)),
+        best_algo_balance.store(Int(0)),
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            shard.store(get_shard(i.load())),
+            algo_balance.store(get_shard_algo_balance(shard.load())),
+            If(
+                And(
+                    algo_balance.load() > best_algo_balance.load(),
+                    get_router_x_algo_value(shard.load()) >= amount,
+                ),
+                Seq(best_shard.store(shard.load()), best_algo_balance.store(algo_balance.load()))
+            ),
+        ),
+        # check shard found which can serve amount
+        Assert(best_shard.load()),
+        best_shard.load(),
+    )
+
+
+router = Router(
+    name="ShardRouter",
+    bare_calls=BareCallActions()
+)
+
+
+@router.method(no_op=CallConfig.CREATE)
+def create(admin: abi.Address) -> Expr:
+    return Seq(
+        App.globalPut(admin_key, admin.get()),
+        App.globalPut(num_shards_key, Int(0)),
+        App.globalPut(x_algo_id_key, Int(0)),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def initialise() -> Expr:
+    return Seq(
+        rekey_and_close_to_check(),
+        # verify caller is admin
+        check_admin_call(),
+        # check not already initialised
+        Assert(Not(App.globalGet(x_algo_id_key))),
+        # create shared xALGO, held by the router until minted (min balance must be funded beforehand)
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.SetFields({
+            TxnField.type_enum: TxnType.AssetConfig,
+            TxnField.config_asset_name: Bytes("Sharded xAlgo"),
+            TxnField.config_asset_unit_name: Bytes("xALGO"),
+            TxnField.config_asset_total: X_ALGO_TOTAL_SUPPLY,
+            TxnField.config_asset_decimals: Int(6),
+            TxnField.config_asset_reserve: Global.current_application_address(),
+            TxnField.fee: Int(0),
+        }),
+        InnerTxnBuilder.Submit(),
+        App.globalPut(x_algo_id_key, InnerTxn.created_asset_id()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def update_admin(new_admin: abi.Address) -> Expr:
+    return Seq(
+        rekey_and_close_to_check(),
+        # verify caller is admin
+        check_admin_call(),
+        # update admin
+        App.globalPut(admin_key, new_admin.get()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def add_shard(shard: abi.Application) -> Expr:
+    initialised = App.globalGetEx(shard.application_id(), ConsensusV3GlobalState.INITIALISED)
+
+    shard_id = ScratchVar(TealType.uint64)
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # verify caller is admin
+        check_admin_call(),
+        # check shard is an initialised consensus app
+        shard_id.store(shard.application_id()),
+        initialised,
+        Assert(initialised.value()),
+        # check max num shards not reached
+        num_shards.store(App.globalGet(num_shards_key)),
+        Assert(num_shards.load() < ShardsBox.MAX_NUM_SHARDS),
+        # check shard not already added
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            Assert(get_shard(i.load()) != shard_id.load())
+        ),
+        # create box when adding first shard (min balance must be funded beforehand)
+        If(Not(num_shards.load()), Assert(App.box_create(ShardsBox.NAME, ShardsBox.SIZE))),
+        # add shard
+        App.box_replace(ShardsBox.NAME, num_shards.load() * ShardsBox.APP_ID_SIZE, Itob(shard_id.load())),
+        App.globalPut(num_shards_key, num_shards.load() + Int(1)),
+        # opt into shard xALGO to hold what is minted through the router (min balance must be funded beforehand)
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(
+            Global.current_application_address(),
+            Global.current_application_address(),
+            Int(0),
+            get_shard_global(shard_id.load(), ConsensusV3GlobalState.X_ALGO_ID)
+        ),
+        InnerTxnBuilder.Submit(),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def mint(send_algo: abi.PaymentTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+    algo_sent = send_algo.get().amount()
+    algo_balance = ScratchVar(TealType.uint64)
+    x_algo_circulating_supply = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    shard_algo_balance = ScratchVar(TealType.uint64)
+    shard_x_algo_circulating_supply = ScratchVar(TealType.uint64)
+    shard_x_algo_received = ScratchVar(TealType.uint64)
+    algo_received = ScratchVar(TealType.uint64)
+    mint_amount = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(x_algo_id_key)),
+        # check address passed is 32 bytes
+        address_length_check(receiver),
+        # check algo sent
+        check_algo_sent(send_algo),
+        # sync every shard before pricing so the rewards of one cannot be captured by minting before its sync
+        sync_shards(),
+        ensure_opcode_budget(get_shards_budget()),
+        # value shared xALGO before receiving the shard xALGO
+        algo_balance.store(get_algo_balance()),
+        x_algo_circulating_supply.store(get_x_algo_circulating_supply()),
+        # mint in least loaded shard with the router as receiver, slippage is checked on the shared xALGO instead
+        shard.store(select_mint_shard(algo_sent)),
+        shard_algo_balance.store(get_shard_algo_balance(shard.load())),
+        shard_x_algo_circulating_supply.store(get_shard_x_algo_circulating_supply(shard.load())),
+        shard_x_algo_received.store(get_router_x_algo_balance(shard.load())),
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.MethodCall(
+            app_id=shard.load(),
+            method_signature="immediate_mint(pay,address,uint64)void",
+            args=[
+                {
+                    TxnField.type_enum: TxnType.Payment,
+                    TxnField.receiver: get_shard_address(shard.load()),
+                    TxnField.amount: algo_sent,
+                    TxnField.fee: Int(0),
+                },
+                Global.current_application_address(),
+                Itob(Int(0)),
+            ],
+            extra_fields={TxnField.fee: Int(0)}
+        ),
+        InnerTxnBuilder.Submit(),
+        ensure_opcode_budget(ShardRouterOpcodeBudget.BASE),
+        shard_x_algo_received.store(get_router_x_algo_balance(shard.load()) - shard_x_algo_received.load()),
+        # value shard xALGO received at the shard's rate before the mint, as the held shard xALGO was valued
+        algo_received.store(get_x_algo_value(
+            shard_x_algo_received.load(),
+            shard_algo_balance.load(),
+            shard_x_algo_circulating_supply.load()
+        )),
+        # calculate mint amount
+        mint_amount.store(
+            If(
+                x_algo_circulating_supply.load(),
+                mul_scale(algo_received.load(), x_algo_circulating_supply.load(), algo_balance.load()),
+                algo_received.load()
+            )
+        ),
+        # check mint amount and send shared xALGO to user
+        Assert(mint_amount.load()),
+        Assert(mint_amount.load() >= min_received.get()),
+        InnerTxnBuilder.Begin(),
+        get_transfer_inner_txn(
+            Global.current_application_address(),
+            receiver.get(),
+            mint_amount.load(),
+            App.globalGet(x_algo_id_key)
+        ),
+        InnerTxnBuilder.Submit(),
+        # log mint
+        Log(Concat(
+            MethodSignature("Mint(address,address,uint64,uint64,uint64)"),
+            Txn.sender(),
+            receiver.get(),
+            Itob(shard.load()),
+            Itob(algo_sent),
+            Itob(mint_amount.load()),
+        )),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def burn(send_xalgo: abi.AssetTransferTransaction, receiver: abi.Address, min_received: abi.Uint64) -> Expr:
+    burn_amount = send_xalgo.get().asset_amount()
+    algo_to_redeem = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    shard_burn_amount = ScratchVar(TealType.uint64)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(x_algo_id_key)),
+        # check address passed is 32 bytes
+        address_length_check(receiver),
+        # check shared xALGO sent
+        check_x_algo_sent(send_xalgo),
+        # sync every shard before pricing so the rewards of one cannot be captured by burning after its sync
+        sync_shards(),
+        ensure_opcode_budget(get_shards_budget()),
+        # calculate value of shared xALGO sent, which is no longer circulating
+        algo_to_redeem.store(
+            mul_scale(burn_amount, get_algo_balance(), get_x_algo_circulating_supply() + burn_amount)
+        ),
+        Assert(algo_to_redeem.load()),
+        # redeem shard xALGO worth the value from best funded shard, rounding down
+        shard.store(select_burn_shard(algo_to_redeem.load())),
+        shard_burn_amount.store(mul_scale(
+            algo_to_redeem.load(),
+            get_shard_x_algo_circulating_supply(shard.load()),
+            get_shard_algo_balance(shard.load())
+        )),
+        Assert(shard_burn_amount.load()),
+        # shard sends the ALGO straight to the receiver and checks the min received
+        InnerTxnBuilder.Begin(),
+        InnerTxnBuilder.MethodCall(
+            app_id=shard.load(),
+            method_signature="burn(axfer,address,uint64)void",
+            args=[
+                {
+                    TxnField.type_enum: TxnType.AssetTransfer,
+                    TxnField.xfer_asset: get_shard_global(shard.load(), ConsensusV3GlobalState.X_ALGO_ID),
+                    TxnField.asset_receiver: get_shard_address(shard.load()),
+                    TxnField.asset_amount: shard_burn_amount.load(),
+                    TxnField.fee: Int(0),
+                },
+                receiver,
+                min_received,
+            ],
+            extra_fields={TxnField.fee: Int(0)}
+        ),
+        InnerTxnBuilder.Submit(),
+        ensure_opcode_budget(ShardRouterOpcodeBudget.BASE),
+        # log burn
+        Log(Concat(
+            MethodSignature("Burn(address,uint64,uint64,uint64)"),
+            Txn.sender(),
+            Itob(shard.load()),
+            Itob(burn_amount),
+            Itob(shard_burn_amount.load()),
+        )),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_shards_state(*, output: abi.DynamicArray[ShardState]) -> Expr:
+    num_shards = ScratchVar(TealType.uint64)
+    i = ScratchVar(TealType.uint64)
+    shard = ScratchVar(TealType.uint64)
+    states = ScratchVar(TealType.bytes)
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # concatenate encoded states prefixed by the array length
+        num_shards.store(App.globalGet(num_shards_key)),
+        states.store(Suffix(Itob(num_shards.load()), Int(6))),
+        For(i.store(Int(0)), i.load() < num_shards.load(), i.store(i.load() + Int(1))).Do(
+            shard.store(get_shard(i.load())),
+            states.store(Concat(
+                states.load(),
+                Itob(shard.load()),
+                Itob(get_shard_global(shard.load(), ConsensusV3GlobalState.X_ALGO_ID)),
+                Itob(get_shard_algo_balance(shard.load())),
+                Itob(get_shard_x_algo_circulating_supply(shard.load())),
+                Itob(get_shard_capacity(shard.load())),
+                Itob(get_router_x_algo_balance(shard.load())),
+            )),
+        ),
+        # return
+        output.decode(states.load()),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_combined_rate(*, output: CombinedRate) -> Expr:
+    algo_balance = abi.Uint64()
+    x_algo_circulating_supply = abi.Uint64()
+
+    return Seq(
+        rekey_and_close_to_check(),
+        # ensure initialised
+        Assert(App.globalGet(x_algo_id_key)),
+        # shared xALGO is backed by the shard xALGO held by the router
+        algo_balance.set(get_algo_balance()),
+        x_algo_circulating_supply.set(get_x_algo_circulating_supply()),
+        # return
+        output.set(algo_balance, x_algo_circulating_supply),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_mint_shard(amount: abi.Uint64, *, output: abi.Uint64) -> Expr:
+    return Seq(
+        rekey_and_close_to_check(),
+        output.set(select_mint_shard(amount.get())),
+    )
+
+
+@router.method(no_op=CallConfig.CALL)
+def get_burn_shard(amount: abi.Uint64, *, output: abi.Uint64) -> Expr:
+    return Seq(
+        rekey_and_close_to_check(),
+        output.set(select_burn_shard(amount.get())),
+    )
+
+
+# used to append shard apps, accounts and assets to foreign arrays
+@router.method(no_op=CallConfig.CALL)
+def dummy() -> Expr:
+    return Seq()
+
+
+pragma(compiler_version="0.26.1")
+approval_program, clear_program, contract = router.compile_program(
+    version=10, optimize=OptimizeOptions(scratch_slots=True)
+)
+
+if __name__ == "__main__":
+    print(approval_program)
@@ -0,0 +1,36 @@
+from enum import EnumMeta
+from pyteal import abi, Bytes, Int
+
+
+class ShardRouterGlobalState(EnumMeta):
+    ADMIN = Bytes("admin")
+    NUM_SHARDS = Bytes("num_shards")
+    X_ALGO_ID = Bytes("x_algo_id")
+
+
+class ShardsBox(EnumMeta):
+    NAME = Bytes("sh")
+    APP_ID_SIZE = Int(8)
+    MAX_NUM_SHARDS = Int(16)
+    SIZE = Int(128)
+
+
+class ShardRouterOpcodeBudget(EnumMeta):
+    # ensured once the shards are synced, upper bounds of the opcodes executed
+    BASE = Int(400)  # ensured again after the call to the shard, which uses the pooled budget
+    SHARD = Int(300)  # per shard to value the shard xALGO held and select the shard
+    SYNC = Int(60)  # before the call syncing each shard, as the previous one uses the pooled budget
+
+
+class ShardState(abi.NamedTuple):
+    app_id: abi.Field[abi.Uint64]
+    x_algo_id: abi.Field[abi.Uint64]
+    algo_balance: abi.Field[abi.Uint64]
+    x_algo_circulating_supply: abi.Field[abi.Uint64]
+    capacity: abi.Field[abi.Uint64]
+    router_x_algo_balance: abi.Field[abi.Uint64]
+
+
+class CombinedRate(abi.NamedTuple):
+    algo_balance: abi.Field[abi.Uint64]
+    x_algo_circulating_supply: abi.Field[abi.Uint64]
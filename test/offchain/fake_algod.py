@@ -0,0 +1,184 @@
+"""
+In-memory stand-in for the algod REST endpoints used by the off-chain tooling
+"""
+import json
+import threading
+from base64 import b64decode, b64encode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import msgpack
+
+
+class FakeAlgod:
+    def __init__(self, page_size: int = 100):
+        self.round = 1
+        self.page_size = page_size
+        self.accounts: dict[str, dict] = {}
+        self.asset_holdings: dict[tuple[str, int], int] = {}
+        self.global_states: dict[int, dict[str, int | bytes]] = {}
+        # other app params e.g. programs and schemas
+        self.app_params: dict[int, dict] = {}
+        self.boxes: dict[int, dict[bytes, bytes]] = {}
+        self.blocks: dict[int, dict] = {}
+        # state deltas of each round in msgpack
+        self.deltas: dict[int, bytes] = {}
+        self.sent: list[bytes] = []
+        self.simulated: list[bytes] = []
+        # message to reject sent transactions with
+        self.reject_message: str | None = None
+        self.simulate_result = {"app-budget-added": 0, "app-budget-consumed": 0}
+        self.requests: list[str] = []
+        self.num_connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAlgod":
+        algod = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with algod._lock:
+                    algod.num_connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with algod._lock:
+                    algod.requests.append(url.path)
+                    status, body = algod.handle_get(url.path, {k: v[0] for k, v in parse_qs(url.query).items()})
+                is_msgpack = isinstance(body, bytes)
+                data = body if is_msgpack else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/msgpack" if is_msgpack else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status = 200
+                with algod._lock:
+                    algod.requests.append(url.path)
+                    if url.path == "/v2/transactions/simulate":
+                        algod.simulated.append(body)
+                        response = {"txn-groups": [algod.simulate_result]}
+                    elif algod.reject_message is not None:
+                        status, response = 400, {"message": algod.reject_message}
+                    else:
+                        algod.sent.append(body)
+                        response = {"txId": "FAKE"}
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_block(self, txns: list[dict], **header):
+        """
+        Append a block with the given transactions and header fields in algod json format and advance the round
+        """
+        self.round += 1
+        self.blocks[self.round] = {"rnd": self.round, "txns": txns, **header}
+
+    def count(self, path: str) -> int:
+        return self.requests.count(path)
+
+    def handle_get(self, path: str, params: dict) -> tuple[int, dict | bytes]:
+        parts = path.strip("/").split("/")[1:]
+        if parts == ["status"] or parts[:2] == ["status", "wait-for-block-after"]:
+            return 200, {"last-round": self.round}
+        if parts == ["transactions", "params"]:
+            return 200, {
+                "consensus-version": "future",
+                "fee": 0,
+                "genesis-hash": "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=",
+                "genesis-id": "testnet-v1.0",
+                "last-round": self.round,
+                "min-fee": 1000,
+            }
+        if parts[:2] == ["transactions", "pending"]:
+            # everything sent is confirmed in the current round
+            return 200, {"confirmed-round": self.round, "pool-error": ""}
+        if parts[0] == "blocks":
+            rnd = int(parts[1])
+            if rnd not in self.blocks:
+                return 404, {"message": "block not found"}
+            if params.get("format") == "msgpack":
+                return 200, msgpack.packb({"block": self.blocks[rnd]})
+            return 200, {"block": self.blocks[rnd]}
+        if parts[0] == "deltas":
+            rnd = int(parts[1])
+            if rnd not in self.deltas:
+                return 404, {"message": "state delta not found"}
+            return 200, self.deltas[rnd]
+        if parts[0] == "accounts" and len(parts) == 4 and parts[2] == "assets":
+            key = (parts[1], int(parts[3]))
+            if key not in self.asset_holdings:
+                return 404, {"message": "account asset info not found"}
+            return 200, {"round": self.round, "asset-holding": {"amount": self.asset_holdings[key]}}
+        if parts[0] == "accounts" and len(parts) == 2:
+            if parts[1] not in self.accounts:
+                return 404, {"message": "account not found"}
+            return 200, {"address": parts[1], "round": self.round, **self.accounts[parts[1]]}
+        if parts[0] == "applications":
+            app_id = int(parts[1])
+            if app_id not in self.global_states:
+                return 404, {"message": "application does not exist"}
+            if len(parts) == 2:
+                app_params = {**self.app_params.get(app_id, {}), "global-state": self._encode_global_state(app_id)}
+                return 200, {"id": app_id, "params": app_params}
+            boxes = self.boxes.get(app_id, {})
+            if parts[2] == "box":
+                name = b64decode(params["name"].removeprefix("b64:"))
+                if name not in boxes:
+                    return 404, {"message": "box not found"}
+                value = b64encode(boxes[name]).decode()
+                return 200, {"name": b64encode(name).decode(), "round": self.round, "value": value}
+            if parts[2] == "boxes":
+                return 200, self._list_boxes(boxes, params)
+        return 404, {"message": "unknown path"}
+
+    def _encode_global_state(self, app_id: int) -> list[dict]:
+        state = []
+        for key, value in self.global_states[app_id].items():
+            if isinstance(value, bytes):
+                encoded = {"type": 1, "bytes": b64encode(value).decode()}
+            else:
+                encoded = {"type": 2, "uint": value}
+            state.append({"key": b64encode(key.encode()).decode(), "value": encoded})
+        return state
+
+    def _list_boxes(self, boxes: dict[bytes, bytes], params: dict) -> dict:
+        prefix = b64decode(params.get("prefix", "b64:").removeprefix("b64:"))
+        names = sorted(name for name in boxes if name.startswith(prefix))
+        if "next" in params:
+            after = b64decode(params["next"].removeprefix("b64:"))
+            names = [name for name in names if name > after]
+        page_size = min(int(params.get("max", self.page_size)), self.page_size)
+        page = names[:page_size]
+        response = {"round": self.round, "boxes": [{"name": b64encode(name).decode()} for name in page]}
+        if len(names) > page_size:
+            response["next-token"] = "b64:" + b64encode(page[-1]).decode()
+        return response
@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMintBox,
+    ProposersBox,
+    get_delay_mint_box_name,
+    get_delay_mint_nonce_box_name,
+)
+from offchain.state_reader import ConsensusStateReader
+
+APP_ID = 1000
+
+
+def delay_mint_value(receiver: str, stake: int, rnd: int) -> bytes:
+    return decode_address(receiver) + stake.to_bytes(8, "big") + rnd.to_bytes(8, "big")
+
+
+class AsyncAlgodTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod(page_size=4).start()
+        self.proposers = [generate_account()[1] for _ in range(3)]
+        self.minter = generate_account()[1]
+        self.algod.global_states[APP_ID] = {
+            ConsensusV3GlobalState.NUM_PROPOSERS: len(self.proposers),
+            ConsensusV3GlobalState.ADMIN: decode_address(self.minter),
+        }
+        self.algod.boxes[APP_ID] = {
+            ProposersBox.NAME: b"".join(decode_address(p) for p in self.proposers).ljust(960, b"\x00"),
+        }
+        for i, proposer in enumerate(self.proposers):
+            self.algod.accounts[proposer] = {"amount": 1_000_000 * (i + 1), "min-balance": 100_000, "status": "Online"}
+        for nonce in range(10):
+            self.add_delay_mint(nonce)
+
+    def tearDown(self):
+        self.algod.stop()
+
+    def add_delay_mint(self, nonce: int):
+        name = get_delay_mint_box_name(self.minter, nonce.to_bytes(2, "big"))
+        self.algod.boxes[APP_ID][name] = delay_mint_value(self.minter, 1000 + nonce, 500 + nonce)
+        return name
+
+    async def test_reuses_pooled_connections(self):
+        async with AsyncAlgodClient("", self.algod.address, max_connections=2) as client:
+            for _ in range(5):
+                await asyncio.gather(*(client.status() for _ in range(10)))
+            self.assertLessEqual(client.num_connections_opened, 2)
+        self.assertEqual(self.algod.num_connections, client.num_connections_opened)
+        self.assertEqual(self.algod.count("/v2/status"), 50)
+
+    async def test_raises_http_error(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            with self.assertRaises(AlgodHTTPError) as context:
+                await client.application_info(APP_ID + 1)
+            self.assertEqual(context.exception.status, 404)
+            # connection is still usable after an error response
+            self.assertEqual((await client.status())["last-round"], 1)
+            self.assertEqual(client.num_connections_opened, 1)
+
+    async def test_paginates_boxes(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            names = await client.application_boxes(APP_ID, DelayMintBox.NAME_PREFIX)
+        self.assertEqual(len(names), 10)
+        self.assertTrue(all(name.startswith(DelayMintBox.NAME_PREFIX) for name in names))
+        self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}/boxes"), 3)
+
+    async def test_fetch_state(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            reader = ConsensusStateReader(client, APP_ID)
+            snapshot = await reader.fetch_state()
+            self.assertEqual(snapshot.round, 1)
+            self.assertEqual(snapshot.global_state[ConsensusV3GlobalState.NUM_PROPOSERS], 3)
+            self.assertEqual(snapshot.global_state[ConsensusV3GlobalState.ADMIN], decode_address(self.minter))
+            self.assertEqual([p.address for p in snapshot.proposers], self.proposers)
+            self.assertEqual([p.balance for p in snapshot.proposers], [1_000_000, 2_000_000, 3_000_000])
+            self.assertEqual(len(snapshot.delay_mints), 10)
+            delay_mint = snapshot.delay_mints[get_delay_mint_box_name(self.minter, (3).to_bytes(2, "big"))]
+            self.assertEqual((delay_mint.receiver, delay_mint.stake, delay_mint.round), (self.minter, 1003, 503))
+
+            # same round so cached snapshot is returned
+            num_requests = len(self.algod.requests)
+            self.assertIs(await reader.fetch_state(), snapshot)
+            self.assertEqual(len(self.algod.requests), num_requests + 1)
+
+            # only new boxes are fetched and claimed boxes are dropped
+            self.algod.round += 1
+            claimed = get_delay_mint_box_name(self.minter, (0).to_bytes(2, "big"))
+            del self.algod.boxes[APP_ID][claimed]
+            added = self.add_delay_mint(10)
+            num_box_reads = self.algod.count(f"/v2/applications/{APP_ID}/box")
+            snapshot = await reader.fetch_state()
+            self.assertEqual(snapshot.round, 2)
+            self.assertNotIn(claimed, snapshot.delay_mints)
+            self.assertIn(added, snapshot.delay_mints)
+            self.assertEqual(len(snapshot.delay_mints), 10)
+            # proposers box and the one new delay mint box
+            self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}/box") - num_box_reads, 2)
+
+    async def test_fetch_next_delay_mint_nonce(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            reader = ConsensusStateReader(client, APP_ID)
+            # no nonce box so scanned from 0 past the unclaimed delay mints of nonces 0 to 9
+            self.assertEqual(await reader.fetch_next_delay_mint_nonce(self.minter), 10)
+            self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}/box"), 12)
+
+            nonce_box_name = get_delay_mint_nonce_box_name(self.minter)
+            self.algod.boxes[APP_ID][nonce_box_name] = (10).to_bytes(8, "big")
+            self.assertEqual(await reader.fetch_next_delay_mint_nonce(self.minter), 10)
+            # nonce box then the delay mint box of the next nonce
+            self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}/box"), 14)
+
+            # highest nonce used so wrapped around, and the delay mints of nonces 65535 and 0 to 9 are yet to be claimed
+            self.add_delay_mint(2**16 - 1)
+            self.algod.boxes[APP_ID][nonce_box_name] = (2**16 - 1).to_bytes(8, "big")
+            self.assertEqual(await reader.fetch_delay_mint_nonce_cursor(self.minter), 2**16 - 1)
+            self.assertEqual(await reader.fetch_next_delay_mint_nonce(self.minter), 10)
+            with self.assertRaisesRegex(ValueError, "Next 8 delay mint nonces"):
+                await reader.fetch_next_delay_mint_nonce(self.minter, max_scan=8)
@@ -0,0 +1,111 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import EmptySigner, TransactionWithSigner
+from algosdk.transaction import ApplicationCallTxn, OnComplete, PaymentTxn, SuggestedParams
+
+from offchain.benchmark import (
+    MINT_AMOUNT,
+    BenchmarkResult,
+    Measurement,
+    Scenario,
+    aggregate,
+    check_thresholds,
+    compare_to_baseline,
+    get_active_balances,
+    get_measurement,
+    make_snapshot,
+    record_thresholds,
+)
+from offchain.state import ConsensusV3GlobalState, DelayMintBox, get_delay_mint_nonce_box_name
+
+APP_ID = 1000
+
+
+def make_result(version: str, method: str = "immediate_mint", **kwargs) -> BenchmarkResult:
+    metrics = dict(opcode_cost=1000, num_inner_txns=2, num_app_calls=2, fees=4000, latency_p50=1.0, latency_max=1.5)
+    return BenchmarkResult(version, 5, 0.5, method, **{**metrics, **kwargs}, samples=3)
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_spreads_balances_around_average(self):
+        self.assertEqual(get_active_balances(1, 0.9, 100), [100])
+        self.assertEqual(get_active_balances(3, 0.0, 100), [100, 100, 100])
+        self.assertEqual(get_active_balances(3, 0.5, 100), [50, 100, 150])
+
+    def test_makes_synced_state_with_matured_delay_mints(self):
+        admin = generate_account()[1]
+        snapshot = make_snapshot(Scenario("v3", 5, 0.9), admin, b"", b"", 1000, num_delay_mints=3)
+        consensus_snapshot = snapshot.to_consensus_snapshot()
+        global_state = consensus_snapshot.global_state
+
+        active_balance = sum(p.balance - p.min_balance for p in consensus_snapshot.proposers)
+        pending_stake = global_state[ConsensusV3GlobalState.TOTAL_PENDING_STAKE]
+        self.assertEqual(pending_stake, 3 * MINT_AMOUNT)
+        last_active_balance = global_state[ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE]
+        self.assertEqual(active_balance - pending_stake, last_active_balance)
+        self.assertEqual(len(consensus_snapshot.delay_mints), 3)
+        self.assertEqual(snapshot.boxes[get_delay_mint_nonce_box_name(admin)], (3).to_bytes(8, "big"))
+        for delay_mint in consensus_snapshot.delay_mints.values():
+            self.assertEqual((delay_mint.minter, delay_mint.receiver), (admin, admin))
+            self.assertLessEqual(delay_mint.round + DelayMintBox.DELAY, 1000)
+
+        algo_balance = last_active_balance - global_state[ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES]
+        self.assertAlmostEqual(algo_balance / consensus_snapshot.x_algo_circulating_supply, 1.05)
+
+        baseline = make_snapshot(Scenario("v2", 5, 0.9), admin, b"", b"", 1000, num_delay_mints=3)
+        self.assertEqual(list(baseline.boxes), [b"pr"])
+        self.assertNotIn(ConsensusV3GlobalState.RATE_CHECKPOINT_INTERVAL, baseline.global_state)
+
+
+class ResultsTest(unittest.TestCase):
+    def test_measures_group(self):
+        sender = generate_account()[1]
+        params = SuggestedParams(1000, 1, 1000, "", flat_fee=True)
+        txns = [
+            TransactionWithSigner(PaymentTxn(sender, params, sender, 0), EmptySigner()),
+            TransactionWithSigner(ApplicationCallTxn(sender, params, APP_ID, OnComplete.NoOpOC), EmptySigner()),
+            TransactionWithSigner(ApplicationCallTxn(sender, params, APP_ID, OnComplete.NoOpOC), EmptySigner()),
+        ]
+        simulate_result = {
+            "app-budget-consumed": 1200,
+            "txn-results": [
+                {"txn-result": {}},
+                {"txn-result": {"inner-txns": [{"inner-txns": [{}]}, {}]}},
+                {"txn-result": {}},
+            ],
+        }
+        measurement = get_measurement(txns, APP_ID, simulate_result, 2.5)
+        self.assertEqual(measurement, Measurement(1200, 3, 2, 3000, 2.5))
+
+        result = aggregate(Scenario("v3", 5, 0.5), "burn", [measurement, Measurement(1000, 4, 2, 4000, 1.5)])
+        self.assertEqual((result.opcode_cost, result.num_inner_txns, result.fees), (1200, 4, 4000))
+        self.assertEqual((result.latency_p50, result.latency_max, result.samples), (2.0, 2.5, 2))
+
+    def test_checks_thresholds(self):
+        reference = [make_result("v3"), make_result("v3", "burn")]
+        thresholds = record_thresholds(reference, 0.1)
+        self.assertEqual(thresholds["v3/immediate_mint/5/0.5"]["opcode_cost"], 1100)
+        self.assertEqual(check_thresholds(reference, thresholds), [])
+
+        thresholds["v3/burn/5/0.5"]["latency_p50"] = 0.5
+        regressed = [make_result("v3", opcode_cost=1101), make_result("v3", "burn"), make_result("v3", "claim_fee")]
+        self.assertEqual(check_thresholds(regressed, thresholds), [
+            "v3/immediate_mint/5/0.5 opcode_cost of 1101 exceeds threshold of 1100",
+            "v3/burn/5/0.5 latency_p50 of 1.0 exceeds threshold of 0.5",
+        ])
+
+    def test_compares_to_baseline(self):
+        results = [make_result("v2", opcode_cost=200, num_inner_txns=1), make_result("v3"), make_result("v3", "burn")]
+        self.assertEqual(compare_to_baseline(results), [{
+            "key": "v3/immediate_mint/5/0.5",
+            "baseline_key": "v2/immediate_mint/5/0.5",
+            "opcode_cost_ratio": 5.0,
+            "num_inner_txns_ratio": 2.0,
+            "fees_ratio": 1.0,
+            "latency_p50_ratio": 1.0,
+        }])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from base64 import b64encode
+
+from fake_algod import FakeAlgod
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.budget_collector import (
+    BUDGET_SELECTOR,
+    LOG_BUDGET_COST,
+    LOG_BUDGET_OVERHEAD,
+    BudgetCollector,
+    collect_rounds,
+    get_phase_costs,
+)
+from offchain.events import DELAYED_MINT_SELECTOR
+from offchain.state import BudgetPhase
+
+APP_ID = 1000
+
+
+def budget_log(phase: int, is_exit: bool, budget: int) -> bytes:
+    return BUDGET_SELECTOR + bytes([phase, is_exit]) + budget.to_bytes(8, "big")
+
+
+def phase_logs(phase: int, entry_budget: int, exit_budget: int) -> tuple[bytes, bytes]:
+    return budget_log(phase, False, entry_budget), budget_log(phase, True, exit_budget)
+
+
+def selector(method_name: str) -> str:
+    return b64encode(get_consensus_v3_contract().get_method_by_name(method_name).get_selector()).decode()
+
+
+def app_call(method_name: str, *logs: bytes, app_id: int = APP_ID) -> dict:
+    return {
+        "txn": {"type": "appl", "apid": app_id, "apaa": [selector(method_name)]},
+        "dt": {"lg": [b64encode(log).decode() for log in logs]},
+    }
+
+
+class GetPhaseCostsTest(unittest.TestCase):
+    def test_excludes_instrumentation_overhead(self):
+        logs = [budget_log(BudgetPhase.SYNC, False, 2000), budget_log(BudgetPhase.SYNC, True, 1800)]
+        self.assertEqual(get_phase_costs(logs), [(BudgetPhase.SYNC, 200 - LOG_BUDGET_OVERHEAD)])
+
+    def test_excludes_nested_phases_instrumentation(self):
+        logs = [
+            budget_log(BudgetPhase.RECEIVE_ALLOCATION, False, 2000),
+            budget_log(BudgetPhase.INNER_SUBMIT, False, 1900),
+            budget_log(BudgetPhase.INNER_SUBMIT, True, 1850),
+            DELAYED_MINT_SELECTOR + bytes(108),
+            budget_log(BudgetPhase.INNER_SUBMIT, False, 1800),
+            budget_log(BudgetPhase.INNER_SUBMIT, True, 1750),
+            budget_log(BudgetPhase.RECEIVE_ALLOCATION, True, 1700),
+        ]
+        self.assertEqual(get_phase_costs(logs), [
+            (BudgetPhase.INNER_SUBMIT, 50 - LOG_BUDGET_OVERHEAD),
+            (BudgetPhase.INNER_SUBMIT, 50 - LOG_BUDGET_OVERHEAD),
+            (BudgetPhase.RECEIVE_ALLOCATION, 300 - LOG_BUDGET_OVERHEAD - 4 * LOG_BUDGET_COST),
+        ])
+
+    def test_fails_on_unmatched_logs(self):
+        with self.assertRaises(ValueError):
+            get_phase_costs([budget_log(BudgetPhase.SYNC, False, 2000)])
+        with self.assertRaises(ValueError):
+            get_phase_costs([
+                budget_log(BudgetPhase.SYNC, False, 2000),
+                budget_log(BudgetPhase.MINT_PRICING, True, 1900),
+            ])
+
+
+class BudgetCollectorTest(unittest.TestCase):
+    def test_aggregates_per_method_and_phase(self):
+        collector = BudgetCollector(APP_ID, bucket_width=100)
+        collector.add_block({"rnd": 1, "txns": [
+            {"txn": {"type": "pay"}},
+            app_call("immediate_mint", *phase_logs(BudgetPhase.SYNC, 1000, 850)),
+            app_call("immediate_mint", *phase_logs(BudgetPhase.SYNC, 1000, 700)),
+            app_call("burn", *phase_logs(BudgetPhase.SYNC, 1000, 850)),
+            # other apps are ignored
+            app_call("burn", *phase_logs(BudgetPhase.SYNC, 1000, 0), app_id=1),
+        ]})
+        collector.add_simulate_result({"txn-results": [{"txn-result": {
+            "txn": {"txn": app_call("burn")["txn"]},
+            "logs": app_call("burn", *phase_logs(BudgetPhase.MINT_PRICING, 500, 400))["dt"]["lg"],
+        }}]})
+
+        self.assertEqual(collector.histograms(), {
+            "burn": {"sync": {100: 1}, "mint_pricing": {0: 1}},
+            "immediate_mint": {"sync": {100: 1, 200: 1}},
+        })
+        summary = collector.summarise()
+        self.assertEqual(summary["immediate_mint"]["sync"]["count"], 2)
+        self.assertEqual(summary["immediate_mint"]["sync"]["max"], 300 - LOG_BUDGET_OVERHEAD)
+
+
+class CollectRoundsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+
+    def tearDown(self):
+        self.algod.stop()
+
+    async def test_collects_blocks(self):
+        for _ in range(3):
+            self.algod.add_block([app_call("claim_delayed_mint", *phase_logs(BudgetPhase.SYNC, 700, 600))])
+        collector = BudgetCollector(APP_ID)
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            await collect_rounds(client, collector, list(self.algod.blocks))
+        self.assertEqual(collector.summarise()["claim_delayed_mint"]["sync"]["count"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
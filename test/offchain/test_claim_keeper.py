@@ -0,0 +1,227 @@
+import unittest
+from base64 import b64encode
+
+import msgpack
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import AccountTransactionSigner
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.claim_keeper import ClaimKeeper, MaturityIndex, plan_claim_groups
+from offchain.events import CLAIM_DELAYED_MINT_SELECTOR, DELAYED_MINT_SELECTOR
+from offchain.group_builder import MAX_GROUP_SIZE, MAX_TXN_ACCOUNTS, MAX_TXN_REFERENCES
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMint,
+    DelayMintBox,
+    ProposersBox,
+    RateCheckpointsBox,
+    X_ALGO_TOTAL_SUPPLY,
+)
+
+APP_ID = 1000
+X_ALGO_ID = 2000
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def delay_mint(nonce: int, rnd: int, minter: str = None, receiver: str = None) -> DelayMint:
+    minter = minter or new_address()
+    return DelayMint(minter, nonce.to_bytes(2, "big"), receiver or minter, 1_000_000, rnd)
+
+
+def app_call(*logs: bytes) -> dict:
+    return {
+        "txn": {"type": "appl", "apid": APP_ID},
+        "dt": {"lg": [b64encode(log).decode() for log in logs]},
+    }
+
+
+def delayed_mint_log(dm: DelayMint) -> bytes:
+    return (
+        DELAYED_MINT_SELECTOR + dm.box_name + decode_address(dm.minter) + decode_address(dm.receiver)
+        + dm.stake.to_bytes(8, "big")
+    )
+
+
+def claim_delayed_mint_log(dm: DelayMint) -> bytes:
+    return (
+        CLAIM_DELAYED_MINT_SELECTOR + dm.box_name + decode_address(dm.minter) + decode_address(dm.receiver)
+        + dm.stake.to_bytes(8, "big") + dm.stake.to_bytes(8, "big")
+    )
+
+
+class MaturityIndexTest(unittest.TestCase):
+    def test_pops_matured_in_round_order(self):
+        index = MaturityIndex()
+        delay_mints = [delay_mint(0, 30), delay_mint(1, 10), delay_mint(2, 20)]
+        for dm in delay_mints:
+            index.add(dm)
+        self.assertEqual(index.next_round(), 10)
+        self.assertEqual(index.pop_matured(20), [delay_mints[1], delay_mints[2]])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.pop_matured(29), [])
+
+    def test_removal_and_box_name_reuse(self):
+        index = MaturityIndex()
+        dm = delay_mint(0, 10)
+        index.add(dm)
+        index.remove(dm.box_name)
+        self.assertNotIn(dm.box_name, index)
+        self.assertIsNone(index.next_round())
+        # same box name created again after claim
+        index.add(dm)
+        index.remove(dm.box_name)
+        reused = DelayMint(dm.minter, dm.nonce, dm.receiver, dm.stake, 40)
+        index.add(reused)
+        self.assertEqual(index.pop_matured(39), [])
+        self.assertEqual(index.pop_matured(40), [reused])
+
+
+class PlanClaimGroupsTest(unittest.TestCase):
+    def check_group(self, calls, proposers):
+        self.assertLessEqual(len(calls), MAX_GROUP_SIZE)
+        accounts, assets, boxes = set(), set(), set()
+        for call in calls:
+            refs = call.references
+            self.assertLessEqual(refs.num_references, MAX_TXN_REFERENCES)
+            self.assertLessEqual(len(refs.accounts), MAX_TXN_ACCOUNTS)
+            accounts.update(refs.accounts)
+            assets.update(refs.assets)
+            boxes.update(refs.boxes)
+        claims = [call.delay_mint for call in calls if call.delay_mint is not None]
+        self.assertTrue(set(proposers) <= accounts)
+        self.assertTrue({dm.receiver for dm in claims} <= accounts)
+        self.assertEqual(assets, {X_ALGO_ID})
+        self.assertEqual(boxes, {ProposersBox.NAME, RateCheckpointsBox.NAME} | {dm.box_name for dm in claims})
+
+    def test_fills_group_without_dummies(self):
+        proposers = [new_address() for _ in range(3)]
+        delay_mints = [delay_mint(i, 1) for i in range(20)]
+        groups = plan_claim_groups(delay_mints, proposers, X_ALGO_ID)
+        self.assertEqual([len(calls) for calls in groups], [16, 4])
+        self.assertTrue(all(call.delay_mint is not None for calls in groups for call in calls))
+        for calls in groups:
+            self.check_group(calls, proposers)
+
+    def test_adds_dummies_for_references(self):
+        proposers = [new_address() for _ in range(30)]
+        receiver = new_address()
+        delay_mints = [delay_mint(i, 1, receiver, receiver) for i in range(2)]
+        groups = plan_claim_groups(delay_mints, proposers, X_ALGO_ID)
+        self.assertEqual(len(groups), 1)
+        # 31 accounts need 8 calls with 4 accounts each
+        self.assertEqual(len(groups[0]), 8)
+        self.check_group(groups[0], proposers)
+
+        # budget ensured by each claim looping over the proposers is pooled rather than topped up
+        delay_mints = [delay_mint(i, 1, receiver, receiver) for i in range(5)]
+        [calls] = plan_claim_groups(delay_mints, proposers, X_ALGO_ID)
+        self.assertEqual(len(calls), 13)
+
+    def test_adds_dummies_for_budget(self):
+        proposers = [new_address() for _ in range(3)]
+        delay_mints = [delay_mint(i, 1) for i in range(20)]
+        groups = plan_claim_groups(delay_mints, proposers, X_ALGO_ID, claim_opcode_cost=1400)
+        self.assertEqual([sum(call.delay_mint is not None for call in calls) for calls in groups], [8, 8, 4])
+        self.assertEqual([len(calls) for calls in groups], [16, 16, 8])
+        for calls in groups:
+            self.check_group(calls, proposers)
+
+
+class ClaimKeeperTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.algod.round = 1000
+        self.proposers = [new_address() for _ in range(2)]
+        self.algod.global_states[APP_ID] = {
+            ConsensusV3GlobalState.NUM_PROPOSERS: len(self.proposers),
+            ConsensusV3GlobalState.X_ALGO_ID: X_ALGO_ID,
+        }
+        self.algod.boxes[APP_ID] = {
+            ProposersBox.NAME: b"".join(decode_address(p) for p in self.proposers).ljust(960, b"\x00"),
+        }
+        for proposer in self.proposers:
+            self.algod.accounts[proposer] = {"amount": 1_000_000, "min-balance": 100_000, "status": "Online"}
+        self.algod.asset_holdings[(get_application_address(APP_ID), X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY
+        # one matured and one pending delay mint already in boxes
+        self.existing = [delay_mint(0, 900), delay_mint(1, 1100)]
+        for dm in self.existing:
+            self.algod.boxes[APP_ID][dm.box_name] = (
+                decode_address(dm.receiver) + dm.stake.to_bytes(8, "big") + dm.round.to_bytes(8, "big")
+            )
+        private_key, self.sender = generate_account()
+        self.signer = AccountTransactionSigner(private_key)
+
+    def tearDown(self):
+        self.algod.stop()
+
+    def sent_groups(self) -> list[list[dict]]:
+        groups = []
+        for raw in self.algod.sent:
+            unpacker = msgpack.Unpacker(raw=False)
+            unpacker.feed(raw)
+            groups.append(list(unpacker))
+        return groups
+
+    async def test_dry_run(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            keeper = ClaimKeeper(client, APP_ID, self.sender, dry_run=True)
+            await keeper.bootstrap()
+            self.assertEqual(len(keeper.index), 2)
+            groups = await keeper.claim_matured()
+            self.assertEqual(len(groups), 1)
+            self.assertIn(self.existing[0].box_name, [box.name for box in groups[0][0].boxes])
+            # nothing sent and claim kept in index
+            self.assertEqual(self.algod.sent, [])
+            self.assertIn(self.existing[0].box_name, keeper.index)
+
+    async def test_tracks_events_and_claims(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            keeper = ClaimKeeper(client, APP_ID, self.sender, self.signer)
+            await keeper.bootstrap()
+            num_box_list_requests = self.algod.count(f"/v2/applications/{APP_ID}/boxes")
+
+            await keeper.claim_matured()
+            self.assertEqual(len(self.algod.sent), 1)
+            [group] = self.sent_groups()
+            self.assertEqual(len(group), 1)
+            self.assertEqual(group[0]["txn"]["fee"], 3000)
+            self.assertIn(self.existing[0].box_name, [box["n"] for box in group[0]["txn"]["apbx"]])
+            self.assertIn(self.existing[0].box_name, keeper.in_flight)
+
+            # new delay mint and confirmation of sent claim
+            new = delay_mint(2, self.algod.round + 1 + DelayMintBox.DELAY)
+            self.algod.add_block([app_call(delayed_mint_log(new)), app_call(claim_delayed_mint_log(self.existing[0]))])
+            await keeper.process_block(self.algod.round)
+            self.assertEqual(keeper.in_flight, {})
+            self.assertIn(new.box_name, keeper.index)
+            self.assertEqual(keeper.index.next_round(), 1100)
+
+            # not yet matured
+            self.assertEqual(await keeper.claim_matured(), [])
+            keeper.last_round = new.round - 1
+            # both the new and the remaining existing delay mint
+            groups = await keeper.claim_matured()
+            self.assertEqual([len(txns) for txns in groups], [2])
+            self.assertEqual(len(self.algod.sent), 2)
+            self.assertEqual(len(keeper.index), 0)
+
+            # index is never rebuilt from boxes
+            self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}/boxes"), num_box_list_requests)
+
+    async def test_retries_unconfirmed_claims(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            keeper = ClaimKeeper(client, APP_ID, self.sender, self.signer)
+            await keeper.bootstrap()
+            await keeper.claim_matured()
+            _, last_valid = keeper.in_flight[self.existing[0].box_name]
+            self.algod.add_block([])
+            self.algod.blocks[last_valid] = {"rnd": last_valid, "txns": []}
+            await keeper.process_block(last_valid)
+            self.assertEqual(keeper.in_flight, {})
+            self.assertIn(self.existing[0].box_name, keeper.index)
@@ -0,0 +1,185 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import msgpack
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.delta_tracker import DeltaTracker, get_min_balance, record
+from offchain.state import (
+    X_ALGO_TOTAL_SUPPLY,
+    ConsensusV3GlobalState,
+    ProposersBox,
+    get_delay_mint_box_name,
+)
+from offchain.state_reader import ProposerAccount
+
+APP_ID = 1000
+APP_ADDRESS = get_application_address(APP_ID)
+X_ALGO_ID = 2000
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def box_key(name: bytes) -> bytes:
+    return b"bx:" + APP_ID.to_bytes(8, "big") + name
+
+
+def delay_mint_value(receiver: str, stake: int, rnd: int) -> bytes:
+    return decode_address(receiver) + stake.to_bytes(8, "big") + rnd.to_bytes(8, "big")
+
+
+def balance_record(address: str, amount: int, status: int = 1, **totals) -> dict:
+    return {"Addr": decode_address(address), "MicroAlgos": amount, "Status": status, **totals}
+
+
+def global_state_params(global_state: dict[str, int]) -> dict:
+    return {"Params": {"gs": {key.encode(): {"tt": 2, "ui": value} for key, value in global_state.items()}}}
+
+
+class DeltaTrackerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.proposers = [new_address() for _ in range(3)]
+        self.minter = new_address()
+        self.global_state = {
+            ConsensusV3GlobalState.NUM_PROPOSERS: 2,
+            ConsensusV3GlobalState.X_ALGO_ID: X_ALGO_ID,
+            ConsensusV3GlobalState.TOTAL_PENDING_STAKE: 1_000_000,
+        }
+        self.algod.global_states[APP_ID] = dict(self.global_state)
+        self.claimed = get_delay_mint_box_name(self.minter, b"\x00\x00")
+        self.algod.boxes[APP_ID] = {
+            ProposersBox.NAME: b"".join(decode_address(p) for p in self.proposers[:2]).ljust(960, b"\x00"),
+            self.claimed: delay_mint_value(self.minter, 1_000_000, 500),
+        }
+        for proposer in self.proposers:
+            self.algod.accounts[proposer] = {"amount": 2_000_000, "min-balance": 100_000, "status": "Online"}
+        self.algod.accounts[APP_ADDRESS] = {"amount": 600_000, "min-balance": 600_000, "status": "Offline"}
+        self.algod.asset_holdings[(APP_ADDRESS, X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY - 5_000_000
+
+    def tearDown(self):
+        self.algod.stop()
+
+    def add_round(self, delta: dict):
+        self.algod.add_block([], ts=1_700_000_000 + self.algod.round)
+        self.algod.deltas[self.algod.round] = msgpack.packb(delta)
+
+    def add_rounds(self):
+        # mint delayed and previous delayed mint claimed
+        self.added = get_delay_mint_box_name(self.minter, b"\x00\x01")
+        global_state = {**self.global_state, ConsensusV3GlobalState.TOTAL_PENDING_STAKE: 0}
+        self.add_round({
+            "Accts": {
+                "Accts": [
+                    balance_record(self.proposers[0], 3_000_000),
+                    balance_record(APP_ADDRESS, 600_000, 0, TotalAssets=1, TotalBoxes=2, TotalBoxBytes=1_012),
+                    balance_record(new_address(), 1_000_000),
+                ],
+                "AppResources": [{
+                    "Aidx": APP_ID,
+                    "Addr": decode_address(self.minter),
+                    "Params": global_state_params(global_state),
+                }],
+                "AssetResources": [{
+                    "Aidx": X_ALGO_ID,
+                    "Addr": decode_address(APP_ADDRESS),
+                    "Holding": {"Holding": {"a": X_ALGO_TOTAL_SUPPLY - 6_000_000}},
+                }],
+            },
+            "KvMods": {
+                box_key(self.claimed): {"OldData": self.algod.boxes[APP_ID][self.claimed]},
+                box_key(self.added): {"Data": delay_mint_value(self.minter, 1_000_000, 322)},
+                box_key(b"other"): {"Data": b"\x01"},
+            },
+        })
+        # proposer added after being rekeyed in an earlier round
+        self.add_round({
+            "Accts": {
+                "AppResources": [{
+                    "Aidx": APP_ID,
+                    "Addr": decode_address(self.minter),
+                    "Params": global_state_params({**global_state, ConsensusV3GlobalState.NUM_PROPOSERS: 3}),
+                }],
+            },
+            "KvMods": {
+                box_key(ProposersBox.NAME): {
+                    "Data": b"".join(decode_address(p) for p in self.proposers).ljust(960, b"\x00"),
+                },
+            },
+        })
+
+    def test_min_balance(self):
+        self.assertEqual(get_min_balance({}), 100_000)
+        # xALGO holding, proposers box and the app created with extra pages and a global schema
+        app_data = {
+            b"TotalAssets": 1, b"TotalAppParams": 1, b"TotalExtraAppPages": 3,
+            b"TotalAppSchema": {b"nui": 32, b"nbs": 32},
+            b"TotalBoxes": 1, b"TotalBoxBytes": 962,
+        }
+        self.assertEqual(get_min_balance(app_data), 200_000 + 400_000 + 1_600_000 + 112_000 + 800_000 + 387_300)
+
+    async def test_follows_deltas(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            tracker = await DeltaTracker.bootstrap(client, APP_ID)
+            self.assertEqual(tracker.round, 1)
+            self.add_rounds()
+            first, second = [changes async for changes in tracker.follow(client, last_round=3)]
+
+        self.assertEqual((first.round, first.timestamp), (2, 1_700_000_001))
+        self.assertEqual(first.accounts, {
+            self.proposers[0]: ProposerAccount(self.proposers[0], 3_000_000, 100_000, "Online"),
+            APP_ADDRESS: ProposerAccount(APP_ADDRESS, 600_000, 200_000 + 2 * 2_500 + 1_012 * 400, "Offline"),
+        })
+        self.assertEqual(first.global_state, {ConsensusV3GlobalState.TOTAL_PENDING_STAKE: 0})
+        self.assertEqual([delay_mint.box_name for delay_mint in first.added_delay_mints], [self.added])
+        self.assertEqual(first.removed_delay_mints, [self.claimed])
+        self.assertEqual(first.x_algo_circulating_supply, 6_000_000)
+        self.assertFalse(first.proposers_changed)
+
+        self.assertTrue(second.proposers_changed)
+        self.assertEqual(second.global_state, {ConsensusV3GlobalState.NUM_PROPOSERS: 3})
+        self.assertEqual(list(second.accounts), [self.proposers[2]])
+        self.assertIsNone(second.x_algo_circulating_supply)
+
+        snapshot = tracker.snapshot
+        self.assertEqual(snapshot.round, 3)
+        self.assertEqual([p.address for p in snapshot.proposers], self.proposers)
+        self.assertEqual([p.balance for p in snapshot.proposers], [3_000_000, 2_000_000, 2_000_000])
+        self.assertEqual(list(snapshot.delay_mints), [self.added])
+        self.assertEqual(snapshot.x_algo_circulating_supply, 6_000_000)
+        # only the added proposer is fetched after bootstrapping
+        self.assertEqual(self.algod.count(f"/v2/accounts/{self.proposers[2]}"), 1)
+        self.assertEqual(self.algod.count(f"/v2/accounts/{self.proposers[0]}"), 1)
+
+    async def test_replays_records(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "deltas.msgpack"
+            async with AsyncAlgodClient("", self.algod.address) as client:
+                tracker = await DeltaTracker.bootstrap(client, APP_ID)
+                self.add_rounds()
+                await record(client, path, 2, 3)
+
+            changes = tracker.replay(path)
+            self.assertEqual(next(changes).x_algo_circulating_supply, 6_000_000)
+            # added proposer never changed so its account is not known
+            with self.assertRaises(ValueError):
+                next(changes)
+
+    async def test_rejects_rounds_out_of_order(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            tracker = await DeltaTracker.bootstrap(client, APP_ID)
+            self.add_rounds()
+            block, delta = await client.block_msgpack(3), await client.ledger_state_delta(3)
+        with self.assertRaises(ValueError):
+            tracker.apply(block, delta)
+
+
+if __name__ == "__main__":
+    unittest.main()
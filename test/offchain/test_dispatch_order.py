@@ -0,0 +1,39 @@
+import os
+import re
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from common.utils.peephole import parse
+
+ROOT_PATH = Path(__file__).parents[2]
+CONTRACTS_PATH = ROOT_PATH / "contracts"
+CONSENSUS_V3_PATH = CONTRACTS_PATH / "xalgo" / "consensus_v3.py"
+
+
+class DispatchOrderTest(unittest.TestCase):
+    def test_dispatches_user_methods_first(self):
+        env = {**os.environ, "PYTHONPATH": str(CONTRACTS_PATH)}
+        program = subprocess.run(
+            [sys.executable, CONSENSUS_V3_PATH], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        selectors = [args.strip('"').split("(")[0] for op, args in parse(program) if op == "method"]
+        self.assertEqual(
+            selectors[:7],
+            ["dummy", "immediate_mint", "burn", "claim_delayed_mint", "delayed_mint", "get_xalgo_rate",
+             "immediate_mint_batch"],
+        )
+        # admin methods keep their declared order
+        self.assertEqual(selectors[7:10], ["initialise", "update_admin", "schedule_update_sc"])
+
+    def test_reorders_for_pinned_pyteal_version(self):
+        # the router internals reordered are only checked against the version the build asserts
+        requirements = (ROOT_PATH / "requirements.txt").read_text()
+        pinned = re.search(r"^pyteal==(\S+)$", requirements, re.MULTILINE)
+        self.assertIsNotNone(pinned)
+        self.assertIn(f'pragma(compiler_version="{pinned.group(1)}")', CONSENSUS_V3_PATH.read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import re
+import unittest
+from pathlib import Path
+
+from common.utils.peephole import BRANCH_OPS, is_label, parse
+from offchain.abi import CONTRACTS_PATH, compile_pyteal
+
+ROOT_PATH = Path(__file__).parents[2]
+CONSENSUS_V3_PATH = CONTRACTS_PATH / "xalgo" / "consensus_v3.py"
+CONSENSUS_V3_TEST_PATH = ROOT_PATH / "test" / "xAlgoConsensusV3.test.ts"
+
+# algod reports a failing program with the disassembly of the last opcodes executed, e.g. "opcodes=store 1; load 2;
+# assert", which the jest tests pin to check where a call fails
+NUM_ERROR_OPCODES = 3
+
+
+def disassemble(teal: str) -> list[str]:
+    """
+    Lines of the disassembly of the program as algod prints them, up to the constants which are printed with their
+    value as a comment. Labels are numbered in order of first reference.
+    """
+    instructions = parse(teal)
+    label_indexes = {}
+    ops = []
+    for op, args in instructions:
+        if is_label((op, args)):
+            label_indexes[op[:-1]] = len(ops)
+        elif op != "#pragma":
+            ops.append((op, args))
+
+    label_names = {}
+    lines = []
+    for op, args in ops:
+        if op in BRANCH_OPS or op == "callsub":
+            names = []
+            for label in args.split():
+                index = label_indexes[label]
+                label_names.setdefault(index, f"label{len(label_names) + 1}")
+                names.append(label_names[index])
+            args = " ".join(names)
+        elif op in ("int", "pushint"):
+            op, args = "intc", f"// {args}"
+        elif op in ("byte", "pushbytes", "method", "addr"):
+            op, args = "bytec", f"// {args}"
+        elif op == "txn" and " " in args:
+            op = "txna"
+        lines.append(f"{op} {args}" if args else op)
+    return lines
+
+
+def get_error_opcodes(teal: str) -> str:
+    lines = disassemble(teal)
+    return "\n".join(
+        "opcodes=" + "; ".join(lines[max(i - NUM_ERROR_OPCODES + 1, 0):i + 1]) for i in range(len(lines))
+    )
+
+
+class ErrorPinsTest(unittest.TestCase):
+    def test_disassembles_labels_in_order_of_first_reference(self):
+        teal = "#pragma version 10\ncallsub b\nb a\na:\nint 1\nreturn\nb:\nbyte \"x\"\nretsub\n"
+        self.assertEqual(
+            disassemble(teal), ["callsub label1", "b label2", "intc // 1", "return", "bytec // \"x\"", "retsub"]
+        )
+
+    def test_pinned_errors_occur_in_program(self):
+        opcodes = get_error_opcodes(compile_pyteal(CONSENSUS_V3_PATH))
+        pins = [pin for _, pin in re.findall(r"failedAt\((['\"])(.*?)\1\)", CONSENSUS_V3_TEST_PATH.read_text())]
+        self.assertTrue(pins)
+        self.assertEqual([pin for pin in pins if pin not in opcodes], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from fractions import Fraction
+
+from offchain.fuzzer import (
+    DELAY_MINT_ROUNDS,
+    ModelState,
+    Outcome,
+    ReferenceModel,
+    Step,
+    replay,
+    run_seed,
+    shrink,
+)
+
+
+def make_state(**kwargs) -> ModelState:
+    state = ModelState(
+        round=1000,
+        proposer_balances=[5_100_000, 5_100_000],
+        proposer_min_balances=[100_000, 100_000],
+        max_proposer_balance=100_000_000,
+        fee=1000,
+        premium=0,
+        last_proposers_active_balance=10_000_000,
+        total_pending_stake=0,
+        total_unclaimed_fees=0,
+        x_algo_circulating_supply=8_000_000,
+        user_x_algo=8_000_000,
+    )
+    for key, value in kwargs.items():
+        setattr(state, key, value)
+    return state
+
+
+class RoundingUpModel(ReferenceModel):
+    def _burn(self, step: Step) -> Outcome:
+        outcome = super()._burn(step)
+        # send one more microALGO than the contract would
+        self._send(1)
+        self.state.last_proposers_active_balance -= 1
+        return Outcome(amount=outcome.amount + 1, exact=outcome.exact, num_roundings=1)
+
+
+class ReferenceModelTest(unittest.TestCase):
+    def test_mints_and_burns_at_synced_rate(self):
+        model = ReferenceModel(make_state())
+        # rewards of 1 ALGO of which 10% is fee
+        model.apply(Step("reward", 1_000_000, 0))
+        self.assertEqual(model.synced_rate(), Fraction(10_900_000, 8_000_000))
+
+        outcome = model.apply(Step("immediate_mint", 1_090_000))
+        self.assertIsNone(outcome.rejection)
+        self.assertEqual(outcome.amount, 800_000)
+        self.assertEqual(model.state.total_unclaimed_fees, 100_000)
+        self.assertEqual(model.state.last_proposers_active_balance, 12_090_000)
+        self.assertEqual(model.state.proposer_balances, [6_145_001, 6_144_999])
+
+        outcome = model.apply(Step("burn", 800_000))
+        self.assertEqual(outcome.amount, 1_090_000)
+        self.assertEqual(model.state.x_algo_circulating_supply, 8_000_000)
+
+        outcome = model.apply(Step("claim_fee"))
+        self.assertEqual(outcome.amount, 100_000)
+        self.assertEqual(model.state.total_unclaimed_fees, 0)
+        self.assertEqual(sum(model.state.proposer_balances), 11_100_000)
+
+    def test_settles_fees_in_x_algo(self):
+        model = ReferenceModel(make_state())
+        model.apply(Step("update_fee_settlement", 1))
+        model.apply(Step("reward", 1_000_000, 0))
+        rate = model.synced_rate()
+
+        outcome = model.apply(Step("claim_fee"))
+        # 0.1 ALGO of fees at 10.9 ALGO per 8 xALGO, rounded down
+        self.assertEqual(outcome.amount, 73_394)
+        self.assertEqual(outcome.exact, Fraction(100_000 * 8_000_000, 10_900_000))
+        self.assertEqual(model.state.total_unclaimed_fees, 0)
+        self.assertEqual(model.state.last_proposers_active_balance, 11_000_000)
+        self.assertEqual(model.state.proposer_balances, [6_100_000, 5_100_000])
+        self.assertGreaterEqual(model.synced_rate(), rate)
+
+    def test_delayed_mint_matures(self):
+        model = ReferenceModel(make_state())
+        model.apply(Step("delayed_mint", 1_000_000, 7))
+        self.assertEqual(model.state.delay_mints, {7: (1_000_000, 1000 + DELAY_MINT_ROUNDS)})
+        self.assertEqual(model.state.total_pending_stake, 1_000_000)
+        self.assertEqual(model.state.next_nonce, 8)
+
+        outcome = model.apply(Step("claim_delayed_mint", index=7))
+        self.assertEqual(outcome.rejection, "delay mint not matured")
+        self.assertIn(7, model.state.delay_mints)
+
+        model.apply(Step("advance", DELAY_MINT_ROUNDS))
+        outcome = model.apply(Step("claim_delayed_mint", index=7))
+        self.assertEqual(outcome.amount, 800_000)
+        self.assertEqual((model.state.total_pending_stake, model.state.delay_mints), (0, {}))
+
+    def test_next_nonce_wraps_around(self):
+        model = ReferenceModel(make_state())
+        model.apply(Step("delayed_mint", 1_000_000, 2**16 - 1))
+        self.assertEqual(model.state.next_nonce, 0)
+        # follows the last nonce used rather than the highest
+        model.apply(Step("delayed_mint", 1_000_000, 3))
+        self.assertEqual(model.state.next_nonce, 4)
+
+    def test_rejection_leaves_state_unchanged(self):
+        model = ReferenceModel(make_state())
+        state = make_state()
+        self.assertEqual(model.apply(Step("burn", 8_000_001)).rejection, "insufficient xALGO")
+        self.assertEqual(model.apply(Step("immediate_mint", 200_000_000)).rejection, "exceeds max proposer balance")
+        # fee is claimed before the new fee is checked
+        self.assertEqual(model.apply(Step("update_fee", 10_001)).rejection, "fee exceeds 100%")
+        self.assertEqual(model.state, state)
+
+
+class FuzzerTest(unittest.TestCase):
+    def test_seeds_hold_invariants(self):
+        for seed in range(3):
+            result = run_seed(seed, 300)
+            self.assertIsNone(result.failure)
+            self.assertEqual(len(result.steps), 300)
+            self.assertIn("burn", result.executed)
+
+    def test_shrinks_to_failing_step(self):
+        initial = make_state()
+        steps = [Step("reward", 1000, 1), Step("immediate_mint", 5_000), Step("claim_fee"), Step("burn", 5_000)]
+        self.assertIsNone(replay(initial, steps))
+
+        failure = replay(initial, steps, RoundingUpModel)
+        self.assertEqual((failure.step_index, failure.step), (3, Step("burn", 5_000)))
+        self.assertTrue(any(message.startswith("burn rounded up") for message in failure.messages))
+        self.assertEqual(shrink(initial, steps, RoundingUpModel), [Step("burn", 5_000)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,329 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import EmptySigner, TransactionWithSigner
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+from algosdk.transaction import AssetTransferTxn, OnComplete, PaymentTxn, SuggestedParams
+
+from fake_algod import FakeAlgod
+from offchain.abi import get_consensus_v3_contract
+from offchain.async_algod import AsyncAlgodClient
+from offchain.group_builder import (
+    MAX_GROUP_SIZE,
+    MAX_TXN_ACCOUNTS,
+    MAX_TXN_REFERENCES,
+    CallRequirements,
+    ConsensusGroupBuilder,
+    count_opup_calls,
+    get_added_proposer_box_name,
+    pack_references,
+)
+from offchain.state import (
+    ConsensusV3GlobalState,
+    DelayMint,
+    RateCheckpointsBox,
+    get_delay_mint_box_name,
+    get_delay_mint_nonce_box_name,
+)
+from offchain.state_reader import ConsensusSnapshot, ProposerAccount
+
+APP_ID = 1000
+X_ALGO_ID = 2000
+XGOV_REGISTRY_ID = 3000
+
+PARAMS = SuggestedParams(0, 1, 1001, "SGO1GKSzyE7IEPItTxCByw9x8FmnrCDexi9/cOUJOiI=", "testnet-v1.0", min_fee=1000)
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def make_snapshot(balances: list[int], **global_state) -> ConsensusSnapshot:
+    proposers = [ProposerAccount(new_address(), balance, 100_000, "Online") for balance in balances]
+    return ConsensusSnapshot(
+        round=1,
+        global_state={
+            ConsensusV3GlobalState.ADMIN: decode_address(new_address()),
+            ConsensusV3GlobalState.REGISTER_ADMIN: decode_address(new_address()),
+            ConsensusV3GlobalState.X_ALGO_ID: X_ALGO_ID,
+            ConsensusV3GlobalState.NUM_PROPOSERS: len(proposers),
+            ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: sum(b - 100_000 for b in balances),
+            **global_state,
+        },
+        proposers=proposers,
+        delay_mints={},
+        x_algo_circulating_supply=sum(b - 100_000 for b in balances),
+    )
+
+
+class PackReferencesTest(unittest.TestCase):
+    def test_packs_into_free_slots(self):
+        accounts = [new_address() for _ in range(4)]
+        requirements = CallRequirements(accounts=accounts, assets=[X_ALGO_ID], boxes=[b"pr", b"rc"])
+        [refs] = pack_references([requirements])
+        self.assertEqual(refs.accounts, accounts)
+        self.assertEqual(refs.num_references, 7)
+
+    def test_adds_dummies_for_accounts(self):
+        accounts = [new_address() for _ in range(9)]
+        requirements = CallRequirements(accounts=accounts, pinned_accounts=[accounts[0]], boxes=[b"pr"])
+        calls = pack_references([requirements])
+        self.assertEqual(len(calls), 3)
+        # pinned account stays in the call itself and is not repeated
+        self.assertEqual(calls[0].accounts[0], accounts[0])
+        self.assertEqual(sorted(a for call in calls for a in call.accounts), sorted(accounts))
+        self.assertTrue(all(len(call.accounts) <= MAX_TXN_ACCOUNTS for call in calls))
+
+    def test_counts_opup_calls(self):
+        self.assertEqual(count_opup_calls([], 1), 0)
+        self.assertEqual(count_opup_calls([(1000, 1000)], 1), 1)
+        self.assertEqual(count_opup_calls([(1000, 1000)], 2), 0)
+        # each inner app call adds the budget of an app call less its own cost
+        self.assertEqual(count_opup_calls([(6400, 6400)], 1), 9)
+        # only topped up once the budget ensured runs short
+        self.assertEqual(count_opup_calls([(300, 300), (200, 200)], 1), 0)
+        self.assertEqual(count_opup_calls([(300, 300), (300, 300)], 1), 1)
+
+    def test_adds_dummies_for_budget(self):
+        calls = pack_references([CallRequirements()], opcode_cost=1401)
+        self.assertEqual(len(calls), 3)
+
+    def test_exceeds_group_size(self):
+        accounts = [new_address() for _ in range(MAX_GROUP_SIZE * MAX_TXN_ACCOUNTS)]
+        self.assertIsNotNone(pack_references([CallRequirements(accounts=accounts)]))
+        self.assertIsNone(pack_references([CallRequirements(accounts=accounts)], num_other_txns=1))
+
+
+class ConsensusGroupBuilderTest(unittest.TestCase):
+    def setUp(self):
+        self.sender = new_address()
+        self.app_address = get_application_address(APP_ID)
+
+    def pay(self, amount: int) -> TransactionWithSigner:
+        return TransactionWithSigner(PaymentTxn(self.sender, PARAMS, self.app_address, amount), EmptySigner())
+
+    def check_group(self, txns):
+        self.assertLessEqual(len(txns), MAX_GROUP_SIZE)
+        for txn in txns:
+            if txn.type == "appl":
+                refs = [txn.accounts, txn.foreign_assets, txn.foreign_apps, txn.boxes]
+                self.assertLessEqual(sum(len(ref or []) for ref in refs), MAX_TXN_REFERENCES)
+                self.assertLessEqual(len(txn.accounts or []), MAX_TXN_ACCOUNTS)
+
+    def build(self, builder, method_name, method_args, **call_kwargs):
+        atc = builder.build(method_name, self.sender, EmptySigner(), PARAMS, method_args, **call_kwargs)
+        txns = [txn_with_signer.txn for txn_with_signer in atc.build_group()]
+        self.check_group(txns)
+        return txns
+
+    def test_immediate_mint_exact_fee(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000, 2_000_000, 3_000_000]))
+        send_algo = self.pay(3_000_000)
+        txns = self.build(builder, "immediate_mint", [send_algo, self.sender, 0])
+        # payment, app call, inner app call for budget and two allocations to proposers plus xALGO transfer
+        self.assertEqual([txn.type for txn in txns], ["pay", "appl"])
+        self.assertEqual([txn.fee for txn in txns], [0, 6000])
+        self.assertEqual(send_algo.txn.fee, 1000)
+        self.assertEqual(txns[1].accounts, [self.sender, *builder.proposers])
+        self.assertEqual(txns[1].foreign_assets, [X_ALGO_ID])
+
+    def test_immediate_mint_with_dummy(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([2_000_000] * 5))
+        txns = self.build(builder, "immediate_mint", [self.pay(1_000_000), self.sender, 0])
+        # split among all five proposers, xALGO transfer and inner app call in case the bounded budget runs short
+        self.assertEqual(len(txns), 3)
+        self.assertEqual([txn.fee for txn in txns], [0, 10000, 0])
+        self.assertEqual(set(txns[1].accounts + txns[2].accounts), {self.sender, *builder.proposers})
+
+    def test_tops_up_budget_with_inner_calls(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([2_000_000] * 30))
+        txns = self.build(builder, "immediate_mint", [self.pay(1_000_000), self.sender, 0])
+        # only the app calls needed to reference the proposers, the rest of the budget is topped up by the contract
+        self.assertEqual(len(txns), 9)
+        requirements = builder.requirements("immediate_mint", self.sender, [self.pay(1_000_000), self.sender, 0])
+        self.assertEqual(count_opup_calls(requirements.opcode_budgets, len(txns) - 1), 2)
+        self.assertEqual(txns[1].fee, (len(txns) + requirements.num_inner_txns + 2) * 1000)
+
+    def test_immediate_mint_batch_exact_fee(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000, 2_000_000, 3_000_000]))
+        receivers = [self.sender, new_address(), new_address()]
+        mints = [[receiver, 1_000_000, 0] for receiver in receivers]
+        txns = self.build(builder, "immediate_mint_batch", [self.pay(3_000_000), mints])
+        # three txns plus two allocations to proposers once and xALGO transfer to each receiver
+        self.assertEqual([txn.fee for txn in txns], [0, 8000, 0])
+        self.assertEqual(set(txns[1].accounts + txns[2].accounts), {*receivers, *builder.proposers})
+
+    def test_burn_exact_fee(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([3_000_000, 2_000_000, 1_000_000]))
+        send_xalgo = TransactionWithSigner(
+            AssetTransferTxn(self.sender, PARAMS, self.app_address, 3_000_000, X_ALGO_ID), EmptySigner()
+        )
+        txns = self.build(builder, "burn", [send_xalgo, self.sender, 0])
+        # rate is 1:1 so 3 ALGO taken from first two proposers and sent to receiver
+        self.assertEqual([txn.fee for txn in txns], [0, 6000])
+
+    def test_allocation_hints_need_fewest_transfers(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([4_000_000, 4_000_000, 4_000_000, 1_000_000]))
+        hints = builder.get_allocation_hints("immediate_mint_hinted", 3_000_000)
+        self.assertEqual(hints, [(3, 3_000_000)])
+        method_args = [self.pay(3_000_000), self.sender, 0]
+        hinted = builder.requirements("immediate_mint_hinted", self.sender, method_args + [hints])
+        searched = builder.requirements("immediate_mint", self.sender, method_args)
+        # search tops up each of the first three proposers to the target before reaching the last
+        self.assertEqual((hinted.num_inner_txns, searched.num_inner_txns), (2, 5))
+        self.assertLess(hinted.opcode_budget, searched.opcode_budget)
+
+        # rejected as by the contract
+        for hints in ([(0, 3_000_000)], [(3, 2_000_000)], [(4, 3_000_000)]):
+            with self.assertRaises(ValueError):
+                builder.requirements("immediate_mint_hinted", self.sender, [self.pay(3_000_000), self.sender, 0, hints])
+
+    def test_burn_allocation_hints_cover_margin(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([5_000_000, 3_000_000, 1_000_000]))
+        send_xalgo = TransactionWithSigner(
+            AssetTransferTxn(self.sender, PARAMS, self.app_address, 1_000_000, X_ALGO_ID), EmptySigner()
+        )
+        self.assertEqual(builder.get_allocation_hints("burn", 1_000_000), [(0, 1_000_000)])
+        hints = builder.get_allocation_hints("burn", 1_000_000, margin=100_000)
+        self.assertEqual(hints, [(0, 1_100_000)])
+        # contract stops once the amount is allocated
+        requirements = builder.requirements("burn_hinted", self.sender, [send_xalgo, self.sender, 0, hints])
+        self.assertEqual(requirements.num_inner_txns, 2)
+
+    def test_claim_fee_exact_fee(self):
+        snapshot = make_snapshot([10_000_000] * 3, **{ConsensusV3GlobalState.FEE: 1000})
+        # each proposer earnt 1 ALGO of rewards
+        snapshot.global_state[ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE] -= 3_000_000
+        builder = ConsensusGroupBuilder(APP_ID, snapshot)
+        txns = self.build(builder, "claim_fee", [])
+        # 0.3 ALGO fees taken equally from the three proposers and sent to admin
+        self.assertEqual([txn.fee for txn in txns], [6000])
+
+        # settled by minting xALGO to admin instead
+        snapshot.global_state[ConsensusV3GlobalState.SETTLE_FEES_IN_X_ALGO] = 1
+        txns = self.build(ConsensusGroupBuilder(APP_ID, snapshot), "claim_fee", [])
+        self.assertEqual([txn.fee for txn in txns], [2000])
+        self.assertEqual(txns[0].foreign_assets, [X_ALGO_ID])
+
+    def test_remove_proposer_exact_fee(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([3_000_000, 1_000_000, 2_000_000]))
+        txns = self.build(builder, "remove_proposer", [0])
+        # key registration and close, 3 ALGO split among the two remaining proposers and box min balance refund
+        self.assertEqual([txn.fee for txn in txns], [7000])
+        self.assertEqual(txns[0].accounts, builder.proposers)
+        self.assertIn(get_added_proposer_box_name(builder.proposers[0]), [box.name for box in txns[0].boxes])
+        # rate is published if due as the min balance of the proposer becomes active
+        self.assertIn(RateCheckpointsBox.NAME, [box.name for box in txns[0].boxes])
+
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+        with self.assertRaises(ValueError):
+            builder.requirements("remove_proposer", self.sender, [0])
+
+    def test_claim_delayed_mint_requires_known_delay_mint(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+        with self.assertRaises(ValueError):
+            builder.requirements("claim_delayed_mint", self.sender, [self.sender, b"\x00\x00"])
+        delay_mint = DelayMint(self.sender, b"\x00\x01", new_address(), 1_000_000, 1)
+        builder.snapshot.delay_mints[delay_mint.box_name] = delay_mint
+        requirements = builder.requirements("claim_delayed_mint", self.sender, [self.sender, b"\x00\x01"])
+        self.assertIn(delay_mint.receiver, requirements.accounts)
+        self.assertIn(delay_mint.box_name, requirements.boxes)
+
+    def test_delayed_mint_references_nonce_box(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+        method_args = [self.pay(1_000_000), self.sender, b"\x00\x02"]
+        requirements = builder.requirements("delayed_mint", self.sender, method_args)
+        self.assertIn(get_delay_mint_box_name(self.sender, b"\x00\x02"), requirements.boxes)
+        self.assertIn(get_delay_mint_nonce_box_name(self.sender), requirements.boxes)
+
+    def test_register_offline_batch_skips_admin_boxes_for_register_admin(self):
+        snapshot = make_snapshot([1_000_000] * 3)
+        builder = ConsensusGroupBuilder(APP_ID, snapshot)
+        register_admin = new_address()
+        snapshot.global_state[ConsensusV3GlobalState.REGISTER_ADMIN] = decode_address(register_admin)
+        self.assertEqual(len(builder.requirements("register_offline_batch", register_admin, [[0, 1, 2]]).boxes), 1)
+        self.assertEqual(len(builder.requirements("register_offline_batch", self.sender, [[0, 1, 2]]).boxes), 4)
+
+    def test_update_fee_settlement_references_x_algo(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+        self.assertEqual(builder.requirements("update_fee_settlement", self.sender, [True]).assets, [X_ALGO_ID])
+
+    def test_unknown_method(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+        with self.assertRaises(ValueError):
+            builder.requirements("unknown", self.sender, [])
+
+    def test_builds_every_method(self):
+        builder = ConsensusGroupBuilder(APP_ID, make_snapshot([10_000_000] * 30))
+        delay_mint = DelayMint(self.sender, b"\x00\x01", new_address(), 1_000_000, 1)
+        builder.snapshot.delay_mints[delay_mint.box_name] = delay_mint
+        registration = (0, self.sender, self.sender, bytes(64), 1, 2, 3, 1000)
+        send_xalgo = TransactionWithSigner(
+            AssetTransferTxn(self.sender, PARAMS, self.app_address, 1_000_000, X_ALGO_ID), EmptySigner()
+        )
+        method_args = {
+            "initialise": [],
+            "update_admin": ["admin", self.sender],
+            "schedule_update_sc": [bytes(32), bytes(32)],
+            "update_sc": [],
+            "add_proposer": [new_address()],
+            "remove_proposer": [0],
+            "update_max_proposer_balance": [1],
+            "update_rate_checkpoint_interval": [1],
+            "update_fee": [1],
+            "claim_fee": [],
+            "update_fee_settlement": [True],
+            "update_premium": [1],
+            "pause_minting": ["can_immediate_mint", True],
+            "set_proposer_admin": [0, self.sender],
+            "register_online": [self.pay(1000), 0, self.sender, self.sender, bytes(64), 1, 2, 3],
+            "register_offline": [0],
+            "register_online_batch": [self.pay(2000), [registration, registration]],
+            "register_offline_batch": [[0, 1]],
+            "subscribe_xgov": [self.pay(1000), 0, XGOV_REGISTRY_ID, self.sender],
+            "unsubscribe_xgov": [0, XGOV_REGISTRY_ID],
+            "rebalance_proposers": [0, 1, 1],
+            "immediate_mint": [self.pay(1_000_000), self.sender, 0],
+            "immediate_mint_hinted": [self.pay(1_000_000), self.sender, 0, []],
+            "immediate_mint_batch": [self.pay(1_000_000), [[self.sender, 1_000_000, 0]]],
+            "immediate_mint_batch_hinted": [self.pay(1_000_000), [[self.sender, 1_000_000, 0]], []],
+            "delayed_mint": [self.pay(1_000_000), self.sender, b"\x00\x02"],
+            "delayed_mint_hinted": [self.pay(1_000_000), self.sender, b"\x00\x02", []],
+            "claim_delayed_mint": [self.sender, b"\x00\x01"],
+            "burn": [send_xalgo, self.sender, 0],
+            "burn_hinted": [send_xalgo, self.sender, 0, []],
+            "get_xalgo_rate": [],
+            "get_proposer_records": [0],
+            "get_delay_mint_records": [[(self.sender, b"\x00\x01")]],
+            "get_scheduled_update": [],
+            "dummy": [],
+        }
+        update_kwargs = {
+            "on_complete": OnComplete.UpdateApplicationOC,
+            "approval_program": b"\x0a",
+            "clear_program": b"\x0a",
+        }
+        for method in get_consensus_v3_contract().methods:
+            with self.subTest(method=method.name):
+                call_kwargs = update_kwargs if method.name == "update_sc" else {}
+                txns = self.build(builder, method.name, method_args[method.name], **call_kwargs)
+                self.assertEqual(sum(txn.fee for txn in txns) % 1000, 0)
+
+
+class SimulatedBudgetTest(unittest.IsolatedAsyncioTestCase):
+    async def test_adds_dummies_for_simulated_budget(self):
+        algod = FakeAlgod().start()
+        algod.simulate_result = {"app-budget-added": 700, "app-budget-consumed": 2000}
+        try:
+            async with AsyncAlgodClient("", algod.address) as client:
+                builder = ConsensusGroupBuilder(APP_ID, make_snapshot([1_000_000]))
+                atc = await builder.build_with_simulated_budget(
+                    client, "get_xalgo_rate", new_address(), EmptySigner(), PARAMS, []
+                )
+            txns = [txn_with_signer.txn for txn_with_signer in atc.build_group()]
+            self.assertEqual(len(algod.simulated), 1)
+            self.assertEqual(len(txns), 3)
+            self.assertEqual([txn.fee for txn in txns], [3000, 0, 0])
+        finally:
+            algod.stop()
@@ -0,0 +1,112 @@
+import tempfile
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from offchain.events import (
+    BURN_SELECTOR,
+    IMMEDIATE_MINT_SELECTOR,
+    REBALANCE_PROPOSERS_SELECTOR,
+    UPDATE_FEE_SELECTOR,
+    UPDATE_FEE_SETTLEMENT_SELECTOR,
+    BurnEvent,
+    ClaimDelayedMintEvent,
+    ImmediateMintEvent,
+    RebalanceProposersEvent,
+    UpdateFeeEvent,
+    UpdateFeeSettlementEvent,
+    decode_event,
+)
+from offchain.history_store import SECONDS_PER_YEAR, HistoryStore, np
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+class DecodeEventTest(unittest.TestCase):
+    def test_decodes_mint_burn_and_update_events(self):
+        minter, receiver = new_address(), new_address()
+        amounts = (5).to_bytes(8, "big") + (4).to_bytes(8, "big")
+        log = IMMEDIATE_MINT_SELECTOR + decode_address(minter) + decode_address(receiver) + amounts
+        self.assertEqual(decode_event(log, 10), ImmediateMintEvent(10, minter, receiver, 5, 4))
+        log = BURN_SELECTOR + decode_address(minter) + amounts
+        self.assertEqual(decode_event(log, 11), BurnEvent(11, minter, 5, 4))
+        log = UPDATE_FEE_SELECTOR + (1000).to_bytes(8, "big")
+        self.assertEqual(decode_event(log, 12), UpdateFeeEvent(12, 1000))
+        self.assertEqual(decode_event(UPDATE_FEE_SETTLEMENT_SELECTOR + b"\x80", 12), UpdateFeeSettlementEvent(12, True))
+        self.assertEqual(decode_event(UPDATE_FEE_SETTLEMENT_SELECTOR + b"\x00", 12), UpdateFeeSettlementEvent(12, False))
+
+    def test_decodes_rebalance_proposers_event(self):
+        # proposer indexes are logged as uint64 like every other integer in the events
+        log = REBALANCE_PROPOSERS_SELECTOR + b"".join(n.to_bytes(8, "big") for n in (3, 1, 2_000_000))
+        self.assertEqual(decode_event(log, 13), RebalanceProposersEvent(13, 3, 1, 2_000_000))
+        self.assertIsNone(decode_event(REBALANCE_PROPOSERS_SELECTOR + bytes([3, 1]) + log[-8:], 13))
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class HistoryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(self.dir.name, partition_rounds=100)
+        self.user = new_address()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_scans_round_range_across_partitions(self):
+        self.store.append_events([
+            ImmediateMintEvent(rnd, self.user, self.user, rnd * 10, rnd * 9) for rnd in range(50, 350, 10)
+        ])
+        parts = list(self.store.scan("mints", 95, 205))
+        self.assertEqual(len(parts), 2)
+        rounds = np.concatenate([part["round"] for part in parts])
+        self.assertEqual(rounds.tolist(), list(range(100, 210, 10)))
+        # views over the files rather than copies
+        self.assertIsInstance(parts[0]["round"], np.memmap)
+
+        volume = self.store.volume(95, 205)
+        self.assertEqual(volume["num_mints"], 11)
+        self.assertEqual(volume["mint_algo"], sum(range(100, 210, 10)) * 10)
+
+    def test_reopens_and_rejects_out_of_order_rows(self):
+        self.store.append_events([BurnEvent(120, self.user, 10, 11)])
+        store = HistoryStore(self.dir.name, partition_rounds=100)
+        with self.assertRaises(ValueError):
+            store.append_events([BurnEvent(110, self.user, 10, 11)])
+        store.append_events([BurnEvent(120, self.user, 20, 22), BurnEvent(250, self.user, 30, 33)])
+        self.assertEqual(store.read("burns", 0, 1000)["x_algo"].tolist(), [10, 20, 30])
+
+    def test_user_history(self):
+        other = new_address()
+        self.store.append_events([
+            ImmediateMintEvent(10, self.user, self.user, 100, 90),
+            ClaimDelayedMintEvent(20, b"dm", other, self.user, 200, 180),
+            ImmediateMintEvent(30, other, other, 300, 270),
+            BurnEvent(40, self.user, 50, 55),
+            BurnEvent(50, other, 60, 66),
+        ])
+        history = self.store.user_history(self.user, 0, 100)
+        self.assertEqual(history["mints"]["round"].tolist(), [10, 20])
+        self.assertEqual(history["mints"]["x_algo"].tolist(), [90, 180])
+        self.assertEqual(history["burns"]["algo"].tolist(), [55])
+
+    def test_apy_and_fee_accrual(self):
+        start = 1_700_000_000
+        # 1% growth in rate over half a year
+        self.store.append_rate(100, start, 1_000_000, 1_000_000)
+        self.store.append_rate(200, start + SECONDS_PER_YEAR // 2, 1_010_000, 1_000_000)
+        self.assertAlmostEqual(self.store.apy(0, 1000), 1.01 ** 2 - 1)
+
+        # mint of 500_000 ALGO plus 9_000 rewards net of 10% fee
+        self.store.append_events([
+            UpdateFeeEvent(150, 1000),
+            ImmediateMintEvent(250, self.user, self.user, 500_000, 495_000),
+        ])
+        self.store.append_rate(300, start + SECONDS_PER_YEAR, 1_519_000, 1_495_000)
+        accrual = self.store.fee_accrual(0, 1000, initial_fee=0)
+        self.assertEqual(accrual, {"rewards": 10_000 + 9_000, "fees": 1_000})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import zlib
+from base64 import b64encode
+
+import msgpack
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.ledger_snapshot import capture_snapshot, decode_snapshot, encode_snapshot, remap_state
+from offchain.state import (
+    X_ALGO_TOTAL_SUPPLY,
+    ConsensusV3GlobalState,
+    DelayMintBox,
+    ProposersBox,
+    RateCheckpointsBox,
+    get_delay_mint_box_name,
+)
+
+APP_ID = 1000
+X_ALGO_ID = 2000
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+class LedgerSnapshotTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.algod.round = 5000
+        self.app_address = get_application_address(APP_ID)
+        self.admin = new_address()
+        self.proposers = [new_address() for _ in range(2)]
+        self.minter, self.holder, self.other = new_address(), new_address(), new_address()
+
+        self.algod.app_params[APP_ID] = {
+            "approval-program": b64encode(b"\x0a\x81\x01").decode(),
+            "clear-state-program": b64encode(b"\x0a\x81\x01").decode(),
+            "global-state-schema": {"num-uint": 32, "num-byte-slice": 32},
+            "local-state-schema": {"num-uint": 8, "num-byte-slice": 8},
+            "extra-program-pages": 3,
+        }
+        self.algod.global_states[APP_ID] = {
+            ConsensusV3GlobalState.ADMIN: decode_address(self.admin),
+            ConsensusV3GlobalState.X_ALGO_ID: X_ALGO_ID,
+            ConsensusV3GlobalState.NUM_PROPOSERS: len(self.proposers),
+            ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND: 4900,
+        }
+        self.delay_mint_box_name = get_delay_mint_box_name(self.minter, b"\x00\x01")
+        checkpoint = (4900).to_bytes(8, "big") + (100).to_bytes(8, "big") + (90).to_bytes(8, "big")
+        self.algod.boxes[APP_ID] = {
+            ProposersBox.NAME: b"".join(decode_address(p) for p in self.proposers).ljust(960, b"\0"),
+            self.delay_mint_box_name: decode_address(self.holder) + (10).to_bytes(8, "big") + (4990).to_bytes(8, "big"),
+            RateCheckpointsBox.NAME: checkpoint + bytes(24),
+        }
+        self.algod.accounts[self.app_address] = {"amount": 500_000, "min-balance": 400_000, "status": "Offline"}
+        for proposer in self.proposers:
+            self.algod.accounts[proposer] = {
+                "amount": 10_000_000, "min-balance": 100_000, "status": "Online", "auth-addr": self.app_address,
+            }
+        for holder in (self.holder, self.other):
+            self.algod.accounts[holder] = {"amount": 2_000_000, "min-balance": 200_000, "status": "Offline"}
+        self.algod.asset_holdings[(self.app_address, X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY - 15_000_000
+        self.algod.asset_holdings[(self.holder, X_ALGO_ID)] = 5_000_000
+
+    def tearDown(self):
+        self.algod.stop()
+
+    async def capture(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            return await capture_snapshot(client, APP_ID, [self.holder, self.other])
+
+    async def test_captures_state(self):
+        snapshot = await self.capture()
+        self.assertEqual(snapshot.round, 5000)
+        self.assertEqual(snapshot.global_schema, (32, 32))
+        self.assertEqual(snapshot.extra_pages, 3)
+        self.assertEqual(set(snapshot.boxes), set(self.algod.boxes[APP_ID]))
+        self.assertEqual([p.address for p in snapshot.proposers], self.proposers)
+        self.assertEqual({p.auth_address for p in snapshot.proposers}, {self.app_address})
+        self.assertEqual([h.holdings for h in snapshot.holders], [{X_ALGO_ID: 5_000_000}, {}])
+        self.assertEqual(snapshot.x_algo_circulating_supply, 15_000_000)
+
+        consensus_snapshot = snapshot.to_consensus_snapshot()
+        self.assertEqual(len(consensus_snapshot.proposers), 2)
+        delay_mint = consensus_snapshot.delay_mints[self.delay_mint_box_name]
+        self.assertEqual((delay_mint.minter, delay_mint.receiver, delay_mint.round), (self.minter, self.holder, 4990))
+
+    async def test_encodes_round_trip(self):
+        snapshot = await self.capture()
+        data = encode_snapshot(snapshot)
+        self.assertEqual(decode_snapshot(data), snapshot)
+
+        payload = msgpack.unpackb(zlib.decompress(data), raw=False, strict_map_key=False)
+        payload[0] = 2
+        with self.assertRaises(ValueError):
+            decode_snapshot(zlib.compress(msgpack.packb(payload, use_bin_type=True)))
+
+    async def test_remaps_addresses_and_rounds(self):
+        snapshot = await self.capture()
+        new_proposers = [new_address() for _ in range(2)]
+        new_admin, new_holder = new_address(), new_address()
+        addresses = {self.admin: new_admin, self.holder: new_holder, **dict(zip(self.proposers, new_proposers))}
+        global_state, boxes = remap_state(snapshot, addresses, X_ALGO_ID + 1, round_offset=-4000)
+
+        self.assertEqual(global_state[ConsensusV3GlobalState.ADMIN], decode_address(new_admin))
+        self.assertEqual(global_state[ConsensusV3GlobalState.X_ALGO_ID], X_ALGO_ID + 1)
+        self.assertEqual(global_state[ConsensusV3GlobalState.LAST_RATE_CHECKPOINT_ROUND], 900)
+        self.assertEqual(boxes[ProposersBox.NAME][:64], b"".join(decode_address(p) for p in new_proposers))
+
+        delay_mint = boxes[self.delay_mint_box_name]
+        self.assertEqual(delay_mint[DelayMintBox.RECEIVER:DelayMintBox.STAKE], decode_address(new_holder))
+        self.assertEqual(int.from_bytes(delay_mint[DelayMintBox.ROUND:], "big"), 990)
+
+        checkpoints = boxes[RateCheckpointsBox.NAME]
+        self.assertEqual(int.from_bytes(checkpoints[:8], "big"), 900)
+        self.assertEqual(checkpoints[8:24], snapshot.boxes[RateCheckpointsBox.NAME][8:24])
+        self.assertEqual(checkpoints[24:], bytes(24))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+import msgpack
+from algosdk.account import generate_account
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.load_generator import LoadConfig, generate, plan_operations, read_groups, replay, summarise
+from offchain.state import DelayMint
+from test_group_builder import APP_ID, PARAMS, make_snapshot
+
+
+def decode_txns(raw: bytes) -> list[dict]:
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(raw)
+    return list(unpacker)
+
+
+class LoadGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = make_snapshot([10_000_000] * 3)
+        self.funder_private_key = generate_account()[0]
+        for i, rnd in enumerate([PARAMS.first, PARAMS.first + 1]):
+            delay_mint = DelayMint(generate_account()[1], i.to_bytes(2, "big"), generate_account()[1], 1000, rnd)
+            self.snapshot.delay_mints[delay_mint.box_name] = delay_mint
+
+    def test_plan_operations_claims_each_matured_delay_mint_once(self):
+        config = LoadConfig(2, 5, {"claim_delayed_mint": 1})
+        planned = plan_operations(self.snapshot, PARAMS, config)
+        self.assertEqual([op for _, op, _ in planned], ["claim_delayed_mint"] + ["immediate_mint"] * 4)
+        self.assertEqual(planned[0][2][1], b"\x00\x00")
+
+    def test_generate(self):
+        config = LoadConfig(4, 25, {"immediate_mint": 1, "delayed_mint": 1, "burn": 1}, groups_per_file=10)
+        with tempfile.TemporaryDirectory() as out_dir:
+            counts = generate(Path(out_dir), APP_ID, self.snapshot, PARAMS, config, self.funder_private_key, 2)
+            self.assertEqual(sum(counts.values()), 25)
+            paths = sorted(Path(out_dir).glob("*.msgpack"))
+            self.assertEqual(
+                [path.name for path in paths],
+                ["00-fund.msgpack", "01-opt-in.msgpack", "02-setup-mint.msgpack"]
+                + [f"10-load-{i:04d}.msgpack" for i in range(3)],
+            )
+
+            load_groups = [group for path in paths[3:] for group in read_groups(path)]
+            self.assertEqual(Counter(group["op"] for group in load_groups), counts)
+            nonces = set()
+            for group in load_groups:
+                stxns = decode_txns(group["txns"])
+                self.assertTrue(all("sig" in stxn for stxn in stxns))
+                if len(stxns) > 1:
+                    self.assertEqual(len({stxn["txn"]["grp"] for stxn in stxns}), 1)
+                if group["op"] == "delayed_mint":
+                    app_call = stxns[1]["txn"]
+                    nonces.add((app_call["snd"], app_call["apaa"][2]))
+            # delayed mint nonces are unique per sender
+            self.assertEqual(len(nonces), counts["delayed_mint"])
+            self.assertEqual(len(list(read_groups(paths[0]))), 4)
+
+
+class ReplayTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.out_dir = tempfile.TemporaryDirectory()
+        config = LoadConfig(2, 10, {"immediate_mint": 1})
+        snapshot = make_snapshot([10_000_000] * 2)
+        generate(Path(self.out_dir.name), APP_ID, snapshot, PARAMS, config, generate_account()[0], 1)
+        self.paths = list(Path(self.out_dir.name).glob("*.msgpack"))
+
+    def tearDown(self):
+        self.algod.stop()
+        self.out_dir.cleanup()
+
+    async def test_replay(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            results = await replay(client, self.paths, concurrency=4, poll_interval=0)
+        self.assertEqual(len(results), 16)
+        self.assertEqual(len(self.algod.sent), 16)
+        self.assertTrue(all(result.error is None and result.latency is not None for result in results))
+        # setup files are fully replayed before the load
+        self.assertEqual([result.op for result in results[:2]], ["fund", "fund"])
+        summary = summarise(results, 1)
+        self.assertEqual(summary["confirmed"], 16)
+        self.assertEqual(summary["failures"], {})
+        self.assertIn("p95", summary["latency"])
+
+    async def test_replay_records_failures(self):
+        self.algod.reject_message = "overspend"
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            results = await replay(client, self.paths, concurrency=4, poll_interval=0)
+        summary = summarise(results, 1)
+        self.assertEqual(summary["confirmed"], 0)
+        self.assertEqual(summary["failures"], {"overspend": 16})
+        self.assertNotIn("latency", summary)
@@ -0,0 +1,338 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from algosdk.abi import Method
+from algosdk.encoding import checksum
+from common.utils.peephole import BRANCH_OPS, estimate_size, is_label, optimise_teal, parse
+
+CONTRACTS_PATH = Path(__file__).parents[2] / "contracts"
+CONSENSUS_V3_PATH = CONTRACTS_PATH / "xalgo" / "consensus_v3.py"
+
+
+def teal(*lines: str) -> str:
+    return "\n".join(("#pragma version 10", *lines)) + "\n"
+
+
+class PeepholeTest(unittest.TestCase):
+    def test_inlines_subroutine_called_once(self):
+        program, report = optimise_teal(teal(
+            "callsub check_0",
+            "int 1",
+            "return",
+            "check_0:",
+            "proto 0 0",
+            "txn RekeyTo",
+            "global ZeroAddress",
+            "==",
+            "assert",
+            "retsub",
+        ))
+        self.assertEqual(report.inlined, {"check_0": 1})
+        self.assertEqual(parse(program), parse(teal(
+            "txn RekeyTo",
+            "global ZeroAddress",
+            "==",
+            "assert",
+            "pushint 1",
+            "return",
+        )))
+
+    def test_inlines_subroutine_with_args_from_stack(self):
+        program, report = optimise_teal(teal(
+            "int 1",
+            "int 2",
+            "int 3",
+            "callsub mulscale_0",
+            "int 4",
+            "int 5",
+            "int 6",
+            "callsub mulscale_0",
+            "+",
+            "return",
+            "mulscale_0:",
+            "proto 3 1",
+            "frame_dig -3",
+            "frame_dig -2",
+            "mulw",
+            "frame_dig -1",
+            "divw",
+            "retsub",
+        ))
+        self.assertEqual(report.inlined, {"mulscale_0": 2})
+        # callsub, proto and retsub, the frame digs being replaced one for one
+        self.assertEqual(report.ops_saved_per_call, {"mulscale_0": 3})
+        body = ["uncover 2", "uncover 2", "mulw", "uncover 2", "divw"]
+        self.assertEqual(parse(program), parse(teal(
+            "pushint 1", "pushint 2", "pushint 3", *body, "pushint 4", "pushint 5", "pushint 6", *body, "+", "return",
+        )))
+
+    def test_inlines_subroutine_reading_arg_many_times(self):
+        program, report = optimise_teal(teal(
+            "int 0",
+            "callsub check_0",
+            "txn Fee",
+            "return",
+            "check_0:",
+            "proto 1 0",
+            "frame_dig -1",
+            "gtxns TypeEnum",
+            "int pay",
+            "==",
+            "assert",
+            "frame_dig -1",
+            "gtxns Amount",
+            "assert",
+            "retsub",
+        ))
+        # the last read is already on top of the stack so uncovered in place
+        self.assertEqual(report.ops_saved_per_call, {"check_0": 4})
+        self.assertEqual(parse(program), parse(teal(
+            "pushint 0", "dup", "gtxns TypeEnum", "pushint 1", "==", "assert", "gtxns Amount", "assert", "txn Fee",
+            "return",
+        )))
+
+    def test_does_not_inline_subroutine_with_branches_locals_or_unread_args(self):
+        program = teal(
+            "int 1",
+            "int 2",
+            "callsub minimum_0",
+            "callsub flag_1",
+            "int 3",
+            "callsub first_2",
+            "callsub local_3",
+            "return",
+            "minimum_0:",
+            "proto 2 1",
+            "frame_dig -2",
+            "frame_dig -1",
+            "<",
+            "bnz minimum_0_l2",
+            "frame_dig -1",
+            "retsub",
+            "minimum_0_l2:",
+            "frame_dig -2",
+            "retsub",
+            "flag_1:",
+            "proto 0 1",
+            "int 1",
+            "bnz flag_1_l2",
+            "int 0",
+            "flag_1_l2:",
+            "retsub",
+            "first_2:",
+            "proto 2 1",
+            "frame_dig -2",
+            "retsub",
+            "local_3:",
+            "proto 1 1",
+            "int 0",
+            "frame_dig 0",
+            "frame_dig -1",
+            "+",
+            "frame_bury 0",
+            "retsub",
+        )
+        _, report = optimise_teal(program)
+        self.assertEqual(report.inlined, {})
+
+    def test_inlines_nested_subroutines_keeping_call_order(self):
+        program, report = optimise_teal(teal(
+            "callsub outer_0",
+            "callsub fee_1",
+            "+",
+            "return",
+            "outer_0:",
+            "proto 0 0",
+            "callsub fee_1",
+            "pop",
+            "retsub",
+            "fee_1:",
+            "proto 0 1",
+            "byte \"fee\"",
+            "app_global_get",
+            "retsub",
+        ), max_inline_size=0)
+        # the subroutine returning a value is called twice and too big so stays a call
+        self.assertEqual(report.inlined, {"outer_0": 1})
+        self.assertEqual(parse(program), parse(teal(
+            "callsub fee_1",
+            "pop",
+            "callsub fee_1",
+            "+",
+            "return",
+            "fee_1:",
+            "proto 0 1",
+            "pushbytes 0x666565",
+            "app_global_get",
+            "retsub",
+        )))
+
+    def test_does_not_inline_subroutine_reached_other_than_by_call(self):
+        body = ["check_0:", "proto 0 0", "int 1", "assert", "retsub"]
+        programs = [
+            # branched to
+            teal("callsub check_0", "b check_0", *body),
+            # fallen through to
+            teal("callsub check_0", "int 1", *body),
+            # recursive
+            teal("callsub check_0", "int 1", "return", "check_0:", "proto 0 0", "callsub check_0", "retsub"),
+        ]
+        for program in programs:
+            optimised, report = optimise_teal(program)
+            self.assertEqual(report.inlined, {})
+            self.assertIn(("callsub", "check_0"), parse(optimised))
+
+    def test_only_inlines_small_subroutine_called_many_times(self):
+        body = ["txn Sender", "byte \"admin\"", "app_global_get", "==", "assert"]
+        program = teal(
+            "callsub check_0", "callsub check_0", "int 1", "return", "check_0:", "proto 0 0", *body, "retsub"
+        )
+        _, report = optimise_teal(program, max_inline_size=4)
+        self.assertEqual(report.inlined, {})
+        _, report = optimise_teal(program, max_inline_size=8)
+        self.assertEqual(report.inlined, {"check_0": 2})
+
+    def test_removes_store_loads(self):
+        program, report = optimise_teal(teal(
+            "txn Fee",
+            "store 0",
+            "load 0",
+            "txn Amount",
+            "store 1",
+            "load 1",
+            "+",
+            "load 1",
+            "load 1",
+            "+",
+            "+",
+            "return",
+        ))
+        self.assertEqual(report.removed_store_loads, 2)
+        self.assertEqual(report.collapsed_reads, 1)
+        self.assertEqual(parse(program), parse(teal(
+            "txn Fee",
+            "txn Amount",
+            "dup",
+            "store 1",
+            "+",
+            "load 1",
+            "dup",
+            "+",
+            "+",
+            "return",
+        )))
+
+    def test_keeps_store_loads_with_dynamic_scratch_access(self):
+        program = teal("txn Fee", "store 0", "load 0", "int 0", "loads", "==", "return")
+        optimised, report = optimise_teal(program)
+        self.assertEqual(report.removed_store_loads, 0)
+        self.assertEqual(parse(optimised)[1:4], [("txn", "Fee"), ("store", "0"), ("load", "0")])
+
+    def test_only_collapses_adjacent_reads(self):
+        program, report = optimise_teal(teal(
+            "load 0",
+            "label_0:",
+            "load 0",
+            "txna Accounts 1",
+            "txna Accounts 1",
+            "==",
+            "return",
+        ))
+        # a label between the reads may be branched to with a different stack
+        self.assertEqual(report.collapsed_reads, 1)
+        self.assertEqual(parse(program), parse(teal(
+            "load 0",
+            "label_0:",
+            "load 0",
+            "txna Accounts 1",
+            "dup",
+            "==",
+            "return",
+        )))
+
+    def test_collapses_global_state_reads(self):
+        program, report = optimise_teal(teal(
+            "byte \"fee\"",
+            "app_global_get",
+            "byte \"fee\"",
+            "app_global_get",
+            "global OpcodeBudget",
+            "global OpcodeBudget",
+            "return",
+        ))
+        self.assertEqual(report.collapsed_reads, 1)
+        self.assertEqual(parse(program), parse(teal(
+            "pushbytes 0x666565",
+            "app_global_get",
+            "dup",
+            "global OpcodeBudget",
+            "global OpcodeBudget",
+            "return",
+        )))
+
+    def test_assembles_constants_by_frequency(self):
+        program, _ = optimise_teal(teal(
+            "int 5",
+            "int NoOp",
+            "int 5",
+            "int 0",
+            "int 0",
+            "method \"dummy()void\"",
+            "byte 0x01",
+            "byte 0x01",
+            "return",
+        ))
+        self.assertEqual(parse(program), parse(teal(
+            "intcblock 0 5",
+            "bytecblock 0x01",
+            "intc_1",
+            "intc_0",
+            "intc_1",
+            "intc_0",
+            "intc_0",
+            "pushbytes 0x" + Method.from_signature("dummy()void").get_selector().hex(),
+            "bytec_0",
+            "bytec_0",
+            "return",
+        )))
+
+    def test_optimises_consensus_v3(self):
+        env = {**os.environ, "PYTHONPATH": str(CONTRACTS_PATH)}
+        default = subprocess.run(
+            [sys.executable, CONSENSUS_V3_PATH], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = subprocess.run(
+            [sys.executable, CONSENSUS_V3_PATH, "--optimise"], env=env, capture_output=True, text=True, check=True
+        )
+        _, report = optimise_teal(default)
+        self.assertGreater(report.bytes_saved, 0)
+        self.assertEqual(result.stderr.strip(), str(report))
+
+        # every branch and call target still exists
+        instructions = parse(result.stdout)
+        labels = {op[:-1] for op, _ in instructions if is_label((op, _))}
+        for op, args in instructions:
+            if op in BRANCH_OPS | {"callsub"}:
+                self.assertTrue(set(args.split()) <= labels, f"{op} {args}")
+
+        # every constant reference is within its block and every method is still dispatched
+        blocks = {op: args.split() for op, args in instructions if op in ("intcblock", "bytecblock")}
+        pushed = {args for op, args in instructions if op == "pushbytes"}
+        for op, args in instructions:
+            if op.startswith(("intc", "bytec")) and not op.endswith("block"):
+                block, _, index = op.partition("_")
+                self.assertLess(int(index or args), len(blocks[f"{block}block"]), op)
+        for op, args in parse(default):
+            if op == "method":
+                # events are logged with the selector of their signature too
+                selector = "0x" + checksum(args.strip('"').encode())[:4].hex()
+                self.assertTrue(selector in pushed or selector in blocks["bytecblock"], args)
+        # fits in the max program size with all extra pages
+        self.assertLessEqual(estimate_size(instructions), 8192)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.proposer_rewards import ProposerFlows, get_block_flows, report
+from offchain.state import ConsensusV3GlobalState, ProposersBox
+
+APP_ID = 1000
+APP_ADDRESS = get_application_address(APP_ID)
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def payment(sender: str, receiver: str, amount: int, fee: int = 0) -> dict:
+    return {"txn": {"type": "pay", "snd": sender, "rcv": receiver, "amt": amount, "fee": fee}}
+
+
+def app_call(sender: str, inner_txns: list[dict]) -> dict:
+    return {"txn": {"type": "appl", "snd": sender, "apid": APP_ID, "fee": 1000}, "dt": {"itx": inner_txns}}
+
+
+class ProposerRewardsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.algod.round = 1000
+        self.proposers = [new_address() for _ in range(2)]
+        self.user, self.donor = new_address(), new_address()
+        self.algod.global_states[APP_ID] = {ConsensusV3GlobalState.NUM_PROPOSERS: len(self.proposers)}
+        self.algod.boxes[APP_ID] = {ProposersBox.NAME: b"".join(decode_address(p) for p in self.proposers)}
+        for proposer, active_balance in zip(self.proposers, [10_000_000, 20_000_000]):
+            self.algod.accounts[proposer] = {
+                "amount": active_balance + 100_000, "min-balance": 100_000, "status": "Online",
+            }
+
+        p0, p1 = self.proposers
+        # proposes with payout and mint allocated to other proposer
+        self.algod.add_block(
+            [payment(self.user, APP_ADDRESS, 5_000_000), app_call(self.user, [payment(APP_ADDRESS, p1, 5_000_000)])],
+            prp=p0, pp=2_000_000,
+        )
+        # donation
+        self.algod.add_block([payment(self.donor, p1, 1_000_000, fee=1000)])
+        # sent fee then registers online paying it
+        keyreg = {"txn": {"type": "keyreg", "snd": p0, "fee": 2_000_000}}
+        self.algod.add_block([app_call(self.user, [payment(APP_ADDRESS, p0, 2_000_000), keyreg])])
+        # burn allocated from first proposer
+        self.algod.add_block(
+            [app_call(self.user, [payment(p0, APP_ADDRESS, 3_000_000), payment(APP_ADDRESS, self.user, 3_000_000)])],
+            prp=p1, pp=500_000,
+        )
+
+    def tearDown(self):
+        self.algod.stop()
+
+    def test_classifies_flows(self):
+        p0, p1 = self.proposers
+        proposers = set(self.proposers)
+        flows = [get_block_flows(self.algod.blocks[rnd], APP_ID, proposers).flows for rnd in range(1001, 1005)]
+        self.assertEqual(flows[0], {
+            p0: ProposerFlows(blocks_proposed=1, block_payouts=2_000_000),
+            p1: ProposerFlows(transfers_in=5_000_000),
+        })
+        self.assertEqual(flows[1], {p1: ProposerFlows(other_inflows=1_000_000)})
+        self.assertEqual(flows[2], {p0: ProposerFlows(transfers_in=2_000_000, fees_paid=2_000_000)})
+        self.assertEqual(flows[3][p0], ProposerFlows(transfers_out=3_000_000))
+        self.assertEqual(flows[3][p1].rewards, 500_000)
+
+    async def test_ranks_proposers_by_yield_per_window(self):
+        p0, p1 = self.proposers
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            performances = await report(client, APP_ID, 1001, window=2)
+
+        first, second = performances[:2], performances[2:]
+        self.assertEqual([(p.first_round, p.last_round) for p in performances], [(1001, 1002)] * 2 + [(1003, 1004)] * 2)
+        # balances reconstructed as 11 and 13.5 ALGO before the first round
+        self.assertEqual([(p.address, p.rewards, p.average_stake) for p in first], [
+            (p0, 2_000_000, 12_000_000),
+            (p1, 1_000_000, 16_000_000),
+        ])
+        self.assertEqual([(p.address, p.rewards, p.average_stake) for p in second], [
+            (p1, 500_000, 19_500_000),
+            (p0, 0, 13_000_000),
+        ])
+        self.assertAlmostEqual(first[0].yield_per_algo, 1 / 6)
+        self.assertEqual(second[1].blocks_proposed, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AlgodHTTPError, AsyncAlgodClient
+from offchain.quote_service import LRUCache, QuoteService, get_quote
+from offchain.state import X_ALGO_TOTAL_SUPPLY, ConsensusV3GlobalState, ProposersBox
+
+APP_ID = 1000
+APP_ADDRESS = get_application_address(APP_ID)
+X_ALGO_ID = 2000
+ONE_16_DP = int(1e16)
+
+ACTIVE_BALANCE = int(2000e6)
+UNCLAIMED_FEES = int(10e6)
+CIRCULATING_SUPPLY = int(1800e6)
+PREMIUM = int(0.001e16)
+
+
+class QuoteServiceTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.algod = FakeAlgod().start()
+        proposers = [generate_account()[1] for _ in range(2)]
+        self.algod.global_states[APP_ID] = {
+            ConsensusV3GlobalState.NUM_PROPOSERS: len(proposers),
+            ConsensusV3GlobalState.X_ALGO_ID: X_ALGO_ID,
+            ConsensusV3GlobalState.MAX_PROPOSER_BALANCE: int(10_000e6),
+            ConsensusV3GlobalState.FEE: 1000,
+            ConsensusV3GlobalState.PREMIUM: PREMIUM,
+            ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: ACTIVE_BALANCE,
+            ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES: UNCLAIMED_FEES,
+            ConsensusV3GlobalState.CAN_IMMEDIATE_MINT: 1,
+        }
+        self.algod.boxes[APP_ID] = {ProposersBox.NAME: b"".join(decode_address(p) for p in proposers)}
+        for proposer in proposers:
+            self.algod.accounts[proposer] = {
+                "amount": ACTIVE_BALANCE // 2 + 100_000, "min-balance": 100_000, "status": "Online",
+            }
+        self.algod.asset_holdings[(APP_ADDRESS, X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY - CIRCULATING_SUPPLY
+
+        self.upstream = AsyncAlgodClient("", self.algod.address)
+        self.service = QuoteService(self.upstream, APP_ID, cache_size=16)
+        self.server = await self.service.start("127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.client = AsyncAlgodClient("", f"http://{host}:{port}", max_connections=64)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.service.stop(self.server)
+        await self.upstream.close()
+        self.algod.stop()
+
+    async def test_coalesces_requests_per_round(self):
+        amounts = [int(1e6) + i % 4 for i in range(100)]
+        quotes = await asyncio.gather(*(
+            self.client.get("/quote/immediate_mint", {"amount": amount}) for amount in amounts
+        ))
+        algo_balance = ACTIVE_BALANCE - UNCLAIMED_FEES
+        for amount, quote in zip(amounts, quotes):
+            expected = amount * CIRCULATING_SUPPLY // algo_balance * (ONE_16_DP - PREMIUM) // ONE_16_DP
+            self.assertEqual((quote["round"], quote["amount"], quote["quote"]), (1, amount, expected))
+        self.assertEqual(self.algod.count(f"/v2/applications/{APP_ID}"), 1)
+        self.assertEqual(self.service.state.num_fetches, 1)
+        self.assertEqual(len(self.service.cache), 4)
+
+        # state is fetched again once the round advances
+        self.algod.round += 1
+        while self.service.state.round < 2:
+            await asyncio.sleep(0.01)
+        quotes = await asyncio.gather(*(self.client.get("/quote/burn", {"amount": int(1e6)}) for _ in range(20)))
+        self.assertEqual({quote["round"] for quote in quotes}, {2})
+        self.assertEqual(quotes[0]["quote"], int(1e6) * algo_balance // CIRCULATING_SUPPLY)
+        self.assertEqual(self.service.state.num_fetches, 2)
+
+    async def test_rejects_invalid_requests(self):
+        with self.assertRaises(AlgodHTTPError) as context:
+            await self.client.get("/quote/burn", {"amount": CIRCULATING_SUPPLY + 1})
+        self.assertEqual(context.exception.status, 422)
+        with self.assertRaises(AlgodHTTPError) as context:
+            await self.client.get("/quote/delayed_mint", {"amount": 1})
+        self.assertEqual(context.exception.status, 404)
+        with self.assertRaises(AlgodHTTPError) as context:
+            await self.client.get("/quote/burn", {"amount": "one"})
+        self.assertEqual(context.exception.status, 400)
+
+    async def test_quotes_claim_at_rate_without_premium(self):
+        snapshot = await self.service.state.get()
+        stake = int(5e6)
+        self.assertEqual(
+            get_quote(snapshot, "claim_delayed_mint", stake),
+            stake * CIRCULATING_SUPPLY // (ACTIVE_BALANCE - UNCLAIMED_FEES),
+        )
+        snapshot.global_state[ConsensusV3GlobalState.CAN_IMMEDIATE_MINT] = 0
+        with self.assertRaises(ValueError):
+            get_quote(snapshot, "immediate_mint", stake)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c"), len(cache)), (1, 3, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from fractions import Fraction
+
+from offchain.rate_checkpoints import RateCheckpoint, RateCheckpoints, decode_rate_checkpoints
+from offchain.state import RateCheckpointsBox
+
+
+def encode_checkpoint(rnd: int, algo_balance: int, x_algo_circulating_supply: int) -> bytes:
+    return rnd.to_bytes(8, "big") + algo_balance.to_bytes(8, "big") + x_algo_circulating_supply.to_bytes(8, "big")
+
+
+def encode_ring_buffer(slots: list[tuple[int, int, int] | None]) -> bytes:
+    value = b"".join(encode_checkpoint(*slot) if slot else bytes(RateCheckpointsBox.CHECKPOINT_SIZE) for slot in slots)
+    return value.ljust(RateCheckpointsBox.MAX_NUM_CHECKPOINTS * RateCheckpointsBox.CHECKPOINT_SIZE, b"\x00")
+
+
+class RateCheckpointsTest(unittest.TestCase):
+    def test_orders_checkpoints_across_ring_wrap(self):
+        # next index is 2 so the two newest checkpoints were written over the oldest at the start of the box
+        slots = [(4300, 43, 40), (4400, 44, 40)]
+        slots += [(rnd, rnd // 100, 40) for rnd in range(200, 4200, 100)]
+        checkpoints = decode_rate_checkpoints(encode_ring_buffer(slots))
+        self.assertEqual(len(checkpoints), RateCheckpointsBox.MAX_NUM_CHECKPOINTS)
+        self.assertEqual([checkpoint.round for checkpoint in checkpoints], sorted(rnd for rnd, _, _ in slots))
+        self.assertEqual(checkpoints[-1], RateCheckpoint(4400, 44, 40))
+
+    def test_skips_empty_slots(self):
+        value = encode_ring_buffer([(300, 6, 5), None, (100, 5, 5)])
+        self.assertEqual(decode_rate_checkpoints(value), [RateCheckpoint(100, 5, 5), RateCheckpoint(300, 6, 5)])
+        self.assertEqual(decode_rate_checkpoints(encode_ring_buffer([])), [])
+
+    def test_rate_is_one_when_nothing_staked(self):
+        self.assertEqual(RateCheckpoint(100, 0, 0).rate, 1)
+        self.assertEqual(RateCheckpoint(100, 5, 0).rate, 1)
+
+    def test_returns_exact_rate_at_checkpoint(self):
+        rates = RateCheckpoints.from_box_value(encode_ring_buffer([(200, 12, 10), (100, 11, 10)]))
+        self.assertEqual(rates.rate_at(100), Fraction(11, 10))
+        self.assertEqual(rates.rate_at(200), Fraction(12, 10))
+
+    def test_interpolates_between_checkpoints(self):
+        rates = RateCheckpoints.from_box_value(encode_ring_buffer([(100, 10, 10), (400, 13, 10)]))
+        self.assertEqual(rates.rate_at(200), Fraction(11, 10))
+        self.assertEqual(rates.rate_at(150), Fraction(21, 20))
+        # exact rather than rounded
+        self.assertEqual(rates.rate_at(101), 1 + Fraction(3, 10) / 300)
+
+    def test_holds_latest_rate_after_last_checkpoint(self):
+        rates = RateCheckpoints([RateCheckpoint(100, 10, 10), RateCheckpoint(200, 12, 10)])
+        self.assertEqual(rates.rate_at(10_000), Fraction(12, 10))
+
+    def test_fails_before_oldest_checkpoint(self):
+        rates = RateCheckpoints([RateCheckpoint(100, 10, 10)])
+        with self.assertRaisesRegex(ValueError, "round 99"):
+            rates.rate_at(99)
+        with self.assertRaises(ValueError):
+            RateCheckpoints([]).rate_at(100)
+
+
+if __name__ == "__main__":
+    unittest.main()
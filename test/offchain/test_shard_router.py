@@ -0,0 +1,260 @@
+import unittest
+
+from algosdk.account import generate_account
+from algosdk.atomic_transaction_composer import EmptySigner
+from algosdk.encoding import decode_address
+from algosdk.logic import get_application_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.group_builder import MAX_TXN_ACCOUNTS, MAX_TXN_REFERENCES, AppCallReferences, CallRequirements
+from offchain.shard_router import (
+    ShardRouter,
+    ShardState,
+    add_shard_call_references,
+    get_burn_value,
+    get_combined_rate,
+    get_shard_references,
+    get_shard_state,
+    select_burn_shard,
+    select_mint_shard,
+)
+from offchain.state import (
+    X_ALGO_TOTAL_SUPPLY,
+    ConsensusV3GlobalState,
+    ProposersBox,
+    RateCheckpointsBox,
+    ShardsBox,
+)
+from test_group_builder import PARAMS, make_snapshot
+
+ROUTER_APP_ID = 500
+X_ALGO_ID = 900
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def shard(
+    app_id: int,
+    algo_balance: int,
+    capacity: int,
+    can_immediate_mint: bool = True,
+    router_x_algo_balance: int = 0,
+) -> ShardState:
+    return ShardState(
+        app_id, app_id + 1, algo_balance, algo_balance // 2, capacity, can_immediate_mint, router_x_algo_balance
+    )
+
+
+class SelectShardTest(unittest.TestCase):
+    def test_gets_shard_state_from_published_state(self):
+        # pending stake is held by the proposers
+        snapshot = make_snapshot(
+            [1_100_000, 1_100_000, 1_600_000],
+            **{
+                ConsensusV3GlobalState.MAX_PROPOSER_BALANCE: 2_000_000,
+                ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: 3_000_000,
+                ConsensusV3GlobalState.TOTAL_PENDING_STAKE: 500_000,
+                ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES: 100_000,
+                ConsensusV3GlobalState.CAN_IMMEDIATE_MINT: 1,
+            },
+        )
+        state = get_shard_state(1000, snapshot, 7)
+        self.assertEqual(state.algo_balance, 3_000_000 - 100_000)
+        self.assertEqual(state.capacity, 6_000_000 - 3_000_000 - 500_000)
+        self.assertTrue(state.can_immediate_mint)
+        self.assertEqual(state.router_x_algo_balance, 7)
+
+    def test_gets_shard_state_including_rewards_since_last_sync(self):
+        # 10% fee on the rewards received since the shard last synced
+        snapshot = make_snapshot(
+            [1_100_000, 2_100_000],
+            **{
+                ConsensusV3GlobalState.MAX_PROPOSER_BALANCE: 2_000_000,
+                ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: 2_000_000,
+                ConsensusV3GlobalState.TOTAL_UNCLAIMED_FEES: 100_000,
+                ConsensusV3GlobalState.FEE: 1000,
+            },
+        )
+        state = get_shard_state(1000, snapshot)
+        self.assertEqual(state.algo_balance, 3_000_000 - 100_000 - 100_000)
+        self.assertEqual(state.capacity, 4_000_000 - 3_000_000)
+
+        # shard without proposers is not synced
+        snapshot.global_state[ConsensusV3GlobalState.NUM_PROPOSERS] = 0
+        self.assertEqual(get_shard_state(1000, snapshot).algo_balance, 2_000_000 - 100_000)
+
+    def test_mints_in_least_loaded_shard(self):
+        states = [shard(1000, 10, 500), shard(2000, 10, 900, can_immediate_mint=False), shard(3000, 10, 700)]
+        self.assertEqual(select_mint_shard(states, 700).app_id, 3000)
+        with self.assertRaises(ValueError):
+            select_mint_shard(states, 701)
+
+    def test_burns_from_best_funded_shard_held_by_router(self):
+        # rate of 2 ALGO per xALGO in each shard
+        states = [
+            shard(1000, 1000, 0, router_x_algo_balance=500),
+            shard(2000, 3000, 0, router_x_algo_balance=100),
+            shard(3000, 2000, 0, router_x_algo_balance=300),
+        ]
+        self.assertEqual(select_burn_shard(states, 200).app_id, 2000)
+        self.assertEqual(select_burn_shard(states, 600).app_id, 3000)
+        self.assertEqual(select_burn_shard(states, 1000).app_id, 1000)
+        with self.assertRaises(ValueError):
+            select_burn_shard(states, 1001)
+
+    def test_combined_rate_is_value_of_shard_x_algo_held_by_router(self):
+        states = [shard(1000, 1000, 0, router_x_algo_balance=500), shard(2000, 3000, 0, router_x_algo_balance=100)]
+        self.assertEqual(get_combined_rate(states, 1000), (1200, 1000))
+        # shard xALGO not held by the router does not back the shared xALGO
+        self.assertEqual(get_combined_rate([shard(1000, 1000, 0)], 0), (0, 0))
+
+    def test_burn_value_at_combined_rate(self):
+        states = [shard(1000, 1000, 0, router_x_algo_balance=500), shard(2000, 3000, 0, router_x_algo_balance=100)]
+        self.assertEqual(get_burn_value(states, 1000, 100), 120)
+        self.assertEqual(get_burn_value(states, 1000, 1), 1)
+        self.assertEqual(get_burn_value(states, 0, 100), 0)
+
+    def test_keeps_shard_references_in_same_call(self):
+        receiver = new_address()
+        calls = get_shard_references(ROUTER_APP_ID, X_ALGO_ID, [shard(1000 * i, 0, 0) for i in range(1, 6)], receiver)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[0].boxes, [(ROUTER_APP_ID, ShardsBox.NAME)])
+        # receiver holding of the shared xALGO is available
+        self.assertEqual(calls[0].assets[0], X_ALGO_ID)
+        self.assertEqual(calls[0].accounts[0], receiver)
+        for call in calls:
+            self.assertLessEqual(call.num_references, MAX_TXN_REFERENCES)
+            self.assertLessEqual(len(call.accounts), MAX_TXN_ACCOUNTS)
+            shard_accounts = [account for account in call.accounts if account != receiver]
+            self.assertEqual(shard_accounts, [get_application_address(app_id) for app_id in call.apps])
+            shard_assets = [asset for asset in call.assets if asset != X_ALGO_ID]
+            self.assertEqual(shard_assets, [app_id + 1 for app_id in call.apps])
+
+    def test_adds_shard_call_references_to_free_slots(self):
+        router_address = get_application_address(ROUTER_APP_ID)
+        proposers = [new_address() for _ in range(3)]
+        calls = [AppCallReferences(accounts=[proposers[0]], apps=[1000]), AppCallReferences(apps=[2000] * 7)]
+        requirements = CallRequirements(
+            accounts=[router_address, *proposers],
+            assets=[1001],
+            boxes=[ProposersBox.NAME, b"other"],
+        )
+        calls = add_shard_call_references(calls, 1000, requirements, {router_address})
+        accounts = [account for call in calls for account in call.accounts]
+        self.assertEqual(sorted(accounts), sorted(proposers))
+        for call in calls:
+            self.assertLessEqual(call.num_references, MAX_TXN_REFERENCES)
+            # boxes of the shard are in calls which reference the shard
+            for app_id, _ in call.boxes:
+                self.assertIn(app_id, call.apps)
+        box_names = sorted(name for call in calls for _, name in call.boxes)
+        self.assertEqual(box_names, sorted([ProposersBox.NAME, b"other"]))
+
+        # boxes already referenced for another inner call to the shard are not repeated
+        calls = add_shard_call_references(calls, 1000, CallRequirements(boxes=[ProposersBox.NAME]), {router_address})
+        self.assertEqual(sum(box == (1000, ProposersBox.NAME) for call in calls for box in call.boxes), 1)
+
+
+class ShardRouterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.algod = FakeAlgod().start()
+        self.shards = [1000, 2000]
+        self.router_address = get_application_address(ROUTER_APP_ID)
+        self.algod.global_states[ROUTER_APP_ID] = {"num_shards": len(self.shards), "x_algo_id": X_ALGO_ID}
+        self.algod.boxes[ROUTER_APP_ID] = {
+            ShardsBox.NAME: b"".join(app_id.to_bytes(8, "big") for app_id in self.shards).ljust(ShardsBox.SIZE, b"\0")
+        }
+        self.algod.asset_holdings[(self.router_address, X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY - 15_000_000
+        # second shard is less loaded and better funded, each at a rate of 1 ALGO per xALGO
+        self.proposers = {}
+        for app_id, num_proposers in zip(self.shards, [1, 2]):
+            proposers = [new_address() for _ in range(num_proposers)]
+            for proposer in proposers:
+                self.algod.accounts[proposer] = {"amount": 10_100_000, "min-balance": 100_000, "status": "Online"}
+            self.algod.global_states[app_id] = {
+                ConsensusV3GlobalState.X_ALGO_ID: app_id + 1,
+                ConsensusV3GlobalState.NUM_PROPOSERS: num_proposers,
+                ConsensusV3GlobalState.MAX_PROPOSER_BALANCE: 50_000_000,
+                ConsensusV3GlobalState.LAST_PROPOSERS_ACTIVE_BALANCE: 10_000_000 * num_proposers,
+                ConsensusV3GlobalState.CAN_IMMEDIATE_MINT: 1,
+            }
+            self.algod.boxes[app_id] = {ProposersBox.NAME: b"".join(decode_address(p) for p in proposers)}
+            self.algod.asset_holdings[(get_application_address(app_id), app_id + 1)] = (
+                X_ALGO_TOTAL_SUPPLY - 10_000_000 * num_proposers
+            )
+            self.algod.asset_holdings[(self.router_address, app_id + 1)] = 5_000_000 * num_proposers
+            self.proposers[app_id] = proposers
+        self.user = new_address()
+
+    def tearDown(self):
+        self.algod.stop()
+
+    def assert_routed(self, atc, shard: int):
+        _, *app_calls = [txn.txn for txn in atc.build_group()]
+        self.assertTrue(all(app_call.index == ROUTER_APP_ID for app_call in app_calls))
+        # every shard is synced before pricing, not only the one minted or burnt in
+        accounts = {account for app_call in app_calls for account in app_call.accounts}
+        boxes = [
+            ((app_call.foreign_apps[box.app_index - 1] if box.app_index else ROUTER_APP_ID), box.name)
+            for app_call in app_calls
+            for box in app_call.boxes
+        ]
+        for app_id in self.shards:
+            self.assertLessEqual(set(self.proposers[app_id]), accounts)
+            self.assertEqual(boxes.count((app_id, ProposersBox.NAME)), 1)
+        self.assertIn((shard, RateCheckpointsBox.NAME), boxes)
+        self.assertIn((ROUTER_APP_ID, ShardsBox.NAME), boxes)
+        # fee of the group is paid by the first app call, covering the sync of each shard
+        self.assertGreater(app_calls[0].fee, (len(app_calls) + len(self.shards)) * 1000)
+        self.assertTrue(all(app_call.fee == 0 for app_call in app_calls[1:]))
+        return app_calls
+
+    async def test_fetches_states(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            router = ShardRouter(client, ROUTER_APP_ID)
+            self.assertEqual(await router.fetch_shards(), self.shards)
+            states = await router.fetch_states()
+        self.assertEqual(router.x_algo_id, X_ALGO_ID)
+        self.assertEqual(router.x_algo_circulating_supply, 15_000_000)
+        self.assertEqual([state.algo_balance for state in states], [10_000_000, 20_000_000])
+        self.assertEqual([state.capacity for state in states], [40_000_000, 80_000_000])
+        self.assertEqual([state.router_x_algo_balance for state in states], [5_000_000, 10_000_000])
+        self.assertEqual(get_combined_rate(states, router.x_algo_circulating_supply), (15_000_000, 15_000_000))
+
+    async def test_builds_mint_through_router_in_least_loaded_shard(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            router = ShardRouter(client, ROUTER_APP_ID)
+            app_id, atc = await router.build_mint(self.user, EmptySigner(), PARAMS, 1_000_000, self.user)
+        self.assertEqual(app_id, 2000)
+        send_algo = atc.build_group()[0].txn
+        self.assertEqual((send_algo.receiver, send_algo.amt, send_algo.fee), (self.router_address, 1_000_000, 0))
+        app_calls = self.assert_routed(atc, 2000)
+        self.assertIn(self.user, app_calls[0].accounts)
+        self.assertIn(X_ALGO_ID, app_calls[0].foreign_assets)
+
+    async def test_builds_burn_through_router_from_shard_held(self):
+        async with AsyncAlgodClient("", self.algod.address) as client:
+            router = ShardRouter(client, ROUTER_APP_ID)
+            app_id, atc = await router.build_burn(self.user, EmptySigner(), PARAMS, 1_000_000, self.user)
+            self.assertEqual(app_id, 2000)
+            send_xalgo = atc.build_group()[0].txn
+            self.assertEqual((send_xalgo.index, send_xalgo.amount), (X_ALGO_ID, 1_000_000))
+            self.assertEqual(send_xalgo.receiver, self.router_address)
+            self.assert_routed(atc, 2000)
+
+            # router no longer holds enough of the better funded shard
+            self.algod.asset_holdings[(self.router_address, 2001)] = 0
+            self.algod.asset_holdings[(self.router_address, X_ALGO_ID)] = X_ALGO_TOTAL_SUPPLY - 5_000_000
+            app_id, atc = await router.build_burn(self.user, EmptySigner(), PARAMS, 1_000_000, self.user)
+            self.assertEqual(app_id, 1000)
+            self.assert_routed(atc, 1000)
+
+            with self.assertRaises(ValueError):
+                await router.build_burn(self.user, EmptySigner(), PARAMS, 6_000_000, self.user)
+
+
+if __name__ == "__main__":
+    unittest.main()
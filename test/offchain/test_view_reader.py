@@ -0,0 +1,86 @@
+import unittest
+from base64 import b64encode
+
+import msgpack
+from algosdk.account import generate_account
+from algosdk.encoding import decode_address
+
+from fake_algod import FakeAlgod
+from offchain.async_algod import AsyncAlgodClient
+from offchain.state import get_delay_mint_box_name
+from offchain.view_reader import (
+    ABI_RETURN_PREFIX,
+    BYTES_TYPE,
+    SC_UPDATE_TYPE,
+    ConsensusViewReader,
+    decode_proposer_records,
+)
+
+APP_ID = 1000
+
+
+def new_address() -> str:
+    return generate_account()[1]
+
+
+def txn_result(abi_type, value: bytes) -> dict:
+    log = ABI_RETURN_PREFIX + abi_type.encode(value)
+    return {"txn-result": {"logs": [b64encode(log).decode()]}}
+
+
+def proposer_record(address: str, balance: int, added_proposer: bytes = b"") -> bytes:
+    return (
+        decode_address(address) + balance.to_bytes(8, "big") + (100_000).to_bytes(8, "big")
+        + added_proposer.ljust(40, b"\x00")
+    )
+
+
+class ViewReaderTest(unittest.IsolatedAsyncioTestCase):
+    def test_decodes_proposer_records(self):
+        proposer, admin = new_address(), new_address()
+        value = proposer_record(proposer, 2_000_000)
+        value += proposer_record(proposer, 3_000_000, (1_700_000_000).to_bytes(8, "big") + decode_address(admin))
+        first, second = decode_proposer_records(value)
+        self.assertEqual(
+            (first.balance, first.min_balance, first.admin_timestamp, first.admin), (2_000_000, 100_000, 0, None),
+        )
+        self.assertEqual((second.balance, second.admin_timestamp, second.admin), (3_000_000, 1_700_000_000, admin))
+
+    async def test_fetches_snapshot_in_single_simulate(self):
+        proposers = [new_address() for _ in range(2)]
+        minter, receiver = new_address(), new_address()
+        pending = get_delay_mint_box_name(minter, b"\x00\x01")
+        claimed = get_delay_mint_box_name(minter, b"\x00\x00")
+
+        algod = FakeAlgod().start()
+        algod.global_states[APP_ID] = {}
+        algod.boxes[APP_ID] = {claimed: b"", pending: b""}
+        delay_mint = decode_address(receiver) + (5).to_bytes(8, "big") + (9).to_bytes(8, "big")
+        algod.simulate_result = {"txn-results": [
+            txn_result(SC_UPDATE_TYPE, bytes(72)),
+            txn_result(BYTES_TYPE, b"".join(proposer_record(p, 2_000_000) for p in proposers)),
+            txn_result(BYTES_TYPE, b""),
+            txn_result(BYTES_TYPE, b""),
+            # boxes are listed in order of name
+            txn_result(BYTES_TYPE, bytes(48) + delay_mint),
+        ]}
+        try:
+            async with AsyncAlgodClient("", algod.address) as client:
+                snapshot = await ConsensusViewReader(client, APP_ID, minter).fetch_snapshot()
+        finally:
+            algod.stop()
+
+        self.assertEqual([p.address for p in snapshot.proposers], proposers)
+        self.assertEqual(list(snapshot.delay_mints), [pending])
+        self.assertEqual((snapshot.delay_mints[pending].receiver, snapshot.delay_mints[pending].stake), (receiver, 5))
+        self.assertIsNone(snapshot.scheduled_update)
+
+        self.assertEqual(len(algod.simulated), 1)
+        request = msgpack.unpackb(algod.simulated[0], strict_map_key=False)
+        self.assertTrue(request["allow-unnamed-resources"])
+        self.assertEqual(request["round"], snapshot.round)
+        self.assertEqual(len(request["txn-groups"][0]["txns"]), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
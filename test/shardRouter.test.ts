@@ -0,0 +1,584 @@
+import {
+  ABIContract,
+  Account,
+  Algodv2,
+  AtomicTransactionComposer,
+  decodeUint64,
+  encodeAddress,
+  encodeUint64,
+  generateAccount,
+  getApplicationAddress,
+  getMethodByName,
+  IntDecoding,
+  makeApplicationUpdateTxn,
+  makeBasicAccountTransactionSigner,
+  modelsv2,
+} from "algosdk";
+import { mulScale } from "folks-finance-js-sdk";
+import { prepareOptIntoAssetTxn } from "./transactions/common";
+import {
+  prepareAddShardToShardRouter,
+  prepareBurnFromShardRouter,
+  prepareCreateShardRouter,
+  prepareInitialiseShardRouter,
+  prepareMintFromShardRouter,
+  prepareUpdateShardRouterAdmin,
+  ShardRouterShard,
+} from "./transactions/shardRouter";
+import {
+  parseXAlgoConsensusGlobalState,
+  prepareCreateXAlgoConsensusV2,
+  prepareInitialiseXAlgoConsensusV2,
+  prepareInitialiseXAlgoConsensusV3,
+  prepareMintFromXAlgoConsensus,
+} from "./transactions/xAlgoConsensus";
+import { getABIContract } from "./utils/abi";
+import { getAlgoBalance, getAssetBalance } from "./utils/account";
+import { compilePyTeal, compileTeal, enc, getAppGlobalState, getParsedValueFromState } from "./utils/contracts";
+import { fundAccountWithAlgo } from "./utils/fund";
+import { privateAlgodClient, startPrivateNetwork, stopPrivateNetwork } from "./utils/privateNetwork";
+import { getParams, submitGroupTransaction, submitTransaction } from "./utils/transaction";
+
+jest.setTimeout(1000000);
+
+describe("Shard Router", () => {
+  let algodClient: Algodv2;
+  let user1: Account = generateAccount();
+  let user2: Account = generateAccount();
+  let admin: Account = generateAccount();
+  let shardRouterAppId: number, xAlgoId: number;
+  let shardRouterABI: ABIContract;
+  let shards: ShardRouterShard[] = [];
+
+  const premium = BigInt(0.001e16); // 0.1%
+  const fee = BigInt(0.1e4); // 10%
+  const routerMinBalance = BigInt(100000 + 100000 + 2500 + 400 * (2 + 128));
+  const shardMinBalance = BigInt(100000);
+
+  async function deployShard(maxProposerBalance: bigint, mintAmount: bigint): Promise<ShardRouterShard> {
+    const proposer = generateAccount();
+
+    // deploy algo consensus v2
+    const { tx: createTx, abi } = await prepareCreateXAlgoConsensusV2(
+      admin.addr,
+      admin.addr,
+      admin.addr,
+      admin.addr,
+      maxProposerBalance,
+      premium,
+      fee,
+      await getParams(algodClient),
+    );
+    let txId = await submitTransaction(algodClient, createTx, admin.sk);
+    let txInfo = await algodClient.pendingTransactionInformation(txId).do();
+    const appId = txInfo["application-index"];
+
+    // fund minimum balance
+    await fundAccountWithAlgo(algodClient, proposer.addr, BigInt(0.1e6), await getParams(algodClient));
+    await fundAccountWithAlgo(algodClient, getApplicationAddress(appId), 0.6034e6);
+
+    // initialise algo consensus v2
+    const initTxns = prepareInitialiseXAlgoConsensusV2(
+      abi,
+      appId,
+      admin.addr,
+      proposer.addr,
+      await getParams(algodClient),
+    );
+    [, txId] = await submitGroupTransaction(algodClient, initTxns, [proposer.sk, admin.sk]);
+    txInfo = await algodClient.pendingTransactionInformation(txId).do();
+    const shardXAlgoId = txInfo["inner-txns"][0]["asset-index"];
+
+    // mint to get pool started
+    const optInTx = prepareOptIntoAssetTxn(user2.addr, shardXAlgoId, await getParams(algodClient));
+    await submitTransaction(algodClient, optInTx, user2.sk);
+    const mintTxns = prepareMintFromXAlgoConsensus(
+      abi,
+      appId,
+      shardXAlgoId,
+      user2.addr,
+      mintAmount,
+      proposer.addr,
+      await getParams(algodClient),
+    );
+    await submitGroupTransaction(
+      algodClient,
+      mintTxns,
+      mintTxns.map(() => user2.sk),
+    );
+
+    // update to algo consensus v3 and initialise
+    const approval = await compileTeal(compilePyTeal("contracts/xalgo/consensus_v3"));
+    const clear = await compileTeal(compilePyTeal("contracts/common/clear_program", 10));
+    const updateTx = makeApplicationUpdateTxn(admin.addr, await getParams(algodClient), appId, approval, clear);
+    await submitTransaction(algodClient, updateTx, admin.sk);
+    const initTx = prepareInitialiseXAlgoConsensusV3(
+      getABIContract("contracts/xalgo/consensus_v3"),
+      appId,
+      admin.addr,
+      await getParams(algodClient),
+    );
+    await submitTransaction(algodClient, initTx, admin.sk);
+
+    return { appId, xAlgoId: shardXAlgoId, proposerAddrs: [proposer.addr] };
+  }
+
+  async function simulateShardRouterMethod(method: string, methodArgs: any[] = []) {
+    const atc = new AtomicTransactionComposer();
+    atc.addMethodCall({
+      sender: user1.addr,
+      signer: makeBasicAccountTransactionSigner(user1),
+      appID: shardRouterAppId,
+      method: getMethodByName(shardRouterABI.methods, method),
+      methodArgs,
+      suggestedParams: await getParams(algodClient),
+    });
+    const simReq = new modelsv2.SimulateRequest({
+      txnGroups: [],
+      allowUnnamedResources: true,
+    });
+    const { methodResults } = await atc.simulate(algodClient, simReq);
+    return methodResults[0].returnValue as any;
+  }
+
+  async function getCombinedRate() {
+    const [algoBalance, xAlgoCirculatingSupply]: [bigint, bigint] =
+      await simulateShardRouterMethod("get_combined_rate");
+    return { algoBalance, xAlgoCirculatingSupply };
+  }
+
+  async function getShardRate(shard: ShardRouterShard) {
+    const state = await parseXAlgoConsensusGlobalState(algodClient, shard.appId);
+    const algoBalance = state.lastProposersActiveBalance - state.totalUnclaimedFees;
+    const xAlgoCirculatingSupply =
+      BigInt(10e15) - (await getAssetBalance(algodClient, getApplicationAddress(shard.appId), shard.xAlgoId));
+    return { algoBalance, xAlgoCirculatingSupply };
+  }
+
+  beforeAll(async () => {
+    await startPrivateNetwork();
+    algodClient = privateAlgodClient();
+    algodClient.setIntEncoding(IntDecoding.MIXED);
+
+    // initialise accounts with algo
+    await fundAccountWithAlgo(algodClient, user1.addr, 1000e6, await getParams(algodClient));
+    await fundAccountWithAlgo(algodClient, user2.addr, 1000e6, await getParams(algodClient));
+    await fundAccountWithAlgo(algodClient, admin.addr, 1000e6, await getParams(algodClient));
+
+    // second shard has less capacity left
+    shards.push(await deployShard(BigInt(500e6), BigInt(100e6)));
+    shards.push(await deployShard(BigInt(200e6), BigInt(100e6)));
+  });
+
+  afterAll(() => {
+    stopPrivateNetwork();
+  });
+
+  describe("creation", () => {
+    test("succeeds", async () => {
+      const { tx, abi } = await prepareCreateShardRouter(admin.addr, admin.addr, await getParams(algodClient));
+      shardRouterABI = abi;
+      const txId = await submitTransaction(algodClient, tx, admin.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      shardRouterAppId = txInfo["application-index"];
+
+      // fund minimum balance
+      await fundAccountWithAlgo(algodClient, getApplicationAddress(shardRouterAppId), routerMinBalance);
+
+      // verify global state
+      const state = await getAppGlobalState(algodClient, shardRouterAppId);
+      expect(encodeAddress(Buffer.from(String(getParsedValueFromState(state, "admin")), "base64"))).toEqual(admin.addr);
+      expect(getParsedValueFromState(state, "num_shards")).toEqual(BigInt(0));
+      expect(getParsedValueFromState(state, "x_algo_id")).toEqual(BigInt(0));
+    });
+  });
+
+  describe("initialise", () => {
+    test("fails when not admin", async () => {
+      const tx = prepareInitialiseShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        user1.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test("succeeds", async () => {
+      const tx = prepareInitialiseShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        admin.addr,
+        await getParams(algodClient),
+      );
+      const txId = await submitTransaction(algodClient, tx, admin.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      xAlgoId = txInfo["inner-txns"][0]["asset-index"];
+
+      // verify shared xALGO was created
+      const assetInfo = await algodClient.getAssetByID(xAlgoId).do();
+      expect(assetInfo.params.creator).toEqual(getApplicationAddress(shardRouterAppId));
+      expect(assetInfo.params.reserve).toEqual(getApplicationAddress(shardRouterAppId));
+      expect(assetInfo.params.total).toEqual(BigInt(10e15));
+      expect(assetInfo.params.decimals).toEqual(6);
+      expect(assetInfo.params.name).toEqual("Sharded xAlgo");
+      expect(assetInfo.params["unit-name"]).toEqual("xALGO");
+
+      // verify global state
+      const state = await getAppGlobalState(algodClient, shardRouterAppId);
+      expect(getParsedValueFromState(state, "x_algo_id")).toEqual(BigInt(xAlgoId));
+
+      // opt into shared xALGO
+      for (const user of [user1, user2]) {
+        const optInTx = prepareOptIntoAssetTxn(user.addr, xAlgoId, await getParams(algodClient));
+        await submitTransaction(algodClient, optInTx, user.sk);
+      }
+    });
+
+    test("fails when already initialised", async () => {
+      const tx = prepareInitialiseShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        admin.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+  });
+
+  describe("add shard", () => {
+    test("fails when not admin", async () => {
+      const tx = prepareAddShardToShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        user1.addr,
+        shards[0],
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test("succeeds", async () => {
+      for (const shard of shards) {
+        await fundAccountWithAlgo(algodClient, getApplicationAddress(shardRouterAppId), shardMinBalance);
+        const tx = prepareAddShardToShardRouter(
+          shardRouterABI,
+          shardRouterAppId,
+          admin.addr,
+          shard,
+          await getParams(algodClient),
+        );
+        await submitTransaction(algodClient, tx, admin.sk);
+
+        // verify router opted into shard xALGO
+        const assetInfo = await algodClient
+          .accountAssetInformation(getApplicationAddress(shardRouterAppId), shard.xAlgoId)
+          .do();
+        expect(BigInt(assetInfo["asset-holding"]["amount"])).toEqual(BigInt(0));
+      }
+
+      // verify global state and shards box
+      const state = await getAppGlobalState(algodClient, shardRouterAppId);
+      expect(getParsedValueFromState(state, "num_shards")).toEqual(BigInt(shards.length));
+      const shardsBox = await algodClient.getApplicationBoxByName(shardRouterAppId, enc.encode("sh")).do();
+      const value = new Uint8Array(128);
+      shards.forEach(({ appId }, i) => value.set(encodeUint64(appId), 8 * i));
+      expect(shardsBox.value).toEqual(value);
+
+      // verify shards state
+      const shardsState: bigint[][] = await simulateShardRouterMethod("get_shards_state");
+      expect(shardsState.map(([appId, shardXAlgoId]) => [Number(appId), Number(shardXAlgoId)])).toEqual(
+        shards.map(({ appId, xAlgoId }) => [appId, xAlgoId]),
+      );
+    });
+
+    test("fails when shard already added", async () => {
+      const tx = prepareAddShardToShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        admin.addr,
+        shards[0],
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+  });
+
+  describe("mint", () => {
+    test("fails when min received is not met", async () => {
+      const mintAmount = BigInt(10e6);
+      const txns = prepareMintFromShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        xAlgoId,
+        user1.addr,
+        user1.addr,
+        mintAmount,
+        mintAmount,
+        shards,
+        await getParams(algodClient),
+      );
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user1.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test.each([{ mintAmount: BigInt(10e6) }, { mintAmount: BigInt(25e6) }])(
+      "succeeds in least loaded shard for $mintAmount",
+      async ({ mintAmount }) => {
+        const routerAddr = getApplicationAddress(shardRouterAppId);
+        const shard = shards[0];
+        const { algoBalance, xAlgoCirculatingSupply } = await getCombinedRate();
+        const shardRate = await getShardRate(shard);
+        const routerShardXAlgoBalance = await getAssetBalance(algodClient, routerAddr, shard.xAlgoId);
+        const user2XAlgoBalance = await getAssetBalance(algodClient, user2.addr, xAlgoId);
+
+        // mint
+        const txns = prepareMintFromShardRouter(
+          shardRouterABI,
+          shardRouterAppId,
+          xAlgoId,
+          user1.addr,
+          user2.addr,
+          mintAmount,
+          0,
+          shards,
+          await getParams(algodClient),
+        );
+        const [, txId] = await submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user1.sk),
+        );
+        const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+
+        // verify shard xALGO received by router is valued at shard rate before the mint
+        const shardXAlgoReceived =
+          (await getAssetBalance(algodClient, routerAddr, shard.xAlgoId)) - routerShardXAlgoBalance;
+        expect(shardXAlgoReceived).toBeGreaterThan(BigInt(0));
+        const algoReceived = mulScale(shardXAlgoReceived, shardRate.algoBalance, shardRate.xAlgoCirculatingSupply);
+        // premium is charged by the shard
+        expect(algoReceived).toBeLessThan(mintAmount);
+        const mintedAmount = xAlgoCirculatingSupply
+          ? mulScale(algoReceived, xAlgoCirculatingSupply, algoBalance)
+          : algoReceived;
+        expect(await getAssetBalance(algodClient, user2.addr, xAlgoId)).toEqual(user2XAlgoBalance + mintedAmount);
+
+        // verify log
+        const mintLog = Buffer.from(txInfo["logs"][0], "base64");
+        expect(decodeUint64(mintLog.subarray(68, 76), "bigint")).toEqual(BigInt(shard.appId));
+        expect(decodeUint64(mintLog.subarray(76, 84), "bigint")).toEqual(mintAmount);
+        expect(decodeUint64(mintLog.subarray(84, 92), "bigint")).toEqual(mintedAmount);
+
+        // verify combined rate is the value of the shard xALGO held by the router
+        const combinedRate = await getCombinedRate();
+        const newShardRate = await getShardRate(shard);
+        expect(combinedRate.xAlgoCirculatingSupply).toEqual(xAlgoCirculatingSupply + mintedAmount);
+        expect(combinedRate.algoBalance).toEqual(
+          mulScale(
+            routerShardXAlgoBalance + shardXAlgoReceived,
+            newShardRate.algoBalance,
+            newShardRate.xAlgoCirculatingSupply,
+          ),
+        );
+      },
+    );
+
+    test("syncs every shard before pricing", async () => {
+      const routerAddr = getApplicationAddress(shardRouterAppId);
+      const shard = shards[0];
+      const mintAmount = BigInt(10e6);
+      const rewards = BigInt(1e6);
+      const rewardsFee = (rewards * fee) / BigInt(1e4);
+      const { xAlgoCirculatingSupply } = await getCombinedRate();
+      const states = await Promise.all(shards.map(({ appId }) => parseXAlgoConsensusGlobalState(algodClient, appId)));
+      const shardRates = await Promise.all(shards.map(getShardRate));
+      const routerShardXAlgoBalances = await Promise.all(
+        shards.map(({ xAlgoId: shardXAlgoId }) => getAssetBalance(algodClient, routerAddr, shardXAlgoId)),
+      );
+      const user2XAlgoBalance = await getAssetBalance(algodClient, user2.addr, xAlgoId);
+
+      // rewards received by each shard since its last sync
+      for (const { proposerAddrs } of shards) {
+        await fundAccountWithAlgo(algodClient, proposerAddrs[0], rewards, await getParams(algodClient));
+      }
+      const syncedAlgoBalances = shardRates.map(({ algoBalance }) => algoBalance + rewards - rewardsFee);
+
+      // mint
+      const txns = prepareMintFromShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        xAlgoId,
+        user1.addr,
+        user2.addr,
+        mintAmount,
+        0,
+        shards,
+        await getParams(algodClient),
+      );
+      await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => user1.sk),
+      );
+
+      // verify each shard is synced, including those not minted in
+      for (const [i, { appId }] of shards.entries()) {
+        const state = await parseXAlgoConsensusGlobalState(algodClient, appId);
+        expect(state.totalUnclaimedFees).toEqual(states[i].totalUnclaimedFees + rewardsFee);
+        if (appId !== shard.appId) {
+          expect(state.lastProposersActiveBalance).toEqual(states[i].lastProposersActiveBalance + rewards);
+        }
+      }
+
+      // verify shared xALGO minted at the rate including the rewards
+      const shardXAlgoReceived =
+        (await getAssetBalance(algodClient, routerAddr, shard.xAlgoId)) - routerShardXAlgoBalances[0];
+      const algoReceived = mulScale(shardXAlgoReceived, syncedAlgoBalances[0], shardRates[0].xAlgoCirculatingSupply);
+      const algoBalance = shards.reduce(
+        (sum, _, i) =>
+          sum + mulScale(routerShardXAlgoBalances[i], syncedAlgoBalances[i], shardRates[i].xAlgoCirculatingSupply),
+        BigInt(0),
+      );
+      const mintedAmount = mulScale(algoReceived, xAlgoCirculatingSupply, algoBalance);
+      expect(await getAssetBalance(algodClient, user2.addr, xAlgoId)).toEqual(user2XAlgoBalance + mintedAmount);
+    });
+  });
+
+  describe("burn", () => {
+    test("fails when sending shard xALGO", async () => {
+      const shard = shards[0];
+      const txns = prepareBurnFromShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        shard.xAlgoId,
+        user2.addr,
+        user2.addr,
+        BigInt(1e6),
+        0,
+        shards,
+        await getParams(algodClient),
+      );
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user2.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test("fails when min received is not met", async () => {
+      const burnAmount = BigInt(5e6);
+      const { algoBalance, xAlgoCirculatingSupply } = await getCombinedRate();
+      const txns = prepareBurnFromShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        xAlgoId,
+        user2.addr,
+        user2.addr,
+        burnAmount,
+        mulScale(burnAmount, algoBalance, xAlgoCirculatingSupply) + BigInt(1),
+        shards,
+        await getParams(algodClient),
+      );
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user2.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test("succeeds from shard held by router", async () => {
+      const routerAddr = getApplicationAddress(shardRouterAppId);
+      const shard = shards[0];
+      const burnAmount = BigInt(5e6);
+      const { algoBalance, xAlgoCirculatingSupply } = await getCombinedRate();
+      const shardRate = await getShardRate(shard);
+      const routerShardXAlgoBalance = await getAssetBalance(algodClient, routerAddr, shard.xAlgoId);
+      const user2XAlgoBalance = await getAssetBalance(algodClient, user2.addr, xAlgoId);
+      const user1AlgoBalance = await getAlgoBalance(algodClient, user1.addr);
+
+      // burn
+      const algoToRedeem = mulScale(burnAmount, algoBalance, xAlgoCirculatingSupply);
+      const txns = prepareBurnFromShardRouter(
+        shardRouterABI,
+        shardRouterAppId,
+        xAlgoId,
+        user2.addr,
+        user1.addr,
+        burnAmount,
+        algoToRedeem - BigInt(2),
+        shards,
+        await getParams(algodClient),
+      );
+      await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => user2.sk),
+      );
+
+      // verify shard xALGO of the same value is redeemed, rounding down
+      const shardBurnAmount = mulScale(algoToRedeem, shardRate.xAlgoCirculatingSupply, shardRate.algoBalance);
+      expect(await getAssetBalance(algodClient, routerAddr, shard.xAlgoId)).toEqual(
+        routerShardXAlgoBalance - shardBurnAmount,
+      );
+      expect(await getAssetBalance(algodClient, user2.addr, xAlgoId)).toEqual(user2XAlgoBalance - burnAmount);
+      const algoReceived = (await getAlgoBalance(algodClient, user1.addr)) - user1AlgoBalance;
+      expect(algoReceived).toBeLessThanOrEqual(algoToRedeem);
+      expect(algoReceived).toBeGreaterThanOrEqual(algoToRedeem - BigInt(2));
+
+      // verify combined rate
+      const combinedRate = await getCombinedRate();
+      expect(combinedRate.xAlgoCirculatingSupply).toEqual(xAlgoCirculatingSupply - burnAmount);
+    });
+  });
+
+  describe("update admin", () => {
+    test("fails when not admin", async () => {
+      const tx = prepareUpdateShardRouterAdmin(
+        shardRouterABI,
+        shardRouterAppId,
+        user1.addr,
+        user1.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: expect.stringContaining("logic eval error"),
+      });
+    });
+
+    test("succeeds", async () => {
+      const tx = prepareUpdateShardRouterAdmin(
+        shardRouterABI,
+        shardRouterAppId,
+        admin.addr,
+        user1.addr,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, admin.sk);
+      const state = await getAppGlobalState(algodClient, shardRouterAppId);
+      expect(encodeAddress(Buffer.from(String(getParsedValueFromState(state, "admin")), "base64"))).toEqual(user1.addr);
+    });
+  });
+});
@@ -0,0 +1,236 @@
+import {
+  ABIArgument,
+  ABIContract,
+  AtomicTransactionComposer,
+  getApplicationAddress,
+  getMethodByName,
+  SuggestedParams,
+  Transaction,
+} from "algosdk";
+import { getABIContract } from "../utils/abi";
+import { compilePyTeal, compileTeal, enc } from "../utils/contracts";
+import { emptySigner, transferAlgoOrAsset } from "../utils/transaction";
+
+export interface ShardRouterShard {
+  appId: number;
+  xAlgoId: number;
+  proposerAddrs: string[];
+}
+
+export async function prepareCreateShardRouter(
+  creatorAddr: string,
+  adminAddr: string,
+  params: SuggestedParams,
+): Promise<{ tx: Transaction; abi: ABIContract }> {
+  // compile approval and clear program
+  const approval = await compileTeal(compilePyTeal("contracts/xalgo/shard_router"));
+  const clear = await compileTeal(compilePyTeal("contracts/common/clear_program", 10));
+
+  // get ABI contract
+  const abi = getABIContract("contracts/xalgo/shard_router");
+
+  // deploy app txn
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: creatorAddr,
+    signer: emptySigner,
+    appID: 0,
+    method: getMethodByName(abi.methods, "create"),
+    methodArgs: [adminAddr],
+    approvalProgram: approval,
+    clearProgram: clear,
+    numGlobalInts: 2,
+    numGlobalByteSlices: 1,
+    numLocalInts: 0,
+    numLocalByteSlices: 0,
+    suggestedParams: params,
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return { tx: txns[0], abi };
+}
+
+export function prepareInitialiseShardRouter(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  senderAddr: string,
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: shardRouterAppId,
+    method: getMethodByName(shardRouterABI.methods, "initialise"),
+    methodArgs: [],
+    suggestedParams: { ...params, flatFee: true, fee: 2000 },
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
+export function prepareUpdateShardRouterAdmin(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  adminAddr: string,
+  newAdminAddr: string,
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: adminAddr,
+    signer: emptySigner,
+    appID: shardRouterAppId,
+    method: getMethodByName(shardRouterABI.methods, "update_admin"),
+    methodArgs: [newAdminAddr],
+    suggestedParams: params,
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
+export function prepareAddShardToShardRouter(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  senderAddr: string,
+  shard: ShardRouterShard,
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: shardRouterAppId,
+    method: getMethodByName(shardRouterABI.methods, "add_shard"),
+    methodArgs: [shard.appId],
+    appForeignAssets: [shard.xAlgoId],
+    boxes: [{ appIndex: shardRouterAppId, name: enc.encode("sh") }],
+    suggestedParams: { ...params, flatFee: true, fee: 2000 },
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
+// the app, account and xALGO of each shard are referenced in the same call so the holdings are available
+function prepareShardRouterCalls(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  xAlgoId: number,
+  senderAddr: string,
+  receiverAddr: string,
+  method: string,
+  methodArgs: ABIArgument[],
+  shards: ShardRouterShard[],
+  fee: number,
+  params: SuggestedParams,
+): Transaction[] {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: shardRouterAppId,
+    method: getMethodByName(shardRouterABI.methods, method),
+    methodArgs,
+    appAccounts: [receiverAddr],
+    appForeignAssets: [xAlgoId],
+    boxes: [{ appIndex: shardRouterAppId, name: enc.encode("sh") }],
+    suggestedParams: { ...params, flatFee: true, fee },
+  });
+  for (const { appId, xAlgoId: shardXAlgoId, proposerAddrs } of shards) {
+    if (proposerAddrs.length > 3) throw Error("Need to use other dummy txn(s)");
+    atc.addMethodCall({
+      sender: senderAddr,
+      signer: emptySigner,
+      appID: shardRouterAppId,
+      method: getMethodByName(shardRouterABI.methods, "dummy"),
+      methodArgs: [],
+      appForeignApps: [appId],
+      appAccounts: [getApplicationAddress(appId), ...proposerAddrs],
+      appForeignAssets: [shardXAlgoId],
+      boxes: [
+        { appIndex: appId, name: enc.encode("pr") },
+        { appIndex: appId, name: enc.encode("rc") },
+      ],
+      suggestedParams: { ...params, flatFee: true, fee: 0 },
+    });
+  }
+  return atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+}
+
+export function prepareMintFromShardRouter(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  xAlgoId: number,
+  userAddr: string,
+  receiverAddr: string,
+  mintAmount: number | bigint,
+  minReceived: number | bigint,
+  shards: ShardRouterShard[],
+  params: SuggestedParams,
+): Transaction[] {
+  const sendAlgo = {
+    txn: transferAlgoOrAsset(0, userAddr, getApplicationAddress(shardRouterAppId), mintAmount, params),
+    signer: emptySigner,
+  };
+  // app calls, sync of each shard and its opcode budget, payment to shard, shard app call and shared xALGO transfer,
+  // shard inner txns and opcode budget
+  const fee = 1000 * (1 + shards.length + 2 * shards.length + 3 + 4 + 6);
+  return prepareShardRouterCalls(
+    shardRouterABI,
+    shardRouterAppId,
+    xAlgoId,
+    userAddr,
+    receiverAddr,
+    "mint",
+    [sendAlgo, receiverAddr, minReceived],
+    shards,
+    fee,
+    params,
+  );
+}
+
+export function prepareBurnFromShardRouter(
+  shardRouterABI: ABIContract,
+  shardRouterAppId: number,
+  xAlgoId: number,
+  userAddr: string,
+  receiverAddr: string,
+  burnAmount: number | bigint,
+  minReceived: number | bigint,
+  shards: ShardRouterShard[],
+  params: SuggestedParams,
+): Transaction[] {
+  const sendXAlgo = {
+    txn: transferAlgoOrAsset(xAlgoId, userAddr, getApplicationAddress(shardRouterAppId), burnAmount, params),
+    signer: emptySigner,
+  };
+  // app calls, sync of each shard and its opcode budget, shard xALGO transfer and shard app call, shard inner txns
+  // and opcode budget
+  const fee = 1000 * (1 + shards.length + 2 * shards.length + 2 + 4 + 6);
+  return prepareShardRouterCalls(
+    shardRouterABI,
+    shardRouterAppId,
+    xAlgoId,
+    userAddr,
+    receiverAddr,
+    "burn",
+    [sendXAlgo, receiverAddr, minReceived],
+    shards,
+    fee,
+    params,
+  );
+}
@@ -1,5 +1,7 @@
 import {
+  ABIArgument,
   ABIContract,
+  ABIMethod,
   Algodv2,
   AtomicTransactionComposer,
   decodeAddress,
@@ -32,6 +34,10 @@ export interface XAlgoConsensusGlobalState {
   totalUnclaimedFees: bigint;
   canImmediateMint: boolean;
   canDelayMint: boolean;
+  rateCheckpointInterval: bigint;
+  lastRateCheckpointRound: bigint;
+  nextRateCheckpointIndex: bigint;
+  settleFeesInXAlgo: boolean;
 }
 
 export async function parseXAlgoConsensusGlobalState(
@@ -55,6 +61,10 @@ export async function parseXAlgoConsensusGlobalState(
   const totalUnclaimedFees = BigInt(getParsedValueFromState(state, "total_unclaimed_fees") || 0);
   const canImmediateMint = Boolean(getParsedValueFromState(state, "can_immediate_mint"));
   const canDelayMint = Boolean(getParsedValueFromState(state, "can_delay_mint"));
+  const rateCheckpointInterval = BigInt(getParsedValueFromState(state, "rate_checkpoint_interval") || 0);
+  const lastRateCheckpointRound = BigInt(getParsedValueFromState(state, "last_rate_checkpoint_round") || 0);
+  const nextRateCheckpointIndex = BigInt(getParsedValueFromState(state, "next_rate_checkpoint_index") || 0);
+  const settleFeesInXAlgo = Boolean(getParsedValueFromState(state, "settle_fees_in_x_algo"));
 
   return {
     initialised,
@@ -72,6 +82,10 @@ export async function parseXAlgoConsensusGlobalState(
     totalUnclaimedFees,
     canImmediateMint,
     canDelayMint,
+    rateCheckpointInterval,
+    lastRateCheckpointRound,
+    nextRateCheckpointIndex,
+    settleFeesInXAlgo,
   };
 }
 
@@ -331,25 +345,62 @@ export function prepareAddProposerForXAlgoConsensus(
   return [rekeyTx, txns[0]];
 }
 
+export function prepareRemoveProposerFromXAlgoConsensus(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  registerAdminAddr: string,
+  proposerIndex: number | bigint,
+  proposerAddrs: string[],
+  params: SuggestedParams,
+): Transaction {
+  if (proposerAddrs.length > 4) throw Error("Need to use dummy txn(s)");
+
+  const proposerAddr = proposerAddrs[Number(proposerIndex)];
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: registerAdminAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "remove_proposer"),
+    methodArgs: [proposerIndex],
+    appAccounts: proposerAddrs,
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      {
+        appIndex: xAlgoConsensusAppId,
+        name: Uint8Array.from([...enc.encode("ap"), ...decodeAddress(proposerAddr).publicKey]),
+      },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
+    // key registration, close, allocations to remaining proposers and box min balance refund
+    suggestedParams: { ...params, flatFee: true, fee: 1000 * (3 + proposerAddrs.length) },
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
 export function prepareRebalanceXAlgoConsensusProposers(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
-  adminAddr: string,
-  proposerIndex0: number | bigint,
-  proposerIndex1: number | bigint,
+  senderAddr: string,
+  fromProposerIndex: number | bigint,
+  toProposerIndex: number | bigint,
   amount: number | bigint,
-  proposerAddr0: string,
-  proposerAddr1: string,
+  fromProposerAddr: string,
+  toProposerAddr: string,
   params: SuggestedParams,
 ): Transaction {
   const atc = new AtomicTransactionComposer();
   atc.addMethodCall({
-    sender: adminAddr,
+    sender: senderAddr,
     signer: emptySigner,
     appID: xAlgoConsensusAppId,
     method: getMethodByName(xAlgoConsensusABI.methods, "rebalance_proposers"),
-    methodArgs: [proposerIndex0, proposerIndex1, amount],
-    appAccounts: [proposerAddr0, proposerAddr1],
+    methodArgs: [fromProposerIndex, toProposerIndex, amount],
+    appAccounts: [fromProposerAddr, toProposerAddr],
     boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("pr") }],
     suggestedParams: { ...params, flatFee: true, fee: 2000 },
   });
@@ -407,6 +458,30 @@ export function prepareUpdateXAlgoConsensusMaxProposerBalance(
   return txns[0];
 }
 
+export function prepareUpdateXAlgoConsensusRateCheckpointInterval(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  adminAddr: string,
+  rateCheckpointInterval: number | bigint,
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: adminAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "update_rate_checkpoint_interval"),
+    methodArgs: [rateCheckpointInterval],
+    boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("rc") }],
+    suggestedParams: params,
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
 export function prepareUpdateXAlgoConsensusFee(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
@@ -425,7 +500,10 @@ export function prepareUpdateXAlgoConsensusFee(
     method: getMethodByName(xAlgoConsensusABI.methods, "update_fee"),
     methodArgs: [fee],
     appAccounts: proposerAddrs,
-    boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("pr") }],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
     suggestedParams: { ...params, flatFee: true, fee: 1000 * (2 + proposerAddrs.length) },
   });
   const txns = atc.buildGroup().map(({ txn }) => {
@@ -453,7 +531,10 @@ export function prepareClaimXAlgoConsensusFee(
     method: getMethodByName(xAlgoConsensusABI.methods, "claim_fee"),
     methodArgs: [],
     appAccounts: [adminAddr, ...proposerAddrs],
-    boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("pr") }],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
     suggestedParams: { ...params, flatFee: true, fee: 1000 * (2 + proposerAddrs.length) },
   });
   const txns = atc.buildGroup().map(({ txn }) => {
@@ -486,6 +567,64 @@ export function prepareUpdateXAlgoConsensusPremium(
   return txns[0];
 }
 
+export function prepareClaimXAlgoConsensusFeeInXAlgo(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  senderAddr: string,
+  adminAddr: string,
+  xAlgoId: number,
+  proposerAddrs: string[],
+  params: SuggestedParams,
+): Transaction {
+  if (proposerAddrs.length > 3) throw Error("Need to use dummy txn(s)");
+
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "claim_fee"),
+    methodArgs: [],
+    appAccounts: [adminAddr, ...proposerAddrs],
+    appForeignAssets: [xAlgoId],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
+    suggestedParams: { ...params, flatFee: true, fee: 2000 },
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
+export function prepareUpdateXAlgoConsensusFeeSettlement(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  xAlgoId: number,
+  adminAddr: string,
+  settleInXAlgo: boolean,
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: adminAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "update_fee_settlement"),
+    methodArgs: [settleInXAlgo],
+    appForeignAssets: [xAlgoId],
+    suggestedParams: params,
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
 export function preparePauseXAlgoConsensusMinting(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
@@ -625,6 +764,103 @@ export function prepareRegisterXAlgoConsensusOffline(
   return txns[0];
 }
 
+export interface XAlgoConsensusKeyRegistration {
+  proposerIndex: number | bigint;
+  proposerAddr: string;
+  voteKey: Buffer;
+  selectionKey: Buffer;
+  stateProofKey: Buffer;
+  voteFirstRound: number | bigint;
+  voteLastRound: number | bigint;
+  voteKeyDilution: number | bigint;
+  registerFeeAmount: number | bigint;
+}
+
+export function prepareRegisterXAlgoConsensusOnlineBatch(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  senderAddr: string,
+  registrations: XAlgoConsensusKeyRegistration[],
+  params: SuggestedParams,
+): Transaction[] {
+  const totalFeeAmount = registrations.reduce(
+    (acc, { registerFeeAmount }) => acc + BigInt(registerFeeAmount),
+    BigInt(0),
+  );
+  const numInnerTxns = registrations.reduce((acc, { registerFeeAmount }) => acc + (registerFeeAmount ? 2 : 1), 0);
+  const proposerAddrs = [...new Set(registrations.map(({ proposerAddr }) => proposerAddr))];
+
+  const fundCall = {
+    txn: transferAlgoOrAsset(0, senderAddr, getApplicationAddress(xAlgoConsensusAppId), totalFeeAmount, params),
+    signer: emptySigner,
+  };
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "register_online_batch"),
+    methodArgs: [
+      fundCall,
+      registrations.map((registration) => [
+        registration.proposerIndex,
+        encodeAddress(registration.voteKey),
+        encodeAddress(registration.selectionKey),
+        registration.stateProofKey,
+        registration.voteFirstRound,
+        registration.voteLastRound,
+        registration.voteKeyDilution,
+        registration.registerFeeAmount,
+      ]),
+    ],
+    appAccounts: proposerAddrs,
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      ...proposerAddrs.map((proposerAddr) => ({
+        appIndex: xAlgoConsensusAppId,
+        name: Uint8Array.from([...enc.encode("ap"), ...decodeAddress(proposerAddr).publicKey]),
+      })),
+    ],
+    suggestedParams: { ...params, flatFee: true, fee: 1000 * (1 + numInnerTxns) },
+  });
+  return atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+}
+
+export function prepareRegisterXAlgoConsensusOfflineBatch(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  senderAddr: string,
+  proposerIndexes: (number | bigint)[],
+  proposerAddrs: string[],
+  params: SuggestedParams,
+): Transaction {
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: senderAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    method: getMethodByName(xAlgoConsensusABI.methods, "register_offline_batch"),
+    methodArgs: [proposerIndexes],
+    appAccounts: proposerAddrs,
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      ...proposerAddrs.map((proposerAddr) => ({
+        appIndex: xAlgoConsensusAppId,
+        name: Uint8Array.from([...enc.encode("ap"), ...decodeAddress(proposerAddr).publicKey]),
+      })),
+    ],
+    suggestedParams: { ...params, flatFee: true, fee: 1000 * (1 + proposerIndexes.length) },
+  });
+  const txns = atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+  return txns[0];
+}
+
 export function prepareSubscribeXAlgoConsensusProposerToXGov(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
@@ -684,6 +920,25 @@ export function prepareUnsubscribeXAlgoConsensusProposerFromXGov(
   return txns[0];
 }
 
+export interface XAlgoConsensusAllocationHint {
+  proposerIndex: number;
+  amount: number | bigint;
+}
+
+// hinted variant of the method is called when given an allocation, which is then passed as its last argument
+function getMintOrBurnMethod(
+  xAlgoConsensusABI: ABIContract,
+  name: string,
+  methodArgs: ABIArgument[],
+  allocation?: XAlgoConsensusAllocationHint[],
+): { method: ABIMethod; methodArgs: ABIArgument[] } {
+  if (allocation === undefined) return { method: getMethodByName(xAlgoConsensusABI.methods, name), methodArgs };
+  return {
+    method: getMethodByName(xAlgoConsensusABI.methods, `${name}_hinted`),
+    methodArgs: [...methodArgs, allocation.map(({ proposerIndex, amount }) => [proposerIndex, amount])],
+  };
+}
+
 export function prepareImmediateMintFromXAlgoConsensus(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
@@ -694,6 +949,7 @@ export function prepareImmediateMintFromXAlgoConsensus(
   minReceived: number | bigint,
   proposerAddrs: string[],
   params: SuggestedParams,
+  allocation?: XAlgoConsensusAllocationHint[],
 ): Transaction[] {
   if (proposerAddrs.length > 3) throw Error("Need to use dummy txn(s)");
 
@@ -706,11 +962,13 @@ export function prepareImmediateMintFromXAlgoConsensus(
     sender: userAddr,
     signer: emptySigner,
     appID: xAlgoConsensusAppId,
-    method: getMethodByName(xAlgoConsensusABI.methods, "immediate_mint"),
-    methodArgs: [sendAlgo, receiverAddr, minReceived],
+    ...getMintOrBurnMethod(xAlgoConsensusABI, "immediate_mint", [sendAlgo, receiverAddr, minReceived], allocation),
     appAccounts: [receiverAddr, ...proposerAddrs],
     appForeignAssets: [xAlgoId],
-    boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("pr") }],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
     suggestedParams: { ...params, flatFee: true, fee: 1000 * (2 + proposerAddrs.length) },
   });
   return atc.buildGroup().map(({ txn }) => {
@@ -719,6 +977,55 @@ export function prepareImmediateMintFromXAlgoConsensus(
   });
 }
 
+export interface XAlgoConsensusMintEntry {
+  receiverAddr: string;
+  mintAmount: number | bigint;
+  minReceived: number | bigint;
+}
+
+export function prepareImmediateMintBatchFromXAlgoConsensus(
+  xAlgoConsensusABI: ABIContract,
+  xAlgoConsensusAppId: number,
+  xAlgoId: number,
+  userAddr: string,
+  mints: XAlgoConsensusMintEntry[],
+  proposerAddrs: string[],
+  params: SuggestedParams,
+  allocation?: XAlgoConsensusAllocationHint[],
+): Transaction[] {
+  const receiverAddrs = [...new Set(mints.map(({ receiverAddr }) => receiverAddr))];
+  if (receiverAddrs.length + proposerAddrs.length > 4) throw Error("Need to use dummy txn(s)");
+
+  const totalMintAmount = mints.reduce((acc, { mintAmount }) => acc + BigInt(mintAmount), BigInt(0));
+  const sendAlgo = {
+    txn: transferAlgoOrAsset(0, userAddr, getApplicationAddress(xAlgoConsensusAppId), totalMintAmount, params),
+    signer: emptySigner,
+  };
+  const atc = new AtomicTransactionComposer();
+  atc.addMethodCall({
+    sender: userAddr,
+    signer: emptySigner,
+    appID: xAlgoConsensusAppId,
+    ...getMintOrBurnMethod(
+      xAlgoConsensusABI,
+      "immediate_mint_batch",
+      [sendAlgo, mints.map(({ receiverAddr, mintAmount, minReceived }) => [receiverAddr, mintAmount, minReceived])],
+      allocation,
+    ),
+    appAccounts: [...receiverAddrs, ...proposerAddrs],
+    appForeignAssets: [xAlgoId],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
+    suggestedParams: { ...params, flatFee: true, fee: 1000 * (1 + proposerAddrs.length + mints.length) },
+  });
+  return atc.buildGroup().map(({ txn }) => {
+    txn.group = undefined;
+    return txn;
+  });
+}
+
 export function prepareDelayedMintFromXAlgoConsensus(
   xAlgoConsensusABI: ABIContract,
   xAlgoConsensusAppId: number,
@@ -728,10 +1035,12 @@ export function prepareDelayedMintFromXAlgoConsensus(
   nonce: Uint8Array,
   proposerAddrs: string[],
   params: SuggestedParams,
+  allocation?: XAlgoConsensusAllocationHint[],
 ): Transaction[] {
   if (proposerAddrs.length > 4) throw Error("Need to use dummy txn(s)");
 
   const boxName = Uint8Array.from([...enc.encode("dm"), ...decodeAddress(userAddr).publicKey, ...nonce]);
+  const nonceBoxName = Uint8Array.from([...enc.encode("nc"), ...decodeAddress(userAddr).publicKey]);
 
   const sendAlgo = {
     txn: transferAlgoOrAsset(0, userAddr, getApplicationAddress(xAlgoConsensusAppId), mintAmount, params),
@@ -742,12 +1051,13 @@ export function prepareDelayedMintFromXAlgoConsensus(
     sender: userAddr,
     signer: emptySigner,
     appID: xAlgoConsensusAppId,
-    method: getMethodByName(xAlgoConsensusABI.methods, "delayed_mint"),
-    methodArgs: [sendAlgo, receiverAddr, nonce],
+    ...getMintOrBurnMethod(xAlgoConsensusABI, "delayed_mint", [sendAlgo, receiverAddr, nonce], allocation),
     appAccounts: proposerAddrs,
     boxes: [
       { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
       { appIndex: xAlgoConsensusAppId, name: boxName },
+      { appIndex: xAlgoConsensusAppId, name: nonceBoxName },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
     ],
     suggestedParams: { ...params, flatFee: true, fee: 1000 * (1 + proposerAddrs.length) },
   });
@@ -784,6 +1094,7 @@ export function prepareClaimDelayedMintFromXAlgoConsensus(
     boxes: [
       { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
       { appIndex: xAlgoConsensusAppId, name: boxName },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
     ],
     suggestedParams: { ...params, flatFee: true, fee: 3000 },
   });
@@ -804,6 +1115,7 @@ export function prepareBurnFromXAlgoConsensus(
   minReceived: number | bigint,
   proposerAddrs: string[],
   params: SuggestedParams,
+  allocation?: XAlgoConsensusAllocationHint[],
 ): Transaction[] {
   if (proposerAddrs.length > 3) throw Error("Need to use dummy txn(s)");
 
@@ -816,11 +1128,13 @@ export function prepareBurnFromXAlgoConsensus(
     sender: userAddr,
     signer: emptySigner,
     appID: xAlgoConsensusAppId,
-    method: getMethodByName(xAlgoConsensusABI.methods, "burn"),
-    methodArgs: [sendXAlgo, receiverAddr, minReceived],
+    ...getMintOrBurnMethod(xAlgoConsensusABI, "burn", [sendXAlgo, receiverAddr, minReceived], allocation),
     appAccounts: [receiverAddr, ...proposerAddrs],
     appForeignAssets: [xAlgoId],
-    boxes: [{ appIndex: xAlgoConsensusAppId, name: enc.encode("pr") }],
+    boxes: [
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("pr") },
+      { appIndex: xAlgoConsensusAppId, name: enc.encode("rc") },
+    ],
     suggestedParams: { ...params, flatFee: true, fee: 1000 * (2 + proposerAddrs.length) },
   });
   return atc.buildGroup().map(({ txn }) => {
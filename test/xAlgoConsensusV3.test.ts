@@ -1,5 +1,6 @@
 import {
   ABIContract,
+  ABIType,
   Account,
   Algodv2,
   AtomicTransactionComposer,
@@ -28,17 +29,25 @@ import {
   prepareBurnFromXAlgoConsensus,
   prepareClaimDelayedMintFromXAlgoConsensus,
   prepareClaimXAlgoConsensusFee,
+  prepareClaimXAlgoConsensusFeeInXAlgo,
   prepareDelayedMintFromXAlgoConsensus,
+  prepareImmediateMintBatchFromXAlgoConsensus,
   prepareImmediateMintFromXAlgoConsensus,
   prepareInitialiseXAlgoConsensusV2,
   prepareInitialiseXAlgoConsensusV3,
   preparePauseXAlgoConsensusMinting,
+  prepareRebalanceXAlgoConsensusProposers,
   prepareRegisterXAlgoConsensusOffline,
+  prepareRegisterXAlgoConsensusOfflineBatch,
   prepareRegisterXAlgoConsensusOnline,
+  prepareRegisterXAlgoConsensusOnlineBatch,
+  prepareRemoveProposerFromXAlgoConsensus,
   prepareScheduleXAlgoConsensusSCUpdate,
   prepareUpdateXAlgoConsensusAdmin,
   prepareUpdateXAlgoConsensusFee,
+  prepareUpdateXAlgoConsensusFeeSettlement,
   prepareUpdateXAlgoConsensusPremium,
+  prepareUpdateXAlgoConsensusRateCheckpointInterval,
   prepareUpdateXAlgoConsensusMaxProposerBalance,
   prepareUpdateXAlgoConsensusSC,
   prepareSetXAlgoConsensusProposerAdmin,
@@ -66,6 +75,10 @@ import { getParams, submitGroupTransaction, submitTransaction } from "./utils/tr
 
 jest.setTimeout(1000000);
 
+// algod reports where a call fails with the last opcodes executed, which are pinned for the default build only as the
+// optimised build rewrites them, so the optimised build is only checked to fail in the program
+const failedAt = (opcodes: string) => expect.stringContaining(process.env.OPTIMISE ? "logic eval error" : opcodes);
+
 describe("Algo Consensus V3", () => {
   let algodClient: Algodv2;
   let prevBlockTimestamp: bigint;
@@ -95,6 +108,8 @@ describe("Algo Consensus V3", () => {
   const resizeProposerBoxCost = BigInt(16000);
   const updateSCBoxCost = BigInt(32100);
   const delayMintBoxCost = BigInt(36100);
+  const delayMintNonceBoxCost = BigInt(19300);
+  const rateCheckpointsBoxCost = BigInt(406500);
 
   async function getXAlgoRate() {
     const atc = new AtomicTransactionComposer();
@@ -260,7 +275,10 @@ describe("Algo Consensus V3", () => {
       expect(user2XAlgoBalance).toEqual(mintAmount);
 
       // update to algo consensus v3
-      const approval = await compileTeal(compilePyTeal("contracts/xalgo/consensus_v3"));
+      // OPTIMISE runs the whole suite against the peephole optimised build
+      const approval = await compileTeal(
+        compilePyTeal("contracts/xalgo/consensus_v3", ...(process.env.OPTIMISE ? ["--optimise"] : [])),
+      );
       const clear = await compileTeal(compilePyTeal("contracts/common/clear_program", 10));
       const updateTx = makeApplicationUpdateTxn(admin.addr, await getParams(algodClient), xAlgoAppId, approval, clear);
       await submitTransaction(algodClient, updateTx, admin.sk);
@@ -316,7 +334,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; !; assert"),
+        message: failedAt("app_global_get; !; assert"),
       });
     });
   });
@@ -332,7 +350,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("==; ||; assert"),
+        message: failedAt("==; ||; assert"),
       });
     });
 
@@ -351,7 +369,7 @@ describe("Algo Consensus V3", () => {
         suggestedParams: await getParams(algodClient),
       });
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -449,7 +467,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("===; ||; assert"),
+        message: failedAt("===; ||; assert"),
       });
 
       // user updating xgov admin
@@ -463,7 +481,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("===; ||; assert"),
+        message: failedAt("===; ||; assert"),
       });
 
       // user updating admin
@@ -477,7 +495,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("===; ||; assert"),
+        message: failedAt("===; ||; assert"),
       });
 
       // register admin updating admin
@@ -491,7 +509,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("===; ||; assert"),
+        message: failedAt("===; ||; assert"),
       });
 
       // xgov admin updating admin
@@ -505,7 +523,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, xGovAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("===; ||; assert"),
+        message: failedAt("===; ||; assert"),
       });
     });
   });
@@ -526,7 +544,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitGroupTransaction(algodClient, txns, [proposer1.sk, user1.sk])).rejects.toMatchObject({
-        message: expect.stringContaining("callsub label47; assert"),
+        message: failedAt("callsub label77; assert"),
       });
 
       // fails even for admin
@@ -538,7 +556,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitGroupTransaction(algodClient, txns, [proposer1.sk, admin.sk])).rejects.toMatchObject({
-        message: expect.stringContaining("callsub label47; assert"),
+        message: failedAt("callsub label77; assert"),
       });
     });
 
@@ -552,7 +570,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, txns[1], registerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("global CurrentApplicationAddress; ==; assert"),
+        message: failedAt("global CurrentApplicationAddress; ==; assert"),
       });
 
       // rekeyed to wrong address
@@ -565,7 +583,7 @@ describe("Algo Consensus V3", () => {
       );
       txns[0].reKeyTo = decodeAddress(user1.addr);
       await expect(submitGroupTransaction(algodClient, txns, [proposer1.sk, registerAdmin.sk])).rejects.toMatchObject({
-        message: expect.stringContaining("global CurrentApplicationAddress; ==; assert"),
+        message: failedAt("global CurrentApplicationAddress; ==; assert"),
       });
     });
 
@@ -578,7 +596,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, txns[1], registerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("box_create; assert"),
+        message: failedAt("box_create; assert"),
       });
     });
 
@@ -644,7 +662,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -687,7 +705,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -701,7 +719,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("100000000000000; <=; assert"),
+        message: failedAt("100000000000000; <=; assert"),
       });
     });
 
@@ -744,7 +762,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -758,7 +776,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("==; ||; assert"),
+        message: failedAt("==; ||; assert"),
       });
     });
 
@@ -835,7 +853,7 @@ describe("Algo Consensus V3", () => {
         suggestedParams: await getParams(algodClient),
       });
       await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -899,7 +917,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, proposerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract_uint64; >; assert"),
+        message: failedAt("extract_uint64; >; assert"),
       });
     });
 
@@ -962,7 +980,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
 
       // fails even for admin
@@ -976,7 +994,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
     });
 
@@ -992,7 +1010,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <; assert"),
+        message: failedAt("app_global_get; <; assert"),
       });
     });
   });
@@ -1033,7 +1051,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
 
       // fails even for register admin
@@ -1059,7 +1077,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => registerAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
 
       // fails even for admin
@@ -1085,7 +1103,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => admin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
     });
 
@@ -1114,7 +1132,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => proposerAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
 
       // send algo to wrong proposer
@@ -1141,7 +1159,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => proposerAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
     });
 
@@ -1169,7 +1187,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => proposerAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <; assert"),
+        message: failedAt("app_global_get; <; assert"),
       });
     });
 
@@ -1208,6 +1226,125 @@ describe("Algo Consensus V3", () => {
       expect(innerRegisterOnlineTx.votekd).toEqual(voteKeyDilution);
       expect(innerRegisterOnlineTx.fee).toEqual(Number(registerFeeAmount));
     });
+
+    test("batch fails for non proposer admin", async () => {
+      const registrations = [
+        {
+          proposerIndex: 0,
+          proposerAddr: proposer0.addr,
+          voteKey,
+          selectionKey: selKey,
+          stateProofKey,
+          voteFirstRound,
+          voteLastRound,
+          voteKeyDilution,
+          registerFeeAmount,
+        },
+      ];
+      const txns = prepareRegisterXAlgoConsensusOnlineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        registrations,
+        await getParams(algodClient),
+      );
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => registerAdmin.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: failedAt("extract 8 32; ==; assert"),
+      });
+    });
+
+    test("batch fails when payment doesn't equal fees", async () => {
+      const registrations = [
+        {
+          proposerIndex: 0,
+          proposerAddr: proposer0.addr,
+          voteKey,
+          selectionKey: selKey,
+          stateProofKey,
+          voteFirstRound,
+          voteLastRound,
+          voteKeyDilution,
+          registerFeeAmount,
+        },
+      ];
+      const txns = prepareRegisterXAlgoConsensusOnlineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        proposerAdmin.addr,
+        registrations,
+        await getParams(algodClient),
+      );
+      txns[0].amount = registerFeeAmount + BigInt(1);
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => proposerAdmin.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: failedAt("gtxns Amount; ==; assert"),
+      });
+    });
+
+    test("batch succeeds for proposer admin", async () => {
+      const registrations = [
+        {
+          proposerIndex: 0,
+          proposerAddr: proposer0.addr,
+          voteKey,
+          selectionKey: selKey,
+          stateProofKey,
+          voteFirstRound,
+          voteLastRound,
+          voteKeyDilution,
+          registerFeeAmount,
+        },
+      ];
+      const proposerAlgoBalanceB = await getAlgoBalance(algodClient, proposer0.addr);
+      const txns = prepareRegisterXAlgoConsensusOnlineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        proposerAdmin.addr,
+        registrations,
+        await getParams(algodClient),
+      );
+      const [, txId] = await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => proposerAdmin.sk),
+      );
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+
+      // check fee payment
+      const innerFundTx = txInfo["inner-txns"][0]["txn"]["txn"];
+      expect(innerFundTx.type).toEqual("pay");
+      expect(innerFundTx.amt).toEqual(Number(registerFeeAmount));
+      expect(innerFundTx.snd).toEqual(decodeAddress(getApplicationAddress(xAlgoAppId)).publicKey);
+      expect(innerFundTx.rcv).toEqual(decodeAddress(proposer0.addr).publicKey);
+
+      // check key registration
+      const innerRegisterOnlineTx = txInfo["inner-txns"][1]["txn"]["txn"];
+      expect(txInfo["inner-txns"].length).toEqual(2);
+      expect(innerRegisterOnlineTx.type).toEqual("keyreg");
+      expect(innerRegisterOnlineTx.snd).toEqual(Uint8Array.from(decodeAddress(proposer0.addr).publicKey));
+      expect(innerRegisterOnlineTx.votekey).toEqual(Uint8Array.from(voteKey));
+      expect(innerRegisterOnlineTx.selkey).toEqual(Uint8Array.from(selKey));
+      expect(innerRegisterOnlineTx.sprfkey).toEqual(Uint8Array.from(stateProofKey));
+      expect(innerRegisterOnlineTx.votefst).toEqual(voteFirstRound);
+      expect(innerRegisterOnlineTx.votelst).toEqual(voteLastRound);
+      expect(innerRegisterOnlineTx.votekd).toEqual(voteKeyDilution);
+      expect(innerRegisterOnlineTx.fee).toEqual(Number(registerFeeAmount));
+
+      // check proposer balance unchanged
+      const proposerAlgoBalanceA = await getAlgoBalance(algodClient, proposer0.addr);
+      expect(proposerAlgoBalanceA).toEqual(proposerAlgoBalanceB);
+    });
   });
 
   describe("register offline", () => {
@@ -1222,7 +1359,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
 
       // fails even for admin
@@ -1235,7 +1372,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract 8 32; ==; assert"),
+        message: failedAt("extract 8 32; ==; assert"),
       });
     });
 
@@ -1250,7 +1387,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <; assert"),
+        message: failedAt("app_global_get; <; assert"),
       });
     });
 
@@ -1280,6 +1417,58 @@ describe("Algo Consensus V3", () => {
         expect(innerRegisterOnlineTx.fee).toBeUndefined();
       }
     });
+
+    test("batch fails for non register admin", async () => {
+      const tx = prepareRegisterXAlgoConsensusOfflineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        [0],
+        [proposer0.addr],
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("extract 8 32; ==; assert"),
+      });
+    });
+
+    test("batch fails when proposer does not exist", async () => {
+      const tx = prepareRegisterXAlgoConsensusOfflineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        [0, 2],
+        [proposer0.addr],
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
+        message: failedAt("app_global_get; <; assert"),
+      });
+    });
+
+    test("batch succeeds for register admin", async () => {
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const tx = prepareRegisterXAlgoConsensusOfflineBatch(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        [0, 1],
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      const txId = await submitTransaction(algodClient, tx, registerAdmin.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+
+      // check key registrations
+      expect(txInfo["inner-txns"].length).toEqual(2);
+      for (const [i, proposerAddr] of proposerAddrs.entries()) {
+        const innerRegisterOfflineTx = txInfo["inner-txns"][i]["txn"]["txn"];
+        expect(innerRegisterOfflineTx.type).toEqual("keyreg");
+        expect(innerRegisterOfflineTx.snd).toEqual(Uint8Array.from(decodeAddress(proposerAddr).publicKey));
+        expect(innerRegisterOfflineTx.votekey).toBeUndefined();
+        expect(innerRegisterOfflineTx.fee).toBeUndefined();
+      }
+    });
   });
 
   describe("subscribe to xgov", () => {
@@ -1303,7 +1492,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
 
       // fails even for admin
@@ -1325,7 +1514,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => admin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -1349,7 +1538,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => xGovAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <; assert"),
+        message: failedAt("app_global_get; <; assert"),
       });
     });
 
@@ -1374,7 +1563,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => xGovAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
 
       // send algo to proposer
@@ -1397,7 +1586,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => xGovAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
 
       // send less algo than needed
@@ -1419,7 +1608,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => xGovAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("load 24; ==; assert"),
+        message: failedAt("load 73; ==; assert"),
       });
 
       // send more algo than needed
@@ -1441,7 +1630,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => xGovAdmin.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("load 24; ==; assert"),
+        message: failedAt("load 73; ==; assert"),
       });
     });
 
@@ -1494,7 +1683,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
 
       // fails even for admin
@@ -1508,7 +1697,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -1524,7 +1713,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, xGovAdmin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <; assert"),
+        message: failedAt("app_global_get; <; assert"),
       });
     });
 
@@ -1590,7 +1779,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining('"can_immediate_mint"; app_global_get; assert'),
+        message: failedAt('"can_immediate_mint"; app_global_get; assert'),
       });
 
       // resume immediate mint
@@ -1634,7 +1823,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -1663,7 +1852,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
 
       // send algo to proposer
@@ -1686,7 +1875,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
     });
 
@@ -1713,7 +1902,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <=; assert"),
+        message: failedAt("app_global_get; <=; assert"),
       });
     });
 
@@ -1743,7 +1932,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; >=; assert"),
+        message: failedAt("frame_dig -2; >=; assert"),
       });
     });
 
@@ -1915,6 +2104,91 @@ describe("Algo Consensus V3", () => {
       expect(xAlgoTransfer.arcv).toEqual(decodeAddress(user1.addr).publicKey);
     });
 
+    test("succeeds with allocation hints in fewer transfers", async () => {
+      // airdrop rewards
+      await fundAccountWithAlgo(algodClient, proposer0.addr, BigInt(10e6), await getParams(algodClient));
+
+      // mint the difference so the search would top up proposer0 by one before proposer1
+      const {
+        algoBalance: oldAlgoBalance,
+        xAlgoCirculatingSupply: oldXAlgoCirculatingSupply,
+        proposersBalances: oldProposersBalance,
+      } = await getXAlgoRate();
+      expect(oldProposersBalance[0]).toBeGreaterThan(oldProposersBalance[1]);
+      const mintAmount = oldProposersBalance[0] - oldProposersBalance[1];
+      const minReceived = BigInt(0);
+      const expectedReceived = mulScale(
+        mulScale(mintAmount, oldXAlgoCirculatingSupply, oldAlgoBalance),
+        ONE_16_DP - premium,
+        ONE_16_DP,
+      );
+
+      // fails when hint exceeds target
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      let txns = [
+        prepareXAlgoConsensusDummyCall(xAlgoConsensusABI, xAlgoAppId, user1.addr, [], await getParams(algodClient)),
+        ...prepareImmediateMintFromXAlgoConsensus(
+          xAlgoConsensusABI,
+          xAlgoAppId,
+          xAlgoId,
+          user1.addr,
+          user1.addr,
+          mintAmount,
+          minReceived,
+          proposerAddrs,
+          await getParams(algodClient),
+          [{ proposerIndex: 0, amount: mintAmount }],
+        ),
+      ];
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user1.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: failedAt("-; <=; assert"),
+      });
+
+      // immediate mint
+      txns = [
+        prepareXAlgoConsensusDummyCall(xAlgoConsensusABI, xAlgoAppId, user1.addr, [], await getParams(algodClient)),
+        ...prepareImmediateMintFromXAlgoConsensus(
+          xAlgoConsensusABI,
+          xAlgoAppId,
+          xAlgoId,
+          user1.addr,
+          user1.addr,
+          mintAmount,
+          minReceived,
+          proposerAddrs,
+          await getParams(algodClient),
+          [{ proposerIndex: 1, amount: mintAmount }],
+        ),
+      ];
+      const [, , txId] = await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => user1.sk),
+      );
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      const { txn: algoTransfer } = txInfo["inner-txns"][0].txn;
+      const { txn: xAlgoTransfer } = txInfo["inner-txns"][1].txn;
+
+      // balances after
+      const { algoBalance, xAlgoCirculatingSupply, proposersBalances } = await getXAlgoRate();
+      expect(algoBalance).toEqual(oldAlgoBalance + mintAmount);
+      expect(xAlgoCirculatingSupply).toEqual(oldXAlgoCirculatingSupply + expectedReceived);
+      expect(proposersBalances[0]).toEqual(oldProposersBalance[0]);
+      expect(proposersBalances[1]).toEqual(oldProposersBalance[0]);
+      expect(txInfo["inner-txns"].length).toEqual(2);
+      expect(algoTransfer.type).toEqual("pay");
+      expect(algoTransfer.amt).toEqual(Number(mintAmount));
+      expect(algoTransfer.rcv).toEqual(decodeAddress(proposer1.addr).publicKey);
+      expect(xAlgoTransfer.type).toEqual("axfer");
+      expect(xAlgoTransfer.aamt).toEqual(Number(expectedReceived));
+    });
+
     test("succeeds and receives xALGO at different address", async () => {
       // airdrop rewards
       const additionalRewards = BigInt(10e6);
@@ -1977,6 +2251,122 @@ describe("Algo Consensus V3", () => {
     });
   });
 
+  describe("immediate mint batch", () => {
+    test("fails when algo sent does not equal total mint amount", async () => {
+      const mints = [
+        { receiverAddr: user1.addr, mintAmount: BigInt(5e6), minReceived: BigInt(0) },
+        { receiverAddr: user2.addr, mintAmount: BigInt(3e6), minReceived: BigInt(0) },
+      ];
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const txns = prepareImmediateMintBatchFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        user1.addr,
+        mints,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      txns[0].amount = BigInt(7e6);
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user1.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: failedAt("gtxns Amount; ==; assert"),
+      });
+    });
+
+    test("fails when receiving less than min received", async () => {
+      const mints = [
+        { receiverAddr: user1.addr, mintAmount: BigInt(5e6), minReceived: BigInt(0) },
+        { receiverAddr: user2.addr, mintAmount: BigInt(3e6), minReceived: BigInt(3e6) },
+      ];
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const txns = prepareImmediateMintBatchFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        user1.addr,
+        mints,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      await expect(
+        submitGroupTransaction(
+          algodClient,
+          txns,
+          txns.map(() => user1.sk),
+        ),
+      ).rejects.toMatchObject({
+        message: failedAt("frame_dig 3; >=; assert"),
+      });
+    });
+
+    test("succeeds and mints for each receiver at shared rate", async () => {
+      // airdrop rewards
+      const additionalRewards = BigInt(10e6);
+      await fundAccountWithAlgo(algodClient, proposer1.addr, additionalRewards, await getParams(algodClient));
+
+      // calculate rate
+      const { algoBalance: oldAlgoBalance, xAlgoCirculatingSupply: oldXAlgoCirculatingSupply } = await getXAlgoRate();
+      const mints = [
+        { receiverAddr: user1.addr, mintAmount: BigInt(5e6), minReceived: BigInt(0) },
+        { receiverAddr: user2.addr, mintAmount: BigInt(3e6), minReceived: BigInt(0) },
+      ];
+      const totalMintAmount = BigInt(8e6);
+      const expectedReceived = mints.map(({ mintAmount }) =>
+        mulScale(mulScale(mintAmount, oldXAlgoCirculatingSupply, oldAlgoBalance), ONE_16_DP - premium, ONE_16_DP),
+      );
+
+      // balances before
+      const user1XAlgoBalanceB = await getAssetBalance(algodClient, user1.addr, xAlgoId);
+      const user2XAlgoBalanceB = await getAssetBalance(algodClient, user2.addr, xAlgoId);
+
+      // immediate mint batch
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const txns = [
+        prepareXAlgoConsensusDummyCall(xAlgoConsensusABI, xAlgoAppId, user1.addr, [], await getParams(algodClient)),
+        ...prepareImmediateMintBatchFromXAlgoConsensus(
+          xAlgoConsensusABI,
+          xAlgoAppId,
+          xAlgoId,
+          user1.addr,
+          mints,
+          proposerAddrs,
+          await getParams(algodClient),
+        ),
+      ];
+      const [, , txId] = await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => user1.sk),
+      );
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+
+      // balances after
+      const { algoBalance, xAlgoCirculatingSupply } = await getXAlgoRate();
+      expect(algoBalance).toEqual(oldAlgoBalance + totalMintAmount);
+      expect(xAlgoCirculatingSupply).toEqual(oldXAlgoCirculatingSupply + expectedReceived[0] + expectedReceived[1]);
+      const user1XAlgoBalanceA = await getAssetBalance(algodClient, user1.addr, xAlgoId);
+      const user2XAlgoBalanceA = await getAssetBalance(algodClient, user2.addr, xAlgoId);
+      expect(user1XAlgoBalanceA).toEqual(user1XAlgoBalanceB + expectedReceived[0]);
+      expect(user2XAlgoBalanceA).toEqual(user2XAlgoBalanceB + expectedReceived[1]);
+
+      // xALGO transfers follow the allocations to proposers
+      const { txn: xAlgoTransfer0 } = txInfo["inner-txns"][txInfo["inner-txns"].length - 2].txn;
+      const { txn: xAlgoTransfer1 } = txInfo["inner-txns"][txInfo["inner-txns"].length - 1].txn;
+      expect(xAlgoTransfer0.type).toEqual("axfer");
+      expect(xAlgoTransfer0.aamt).toEqual(Number(expectedReceived[0]));
+      expect(xAlgoTransfer0.arcv).toEqual(decodeAddress(user1.addr).publicKey);
+      expect(xAlgoTransfer1.type).toEqual("axfer");
+      expect(xAlgoTransfer1.aamt).toEqual(Number(expectedReceived[1]));
+      expect(xAlgoTransfer1.arcv).toEqual(decodeAddress(user2.addr).publicKey);
+    });
+  });
+
   describe("delayed mint", () => {
     test("fails when delay mint is paused", async () => {
       // pause delay mint
@@ -2012,7 +2402,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining('"can_delay_mint"; app_global_get; assert'),
+        message: failedAt('"can_delay_mint"; app_global_get; assert'),
       });
 
       // resume delay mint
@@ -2050,7 +2440,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
 
       // send algo to proposer
@@ -2072,7 +2462,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; ==; assert"),
+        message: failedAt("frame_dig -1; ==; assert"),
       });
     });
 
@@ -2097,7 +2487,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; <=; assert"),
+        message: failedAt("app_global_get; <=; assert"),
       });
     });
 
@@ -2122,12 +2512,16 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("// 2; ==; assert"),
+        message: failedAt("// 2; ==; assert"),
       });
     });
 
     test("succeeds when receiver is sender", async () => {
-      await fundAccountWithAlgo(algodClient, getApplicationAddress(xAlgoAppId), delayMintBoxCost);
+      await fundAccountWithAlgo(
+        algodClient,
+        getApplicationAddress(xAlgoAppId),
+        delayMintBoxCost + delayMintNonceBoxCost,
+      );
 
       // airdrop rewards
       const additionalRewards = BigInt(5e6);
@@ -2195,6 +2589,11 @@ describe("Algo Consensus V3", () => {
       ]);
       expect(box.value).toEqual(boxValue);
 
+      // verify next nonce
+      const nonceBoxName = Uint8Array.from([...enc.encode("nc"), ...decodeAddress(user1.addr).publicKey]);
+      const nonceBox = await algodClient.getApplicationBoxByName(xAlgoAppId, nonceBoxName).do();
+      expect(nonceBox.value).toEqual(encodeUint64(1));
+
       // balances after
       const { algoBalance, xAlgoCirculatingSupply, proposersBalances } = await getXAlgoRate();
       expect(algoBalance).toEqual(oldAlgoBalance);
@@ -2238,7 +2637,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -2268,7 +2667,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("// 2; ==; assert"),
+        message: failedAt("// 2; ==; assert"),
       });
     });
 
@@ -2312,6 +2711,11 @@ describe("Algo Consensus V3", () => {
         ...encodeUint64(round + BigInt(320)),
       ]);
       expect(box.value).toEqual(boxValue);
+
+      // verify next nonce
+      const nonceBoxName = Uint8Array.from([...enc.encode("nc"), ...decodeAddress(user1.addr).publicKey]);
+      const nonceBox = await algodClient.getApplicationBoxByName(xAlgoAppId, nonceBoxName).do();
+      expect(nonceBox.value).toEqual(encodeUint64(2));
     });
 
     test("fails when box is already used", async () => {
@@ -2334,13 +2738,44 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("box_create; assert"),
+        message: failedAt("box_create; assert"),
       });
     });
-  });
 
-  describe("claim delayed mint", () => {
-    test.each([{ length: 30 }, { length: 34 }])(`fails when address length is $length bytes`, async ({ length }) => {
+    test("succeeds and wraps next nonce around after highest", async () => {
+      await fundAccountWithAlgo(algodClient, getApplicationAddress(xAlgoAppId), delayMintBoxCost);
+
+      // delayed mint
+      const highestNonce = Uint8Array.from([255, 255]);
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const txns = [
+        prepareXAlgoConsensusDummyCall(xAlgoConsensusABI, xAlgoAppId, user1.addr, [], await getParams(algodClient)),
+        ...prepareDelayedMintFromXAlgoConsensus(
+          xAlgoConsensusABI,
+          xAlgoAppId,
+          user1.addr,
+          user1.addr,
+          BigInt(1e6),
+          highestNonce,
+          proposerAddrs,
+          await getParams(algodClient),
+        ),
+      ];
+      await submitGroupTransaction(
+        algodClient,
+        txns,
+        txns.map(() => user1.sk),
+      );
+
+      // verify next nonce
+      const nonceBoxName = Uint8Array.from([...enc.encode("nc"), ...decodeAddress(user1.addr).publicKey]);
+      const nonceBox = await algodClient.getApplicationBoxByName(xAlgoAppId, nonceBoxName).do();
+      expect(nonceBox.value).toEqual(encodeUint64(0));
+    });
+  });
+
+  describe("claim delayed mint", () => {
+    test.each([{ length: 30 }, { length: 34 }])(`fails when address length is $length bytes`, async ({ length }) => {
       const minterAddr = getRandomBytes(length);
       const nonce = getRandomBytes(2);
       const params = await getParams(algodClient);
@@ -2352,7 +2787,7 @@ describe("Algo Consensus V3", () => {
         suggestedParams: params,
       });
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -2368,7 +2803,7 @@ describe("Algo Consensus V3", () => {
         suggestedParams: params,
       });
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("// 2; ==; assert"),
+        message: failedAt("// 2; ==; assert"),
       });
     });
 
@@ -2387,7 +2822,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user2.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("store 36; load 37; assert"),
+        message: failedAt("store 32; load 33; assert"),
       });
     });
 
@@ -2405,7 +2840,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user2.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract_uint64; >=; assert"),
+        message: failedAt("extract_uint64; >=; assert"),
       });
     });
 
@@ -2558,7 +2993,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -2587,7 +3022,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("global CurrentApplicationAddress; ==; assert"),
+        message: failedAt("global CurrentApplicationAddress; ==; assert"),
       });
     });
 
@@ -2616,7 +3051,7 @@ describe("Algo Consensus V3", () => {
           txns.map(() => user1.sk),
         ),
       ).rejects.toMatchObject({
-        message: expect.stringContaining("frame_dig -1; >=; assert"),
+        message: failedAt("frame_dig -2; >=; assert"),
       });
     });
 
@@ -2838,6 +3273,154 @@ describe("Algo Consensus V3", () => {
     });
   });
 
+  describe("rebalance proposers", () => {
+    beforeAll(async () => {
+      // airdrop rewards to first proposer so proposers are imbalanced
+      await fundAccountWithAlgo(algodClient, proposer0.addr, BigInt(20e6), await getParams(algodClient));
+
+      // claim fee so rewards are synced before rebalancing
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const tx = prepareClaimXAlgoConsensusFee(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        admin.addr,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, user1.sk);
+    });
+
+    test("fails when proposers are the same", async () => {
+      const tx = prepareRebalanceXAlgoConsensusProposers(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        0,
+        0,
+        1,
+        proposer0.addr,
+        proposer0.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("!=; assert"),
+      });
+    });
+
+    test("fails when proposer does not exist", async () => {
+      const tx = prepareRebalanceXAlgoConsensusProposers(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        0,
+        2,
+        1,
+        proposer0.addr,
+        proposer1.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("app_global_get; <; assert"),
+      });
+    });
+
+    test("fails when sending from lower balance proposer", async () => {
+      const { proposersBalances } = await getXAlgoRate();
+      expect(proposersBalances[0]).toBeGreaterThan(proposersBalances[1]);
+
+      const tx = prepareRebalanceXAlgoConsensusProposers(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        1,
+        0,
+        1,
+        proposer1.addr,
+        proposer0.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt(">; assert"),
+      });
+    });
+
+    test("fails when amount exceeds half the difference", async () => {
+      const { proposersBalances } = await getXAlgoRate();
+      const amount = (proposersBalances[0] - proposersBalances[1]) / BigInt(2) + BigInt(1);
+
+      const tx = prepareRebalanceXAlgoConsensusProposers(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        0,
+        1,
+        amount,
+        proposer0.addr,
+        proposer1.addr,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("/; <=; assert"),
+      });
+    });
+
+    test("succeeds for anyone", async () => {
+      // balances before
+      const {
+        algoBalance: oldAlgoBalance,
+        xAlgoCirculatingSupply: oldXAlgoCirculatingSupply,
+        proposersBalances: oldProposersBalance,
+      } = await getXAlgoRate();
+      const amount = (oldProposersBalance[0] - oldProposersBalance[1]) / BigInt(2);
+
+      // state before
+      let state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      const { lastProposersActiveBalance: oldLastProposersActiveBalance, totalUnclaimedFees: oldTotalUnclaimedFees } =
+        state;
+
+      // rebalance
+      const tx = prepareRebalanceXAlgoConsensusProposers(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user2.addr,
+        0,
+        1,
+        amount,
+        proposer0.addr,
+        proposer1.addr,
+        await getParams(algodClient),
+      );
+      const txId = await submitTransaction(algodClient, tx, user2.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      const { txn: transfer } = txInfo["inner-txns"][0].txn;
+
+      // state after
+      state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.lastProposersActiveBalance).toEqual(oldLastProposersActiveBalance);
+      expect(state.totalUnclaimedFees).toEqual(oldTotalUnclaimedFees);
+
+      // balances after
+      const { algoBalance, xAlgoCirculatingSupply, proposersBalances } = await getXAlgoRate();
+      expect(algoBalance).toEqual(oldAlgoBalance);
+      expect(xAlgoCirculatingSupply).toEqual(oldXAlgoCirculatingSupply);
+      expect(proposersBalances[0]).toEqual(oldProposersBalance[0] - amount);
+      expect(proposersBalances[1]).toEqual(oldProposersBalance[1] + amount);
+      expect(proposersBalances[0] - BigInt(1)).toBeLessThanOrEqual(proposersBalances[1]);
+      expect(txInfo["inner-txns"].length).toEqual(1);
+      expect(transfer.type).toEqual("pay");
+      expect(transfer.amt).toEqual(Number(amount));
+      expect(transfer.snd).toEqual(decodeAddress(proposer0.addr).publicKey);
+      expect(transfer.rcv).toEqual(decodeAddress(proposer1.addr).publicKey);
+
+      // event is RebalanceProposers(uint64,uint64,uint64)
+      const [eventLog] = txInfo["logs"];
+      expect(Buffer.from(eventLog.slice(0, 4)).toString("hex")).toEqual("f15913f1");
+      const eventArgs = ABIType.from("(uint64,uint64,uint64)").decode(eventLog.slice(4));
+      expect(eventArgs).toEqual([BigInt(0), BigInt(1), amount]);
+    });
+  });
+
   describe("update fee", () => {
     test("fails for non-admin", async () => {
       const proposerAddrs = [proposer0.addr, proposer1.addr];
@@ -2850,7 +3433,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -2866,7 +3449,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("10000; <=; assert"),
+        message: failedAt("10000; <=; assert"),
       });
     });
 
@@ -3021,6 +3604,296 @@ describe("Algo Consensus V3", () => {
       expect(transfer.snd).toEqual(decodeAddress(getApplicationAddress(xAlgoAppId)).publicKey);
       expect(transfer.rcv).toEqual(decodeAddress(admin.addr).publicKey);
     });
+
+    test("fails to update fee settlement for non-admin", async () => {
+      const tx = prepareUpdateXAlgoConsensusFeeSettlement(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        user1.addr,
+        true,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("app_global_get; ==; assert"),
+      });
+    });
+
+    test("fails to settle in xALGO when admin is not opted into xALGO", async () => {
+      // new admin is not opted into xALGO
+      const newAdmin = generateAccount();
+      await fundAccountWithAlgo(algodClient, newAdmin.addr, BigInt(1e6), await getParams(algodClient));
+      let tx = prepareUpdateXAlgoConsensusAdmin(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        "admin",
+        admin.addr,
+        newAdmin.addr,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, admin.sk);
+
+      tx = prepareUpdateXAlgoConsensusFeeSettlement(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        newAdmin.addr,
+        true,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, newAdmin.sk)).rejects.toMatchObject({
+        message: failedAt("store 57; load 58; assert"),
+      });
+
+      // restore old admin
+      tx = prepareUpdateXAlgoConsensusAdmin(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        "admin",
+        newAdmin.addr,
+        admin.addr,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, newAdmin.sk);
+    });
+
+    test("succeeds in xALGO", async () => {
+      // settle fees in xALGO
+      let tx = prepareUpdateXAlgoConsensusFeeSettlement(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        admin.addr,
+        true,
+        await getParams(algodClient),
+      );
+      let txId = await submitTransaction(algodClient, tx, admin.sk);
+      let txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      let state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.settleFeesInXAlgo).toEqual(true);
+
+      // event is UpdateFeeSettlement(bool)
+      let [eventLog] = txInfo["logs"];
+      expect(Buffer.from(eventLog.slice(0, 4)).toString("hex")).toEqual("327f3903");
+      expect(ABIType.from("(bool)").decode(eventLog.slice(4))).toEqual([true]);
+
+      // airdrop 10 ALGO rewards (%fee of which will be claimable by admin)
+      const additionalRewards = BigInt(10e6);
+      await fundAccountWithAlgo(algodClient, proposer0.addr, additionalRewards, await getParams(algodClient));
+      const additionalRewardsFee = mulScale(additionalRewards, fee, ONE_4_DP);
+
+      // balances before
+      const adminAlgoBalanceB = await getAlgoBalance(algodClient, admin.addr);
+      const adminXAlgoBalanceB = await getAssetBalance(algodClient, admin.addr, xAlgoId);
+      const {
+        algoBalance: oldAlgoBalance,
+        xAlgoCirculatingSupply: oldXAlgoCirculatingSupply,
+        proposersBalances: oldProposersBalance,
+      } = await getXAlgoRate();
+
+      // state before
+      state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      const { lastProposersActiveBalance: oldLastProposersActiveBalance, totalUnclaimedFees: oldTotalUnclaimedFees } =
+        state;
+      const fees = oldTotalUnclaimedFees + additionalRewardsFee;
+      const mintAmount = mulScale(fees, oldXAlgoCirculatingSupply, oldAlgoBalance);
+
+      // claim fee
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      tx = prepareClaimXAlgoConsensusFeeInXAlgo(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        admin.addr,
+        xAlgoId,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      txId = await submitTransaction(algodClient, tx, user1.sk);
+      txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      expect(txInfo["inner-txns"].length).toEqual(1);
+      const { txn: transfer } = txInfo["inner-txns"][0].txn;
+      state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      const { lastProposersActiveBalance, totalUnclaimedFees } = state;
+      // fees stay with the proposers
+      expect(lastProposersActiveBalance).toEqual(oldLastProposersActiveBalance + additionalRewards);
+      expect(totalUnclaimedFees).toEqual(BigInt(0));
+
+      // balances after
+      const adminAlgoBalanceA = await getAlgoBalance(algodClient, admin.addr);
+      const adminXAlgoBalanceA = await getAssetBalance(algodClient, admin.addr, xAlgoId);
+      const { algoBalance, xAlgoCirculatingSupply, proposersBalances } = await getXAlgoRate();
+      expect(adminAlgoBalanceA).toEqual(adminAlgoBalanceB);
+      expect(adminXAlgoBalanceA).toEqual(adminXAlgoBalanceB + mintAmount);
+      expect(algoBalance).toEqual(oldAlgoBalance + fees);
+      expect(xAlgoCirculatingSupply).toEqual(oldXAlgoCirculatingSupply + mintAmount);
+      expect(proposersBalances).toEqual(oldProposersBalance);
+      expect(transfer.type).toEqual("axfer");
+      expect(transfer.xaid).toEqual(xAlgoId);
+      expect(transfer.aamt).toEqual(Number(mintAmount));
+      expect(transfer.arcv).toEqual(decodeAddress(admin.addr).publicKey);
+
+      // restore settlement in ALGO
+      tx = prepareUpdateXAlgoConsensusFeeSettlement(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        xAlgoId,
+        admin.addr,
+        false,
+        await getParams(algodClient),
+      );
+      txId = await submitTransaction(algodClient, tx, admin.sk);
+      txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.settleFeesInXAlgo).toEqual(false);
+      [eventLog] = txInfo["logs"];
+      expect(ABIType.from("(bool)").decode(eventLog.slice(4))).toEqual([false]);
+    });
+  });
+
+  describe("rate checkpoints", () => {
+    test("fails for non-admin", async () => {
+      const tx = prepareUpdateXAlgoConsensusRateCheckpointInterval(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        1,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
+        message: failedAt("app_global_get; ==; assert"),
+      });
+    });
+
+    test("succeeds in enabling for admin", async () => {
+      // fund box
+      await fundAccountWithAlgo(
+        algodClient,
+        getApplicationAddress(xAlgoAppId),
+        rateCheckpointsBoxCost,
+        await getParams(algodClient),
+      );
+
+      // update rate checkpoint interval
+      const rateCheckpointInterval = BigInt(1);
+      const tx = prepareUpdateXAlgoConsensusRateCheckpointInterval(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        admin.addr,
+        rateCheckpointInterval,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, admin.sk);
+
+      // verify state and box
+      const state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.rateCheckpointInterval).toEqual(rateCheckpointInterval);
+      expect(state.lastRateCheckpointRound).toEqual(BigInt(0));
+      expect(state.nextRateCheckpointIndex).toEqual(BigInt(0));
+      const box = await algodClient.getApplicationBoxByName(xAlgoAppId, enc.encode("rc")).do();
+      expect(box.value).toEqual(new Uint8Array(1008));
+    });
+
+    test("publishes rate when interval has passed", async () => {
+      // claim fee which syncs
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const tx = prepareClaimXAlgoConsensusFee(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        admin.addr,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      const txId = await submitTransaction(algodClient, tx, user1.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      const round = BigInt(txInfo["confirmed-round"]);
+
+      // verify state
+      const state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.lastRateCheckpointRound).toEqual(round);
+      expect(state.nextRateCheckpointIndex).toEqual(BigInt(1));
+
+      // verify checkpoint
+      const { algoBalance, xAlgoCirculatingSupply } = await getXAlgoRate();
+      const box = await algodClient.getApplicationBoxByName(xAlgoAppId, enc.encode("rc")).do();
+      expect(box.value.subarray(0, 24)).toEqual(
+        Uint8Array.from([
+          ...encodeUint64(round),
+          ...encodeUint64(algoBalance),
+          ...encodeUint64(xAlgoCirculatingSupply),
+        ]),
+      );
+      expect(box.value.subarray(24)).toEqual(new Uint8Array(984));
+    });
+
+    test("does not publish rate before interval has passed", async () => {
+      // increase interval
+      let tx = prepareUpdateXAlgoConsensusRateCheckpointInterval(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        admin.addr,
+        1000,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, admin.sk);
+      const oldState = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+
+      // claim fee which syncs
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      tx = prepareClaimXAlgoConsensusFee(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        user1.addr,
+        admin.addr,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      await submitTransaction(algodClient, tx, user1.sk);
+
+      // verify state
+      const state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.lastRateCheckpointRound).toEqual(oldState.lastRateCheckpointRound);
+      expect(state.nextRateCheckpointIndex).toEqual(oldState.nextRateCheckpointIndex);
+    });
+  });
+
+  describe("views", () => {
+    test("returns proposer records and scheduled update", async () => {
+      const atc = new AtomicTransactionComposer();
+      for (const [methodName, methodArgs] of [
+        ["get_proposer_records", [0]],
+        ["get_scheduled_update", []],
+      ] as const) {
+        atc.addMethodCall({
+          sender: user1.addr,
+          signer: makeBasicAccountTransactionSigner(user1),
+          appID: xAlgoAppId,
+          method: getMethodByName(xAlgoConsensusABI.methods, methodName),
+          methodArgs: [...methodArgs],
+          suggestedParams: await getParams(algodClient),
+        });
+      }
+      const simReq = new modelsv2.SimulateRequest({
+        txnGroups: [],
+        allowUnnamedResources: true,
+      });
+      const { methodResults } = await atc.simulate(algodClient, simReq);
+      const records = Uint8Array.from(methodResults[0].returnValue as any);
+      const scheduledUpdate = Uint8Array.from(methodResults[1].returnValue as any);
+
+      // records of 88 bytes for each proposer
+      const { proposersBalances } = await getXAlgoRate();
+      expect(records.length).toEqual(88 * 2);
+      for (const [i, { addr }] of [proposer0, proposer1].entries()) {
+        const record = records.subarray(88 * i, 88 * (i + 1));
+        const { "min-balance": minBalance } = await algodClient.accountInformation(addr).do();
+        expect(record.subarray(0, 32)).toEqual(decodeAddress(addr).publicKey);
+        expect(decodeUint64(record.subarray(32, 40), "bigint")).toEqual(proposersBalances[i]);
+        expect(decodeUint64(record.subarray(40, 48), "mixed")).toEqual(minBalance);
+      }
+      expect(scheduledUpdate).toEqual(new Uint8Array(72));
+    });
   });
 
   test("burns everything", async () => {
@@ -3087,6 +3960,120 @@ describe("Algo Consensus V3", () => {
     expect(xAlgoCirculatingSupply).toEqual(BigInt(0));
   });
 
+  describe("remove proposer", () => {
+    test("fails for non register admin", async () => {
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const tx = prepareRemoveProposerFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        admin.addr,
+        0,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
+        message: failedAt("callsub label77; assert"),
+      });
+    });
+
+    test("fails when proposer does not exist", async () => {
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+      const tx = prepareRemoveProposerFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        0,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      tx.appArgs![1] = Uint8Array.from([2]);
+      await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
+        message: failedAt("<=; assert"),
+      });
+    });
+
+    test("succeeds for register admin, moving last proposer into its place", async () => {
+      const proposerAddrs = [proposer0.addr, proposer1.addr];
+
+      // balances before
+      const {
+        algoBalance: oldAlgoBalance,
+        xAlgoCirculatingSupply: oldXAlgoCirculatingSupply,
+        proposersBalances: oldProposersBalances,
+      } = await getXAlgoRate();
+      const appAlgoBalanceB = await getAlgoBalance(algodClient, getApplicationAddress(xAlgoAppId));
+
+      // remove first proposer
+      const tx = prepareRemoveProposerFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        0,
+        proposerAddrs,
+        await getParams(algodClient),
+      );
+      const txId = await submitTransaction(algodClient, tx, registerAdmin.sk);
+      const txInfo = await algodClient.pendingTransactionInformation(txId).do();
+      const [keyReg, close, allocation, refund] = txInfo["inner-txns"].map(({ txn }: any) => txn.txn);
+
+      // state after
+      const state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.numProposers).toEqual(BigInt(1));
+
+      // balances after, min balance of removed proposer is now active
+      const { algoBalance, xAlgoCirculatingSupply, proposersBalances } = await getXAlgoRate();
+      const appAlgoBalanceA = await getAlgoBalance(algodClient, getApplicationAddress(xAlgoAppId));
+      expect(algoBalance).toEqual(oldAlgoBalance + BigInt(0.1e6));
+      expect(xAlgoCirculatingSupply).toEqual(oldXAlgoCirculatingSupply);
+      expect(proposersBalances).toEqual([oldProposersBalances[0] + oldProposersBalances[1]]);
+      expect(await getAlgoBalance(algodClient, proposer0.addr)).toEqual(BigInt(0));
+
+      // check inner txns
+      expect(txInfo["inner-txns"].length).toEqual(4);
+      expect(keyReg.type).toEqual("keyreg");
+      expect(keyReg.snd).toEqual(decodeAddress(proposer0.addr).publicKey);
+      expect(close.type).toEqual("pay");
+      expect(close.snd).toEqual(decodeAddress(proposer0.addr).publicKey);
+      expect(close.close).toEqual(decodeAddress(getApplicationAddress(xAlgoAppId)).publicKey);
+      expect(allocation.amt).toEqual(Number(oldProposersBalances[0]));
+      expect(allocation.rcv).toEqual(decodeAddress(proposer1.addr).publicKey);
+      expect(refund.amt).toEqual(Number(appAlgoBalanceB - appAlgoBalanceA));
+      expect(refund.rcv).toEqual(decodeAddress(registerAdmin.addr).publicKey);
+
+      // verify proposers box
+      const proposersBox = await algodClient.getApplicationBoxByName(xAlgoAppId, enc.encode("pr")).do();
+      const proposers = new Uint8Array(960);
+      proposers.set(decodeAddress(proposer1.addr).publicKey, 0);
+      expect(proposersBox.value).toEqual(proposers);
+
+      // verify added proposer box deleted
+      const boxName = Uint8Array.from([...enc.encode("ap"), ...decodeAddress(proposer0.addr).publicKey]);
+      await expect(algodClient.getApplicationBoxByName(xAlgoAppId, boxName).do()).rejects.toMatchObject({
+        status: 404,
+      });
+    });
+
+    test("fails when removing last proposer", async () => {
+      const tx = prepareRemoveProposerFromXAlgoConsensus(
+        xAlgoConsensusABI,
+        xAlgoAppId,
+        registerAdmin.addr,
+        0,
+        [proposer1.addr],
+        await getParams(algodClient),
+      );
+      await expect(submitTransaction(algodClient, tx, registerAdmin.sk)).rejects.toMatchObject({
+        message: failedAt("store 54; load 54; assert"),
+      });
+
+      // proposer is kept
+      const state = await parseXAlgoConsensusGlobalState(algodClient, xAlgoAppId);
+      expect(state.numProposers).toEqual(BigInt(1));
+      const proposersBox = await algodClient.getApplicationBoxByName(xAlgoAppId, enc.encode("pr")).do();
+      expect(proposersBox.value.subarray(0, 32)).toEqual(decodeAddress(proposer1.addr).publicKey);
+    });
+  });
+
   describe("update smart contract", () => {
     const boxName = "sc";
 
@@ -3112,7 +4099,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("store 1; load 2; assert"),
+        message: failedAt("store 46; load 47; assert"),
       });
     });
 
@@ -3137,7 +4124,7 @@ describe("Algo Consensus V3", () => {
         suggestedParams: await getParams(algodClient),
       });
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("// 32; ==; assert"),
+        message: failedAt("// 32; ==; assert"),
       });
     });
 
@@ -3189,7 +4176,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 
@@ -3205,7 +4192,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, admin.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("extract_uint64; >; assert"),
+        message: failedAt("extract_uint64; >; assert"),
       });
     });
 
@@ -3230,7 +4217,7 @@ describe("Algo Consensus V3", () => {
         await getParams(algodClient),
       );
       await expect(submitTransaction(algodClient, tx, user1.sk)).rejects.toMatchObject({
-        message: expect.stringContaining("app_global_get; ==; assert"),
+        message: failedAt("app_global_get; ==; assert"),
       });
     });
 